@@ -17,10 +17,11 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 from __future__ import annotations
 
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, TYPE_CHECKING
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from backup_snapshot import BackupSnapshot
@@ -54,6 +55,9 @@ class RetentionPolicy:
 class BackupRepository(ABC):
     """Abstract class for backup repository"""
 
+    # Whether the repository offers refresh_snapshot_catalog() and query_snapshots()
+    has_snapshot_catalog: bool = False
+
     @abstractmethod
     def initialize(self) -> bool:
         """Initialize the backup repository"""
@@ -67,8 +71,16 @@ class BackupRepository(ABC):
     @abstractmethod
     def backup_target(self,
                       targets: List[BackupTarget],
-                      tags: Optional[List[str]] = None) -> Dict:
-        """Create a new backup"""
+                      tags: Optional[List[str]] = None,
+                      progress_callback: Optional[Callable[[Dict], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict:
+        """
+        Create a new backup
+
+        progress_callback receives progress events while the backup runs;
+        setting cancel_event stops it early. Implementations that cannot
+        report progress or be interrupted may ignore either.
+        """
         ...
 
     @abstractmethod
@@ -15,23 +15,46 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, TYPE_CHECKING
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
 
 from typing_extensions import Self
 
 if TYPE_CHECKING:
     from .backup_repository import BackupRepository
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+@lru_cache(maxsize=4096)
+def _path(text: str) -> Path:
+    """Path objects for snapshot paths, shared between the snapshots listing them"""
+    return Path(text)
+
 
 class BackupSnapshot():
-    """Interface for backup snapshots"""
+    """
+    Interface for backup snapshots
+
+    Long-running processes keep hundreds of thousands of snapshots
+    resident, so the representation is compact: attributes live in
+    __slots__, the time is kept as integer nanoseconds since the epoch
+    plus its tzinfo, and paths and tags start as tuples that snapshots
+    listing the same ones share (see from_listing). ``timestamp`` builds
+    its datetime when read; ``paths`` and ``tags`` turn into lists on
+    first read and keep them, so the lists returned can be changed in
+    place as before. Subclasses that need more attributes declare them in
+    their own ``__slots__`` (or leave it out to get a ``__dict__``).
+    """
+    __slots__ = ("repo", "id", "hostname", "size", "_time_ns", "_tzinfo", "_paths", "_tags")
+
     repo: 'BackupRepository'
     id: str
-    timestamp: datetime
-    paths: list[Path]
-    tags: List[str]
+    hostname: Optional[str]
     size: int
 
     def __init__(self, repo: 'BackupRepository', snapshot_id: str, timestamp: datetime, paths: list[Path]):
@@ -39,6 +62,86 @@ class BackupSnapshot():
         self.id = snapshot_id
         self.timestamp = timestamp
         self.paths = paths
+        self._tags = []
+        self.hostname = None
+
+    @classmethod
+    def from_listing(cls, repo: 'BackupRepository', snapshot_id: str, time_ns: int, zone: Optional[tzinfo],
+                     paths: Tuple[str, ...], tags: Tuple[str, ...], hostname: Optional[str] = None) -> Self:
+        """
+        Create a snapshot straight from its compact fields
+
+        Used when decoding listings; the tuples and strings are stored as
+        given, so callers can share (intern) them between snapshots.
+
+        Args:
+            repo: Repository the snapshot belongs to
+            snapshot_id: Snapshot ID
+            time_ns: Snapshot time in nanoseconds since the epoch
+            zone: Zone the time is shown in (None for naive local times)
+            paths: Backed up paths
+            tags: Snapshot tags
+            hostname: Host the snapshot was taken on, if known
+        """
+        snapshot = cls.__new__(cls)
+        snapshot.repo = repo
+        snapshot.id = snapshot_id
+        snapshot._time_ns = time_ns
+        snapshot._tzinfo = zone
+        snapshot._paths = paths
+        snapshot._tags = tags
+        snapshot.hostname = hostname
+        return snapshot
+
+    @property
+    def timestamp(self) -> datetime:
+        """Snapshot time, to the microsecond"""
+        time_ns = self._time_ns
+        if time_ns is None:
+            return None
+        if self._tzinfo is None:
+            return _NAIVE_EPOCH + timedelta(microseconds=time_ns // 1000)
+        return (_EPOCH + timedelta(microseconds=time_ns // 1000)).astimezone(self._tzinfo)
+
+    @timestamp.setter
+    def timestamp(self, value: Optional[datetime]):
+        if value is None:
+            self._time_ns = self._tzinfo = None
+        elif value.utcoffset() is None:
+            self._time_ns = (value - _NAIVE_EPOCH) // _MICROSECOND * 1000
+            self._tzinfo = None
+        else:
+            self._time_ns = (value - _EPOCH) // _MICROSECOND * 1000
+            self._tzinfo = value.tzinfo
+
+    @property
+    def timestamp_ns(self) -> Optional[int]:
+        """Snapshot time in nanoseconds since the epoch (wall clock for naive times)"""
+        return self._time_ns
+
+    @property
+    def paths(self) -> list[Path]:
+        """Backed up paths"""
+        paths = self._paths
+        if type(paths) is tuple:
+            paths = self._paths = [_path(p) if isinstance(p, str) else p for p in paths]
+        return paths
+
+    @paths.setter
+    def paths(self, value: list[Path]):
+        self._paths = value
+
+    @property
+    def tags(self) -> List[str]:
+        """Snapshot tags"""
+        tags = self._tags
+        if type(tags) is tuple:
+            tags = self._tags = list(tags)
+        return tags
+
+    @tags.setter
+    def tags(self, value: List[str]):
+        self._tags = value
 
     def restore(self, target_path: Optional[Path] = None) -> str:
         """Restore this snapshot"""
@@ -20,6 +20,14 @@ from typing import List
 from .file_selections import FileSelection
 
 
+# Parent snapshot policies (BackupTarget.parent); any other value pins that snapshot ID.
+# PARENT_AUTO only lists snapshots through the snapshot catalog, so without one
+# (or a recent listing) it behaves like PARENT_RESTIC.
+PARENT_AUTO = "auto"  # newest snapshot of this host with the target's tags and path set
+PARENT_RESTIC = "restic"  # let restic pick the parent itself
+PARENT_NONE = "none"  # no parent: restic re-reads every file (--force)
+
+
 class BackupTarget:
     """Represents a backup target with paths and metadata"""
 
@@ -27,6 +35,8 @@ class BackupTarget:
                  selection: FileSelection = None,
                  tags: List[str] = None,
                  name: str = None,
+                 stream_file_list: bool = False,
+                 parent: str = PARENT_AUTO,
                  **kwargs):
         """
         Initialize a backup target
@@ -35,6 +45,10 @@ class BackupTarget:
             selection: FileSelection instance defining what to backup
             tags: Optional list of tags to associate with this backup target
             name: Optional name for the backup target (for backward compatibility)
+            stream_file_list: Feed restic the file list computed by the selection
+                instead of letting restic walk the paths itself
+            parent: Parent snapshot policy (PARENT_AUTO, PARENT_RESTIC,
+                PARENT_NONE) or the ID of the snapshot to use as parent
             **kwargs: Additional parameters for backward compatibility
         """
         # Handle backward compatibility for old API
@@ -74,6 +88,8 @@ class BackupTarget:
         self.selection = selection
         self.tags = tags or []
         self.name = name
+        self.stream_file_list = stream_file_list
+        self.parent = parent or PARENT_AUTO
 
     def validate(self) -> bool:
         """
@@ -1080,6 +1080,96 @@ def targets_edit(
         raise typer.Exit(1)
 
 
+@targets_app.command("analyze")
+def targets_analyze(
+        name: Annotated[str, typer.Argument(help="Target name", autocompletion=target_name_completer)],
+        top: Annotated[int, typer.Option("--top", "-n", min=1, help="Number of most expensive patterns to list")] = 20,
+        json_output: Annotated[bool, typer.Option("--json", help="Output in JSON format")] = False,
+        config_dir: Annotated[Optional[Path], typer.Option("--config-dir", help="Configuration directory")] = None,
+        verbose: Annotated[bool, typer.Option("--verbose", "-v", help="Enable verbose output")] = False,
+) -> None:
+    """Profile which of a target's patterns match files and what they cost."""
+    setup_logging(verbose, config_dir)
+    try:
+        manager = _get_service_manager_for_command(config_dir)
+        analyze_method = _get_service_method(manager, "analyze_target_patterns")
+        if not analyze_method:
+            show_error_panel("Not Implemented", "Pattern analysis is not available in this build.")
+            raise typer.Exit(1)
+
+        with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                TimeElapsedColumn(),
+                console=console,
+        ) as progress:
+            task = progress.add_task(f"Profiling patterns of '{name}'...", total=None)
+            analysis = _call_service_method(analyze_method, target_name=name) or {}
+            progress.remove_task(task)
+
+        if json_output:
+            console.print_json(data=analysis)
+            return
+
+        patterns = analysis.get("patterns") or []
+        if not patterns:
+            show_info_panel("No Patterns", f"Target '{name}' has no include or exclude patterns to analyze.")
+            return
+
+        table = Table(title=f"Pattern Analysis: {name}")
+        table.add_column("Pattern", style="cyan", overflow="fold")
+        table.add_column("Kind", style="magenta")
+        table.add_column("Bucket")
+        table.add_column("Hits", justify="right")
+        table.add_column("First match", justify="right")
+        table.add_column("Dirs pruned", justify="right")
+        table.add_column("Evaluations", justify="right")
+        table.add_column("Time", style="green", justify="right")
+        for stats in sorted(patterns, key=lambda p: p.get("match_ns", 0), reverse=True)[:top]:
+            table.add_row(str(stats.get("pattern")), str(stats.get("kind")), str(stats.get("bucket")),
+                          f"{stats.get('hits', 0):,}", f"{stats.get('decisive_hits', 0):,}",
+                          f"{stats.get('directory_prunes', 0):,}", f"{stats.get('evaluations', 0):,}",
+                          f"{stats.get('match_ns', 0) / 1e6:.1f}ms")
+        console.print(table)
+
+        groups = analysis.get("groups") or []
+        if groups:
+            group_table = Table(title="Pattern Groups")
+            group_table.add_column("Group", style="cyan")
+            group_table.add_column("Kind", style="magenta")
+            group_table.add_column("Matched", justify="right")
+            group_table.add_column("Hits", justify="right")
+            for group in groups:
+                group_table.add_row(str(group.get("name")), str(group.get("kind")),
+                                    f"{group.get('matched', 0)}/{group.get('patterns', 0)}", f"{group.get('hits', 0):,}")
+            console.print(group_table)
+
+        unmatched = analysis.get("unmatched") or []
+        if unmatched:
+            console.print(f"🚫 Never matched ({len(unmatched)}): {', '.join(unmatched)}")
+        shadowed = analysis.get("shadowed") or []
+        if shadowed:
+            console.print(f"👥 Only matched files an earlier pattern already matched ({len(shadowed)}): {', '.join(shadowed)}")
+        covered = analysis.get("covered") or {}
+        for pattern, by in sorted(covered.items()):
+            console.print(f"♻️  '{pattern}' is redundant: every path it matches also matches '{by}'")
+        suggested = analysis.get("suggested_order") or []
+        if suggested:
+            console.print(f"⚡ Suggested pattern order: {', '.join(suggested[:top])}{' ...' if len(suggested) > top else ''}")
+        console.print(f"⏱️  Evaluated {analysis.get('files_evaluated', 0):,} file(s) in "
+                      f"{analysis.get('elapsed_seconds', 0):.2f}s")
+    except KeyboardInterrupt:
+        show_error_panel("Operation Cancelled", "Pattern analysis was cancelled by user")
+        raise typer.Exit(130)
+    except click.exceptions.Exit:
+        raise
+    except Exception as e:
+        show_error_panel("Target Analyze Error", f"Failed to analyze target '{name}': {e}")
+        if verbose:
+            console.print_exception()
+        raise typer.Exit(1)
+
+
 @targets_app.command("remove")
 def targets_remove(
         name: Annotated[str, typer.Argument(help="Target name", autocompletion=target_name_completer)],
@@ -2696,6 +2786,93 @@ def backup_verify(
         raise typer.Exit(1)
 
 
+@backup_app.command("estimate")
+def backup_estimate(
+        targets: Annotated[List[str], typer.Option("--target", "-t", help="Configured backup target to estimate (repeatable)",
+                                                   autocompletion=target_name_completer)],
+        repository: Annotated[Optional[str], typer.Option("--repository", "-r", help="Repository name or URI", autocompletion=repository_completer)] = None,
+        workers: Annotated[int, typer.Option("--workers", "-w", min=1, help="Number of parallel scanner threads")] = 1,
+        cache: Annotated[bool, typer.Option("--cache/--no-cache", help="Reuse cached results for directories unchanged since the last estimate")] = True,
+        sample: Annotated[Optional[float], typer.Option("--sample", min=0.1, help="Approximate by sampling for this many seconds instead of a full scan")] = None,
+        config_dir: Annotated[Optional[Path], typer.Option("--config-dir", help="Configuration directory")] = None,
+        verbose: Annotated[bool, typer.Option("--verbose", "-v", help="Enable verbose output")] = False,
+) -> None:
+    """Estimate how many files and bytes a backup of the given targets would include."""
+    setup_logging(verbose, config_dir)
+    try:
+        service_manager = _get_service_manager_for_command(config_dir)
+        estimate_method = _get_service_method(service_manager, "estimate_backup_size")
+        if not estimate_method:
+            show_error_panel("Not Implemented", "Backup size estimation is not available in this build.")
+            raise typer.Exit(1)
+
+        with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                TimeElapsedColumn(),
+                console=console,
+        ) as progress:
+            action = f"Sampling for {sample:g}s" if sample else "Scanning"
+            task = progress.add_task(f"{action} {len(targets)} target(s)...", total=None)
+            estimate = _call_service_method(estimate_method,
+                                            repository_input=repository or "",
+                                            target_names=list(targets),
+                                            max_workers=workers,
+                                            use_scan_cache=cache,
+                                            sample_seconds=sample) or {}
+            progress.remove_task(task)
+
+        sampled = bool(estimate.get("sampled"))
+
+        def cell(value, error=None, formatter=lambda n: f"{n:,}") -> str:
+            if not sampled:
+                return formatter(value)
+            return f"~{formatter(value)} ± {formatter(error)}" if error is not None else f"~{formatter(value)}"
+
+        table = Table(title="Backup Size Estimate (sampled)" if sampled else "Backup Size Estimate")
+        table.add_column("Target", style="cyan")
+        table.add_column("Files", style="magenta", justify="right")
+        table.add_column("Directories", style="magenta", justify="right")
+        table.add_column("Size", style="green", justify="right")
+        for target_name, stats in (estimate.get("targets") or {}).items():
+            table.add_row(str(target_name),
+                          cell(stats.get("file_count", 0), stats.get("file_count_error")),
+                          cell(stats.get("directory_count", 0)),
+                          cell(stats.get("total_size", 0), stats.get("total_size_error"), format_file_size))
+        table.add_row("[bold]Total[/bold]",
+                      cell(estimate.get("estimated_files", 0), estimate.get("estimated_files_error")),
+                      cell(estimate.get("estimated_directories", 0)),
+                      cell(estimate.get("estimated_bytes", 0), estimate.get("estimated_bytes_error"), format_file_size))
+        console.print(table)
+        if sampled:
+            console.print("📊 Sampled estimate; ± values are 95% confidence bounds, run without --sample for exact totals")
+
+        apparent_bytes = estimate.get("estimated_apparent_bytes")
+        if isinstance(apparent_bytes, int) and apparent_bytes != estimate.get("estimated_bytes", 0):
+            console.print(f"🔗 Hardlinks counted once; apparent size {format_file_size(apparent_bytes)}")
+        allocated_bytes = estimate.get("estimated_allocated_bytes")
+        if isinstance(allocated_bytes, int):
+            console.print(f"💾 Allocated on disk: {format_file_size(allocated_bytes)}")
+
+        scan_duration = estimate.get("scan_duration_seconds")
+        if isinstance(scan_duration, (int, float)):
+            if sampled:
+                console.print(f"⏱️  Sampled in {scan_duration:.2f}s")
+            else:
+                console.print(f"⏱️  Scanned in {scan_duration:.2f}s with {workers} worker(s)")
+
+    except KeyboardInterrupt:
+        show_error_panel("Operation Cancelled", "Estimation was cancelled by user")
+        raise typer.Exit(130)
+    except click.exceptions.Exit:
+        raise
+    except Exception as e:
+        show_error_panel("Estimation Error", f"Failed to estimate backup size: {e}")
+        if verbose:
+            console.print_exception()
+        raise typer.Exit(1)
+
+
 @snapshots_app.command("restore")
 def snapshots_restore(
         snapshot_id: Annotated[str, typer.Argument(help="Snapshot ID", autocompletion=snapshot_id_completer)],
@@ -2939,7 +3116,7 @@ def snapshots_list(
             else:
                 snapshot_id = getattr(entry, "short_id", getattr(entry, "id", "unknown"))
                 timestamp = getattr(entry, "time", getattr(entry, "timestamp", "unknown"))
-                host = getattr(entry, "hostname", "unknown")
+                host = getattr(entry, "hostname", None) or "unknown"
                 paths = getattr(entry, "paths", [])
 
             path_display = ", ".join(str(p) for p in paths[:2])
@@ -3031,7 +3208,7 @@ def snapshots_list(
         for snapshot in snapshots:
             snapshot_id = snapshot.id[:12] if len(snapshot.id) > 12 else snapshot.id
             date_str = snapshot.time.strftime('%Y-%m-%d %H:%M:%S') if hasattr(snapshot, 'time') else snapshot.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-            hostname = getattr(snapshot, 'hostname', 'unknown')[:15]
+            hostname = (getattr(snapshot, 'hostname', None) or 'unknown')[:15]
             tags_str = ",".join(snapshot.tags) if snapshot.tags else ""
             if len(tags_str) > 20:
                 tags_str = tags_str[:17] + "..."
@@ -3092,7 +3269,7 @@ def snapshots_show(
             detail_map = {
                     "ID":        getattr(details, "id", snapshot_id),
                     "Timestamp": getattr(details, "time", getattr(details, "timestamp", "unknown")),
-                    "Hostname":  getattr(details, "hostname", "unknown"),
+                    "Hostname":  getattr(details, "hostname", None) or "unknown",
                     "Username":  getattr(details, "username", "unknown"),
                     "Paths":     getattr(details, "paths", []),
                     "Tags":      getattr(details, "tags", []),
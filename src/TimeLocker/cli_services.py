@@ -50,6 +50,7 @@ from .config.configuration_module import ConfigurationModule
 from .config.configuration_path_resolver import ConfigurationPathResolver
 from .backup_target import BackupTarget
 from .file_selections import FileSelection, SelectionType
+from .selection_cache import SelectionCache
 from .security.credential_manager import CredentialManagerError
 
 logger = logging.getLogger(__name__)
@@ -123,7 +124,8 @@ class CLIServiceManager:
         # Initialize backup orchestrator
         self._backup_orchestrator = BackupOrchestrator(
                 repository_factory=self._repository_factory,
-                configuration_provider=self._config_service
+                configuration_provider=self._config_service,
+                selection_cache=SelectionCache()
         )
 
         logger.debug("CLIServiceManager initialized")
@@ -737,6 +739,8 @@ class CLIServiceManager:
         if password:
             repo_config['password'] = password
 
+        self._repository_factory.invalidate_repository(uri=uri, repository_name=name)
+
         if self._config_service is not None:
             try:
                 # Try modern configuration service first
@@ -808,6 +812,8 @@ class CLIServiceManager:
         if store_result is False:
             raise ConfigurationError("Credential manager declined storing the repository password")
 
+        self._repository_factory.invalidate_repository(uri=resolved_uri, repository_name=resolved_name)
+
         # Remove plaintext password from configuration to avoid duplication.
         try:
             repo_config = self._config_module.get_repository(resolved_name)
@@ -878,19 +884,39 @@ class CLIServiceManager:
 
     def estimate_backup_size(self,
                              repository_input: str,
-                             target_names: List[str]) -> Dict[str, Any]:
+                             target_names: List[str],
+                             max_workers: int = 1,
+                             use_scan_cache: bool = False,
+                             sample_seconds: Optional[float] = None) -> Dict[str, Any]:
         """
         Estimate backup size and duration.
         
         Args:
             repository_input: Repository name or URI
             target_names: Names of backup targets
+            max_workers: Number of scanner threads per target (1 scans serially)
+            use_scan_cache: Reuse and update the persistent per-directory scan cache
+            sample_seconds: Approximate each target by sampling for this many seconds
             
         Returns:
             Dictionary with size and time estimates
         """
-        repository_uri = self.resolve_repository_uri(repository_input)
-        return self._backup_orchestrator.estimate_backup_size(repository_uri, target_names)
+        repository_uri = self.resolve_repository_uri(repository_input) if repository_input else ""
+        return self._backup_orchestrator.estimate_backup_size(repository_uri, target_names, max_workers=max_workers,
+                                                              use_scan_cache=use_scan_cache,
+                                                              sample_seconds=sample_seconds)
+
+    def analyze_target_patterns(self, target_name: str) -> Dict[str, Any]:
+        """
+        Profile how a backup target's patterns match its files.
+
+        Args:
+            target_name: Name of backup target
+
+        Returns:
+            Dictionary with per-pattern statistics and redundancy findings
+        """
+        return self._backup_orchestrator.analyze_target_patterns(target_name)
 
     def get_repository_service(self) -> RepositoryService:
         """Backward-compatible accessor used by CLI commands expecting a method."""
@@ -10,10 +10,18 @@ from .core import (
     CommandDefinition,
     CommandBuilder,
 )
+from .async_runner import (
+    CommandOutputLimitError,
+    set_max_concurrency,
+    shared_semaphore,
+)
 
 __all__ = [
     "ParameterStyle",
     "CommandParameter",
     "CommandDefinition",
     "CommandBuilder",
+    "CommandOutputLimitError",
+    "set_max_concurrency",
+    "shared_semaphore",
 ]
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import os
+import subprocess
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+# Default number of commands run at once per event loop
+DEFAULT_MAX_CONCURRENCY = 16
+
+# Default cap on the stdout kept by run_async
+DEFAULT_MAX_OUTPUT = 64 * 1024 * 1024
+
+# Default cap on one line read by stream_async
+DEFAULT_MAX_LINE = 1024 * 1024
+
+# stderr kept for error reports
+STDERR_TAIL_BYTES = 64 * 1024
+
+# Seconds a cancelled command is given to exit after SIGTERM
+TERMINATE_GRACE = 5.0
+
+_READ_CHUNK = 64 * 1024
+
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+class CommandOutputLimitError(RuntimeError):
+    """Raised when a command writes more output than allowed"""
+
+    def __init__(self, cmd: List[str], limit: int):
+        super().__init__(f"Output of {cmd[0]} exceeded {limit} bytes")
+        self.cmd = cmd
+        self.limit = limit
+
+
+def set_max_concurrency(limit: int):
+    """
+    Set how many commands the shared semaphore admits at once
+
+    Applies to event loops that have not run a command yet.
+
+    Args:
+        limit: Maximum number of concurrent commands per event loop
+    """
+    global _max_concurrency
+    if limit < 1:
+        raise ValueError("Concurrency limit must be at least 1")
+    _max_concurrency = limit
+
+
+def shared_semaphore() -> asyncio.Semaphore:
+    """
+    Semaphore shared by every command run from the current event loop
+
+    asyncio primitives belong to one loop, so each loop gets its own.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_max_concurrency)
+    return semaphore
+
+
+def _process_env(env: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """Environment for the child: inherited as is unless variables are added"""
+    if not env:
+        return None
+    process_env = os.environ.copy()
+    process_env.update(env)
+    return process_env
+
+
+async def _discard(stream: Optional[asyncio.StreamReader]):
+    """Read a stream to its end, ignoring the data"""
+    if stream is None:
+        return
+    try:
+        while await stream.read(_READ_CHUNK):
+            pass
+    except (ValueError, ConnectionError):
+        pass
+
+
+async def _stop(process: asyncio.subprocess.Process):
+    """Terminate a running process, killing it if it does not exit in time"""
+    # Unread output would keep the pipes, and so wait(), from ever finishing
+    drain = asyncio.gather(_discard(process.stdout), _discard(process.stderr))
+    try:
+        if process.returncode is None:
+            process.terminate()
+        await asyncio.wait_for(process.wait(), TERMINATE_GRACE)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+    await drain
+
+
+async def _read_tail(stream: asyncio.StreamReader, tail: Deque[bytes], limit: int):
+    """Drain a stream, keeping roughly its last ``limit`` bytes"""
+    size = 0
+    while True:
+        chunk = await stream.read(_READ_CHUNK)
+        if not chunk:
+            return
+        tail.append(chunk)
+        size += len(chunk)
+        while size - len(tail[0]) >= limit:
+            size -= len(tail.popleft())
+
+
+async def _read_bounded(stream: asyncio.StreamReader, cmd: List[str], limit: int) -> bytes:
+    """Read a stream to the end, failing once it exceeds ``limit`` bytes"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await stream.read(_READ_CHUNK)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise CommandOutputLimitError(cmd, limit)
+        chunks.append(chunk)
+
+
+@asynccontextmanager
+async def _started(cmd: List[str], env: Optional[Dict[str, str]], semaphore: Optional[asyncio.Semaphore],
+                   line_limit: int = DEFAULT_MAX_LINE) -> AsyncIterator[asyncio.subprocess.Process]:
+    """Start a command under the semaphore, stopping it if the caller fails or is cancelled"""
+    async with semaphore or shared_semaphore():
+        process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE,
+                                                       env=_process_env(env), limit=line_limit)
+        try:
+            yield process
+        except BaseException:
+            # Includes CancelledError and timeouts: never leave the command running
+            await asyncio.shield(_stop(process))
+            raise
+
+
+async def run_command_async(cmd: List[str], env: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                            max_output: int = DEFAULT_MAX_OUTPUT,
+                            semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """
+    Run a command and return its stdout
+
+    Args:
+        cmd: Complete command line
+        env: Variables to add to the inherited environment
+        timeout: Seconds before the command is stopped
+        max_output: Most stdout bytes accepted
+        semaphore: Concurrency limit (defaults to shared_semaphore())
+
+    Returns:
+        str: Command output
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits non-zero
+        subprocess.TimeoutExpired: If the command runs longer than timeout
+        CommandOutputLimitError: If stdout exceeds max_output
+        FileNotFoundError: If the executable is not found
+    """
+    stderr_tail: Deque[bytes] = deque()
+    async with _started(cmd, env, semaphore) as process:
+        stderr_reader = asyncio.ensure_future(_read_tail(process.stderr, stderr_tail, STDERR_TAIL_BYTES))
+        try:
+            stdout = await asyncio.wait_for(_read_bounded(process.stdout, cmd, max_output), timeout)
+            returncode = await process.wait()
+            await stderr_reader
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(cmd, timeout, stderr=b"".join(stderr_tail)) from None
+        finally:
+            stderr_reader.cancel()
+
+    stderr = b"".join(stderr_tail).decode(errors="replace")
+    output = stdout.decode(errors="replace")
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=output, stderr=stderr)
+    return output
+
+
+async def stream_command_async(cmd: List[str], env: Optional[Dict[str, str]] = None,
+                               timeout: Optional[float] = None, max_line: int = DEFAULT_MAX_LINE,
+                               semaphore: Optional[asyncio.Semaphore] = None) -> AsyncIterator[str]:
+    """
+    Run a command and yield its stdout line by line as it is written
+
+    The command is stopped if the consumer stops iterating early, is
+    cancelled, or the timeout expires; only the tail of stderr is kept.
+
+    Args:
+        cmd: Complete command line
+        env: Variables to add to the inherited environment
+        timeout: Seconds before the command is stopped, measured from start
+        max_line: Longest line accepted, in bytes
+        semaphore: Concurrency limit (defaults to shared_semaphore())
+
+    Yields:
+        str: Each line of output without its line terminator
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits non-zero
+        subprocess.TimeoutExpired: If the command runs longer than timeout
+        CommandOutputLimitError: If a line exceeds max_line
+        FileNotFoundError: If the executable is not found
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    stderr_tail: Deque[bytes] = deque()
+    async with _started(cmd, env, semaphore, line_limit=max_line) as process:
+        stderr_reader = asyncio.ensure_future(_read_tail(process.stderr, stderr_tail, STDERR_TAIL_BYTES))
+        try:
+            while True:
+                remaining = None if deadline is None else max(deadline - loop.time(), 0)
+                try:
+                    line = await asyncio.wait_for(process.stdout.readline(), remaining)
+                except ValueError:
+                    raise CommandOutputLimitError(cmd, max_line) from None
+                if not line:
+                    break
+                yield line.rstrip(b"\r\n").decode(errors="replace")
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            returncode = await asyncio.wait_for(process.wait(), remaining)
+            await stderr_reader
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(cmd, timeout, stderr=b"".join(stderr_tail)) from None
+        finally:
+            stderr_reader.cancel()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=b"".join(stderr_tail).decode(errors="replace"))
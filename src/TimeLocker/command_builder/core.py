@@ -15,9 +15,12 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import asyncio
 import subprocess
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+from .async_runner import DEFAULT_MAX_LINE, DEFAULT_MAX_OUTPUT, run_command_async, stream_command_async
 
 
 class ParameterStyle(Enum):
@@ -128,6 +131,14 @@ class CommandBuilder:
         self.current_command = self.definition.subcommands[name]
         return self
 
+    def copy(self) -> "CommandBuilder":
+        """Independent builder with the same subcommands and parameters, for extending without side effects"""
+        duplicate = CommandBuilder(self.definition)
+        duplicate.current_command = self.current_command
+        duplicate.params = {name: list(value) if isinstance(value, list) else value for name, value in self.params.items()}
+        duplicate.command_chain = list(self.command_chain)
+        return duplicate
+
     def clear(self) -> "CommandBuilder":
         self.params.clear()
         self.command_chain.clear()
@@ -135,7 +146,7 @@ class CommandBuilder:
         return self
 
     def build(
-            self, synopsis_values: Dict[str, str] = None, use_short_form: bool = False
+            self, synopsis_values: Dict[str, Union[str, List[str]]] = None, use_short_form: bool = False
     ) -> List[str]:
         result = [self.definition.name]
 
@@ -230,14 +241,19 @@ class CommandBuilder:
             is_optional = param.startswith("[") and param.endswith("...]")
             param_name = param.strip("[].")
             if param_name in synopsis_values:
-                result.append(synopsis_values[param_name])
+                value = synopsis_values[param_name]
+                # Repeatable parameters ("[name...]") may be given several values
+                if isinstance(value, list):
+                    result.extend(value)
+                else:
+                    result.append(value)
             elif not is_optional:
                 raise ValueError(f"Required synopsis parameter {param_name} is missing")
 
         return result
 
     def run(self, env: Optional[Dict[str, str]] = None,
-            synopsis_values: Dict[str, str] = None,
+            synopsis_values: Dict[str, Union[str, List[str]]] = None,
             use_short_form: bool = False) -> str:
         """
         Execute the command and return the output
@@ -272,3 +288,72 @@ class CommandBuilder:
         )
 
         return result.stdout
+
+    async def run_async(self, env: Optional[Dict[str, str]] = None,
+                        synopsis_values: Dict[str, Union[str, List[str]]] = None,
+                        use_short_form: bool = False,
+                        timeout: Optional[float] = None,
+                        max_output: int = DEFAULT_MAX_OUTPUT,
+                        semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """
+        Execute the command from an event loop and return the output
+
+        Unlike run(), no thread is blocked while the command runs, so many
+        commands can be awaited together (e.g. with asyncio.gather). At most
+        as many run at once as the semaphore admits; cancelling the awaiting
+        task stops the command.
+
+        Args:
+            env: Environment variables to set for the command
+            synopsis_values: Values for synopsis parameters
+            use_short_form: Whether to use short form parameters
+            timeout: Seconds before the command is stopped
+            max_output: Most stdout bytes accepted
+            semaphore: Concurrency limit (defaults to the event loop's shared one)
+
+        Returns:
+            str: Command output
+
+        Raises:
+            subprocess.CalledProcessError: If command fails
+            subprocess.TimeoutExpired: If command runs longer than timeout
+            CommandOutputLimitError: If output exceeds max_output
+            FileNotFoundError: If command executable not found
+        """
+        command_list = self.build(synopsis_values, use_short_form)
+        return await run_command_async(command_list, env=env, timeout=timeout, max_output=max_output,
+                                       semaphore=semaphore)
+
+    def stream_async(self, env: Optional[Dict[str, str]] = None,
+                     synopsis_values: Dict[str, Union[str, List[str]]] = None,
+                     use_short_form: bool = False,
+                     timeout: Optional[float] = None,
+                     max_line: int = DEFAULT_MAX_LINE,
+                     semaphore: Optional[asyncio.Semaphore] = None) -> AsyncIterator[str]:
+        """
+        Execute the command from an event loop, yielding output lines as they arrive
+
+        The command line is built immediately, so later changes to this
+        builder do not affect the stream. Breaking out of the iteration,
+        cancelling the consumer or the timeout expiring stops the command.
+
+        Args:
+            env: Environment variables to set for the command
+            synopsis_values: Values for synopsis parameters
+            use_short_form: Whether to use short form parameters
+            timeout: Seconds before the command is stopped
+            max_line: Longest output line accepted, in bytes
+            semaphore: Concurrency limit (defaults to the event loop's shared one)
+
+        Returns:
+            Async iterator over output lines without line terminators
+
+        Raises:
+            subprocess.CalledProcessError: If command fails (raised at the end of iteration)
+            subprocess.TimeoutExpired: If command runs longer than timeout
+            CommandOutputLimitError: If a line exceeds max_line
+            FileNotFoundError: If command executable not found
+        """
+        command_list = self.build(synopsis_values, use_short_form)
+        return stream_command_async(command_list, env=env, timeout=timeout, max_line=max_line,
+                                    semaphore=semaphore)
@@ -215,6 +215,11 @@ class BackupTargetConfig:
     post_backup_script: Optional[str] = None
     enabled: bool = True
     description: Optional[str] = None
+    stream_file_list: bool = False  # feed restic TimeLocker's own file list
+    one_file_system: bool = False  # stay on the file systems of the target paths
+    exclude_caches: bool = False  # skip directories tagged with CACHEDIR.TAG
+    exclude_larger_than: Optional[str] = None  # e.g. "500M"; restic size syntax
+    parent: str = "auto"  # parent snapshot: "auto", "restic", "none" or a snapshot ID
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary format"""
@@ -16,14 +16,21 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
 import fnmatch
+import hashlib
 import logging
 import os
-import re
 from enum import auto, Enum
 from pathlib import Path
-from typing import Dict, List, Set, Union, Optional
+from typing import Any, BinaryIO, Callable, Dict, FrozenSet, Iterator, List, Set, Tuple, Union, Optional
 from functools import lru_cache
 
+from .parallel_scanner import ParallelScanner
+from .path_index import PathPrefixIndex, child_parts, split_path, split_path_bytes
+from .pattern_matcher import PatternMatcher
+from .pattern_profiler import PatternProfile, PatternProfiler
+from .inode_set import summarize_stats
+from .sampling_estimator import SamplingEstimator
+from .scan_cache import DirectoryAggregate, ScanCache
 from .utils import (
     profile_operation,
     start_operation_tracking,
@@ -32,6 +39,59 @@ from .utils import (
 )
 
 
+# Cache Directory Tagging Standard (https://bford.info/cachedir/), as used by restic --exclude-caches
+CACHEDIR_TAG = "CACHEDIR.TAG"
+CACHEDIR_SIGNATURE = b"Signature: 8a477f597d28d172789f06886806bc55"
+
+_SIZE_SUFFIXES = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+
+def parse_size(value: Union[int, str]) -> int:
+    """
+    Parse a file size the way restic parses --exclude-larger-than
+
+    Args:
+        value: Byte count, or a whole number with a k/m/g/t suffix (powers of 1024)
+
+    Returns:
+        int: Size in bytes
+
+    Raises:
+        ValueError: If the size is malformed or negative
+    """
+    if isinstance(value, int):
+        size = value
+    else:
+        text = value.strip()
+        multiplier = _SIZE_SUFFIXES.get(text[-1:].lower(), 1)
+        if multiplier != 1:
+            text = text[:-1]
+        if not text.isdigit():
+            raise ValueError(f"Invalid size '{value}': expected a whole number with optional k/m/g/t suffix")
+        size = int(text) * multiplier
+    if size < 0:
+        raise ValueError(f"Invalid size '{value}': must not be negative")
+    return size
+
+
+def is_cache_directory(dir_path: Union[str, bytes]) -> bool:
+    """
+    Check whether a directory is tagged as a cache with a valid CACHEDIR.TAG
+
+    Args:
+        dir_path: Directory to check (str or bytes)
+
+    Returns:
+        bool: True if the directory contains a CACHEDIR.TAG with the standard signature
+    """
+    try:
+        tag_name = CACHEDIR_TAG if isinstance(dir_path, str) else os.fsencode(CACHEDIR_TAG)
+        with open(os.path.join(dir_path, tag_name), "rb") as tag:
+            return tag.read(len(CACHEDIR_SIGNATURE)) == CACHEDIR_SIGNATURE
+    except OSError:
+        return False
+
+
 class SelectionType(Enum):
     """Defines whether the selection is for inclusion or exclusion"""
     INCLUDE = auto()
@@ -106,11 +166,24 @@ class FileSelection:
         self._include_patterns: Set[str] = set()  # Pattern includes
         self._exclude_patterns: Set[str] = set()  # Pattern excludes
 
-        # Performance optimization: cache compiled regex patterns
-        self._compiled_include_patterns: Optional[List[re.Pattern]] = None
-        self._compiled_exclude_patterns: Optional[List[re.Pattern]] = None
+        # Performance optimization: cache compiled pattern matchers
+        self._compiled_include_patterns: Optional[PatternMatcher] = None
+        self._compiled_exclude_patterns: Optional[PatternMatcher] = None
+        self._pattern_priority: Tuple[str, ...] = ()  # Patterns to try first when matching
         self._patterns_dirty = True
 
+        # Performance optimization: component tries over explicit include/exclude paths
+        self._include_index: Optional[PathPrefixIndex] = None
+        self._exclude_index: Optional[PathPrefixIndex] = None
+        self._paths_dirty = True
+
+        # File system rules, mirroring restic's --one-file-system, --exclude-caches
+        # and --exclude-larger-than
+        self._one_file_system = False
+        self._exclude_caches = False
+        self._exclude_larger_than: Optional[int] = None
+        self._root_devices: Optional[FrozenSet[int]] = None
+
     def add_path(self, path: Union[str, Path], selection_type: SelectionType = SelectionType.INCLUDE):
         """
         Add a path to either includes or excludes
@@ -122,6 +195,7 @@ class FileSelection:
         path_obj = Path(path) if isinstance(path, str) else path
         target_set = self._includes if selection_type == SelectionType.INCLUDE else self._excludes
         target_set.add(path_obj)
+        self._paths_dirty = True  # Mark path indexes as needing a rebuild
 
     def remove_path(self, path: Union[str, Path], selection_type: SelectionType = SelectionType.INCLUDE):
         """
@@ -134,6 +208,7 @@ class FileSelection:
         path_obj = Path(path) if isinstance(path, str) else path
         target_set = self._includes if selection_type == SelectionType.INCLUDE else self._excludes
         target_set.discard(path_obj)
+        self._paths_dirty = True  # Mark path indexes as needing a rebuild
 
     def add_pattern(self, pattern: str, selection_type: SelectionType = SelectionType.INCLUDE):
         """
@@ -234,6 +309,110 @@ class FileSelection:
         """Get the set of exclusion patterns"""
         return self._exclude_patterns.copy()
 
+    @property
+    def one_file_system(self) -> bool:
+        """Whether traversal stays on the file systems of the include paths"""
+        return self._one_file_system
+
+    @one_file_system.setter
+    def one_file_system(self, enabled: bool):
+        self._one_file_system = bool(enabled)
+
+    @property
+    def exclude_caches(self) -> bool:
+        """Whether directories tagged with a valid CACHEDIR.TAG are skipped"""
+        return self._exclude_caches
+
+    @exclude_caches.setter
+    def exclude_caches(self, enabled: bool):
+        self._exclude_caches = bool(enabled)
+
+    @property
+    def exclude_larger_than(self) -> Optional[int]:
+        """Size in bytes above which files are skipped, or None for no limit"""
+        return self._exclude_larger_than
+
+    @exclude_larger_than.setter
+    def exclude_larger_than(self, size: Optional[Union[int, str]]):
+        self._exclude_larger_than = parse_size(size) if size is not None else None
+
+    def scan_fingerprint(self) -> str:
+        """
+        Stable hash of everything that affects which files a scan selects
+
+        Used to key on-disk scan caches, so that changing any path or
+        pattern invalidates previously cached results.
+
+        Returns:
+            str: Hex digest identifying this selection
+        """
+        digest = hashlib.sha256()
+        for label, values in (("include", self._includes), ("exclude", self._excludes),
+                              ("include_pattern", self._include_patterns),
+                              ("exclude_pattern", self._exclude_patterns)):
+            for value in sorted(str(v) for v in values):
+                digest.update(f"{label}\0{value}\0".encode("utf-8", "surrogateescape"))
+        for label, rule in (("one_file_system", self._one_file_system), ("exclude_caches", self._exclude_caches),
+                            ("exclude_larger_than", self._exclude_larger_than)):
+            if rule:
+                digest.update(f"{label}\0{rule}\0".encode("ascii"))
+        return digest.hexdigest()
+
+    def to_compiled_state(self) -> Dict[str, Any]:
+        """
+        Export the selection with its compiled matchers and path indexes
+
+        The result contains only plain data (strings, tuples, sets and dicts),
+        so it can be written with marshal and restored by from_compiled_state
+        without expanding, classifying or indexing anything again.
+
+        Returns:
+            Dict accepted by from_compiled_state
+        """
+        self._compile_patterns()
+        self._index_paths()
+        return {
+                "includes":         tuple(str(path) for path in self._includes),
+                "excludes":         tuple(str(path) for path in self._excludes),
+                "include_patterns": tuple(self._include_patterns),
+                "exclude_patterns": tuple(self._exclude_patterns),
+                "include_matcher":  self._compiled_include_patterns.to_state(),
+                "exclude_matcher":  self._compiled_exclude_patterns.to_state(),
+                "include_index":    self._include_index.to_state(),
+                "exclude_index":    self._exclude_index.to_state(),
+                "rules":            (self._one_file_system, self._exclude_caches, self._exclude_larger_than),
+                "pattern_groups":   {name: tuple(group.patterns) for name, group in self._pattern_groups.items()},
+                "pattern_priority": self._pattern_priority,
+        }
+
+    @classmethod
+    def from_compiled_state(cls, state: Dict[str, Any]) -> 'FileSelection':
+        """
+        Restore a selection exported with to_compiled_state
+
+        Args:
+            state: Dict returned by to_compiled_state
+
+        Returns:
+            FileSelection that is ready to match without recompiling
+        """
+        selection = cls()
+        selection._includes = {Path(path) for path in state["includes"]}
+        selection._excludes = {Path(path) for path in state["excludes"]}
+        selection._include_patterns = set(state["include_patterns"])
+        selection._exclude_patterns = set(state["exclude_patterns"])
+        selection._compiled_include_patterns = PatternMatcher.from_state(state["include_matcher"])
+        selection._compiled_exclude_patterns = PatternMatcher.from_state(state["exclude_matcher"])
+        selection._include_index = PathPrefixIndex.from_state(state["include_index"])
+        selection._exclude_index = PathPrefixIndex.from_state(state["exclude_index"])
+        selection._one_file_system, selection._exclude_caches, selection._exclude_larger_than = state["rules"]
+        selection._pattern_groups = {name: PatternGroup(name, patterns)
+                                     for name, patterns in state["pattern_groups"].items()}
+        selection._pattern_priority = tuple(state["pattern_priority"])
+        selection._patterns_dirty = False
+        selection._paths_dirty = False
+        return selection
+
     def to_restic_args(self) -> List[str]:
         """
         Convert file selection to restic command arguments
@@ -255,6 +434,8 @@ class FileSelection:
         for path in self._excludes:
             args.extend(["--exclude", str(path)])
 
+        args.extend(self.get_rule_args())
+
         # Add include patterns (if any - restic doesn't have explicit include patterns,
         # but we can use them to filter the included paths)
         # Note: Restic backup works by specifying paths to backup, then excluding patterns
@@ -289,21 +470,126 @@ class FileSelection:
 
         return args
 
+    def get_rule_args(self) -> List[str]:
+        """
+        Get restic arguments for the file system rules
+
+        Returns:
+            List[str]: --one-file-system, --exclude-caches and --exclude-larger-than as set
+        """
+        args = []
+        if self._one_file_system:
+            args.append("--one-file-system")
+        if self._exclude_caches:
+            args.append("--exclude-caches")
+        if self._exclude_larger_than is not None:
+            args.extend(["--exclude-larger-than", str(self._exclude_larger_than)])
+        return args
+
     def _compile_patterns(self):
-        """Compile patterns to regex for better performance"""
+        """Compile patterns into combined matchers for better performance"""
         if not self._patterns_dirty:
             return
 
-        def fnmatch_to_regex(pattern: str) -> re.Pattern:
-            """Convert fnmatch pattern to compiled regex"""
-            # Convert fnmatch pattern to regex pattern
-            regex_pattern = fnmatch.translate(pattern)
-            return re.compile(regex_pattern, re.IGNORECASE)
-
-        self._compiled_include_patterns = [fnmatch_to_regex(p) for p in self._include_patterns]
-        self._compiled_exclude_patterns = [fnmatch_to_regex(p) for p in self._exclude_patterns]
+        self._compiled_include_patterns = PatternMatcher(self._include_patterns, self._pattern_priority)
+        self._compiled_exclude_patterns = PatternMatcher(self._exclude_patterns, self._pattern_priority)
         self._patterns_dirty = False
 
+    def set_pattern_priority(self, patterns: List[str]):
+        """
+        Set the order in which patterns are tried, most frequently matching first
+
+        Only the speed of matching changes, never its result. Typically fed
+        from PatternProfile.suggested_order() after profile_patterns().
+
+        Args:
+            patterns: Patterns in the order they should be tried
+        """
+        self._pattern_priority = tuple(patterns)
+        self._patterns_dirty = True  # Mark patterns as needing recompilation
+
+    def _index_paths(self):
+        """Build prefix indexes over explicit include/exclude paths"""
+        if not self._paths_dirty:
+            return
+
+        self._include_index = PathPrefixIndex(self._includes)
+        self._exclude_index = PathPrefixIndex(self._excludes)
+        self._root_devices = None
+        self._paths_dirty = False
+
+    def _allowed_devices(self) -> FrozenSet[int]:
+        """Devices of the include paths, the file systems one_file_system stays on"""
+        if self._root_devices is None:
+            devices = set()
+            for path in self._includes:
+                try:
+                    devices.add(os.stat(path).st_dev)
+                except OSError:
+                    continue
+            self._root_devices = frozenset(devices)
+        return self._root_devices
+
+    def _is_pruned_by_rules(self, dir_path: Union[str, bytes]) -> bool:
+        """
+        Apply the one_file_system and exclude_caches rules to a directory
+
+        A mount point reports the device of the file system mounted on it, so
+        it is pruned along with everything below it.
+        """
+        if self._one_file_system:
+            try:
+                if os.lstat(dir_path).st_dev not in self._allowed_devices():
+                    return True
+            except OSError:
+                pass
+        return self._exclude_caches and is_cache_directory(dir_path)
+
+    def _exceeds_size_limit(self, entry: Union[os.DirEntry, str]) -> bool:
+        """Apply the exclude_larger_than rule to a file (unreadable files are kept)"""
+        try:
+            st = entry.stat(follow_symlinks=False) if isinstance(entry, os.DirEntry) else os.lstat(entry)
+        except OSError:
+            return False
+        return st.st_size > self._exclude_larger_than
+
+    def is_directory_excluded(self, dir_path: Union[str, Path]) -> bool:
+        """
+        Check whether a whole directory is excluded
+
+        A directory is excluded when it lies under an explicit exclude path,
+        when a directory-level exclude pattern (e.g. ``**/node_modules/*``)
+        matches every path below it, when one_file_system is set and it is on
+        another file system, or when exclude_caches is set and it carries a
+        CACHEDIR.TAG. Traversal skips such subtrees without descending into
+        them.
+
+        Args:
+            dir_path: Directory to check
+
+        Returns:
+            bool: True if every file below the directory is excluded
+        """
+        self._compile_patterns()
+        self._index_paths()
+        if self._exclude_index and self._exclude_index.covers(dir_path):
+            return True
+        if self._compiled_exclude_patterns.matches_directory(str(dir_path)):
+            return True
+        return (self._one_file_system or self._exclude_caches) and self._is_pruned_by_rules(str(dir_path))
+
+    def _is_directory_excluded_bytes(self, dir_path: bytes) -> bool:
+        """
+        Bytes counterpart of is_directory_excluded, for the bytes traversal
+
+        Callers must have run _compile_patterns and _index_paths.
+        """
+        if self._exclude_index and self._exclude_index.encoded.covers_parts(split_path_bytes(dir_path)):
+            return True
+        if self._compiled_exclude_patterns.bytes_matcher.matches_directory(dir_path):
+            return True
+        return (self._one_file_system or self._exclude_caches) and self._is_pruned_by_rules(dir_path)
+
     def matches_pattern(self, file_path: Union[str, Path], patterns: Set[str]) -> bool:
         """
         Check if a file path matches any of the given patterns (legacy method)
@@ -324,25 +610,18 @@ class FileSelection:
                 return True
         return False
 
-    def _matches_compiled_patterns(self, file_path: Union[str, Path], compiled_patterns: List[re.Pattern]) -> bool:
+    def _matches_compiled_patterns(self, file_path: Union[str, Path], compiled_patterns: PatternMatcher) -> bool:
         """
-        Check if a file path matches any compiled regex patterns (optimized)
+        Check if a file path matches a compiled pattern matcher (optimized)
 
         Args:
             file_path: Path to check
-            compiled_patterns: List of compiled regex patterns
+            compiled_patterns: Compiled matcher from _compile_patterns
 
         Returns:
             bool: True if path matches any pattern
         """
-        path_str = str(file_path)
-        path_name = os.path.basename(path_str)
-
-        for pattern in compiled_patterns:
-            # Check both full path and filename
-            if pattern.match(path_str) or pattern.match(path_name):
-                return True
-        return False
+        return compiled_patterns.matches(str(file_path))
 
     def should_include_file(self, file_path: Union[str, Path]) -> bool:
         """
@@ -355,50 +634,315 @@ class FileSelection:
         Returns:
             bool: True if file should be included
         """
-        # Ensure patterns are compiled
+        # Ensure patterns and path indexes are compiled
         self._compile_patterns()
+        self._index_paths()
 
-        path_obj = Path(file_path)
-
-        # Check if path is explicitly excluded
-        if path_obj in self._excludes:
+        if not self._is_included(str(file_path), split_path(file_path)):
             return False
+        return self._exclude_larger_than is None or not self._exceeds_size_limit(str(file_path))
 
-        # Check if path is under any excluded directory
-        for exclude_path in self._excludes:
-            try:
-                path_obj.relative_to(exclude_path)
-                return False  # Path is under an excluded directory
-            except ValueError:
-                continue
+    def _is_included(self, path_str: str, path_parts: Tuple[str, ...]) -> bool:
+        """
+        Apply the selection rules to an already split path
+
+        Callers must have run _compile_patterns and _index_paths.
+        """
+        # Check if path is explicitly excluded or under any excluded directory
+        if self._exclude_index and self._exclude_index.covers_parts(path_parts):
+            return False
 
         # Check if path matches exclude patterns (optimized)
-        if self._compiled_exclude_patterns and self._matches_compiled_patterns(file_path, self._compiled_exclude_patterns):
+        if self._compiled_exclude_patterns and self._compiled_exclude_patterns.matches(path_str):
             return False
 
-        # Check if path is explicitly included
-        if path_obj in self._includes:
+        # Check if path is explicitly included or under any included directory
+        if self._include_index and self._include_index.covers_parts(path_parts):
             return True
 
-        # Check if path is under any included directory
-        for include_path in self._includes:
-            try:
-                path_obj.relative_to(include_path)
-                return True  # File is under an included directory
-            except ValueError:
-                continue
-
         # Check if path matches include patterns (if any) (optimized)
         if self._compiled_include_patterns:
-            return self._matches_compiled_patterns(file_path, self._compiled_include_patterns)
+            return self._compiled_include_patterns.matches(path_str)
 
         return False
 
+    def _bytes_inclusion_check(self) -> Callable[[bytes, Tuple[bytes, ...]], bool]:
+        """
+        Build the bytes counterpart of _is_included, for the bytes traversal
+
+        The bytes views of the path indexes and matchers are resolved once and
+        bound into the returned function. Callers must have run
+        _compile_patterns and _index_paths.
+
+        Returns:
+            Function taking a bytes path and its split_path_bytes components
+        """
+        exclude_index = self._exclude_index.encoded if self._exclude_index else None
+        exclude_matcher = self._compiled_exclude_patterns.bytes_matcher if self._compiled_exclude_patterns else None
+        include_index = self._include_index.encoded if self._include_index else None
+        include_matcher = self._compiled_include_patterns.bytes_matcher if self._compiled_include_patterns else None
+
+        def is_included(path: bytes, path_parts: Tuple[bytes, ...]) -> bool:
+            if exclude_index is not None and exclude_index.covers_parts(path_parts):
+                return False
+            if exclude_matcher is not None and exclude_matcher.matches(path):
+                return False
+            if include_index is not None and include_index.covers_parts(path_parts):
+                return True
+            return include_matcher is not None and include_matcher.matches(path)
+
+        return is_included
+
+    def _scan_directory(self, dir_path: Union[str, bytes],
+                        progress: Dict[str, int]) -> Optional[Tuple[List[os.DirEntry], List[Union[str, bytes]]]]:
+        """
+        List one directory and split it into included files and subdirectories to descend
+
+        Mirrors os.walk(followlinks=False): symlinks to directories are neither
+        descended nor reported as files, and unreadable directories are skipped.
+        Excluded subdirectories are pruned before they are returned. A bytes
+        directory path is listed and matched as bytes throughout.
+
+        Args:
+            dir_path: Directory to list
+            progress: Counters updated in place ('files_processed')
+
+        Returns:
+            Tuple of (included file entries, subdirectory paths), or None if
+            the directory could not be read
+        """
+        try:
+            with os.scandir(dir_path) as scanner:
+                entries = list(scanner)
+        except OSError:
+            return None
+
+        if isinstance(dir_path, bytes):
+            dir_parts = split_path_bytes(dir_path)
+            is_included, is_directory_excluded = self._bytes_inclusion_check(), self._is_directory_excluded_bytes
+        else:
+            dir_parts = split_path(dir_path)
+            is_included, is_directory_excluded = self._is_included, self.is_directory_excluded
+        size_limited = self._exclude_larger_than is not None
+        files = []
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                try:
+                    walk_into = not entry.is_symlink()
+                except OSError:
+                    walk_into = False
+                if walk_into and not is_directory_excluded(entry.path):
+                    subdirs.append(entry.path)
+                continue
+
+            progress["files_processed"] += 1
+            if is_included(entry.path, child_parts(dir_parts, entry.name)):
+                if size_limited and self._exceeds_size_limit(entry):
+                    continue
+                files.append(entry)
+
+        return files, subdirs
+
+    def _aggregate_directory(self, dir_path: str, progress: Dict[str, int],
+                             scan_cache: Optional[ScanCache] = None) -> Optional[Tuple[DirectoryAggregate, List[str]]]:
+        """
+        Summarize the included files directly inside one directory
+
+        With a scan cache, an unchanged directory (same mtime and inode) is
+        answered from the cache without listing it or stat-ing its files.
+
+        Args:
+            dir_path: Directory to scan
+            progress: Counters updated in place ('files_processed')
+            scan_cache: Optional cache of previous per-directory results
+
+        Returns:
+            Tuple of (DirectoryAggregate, subdirectory paths), or None if the
+            directory could not be read
+        """
+        dir_stat = None
+        if scan_cache is not None:
+            try:
+                dir_stat = os.stat(dir_path)
+            except OSError:
+                return None
+            cached = scan_cache.lookup(dir_path, dir_stat)
+            if cached is not None:
+                progress["files_processed"] += cached.files_processed
+                subdirs = [os.path.join(dir_path, name) for name in cached.subdirs]
+                if self._one_file_system or self._exclude_caches:
+                    # Mounting a file system or tagging a cache does not change this directory's mtime
+                    subdirs = [subdir for subdir in subdirs if not self._is_pruned_by_rules(subdir)]
+                return cached, subdirs
+
+        processed_before = progress["files_processed"]
+        scanned = self._scan_directory(dir_path, progress)
+        if scanned is None:
+            return None
+
+        files, subdirs = scanned
+        stat_results = []
+        for entry in files:
+            try:
+                stat_results.append(entry.stat())
+            except OSError:
+                # Skip files we can't access
+                continue
+
+        file_count, apparent_size, single_size, single_allocated, hardlinks = summarize_stats(stat_results)
+        aggregate = DirectoryAggregate(
+                dir_stat.st_mtime_ns if dir_stat is not None else 0,
+                dir_stat.st_ino if dir_stat is not None else 0,
+                file_count, apparent_size, single_size, single_allocated,
+                progress["files_processed"] - processed_before,
+                tuple(os.path.basename(subdir) for subdir in subdirs),
+                hardlinks)
+        if dir_stat is not None:
+            scan_cache.store(dir_path, aggregate)
+
+        return aggregate, subdirs
+
+    def _walk(self, progress: Dict[str, int], as_bytes: bool = False) -> Iterator[
+        Tuple[Optional[Union[str, bytes]], List[Tuple[Union[str, bytes], Optional[os.DirEntry]]]]]:
+        """
+        Shared scandir-based traversal core for the effective path streams
+
+        Works on plain string paths and yields one batch per directory, in
+        os.walk top-down order. Explicitly included single files are yielded
+        as a batch with no directory and no DirEntry.
+
+        Args:
+            progress: Counters updated in place ('files_processed')
+            as_bytes: List and match every directory as bytes, yielding bytes
+                paths (POSIX only)
+
+        Yields:
+            Tuple of (directory path or None, list of (file path, DirEntry or None))
+        """
+        self._compile_patterns()
+        self._index_paths()
+
+        for path in self._includes:
+            if not path.exists():
+                continue
+
+            if not path.is_dir():
+                # Single file
+                progress["files_processed"] += 1
+                path_str = str(path)
+                if self._is_included(path_str, split_path(path)) and (
+                        self._exclude_larger_than is None or not self._exceeds_size_limit(path_str)):
+                    yield None, [(os.fsencode(path_str) if as_bytes else path_str, None)]
+                continue
+
+            root = str(path)
+            if self.is_directory_excluded(root):
+                continue
+
+            stack = [os.fsencode(root) if as_bytes else root]
+            while stack:
+                dir_path = stack.pop()
+                scanned = self._scan_directory(dir_path, progress)
+                if scanned is None:
+                    continue
+                files, subdirs = scanned
+                yield dir_path, [(entry.path, entry) for entry in files]
+                # Reverse so subdirectories are visited in listing order
+                stack.extend(reversed(subdirs))
+
+    def iter_effective_entries(self, progress: Optional[Dict[str, int]] = None) -> Iterator[Tuple[str, Optional[os.DirEntry]]]:
+        """
+        Stream the files that would be included, as they are found
+
+        Memory use is bounded by the largest single directory and the
+        traversal stack, not by the number of files selected.
+
+        Args:
+            progress: Optional counters updated in place ('files_processed')
+
+        Yields:
+            Tuple of (file path string, DirEntry or None for explicitly included files)
+        """
+        if progress is None:
+            progress = {"files_processed": 0}
+        for _, files in self._walk(progress):
+            yield from files
+
+    def iter_effective_bytes(self, progress: Optional[Dict[str, int]] = None) -> Iterator[Tuple[bytes, Optional[os.DirEntry]]]:
+        """
+        Stream the included files as bytes paths, as they are found
+
+        Directories are listed with os.scandir(bytes) and matched with bytes
+        patterns and path tries, so names are never decoded or re-encoded
+        unless they contain non-ASCII bytes. The selected files are the same
+        as for iter_effective_entries, and names that are not valid UTF-8 or
+        contain newlines come back exactly as stored on disk. On Windows,
+        where paths are text at the system call level, this encodes the
+        str traversal instead.
+
+        Args:
+            progress: Optional counters updated in place ('files_processed')
+
+        Yields:
+            Tuple of (file path bytes, DirEntry or None for explicitly included files)
+        """
+        if progress is None:
+            progress = {"files_processed": 0}
+        if os.name == "nt":
+            for path_str, entry in self.iter_effective_entries(progress):
+                yield os.fsencode(path_str), entry
+            return
+        for _, files in self._walk(progress, as_bytes=True):
+            yield from files
+
+    def iter_effective_paths(self) -> Iterator[Path]:
+        """
+        Stream the paths that would be included, as they are found
+
+        Yields:
+            Path of each included file
+        """
+        for path_str, _ in self.iter_effective_entries():
+            yield Path(path_str)
+
+    def write_files_from(self, destination: Union[str, Path, BinaryIO], null_separated: bool = False) -> int:
+        """
+        Stream the included file list in restic --files-from format
+
+        Newline-separated output suits ``--files-from-verbatim``; NUL-separated
+        output suits ``--files-from-raw`` and is the only form that can carry
+        filenames containing newlines. Names come from the bytes traversal, so
+        undecodable bytes are written unchanged.
+
+        Args:
+            destination: File path or binary file object to write to
+            null_separated: Separate entries with NUL instead of newline
+
+        Returns:
+            int: Number of paths written
+        """
+        if isinstance(destination, (str, Path)):
+            with open(destination, "wb") as handle:
+                return self.write_files_from(handle, null_separated)
+
+        separator = b"\0" if null_separated else b"\n"
+        count = 0
+        for path, _ in self.iter_effective_bytes():
+            destination.write(path + separator)
+            count += 1
+        return count
+
     @profile_operation("get_effective_paths")
     def get_effective_paths(self) -> Dict[str, List[Path]]:
         """
         Get the effective paths that will be included/excluded after pattern resolution
-        Optimized version with performance tracking.
+        Thin list-building wrapper over iter_effective_paths, with performance tracking.
 
         Returns:
             Dict with 'included' and 'excluded' lists of resolved paths
@@ -407,121 +951,100 @@ class FileSelection:
         metrics = start_operation_tracking(operation_id, "get_effective_paths")
 
         result = {"included": [], "excluded": []}
-        files_processed = 0
+        progress = {"files_processed": 0}
+        next_update = 1000
 
         try:
-            # Start with explicitly included paths
-            for path in self._includes:
-                if path.exists():
-                    if path.is_dir():
-                        # Add all files in directory that match criteria
-                        for root, dirs, files in os.walk(path):
-                            # Optimize: skip directories that are explicitly excluded
-                            root_path = Path(root)
-                            if root_path in self._excludes:
-                                dirs.clear()  # Don't recurse into excluded directories
-                                continue
-
-                            for file in files:
-                                file_path = root_path / file
-                                files_processed += 1
-                                if self.should_include_file(file_path):
-                                    result["included"].append(file_path)
-
-                                # Update metrics periodically
-                                if files_processed % 1000 == 0:
-                                    update_operation_tracking(operation_id, files_processed=files_processed)
-                    else:
-                        # Single file
-                        files_processed += 1
-                        if self.should_include_file(path):
-                            result["included"].append(path)
+            for path_str, _ in self.iter_effective_entries(progress):
+                # Path objects are only built at the API boundary
+                result["included"].append(Path(path_str))
+
+                # Update metrics periodically
+                if progress["files_processed"] >= next_update:
+                    update_operation_tracking(operation_id, files_processed=progress["files_processed"])
+                    next_update = progress["files_processed"] + 1000
 
             # Add explicitly excluded paths
             result["excluded"] = list(self._excludes)
 
-            update_operation_tracking(operation_id, files_processed=files_processed)
+            update_operation_tracking(operation_id, files_processed=progress["files_processed"])
             return result
 
         finally:
             complete_operation_tracking(operation_id)
 
     @profile_operation("estimate_backup_size")
-    def estimate_backup_size(self) -> Dict[str, int]:
+    def estimate_backup_size(self, max_workers: int = 1, scan_cache: Optional[ScanCache] = None) -> Dict[str, int]:
         """
         Estimate the total size of files that would be backed up
         Optimized version with performance tracking and early termination.
 
+        Hardlinked files are counted once per (st_dev, st_ino), so
+        'total_size' reflects the data restic actually reads. The result
+        also carries 'apparent_size' (st_size summed over every path),
+        'unique_size' (same as 'total_size'), 'allocated_size' (blocks in
+        use on disk, which is smaller than the unique size for sparse files)
+        and 'duplicate_links' (paths skipped as extra links to a counted inode).
+
+        Args:
+            max_workers: Number of scanner threads; values above 1 scan
+                subtrees in parallel with ParallelScanner
+            scan_cache: Optional persistent cache; unchanged directories are
+                reused from it and it is saved once the scan completes
+
         Returns:
             Dict with size statistics in bytes
         """
         operation_id = f"estimate_backup_size_{id(self)}"
         metrics = start_operation_tracking(operation_id, "estimate_backup_size")
 
-        stats = {"total_size": 0, "file_count": 0, "directory_count": 0}
-        visited_dirs = set()
-        files_processed = 0
-
         try:
-            # Start with explicitly included paths
-            for path in self._includes:
-                if path.exists():
-                    if path.is_dir():
-                        # Walk through directory and count files that would be included
-                        for root, dirs, files in os.walk(path):
-                            root_path = Path(root)
-
-                            # Optimize: skip directories that are explicitly excluded
-                            if root_path in self._excludes:
-                                dirs.clear()  # Don't recurse into excluded directories
-                                continue
-
-                            # Count this directory if we haven't seen it
-                            if root_path not in visited_dirs:
-                                visited_dirs.add(root_path)
-                                stats["directory_count"] += 1
-
-                            # Check each file
-                            for file in files:
-                                file_path = root_path / file
-                                files_processed += 1
-
-                                if self.should_include_file(file_path):
-                                    try:
-                                        file_size = file_path.stat().st_size
-                                        stats["total_size"] += file_size
-                                        stats["file_count"] += 1
-
-                                        # Update metrics with bytes processed
-                                        update_operation_tracking(operation_id,
-                                                                  files_processed=files_processed,
-                                                                  bytes_processed=stats["total_size"])
-                                    except (OSError, PermissionError):
-                                        # Skip files we can't access
-                                        continue
-
-                                # Update metrics periodically
-                                if files_processed % 1000 == 0:
-                                    update_operation_tracking(operation_id, files_processed=files_processed)
-                    else:
-                        # Single file
-                        files_processed += 1
-                        if self.should_include_file(path):
-                            try:
-                                file_size = path.stat().st_size
-                                stats["total_size"] += file_size
-                                stats["file_count"] += 1
-                                update_operation_tracking(operation_id,
-                                                          files_processed=files_processed,
-                                                          bytes_processed=stats["total_size"])
-                            except (OSError, PermissionError):
-                                continue
-
+            if scan_cache is not None and not scan_cache.loaded:
+                scan_cache.load()
+            stats = ParallelScanner(self, max_workers=max_workers, scan_cache=scan_cache).scan()
+            if scan_cache is not None:
+                scan_cache.save()
+            update_operation_tracking(operation_id,
+                                      files_processed=stats.pop("files_processed"),
+                                      bytes_processed=stats["apparent_size"])
             return stats
 
         finally:
             complete_operation_tracking(operation_id)
 
+    @profile_operation("sample_backup_size")
+    def sample_backup_size(self, time_budget: float = 2.0, confidence: float = 0.95,
+                           seed: Optional[int] = None) -> Dict[str, object]:
+        """
+        Quickly approximate estimate_backup_size by sampling the tree
+
+        Args:
+            time_budget: Seconds to spend sampling
+            confidence: Confidence level of the reported error bounds
+            seed: Optional random seed for reproducible estimates
+
+        Returns:
+            Dict with the estimate_backup_size keys plus 'file_count_error'
+            and 'total_size_error' bounds (see SamplingEstimator.estimate)
+        """
+        return SamplingEstimator(self, time_budget=time_budget, confidence=confidence, seed=seed).estimate()
+
+    def profile_patterns(self, reorder: bool = False) -> PatternProfile:
+        """
+        Traverse the selection once, recording per-pattern match statistics
+
+        Args:
+            reorder: Afterwards, try patterns in the profile's suggested order
+
+        Returns:
+            PatternProfile with test, hit and timing counts per pattern,
+            unused and redundant patterns, and pattern group totals
+        """
+        profile = PatternProfiler(self).run()
+        if reorder:
+            self.set_pattern_priority(profile.suggested_order())
+        return profile
+
     def __repr__(self) -> str:
         return (f"<FileSelection includes={self._includes}, "
                 f"excludes={self._excludes}, "
@@ -0,0 +1,240 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import threading
+from array import array
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+_MASK64 = (1 << 64) - 1
+# Fibonacci hashing multiplier (2**64 / golden ratio)
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_INITIAL_BITS = 10
+# Grow once the table is this full, in 1/8ths
+_MAX_LOAD_EIGHTHS = 5
+
+
+def allocated_bytes(stat_result: os.stat_result) -> int:
+    """
+    Bytes actually allocated on disk for a file
+
+    Uses st_blocks (always 512-byte units) where the platform provides it,
+    so sparse files report their real footprint; falls back to st_size.
+    """
+    blocks = getattr(stat_result, "st_blocks", None)
+    if blocks is None:
+        return stat_result.st_size
+    return blocks * 512
+
+
+class _InodeTable:
+    """Open-addressing hash set of 64-bit inode numbers for one device"""
+
+    __slots__ = ("slots", "bits", "count", "has_zero")
+
+    def __init__(self):
+        # Slot value 0 marks an empty slot; inode 0 is tracked separately
+        self.bits = _INITIAL_BITS
+        self.slots = array("Q", bytes(8 << self.bits))
+        self.count = 0
+        self.has_zero = False
+
+    def add(self, inode: int) -> bool:
+        if inode == 0:
+            if self.has_zero:
+                return False
+            self.has_zero = True
+            self.count += 1
+            return True
+
+        slots = self.slots
+        mask = len(slots) - 1
+        index = ((inode * _HASH_MULTIPLIER) & _MASK64) >> (64 - self.bits)
+        while True:
+            current = slots[index]
+            if current == 0:
+                break
+            if current == inode:
+                return False
+            index = (index + 1) & mask
+
+        slots[index] = inode
+        self.count += 1
+        if self.count * 8 > len(slots) * _MAX_LOAD_EIGHTHS:
+            self._grow()
+        return True
+
+    def __contains__(self, inode: int) -> bool:
+        if inode == 0:
+            return self.has_zero
+        slots = self.slots
+        mask = len(slots) - 1
+        index = ((inode * _HASH_MULTIPLIER) & _MASK64) >> (64 - self.bits)
+        while True:
+            current = slots[index]
+            if current == 0:
+                return False
+            if current == inode:
+                return True
+            index = (index + 1) & mask
+
+    def _grow(self):
+        old_slots = self.slots
+        self.bits += 1
+        self.slots = array("Q", bytes(8 << self.bits))
+        self.count = 1 if self.has_zero else 0
+        for inode in old_slots:
+            if inode:
+                self.add(inode)
+
+
+class InodeSet:
+    """
+    Compact set of (st_dev, st_ino) pairs for hardlink deduplication.
+
+    Each device gets an open-addressing hash table stored in a flat
+    ``array('Q')``, costing roughly 13-26 bytes per inode instead of the
+    150+ bytes of a Python set of tuples, so tens of millions of inodes fit
+    in a few hundred megabytes. Not thread-safe; callers sharing an instance
+    across threads must serialise add().
+    """
+
+    def __init__(self):
+        self._devices: Dict[int, _InodeTable] = {}
+
+    def add(self, device: int, inode: int) -> bool:
+        """
+        Add an inode
+
+        Args:
+            device: st_dev of the file
+            inode: st_ino of the file
+
+        Returns:
+            bool: True if the inode had not been seen before
+        """
+        table = self._devices.get(device)
+        if table is None:
+            table = self._devices[device] = _InodeTable()
+        return table.add(inode & _MASK64)
+
+    def __contains__(self, key) -> bool:
+        device, inode = key
+        table = self._devices.get(device)
+        return table is not None and (inode & _MASK64) in table
+
+    def __len__(self) -> int:
+        return sum(table.count for table in self._devices.values())
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate bytes used by the hash tables"""
+        return sum(table.slots.itemsize * len(table.slots) for table in self._devices.values())
+
+    def __repr__(self) -> str:
+        return f"<InodeSet inodes={len(self)} devices={len(self._devices)}>"
+
+
+class SizeTally:
+    """
+    Hardlink-aware running totals for size estimation.
+
+    Files with a single link are always unique and are summed directly;
+    only multiply-linked files go through the shared InodeSet, so the set
+    stays small on typical trees. Several tallies may share one InodeSet
+    and lock, one per scanner thread, and be merged afterwards.
+    """
+
+    def __init__(self, inodes: Optional[InodeSet] = None, lock: Optional[threading.Lock] = None):
+        self._inodes = inodes if inodes is not None else InodeSet()
+        self._lock = lock
+        self.file_count = 0
+        self.apparent_size = 0
+        self.unique_size = 0
+        self.allocated_size = 0
+        self.duplicate_links = 0
+
+    def add(self, file_count: int, apparent_size: int, single_link_size: int, single_link_allocated: int,
+            hardlinks: Sequence[Tuple[int, int, int, int]] = ()):
+        """
+        Add the summarized files of one directory
+
+        Args:
+            file_count: Number of included files
+            apparent_size: Sum of st_size over all included files
+            single_link_size: Sum of st_size over files with one link
+            single_link_allocated: Allocated bytes of files with one link
+            hardlinks: (st_dev, st_ino, st_size, allocated) of multiply-linked files
+        """
+        self.file_count += file_count
+        self.apparent_size += apparent_size
+        self.unique_size += single_link_size
+        self.allocated_size += single_link_allocated
+        if not hardlinks:
+            return
+
+        if self._lock is not None:
+            with self._lock:
+                self._add_hardlinks(hardlinks)
+        else:
+            self._add_hardlinks(hardlinks)
+
+    def _add_hardlinks(self, hardlinks: Sequence[Tuple[int, int, int, int]]):
+        inodes = self._inodes
+        for device, inode, size, allocated in hardlinks:
+            if inodes.add(device, inode):
+                self.unique_size += size
+                self.allocated_size += allocated
+            else:
+                self.duplicate_links += 1
+
+    def merge(self, other: 'SizeTally'):
+        """Add another tally's totals to this one (they must share an InodeSet)"""
+        self.file_count += other.file_count
+        self.apparent_size += other.apparent_size
+        self.unique_size += other.unique_size
+        self.allocated_size += other.allocated_size
+        self.duplicate_links += other.duplicate_links
+
+
+def summarize_stats(stat_results: Iterable[os.stat_result]) -> Tuple[int, int, int, int, Tuple[Tuple[int, int, int, int], ...]]:
+    """
+    Summarize file stats into the arguments of SizeTally.add
+
+    Args:
+        stat_results: Stats of included files
+
+    Returns:
+        Tuple of (file count, apparent size, single-link size, single-link
+        allocated bytes, hardlink records)
+    """
+    file_count = 0
+    apparent_size = 0
+    single_link_size = 0
+    single_link_allocated = 0
+    hardlinks = []
+    for stat_result in stat_results:
+        size = stat_result.st_size
+        file_count += 1
+        apparent_size += size
+        # st_nlink is 0 where the platform does not report it; treat as unique
+        if stat_result.st_nlink > 1:
+            hardlinks.append((stat_result.st_dev, stat_result.st_ino, size, allocated_bytes(stat_result)))
+        else:
+            single_link_size += size
+            single_link_allocated += allocated_bytes(stat_result)
+    return file_count, apparent_size, single_link_size, single_link_allocated, tuple(hardlinks)
@@ -172,19 +172,39 @@ class IBackupOrchestrator(ABC):
     @abstractmethod
     def estimate_backup_size(self,
                              repository_name: str,
-                             target_names: List[str]) -> Dict[str, Any]:
+                             target_names: List[str],
+                             max_workers: int = 1,
+                             use_scan_cache: bool = False,
+                             sample_seconds: Optional[float] = None) -> Dict[str, Any]:
         """
         Estimate backup size and duration.
         
         Args:
             repository_name: Name of repository
             target_names: Names of backup targets
+            max_workers: Number of scanner threads per target (1 scans serially)
+            use_scan_cache: Reuse and update the persistent per-directory scan cache
+            sample_seconds: Approximate each target by sampling for this many
+                seconds instead of scanning it fully; adds error bounds
             
         Returns:
             Dictionary with size and time estimates
         """
         pass
 
+    @abstractmethod
+    def analyze_target_patterns(self, target_name: str) -> Dict[str, Any]:
+        """
+        Profile how a backup target's patterns match its files.
+        
+        Args:
+            target_name: Name of backup target
+            
+        Returns:
+            Dictionary with per-pattern statistics and redundancy findings
+        """
+        pass
+
     @abstractmethod
     def verify_backup_integrity(self,
                                 repository_name: str,
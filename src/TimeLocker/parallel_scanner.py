@@ -0,0 +1,207 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Set
+
+from .inode_set import InodeSet, SizeTally, summarize_stats
+
+if TYPE_CHECKING:
+    from .file_selections import FileSelection
+    from .scan_cache import ScanCache
+
+logger = logging.getLogger(__name__)
+
+
+def default_scan_workers() -> int:
+    """Default worker count for I/O-bound directory scanning"""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class _WorkerState:
+    """Per-worker work queue and counters, merged once all workers have finished"""
+
+    def __init__(self, tally: SizeTally):
+        self.queue: Deque[str] = deque()
+        self.progress: Dict[str, int] = {"files_processed": 0}
+        self.tally = tally
+        self.directories: Set[str] = set()
+
+
+class ParallelScanner:
+    """
+    Multi-threaded size estimation over a FileSelection.
+
+    Directories are distributed over a bounded pool of worker threads. Each
+    worker pushes the subdirectories it discovers onto its own deque and
+    pops from the same end (depth-first), while idle workers steal from the
+    opposite end of another worker's deque, which tends to hand over the
+    largest unexplored subtrees. Counters are kept per worker and only
+    summed after the pool has drained, so totals are deterministic and the
+    hot loop takes no locks; the single shared lock guards the count of
+    directories still pending and is touched once per directory. Hardlinked
+    files are deduplicated through one InodeSet shared under its own lock.
+    With a single worker the scan runs on the calling thread.
+    """
+
+    def __init__(self, selection: 'FileSelection', max_workers: Optional[int] = None,
+                 scan_cache: Optional['ScanCache'] = None):
+        """
+        Initialize the scanner
+
+        Args:
+            selection: File selection to evaluate
+            max_workers: Number of worker threads (defaults to default_scan_workers())
+            scan_cache: Optional loaded cache of per-directory results to reuse and update
+        """
+        self._selection = selection
+        self._scan_cache = scan_cache
+        self._max_workers = max(1, max_workers or default_scan_workers())
+        self._workers: List[_WorkerState] = []
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._inode_lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        """Number of worker threads used for scanning"""
+        return self._max_workers
+
+    def _next_directory(self, worker_id: int) -> Optional[str]:
+        """Take work from the worker's own queue, or steal from another worker"""
+        own = self._workers[worker_id].queue
+        try:
+            return own.pop()
+        except IndexError:
+            pass
+
+        count = len(self._workers)
+        for offset in range(1, count):
+            victim = self._workers[(worker_id + offset) % count].queue
+            try:
+                return victim.popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _run_worker(self, worker_id: int):
+        """Worker loop: scan directories until no work is pending anywhere"""
+        state = self._workers[worker_id]
+        selection = self._selection
+
+        while True:
+            dir_path = self._next_directory(worker_id)
+            if dir_path is None:
+                with self._condition:
+                    if self._pending == 0:
+                        return
+                    # Work is still in flight elsewhere; wait for it to be published
+                    self._condition.wait(timeout=0.05)
+                continue
+
+            try:
+                scanned = selection._aggregate_directory(dir_path, state.progress, self._scan_cache)
+                if scanned is not None:
+                    aggregate, subdirs = scanned
+                    state.directories.add(dir_path)
+                    state.tally.add(aggregate.file_count, aggregate.apparent_size, aggregate.single_link_size,
+                                    aggregate.single_link_allocated, aggregate.hardlinks)
+
+                    if subdirs:
+                        # Reverse so the owner pops subdirectories in listing order
+                        state.queue.extend(reversed(subdirs))
+                        with self._condition:
+                            self._pending += len(subdirs)
+                            self._condition.notify_all()
+            finally:
+                with self._condition:
+                    self._pending -= 1
+                    if self._pending == 0:
+                        self._condition.notify_all()
+
+    def scan(self) -> Dict[str, int]:
+        """
+        Scan all include roots in parallel
+
+        Returns:
+            Dict with 'total_size', 'apparent_size', 'unique_size',
+            'allocated_size', 'duplicate_links', 'file_count',
+            'directory_count' and 'files_processed', matching
+            FileSelection.estimate_backup_size
+        """
+        selection = self._selection
+        # Compile shared state up front so worker threads only ever read it
+        selection._compile_patterns()
+        selection._index_paths()
+
+        inodes = InodeSet()
+        lock = self._inode_lock if self._max_workers > 1 else None
+        total = SizeTally(inodes, lock)
+        self._workers = [_WorkerState(SizeTally(inodes, lock)) for _ in range(self._max_workers)]
+        files_processed = 0
+
+        # Single files are sized inline; directory roots are dealt out round-robin
+        roots = []
+        for path in sorted(selection.includes, key=str):
+            if not path.exists():
+                continue
+            if path.is_dir():
+                if not selection.is_directory_excluded(path):
+                    roots.append(str(path))
+                continue
+
+            files_processed += 1
+            if selection.should_include_file(path):
+                try:
+                    total.add(*summarize_stats([path.stat()]))
+                except OSError:
+                    continue
+
+        for index, root in enumerate(roots):
+            self._workers[index % self._max_workers].queue.append(root)
+        self._pending = len(roots)
+
+        if roots and self._max_workers == 1:
+            self._run_worker(0)
+        elif roots:
+            logger.debug(f"Scanning {len(roots)} root(s) with {self._max_workers} worker(s)")
+            with ThreadPoolExecutor(max_workers=self._max_workers,
+                                    thread_name_prefix="timelocker-scan") as executor:
+                futures = [executor.submit(self._run_worker, i) for i in range(self._max_workers)]
+                for future in futures:
+                    future.result()
+
+        directories: Set[str] = set()
+        for state in self._workers:
+            total.merge(state.tally)
+            files_processed += state.progress["files_processed"]
+            directories |= state.directories
+
+        return {
+                "total_size":      total.unique_size,
+                "apparent_size":   total.apparent_size,
+                "unique_size":     total.unique_size,
+                "allocated_size":  total.allocated_size,
+                "duplicate_links": total.duplicate_links,
+                "file_count":      total.file_count,
+                "directory_count": len(directories),
+                "files_processed": files_processed,
+        }
@@ -0,0 +1,182 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+from functools import cached_property
+from pathlib import PurePath
+from typing import Any, Dict, Iterable, Sequence, Tuple, Union
+
+# Trie key marking that an indexed root ends at this node
+_END = None
+
+if os.name == "nt":
+    def split_path(path: Union[str, PurePath]) -> Tuple[str, ...]:
+        """Split a path into comparable components (case-insensitive on Windows)"""
+        return tuple(part.lower() for part in PurePath(path).parts)
+
+    def child_parts(parent_parts: Tuple[str, ...], name: str) -> Tuple[str, ...]:
+        """Extend split parent components with a directory entry name"""
+        return parent_parts + (name.lower(),)
+
+    def split_path_bytes(path: bytes) -> Tuple[bytes, ...]:
+        """Bytes counterpart of split_path"""
+        return tuple(os.fsencode(part) for part in split_path(os.fsdecode(path)))
+else:
+    def split_path(path: Union[str, PurePath]) -> Tuple[str, ...]:
+        """
+        Split a path into components exactly as ``PurePath(path).parts`` would
+
+        Strings are split directly, which avoids building a Path object per
+        file in traversal hot loops.
+        """
+        if not isinstance(path, str):
+            return path.parts
+        if not path.startswith("/"):
+            return tuple(part for part in path.split("/") if part and part != ".")
+        # POSIX keeps exactly two leading slashes as a distinct root
+        root = "//" if path.startswith("//") and not path.startswith("///") else "/"
+        return (root,) + tuple(part for part in path.split("/") if part and part != ".")
+
+    def child_parts(parent_parts: Tuple[str, ...], name: str) -> Tuple[str, ...]:
+        """Extend split parent components with a directory entry name"""
+        return parent_parts + (name,)
+
+    def split_path_bytes(path: bytes) -> Tuple[bytes, ...]:
+        """Bytes counterpart of split_path, matching the index's encoded() components"""
+        if not path.startswith(b"/"):
+            return tuple(part for part in path.split(b"/") if part and part != b".")
+        root = b"//" if path.startswith(b"//") and not path.startswith(b"///") else b"/"
+        return (root,) + tuple(part for part in path.split(b"/") if part and part != b".")
+
+
+class PathPrefixIndex:
+    """
+    Path-component trie over a set of root paths.
+
+    Answers "is this path one of the roots or underneath one of them" with a
+    single walk over the path's components, giving the same result as trying
+    ``Path.relative_to`` against every root.
+    """
+
+    def __init__(self, roots: Iterable[Union[str, PurePath]] = ()):
+        """
+        Build the index
+
+        Args:
+            roots: Root paths to index
+        """
+        self._trie: Dict = {}
+        self._size = 0
+        for root in roots:
+            self.add(root)
+
+    def add(self, root: Union[str, PurePath]):
+        """
+        Add a root path to the index
+
+        Args:
+            root: Root path to add
+        """
+        node = self._trie
+        for part in split_path(root):
+            node = node.setdefault(part, {})
+        if _END not in node:
+            node[_END] = True
+            self._size += 1
+        self.__dict__.pop("encoded", None)
+
+    @cached_property
+    def encoded(self) -> 'PathPrefixIndex':
+        """
+        Copy of the index with os.fsencode-d components, for bytes paths
+
+        Query it with split_path_bytes components; answers are the same as
+        for the decoded path.
+        """
+        def encode(node: Dict) -> Dict:
+            return {key if key is _END else os.fsencode(key): value if key is _END else encode(value)
+                    for key, value in node.items()}
+
+        index = PathPrefixIndex()
+        index._trie = encode(self._trie)
+        index._size = self._size
+        return index
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Export the trie as plain data
+
+        Returns:
+            Dict accepted by from_state
+        """
+        return {"trie": self._trie, "size": self._size}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'PathPrefixIndex':
+        """
+        Restore an index exported with to_state without re-splitting its roots
+
+        Args:
+            state: Dict returned by to_state
+
+        Returns:
+            PathPrefixIndex equivalent to the exported one
+        """
+        index = cls()
+        index._trie = state["trie"]
+        index._size = state["size"]
+        return index
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def covers_parts(self, parts: Sequence[str]) -> bool:
+        """
+        Check whether pre-split path components are a root or lie under one
+
+        Args:
+            parts: Path components as returned by split_path
+
+        Returns:
+            bool: True if the path is equal to or below an indexed root
+        """
+        node = self._trie
+        for part in parts:
+            if _END in node:
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+        return _END in node
+
+    def covers(self, path: Union[str, PurePath]) -> bool:
+        """
+        Check whether a path is a root or lies under one
+
+        Args:
+            path: Path to check
+
+        Returns:
+            bool: True if the path is equal to or below an indexed root
+        """
+        return self.covers_parts(split_path(path))
+
+    def __repr__(self) -> str:
+        return f"<PathPrefixIndex roots={self._size}>"
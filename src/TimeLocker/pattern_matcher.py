@@ -0,0 +1,401 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import fnmatch
+import os
+import re
+import sys
+from functools import cached_property
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+# Characters that give a pattern glob semantics in fnmatch
+_GLOB_CHARS = frozenset("*?[")
+
+# Codec os.fsdecode uses, for decoding non-ASCII bytes paths the same way
+_FS_ENCODING = sys.getfilesystemencoding()
+_FS_ERRORS = sys.getfilesystemencodeerrors()
+
+# Path separators recognised when splitting off the basename (mirrors os.path.basename)
+_SEPARATORS = "/\\" if os.name == "nt" else "/"
+_SEPARATOR_CLASS = re.escape(_SEPARATORS)
+
+
+if os.name == "nt":
+    def _basename(path: str) -> str:
+        return path[max(path.rfind("/"), path.rfind("\\")) + 1:]
+
+    def _components(path: str) -> List[str]:
+        return path.replace("\\", "/").split("/")
+else:
+    def _basename(path: str) -> str:
+        return path[path.rfind("/") + 1:]
+
+    def _components(path: str) -> List[str]:
+        return path.split("/")
+
+
+def _has_glob(text: str) -> bool:
+    """Check whether a pattern fragment contains any fnmatch wildcard"""
+    return any(c in _GLOB_CHARS for c in text)
+
+
+class PatternMatcher:
+    """
+    Compiled matcher for a set of fnmatch-style patterns.
+
+    A path matches when any pattern matches either the full path or its
+    basename, case-insensitively (the semantics FileSelection has always
+    used). Patterns are split into buckets so that most files are decided
+    with a few hash lookups:
+
+    - literals (no wildcards): set lookup on the path and the basename
+    - extensions (``*.ext``): set lookup on each dotted suffix of the basename
+    - prefixes (``literal*``): a single ``str.startswith`` on a tuple
+    - directory segments (``**/name/*``): set intersection with the path's
+      interior components
+    - everything else: one merged alternation regex, anchored so a single
+      ``match()`` call covers both the full path and the basename
+
+    Paths containing non-ASCII characters are matched with a regex built from
+    every pattern, so Unicode case folding stays identical to ``re.IGNORECASE``.
+
+    Patterns ending in ``/*`` (such as ``**/node_modules/*``) also form a
+    directory matcher, used by traversal to prune subtrees in which every
+    path is guaranteed to match.
+
+    Regexes are compiled on first use, so a matcher that is only built (or
+    restored with from_state) and never consulted costs no regex compilation.
+    """
+
+    def __init__(self, patterns: Iterable[str], priority: Optional[Iterable[str]] = None):
+        """
+        Compile a set of patterns
+
+        Args:
+            patterns: fnmatch-style patterns to compile
+            priority: Optional patterns to try first, most frequently matching
+                first (see PatternProfile.suggested_order); decides the order
+                of the regex alternation and the prefix tuple, which stop at
+                the first match
+        """
+        self.patterns: Tuple[str, ...] = tuple(sorted(set(patterns)))
+
+        literals = set()
+        extensions = set()
+        prefixes = {}
+        segments = set()
+        regex_patterns: List[str] = []
+
+        rank = {pattern: i for i, pattern in enumerate(priority or ())}
+        ordered = sorted(self.patterns, key=lambda p: rank.get(p, len(rank)))
+        for pattern in ordered:
+            bucket = self.classify(pattern)
+            if bucket == "literal":
+                literals.add(pattern.lower())
+            elif bucket == "extension":
+                extensions.add(pattern[1:].lower())
+            elif bucket == "prefix":
+                prefixes.setdefault(pattern[:-1].lower(), None)
+            elif bucket == "segment":
+                segments.add(self._segment_of(pattern).lower())
+            else:
+                regex_patterns.append(pattern)
+
+        self.literals: FrozenSet[str] = frozenset(literals)
+        self.extensions: FrozenSet[str] = frozenset(extensions)
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.segments: FrozenSet[str] = frozenset(segments)
+        self.regex_patterns: Tuple[str, ...] = tuple(regex_patterns)
+
+        self.directory_patterns: Tuple[str, ...] = tuple(
+                p for p in self.patterns if p.rstrip("*").endswith("/") and p.endswith("*"))
+
+        self._regex_source = self._regex_source_for(self.regex_patterns)
+        self._fallback_source = self._regex_source_for(ordered)
+        self._directory_source = ("|".join(fnmatch.translate(p) for p in self.directory_patterns)
+                                  if self.directory_patterns else None)
+
+    # Fields exported by to_state, all plain data that marshal can serialize
+    _STATE_FIELDS = ("patterns", "literals", "extensions", "prefixes", "segments", "regex_patterns",
+                     "directory_patterns", "_regex_source", "_fallback_source", "_directory_source")
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Export the compiled buckets and regex sources as plain data
+
+        Returns:
+            Dict accepted by from_state
+        """
+        return {name: getattr(self, name) for name in self._STATE_FIELDS}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'PatternMatcher':
+        """
+        Restore a matcher exported with to_state without reclassifying patterns
+
+        Args:
+            state: Dict returned by to_state
+
+        Returns:
+            PatternMatcher equivalent to the exported one
+        """
+        matcher = cls.__new__(cls)
+        for name in cls._STATE_FIELDS:
+            setattr(matcher, name, state[name])
+        return matcher
+
+    @cached_property
+    def _regex(self) -> Optional[re.Pattern]:
+        return self._compile(self._regex_source)
+
+    @cached_property
+    def _fallback_regex(self) -> Optional[re.Pattern]:
+        return self._compile(self._fallback_source)
+
+    @cached_property
+    def _directory_regex(self) -> Optional[re.Pattern]:
+        return self._compile(self._directory_source)
+
+    @cached_property
+    def bytes_matcher(self) -> 'BytesPatternMatcher':
+        """Matcher giving the same answers for bytes paths (see BytesPatternMatcher)"""
+        return BytesPatternMatcher(self)
+
+    @staticmethod
+    def _compile(source: Optional[Union[str, bytes]]) -> Optional[re.Pattern]:
+        return re.compile(source, re.IGNORECASE | re.DOTALL) if source is not None else None
+
+    @classmethod
+    def classify(cls, pattern: str) -> str:
+        """
+        Name the bucket a pattern is compiled into
+
+        Args:
+            pattern: fnmatch-style pattern
+
+        Returns:
+            str: 'literal', 'extension', 'prefix', 'segment' or 'regex'
+        """
+        if not pattern.isascii():
+            return "regex"
+        if not _has_glob(pattern):
+            return "literal"
+        if (pattern.startswith("*") and pattern[1:2] == "."
+                and not _has_glob(pattern[1:])
+                and not any(sep in pattern for sep in _SEPARATORS)):
+            return "extension"
+        if pattern.endswith("*") and not _has_glob(pattern[:-1]):
+            return "prefix"
+        if cls._segment_of(pattern) is not None:
+            return "segment"
+        return "regex"
+
+    @staticmethod
+    def _segment_of(pattern: str) -> Optional[str]:
+        """
+        Extract the directory name from a ``*/name/*`` style pattern
+
+        Such a pattern matches exactly when ``/name/`` occurs in the path,
+        i.e. when ``name`` is one of the path's interior components.
+
+        Returns:
+            The directory name, or None if the pattern has another shape
+        """
+        core = pattern.strip("*")
+        if (core != pattern and pattern.startswith("*") and pattern.endswith("*")
+                and len(core) > 2 and core[0] == "/" and core[-1] == "/"):
+            name = core[1:-1]
+            if name and not _has_glob(name) and not any(sep in name for sep in _SEPARATORS):
+                return name
+        return None
+
+    @staticmethod
+    def _regex_source_for(patterns: Iterable[str]) -> Optional[str]:
+        """
+        Merge patterns into one regex source matching either the full path or the basename
+
+        The optional leading group consumes everything up to the last path
+        separator (the lookahead forbids any further separator), so the
+        alternation is tried against the basename first and the full path
+        on backtracking.
+        """
+        translated = [fnmatch.translate(p) for p in patterns]
+        if not translated:
+            return None
+        alternation = "|".join(translated)
+        return f"(?:.*[{_SEPARATOR_CLASS}](?=[^{_SEPARATOR_CLASS}]*\\Z))?(?:{alternation})"
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def matches(self, path: str) -> bool:
+        """
+        Check whether a path matches any compiled pattern
+
+        Args:
+            path: Path string to check
+
+        Returns:
+            bool: True if the path or its basename matches any pattern
+        """
+        if not path.isascii():
+            return self._fallback_regex is not None and self._fallback_regex.match(path) is not None
+
+        lowered = path.lower()
+        name = _basename(lowered)
+
+        if self.literals and (name in self.literals or lowered in self.literals):
+            return True
+
+        if self.extensions:
+            dot = name.find(".")
+            while dot != -1:
+                if name[dot:] in self.extensions:
+                    return True
+                dot = name.find(".", dot + 1)
+
+        if self.prefixes and (lowered.startswith(self.prefixes) or name.startswith(self.prefixes)):
+            return True
+
+        if self.segments and not self.segments.isdisjoint(_components(lowered)[1:-1]):
+            return True
+
+        return self._regex is not None and self._regex.match(path) is not None
+
+    def matches_directory(self, dir_path: str) -> bool:
+        """
+        Check whether every path below a directory is guaranteed to match
+
+        A pattern ``X/*`` that matches ``dir_path + "/"`` as a full path has
+        matched ``X`` against the directory or one of its ancestors, so it
+        also matches any ``dir_path/<rest>``.
+
+        Args:
+            dir_path: Directory path string to check
+
+        Returns:
+            bool: True if the whole subtree can be skipped
+        """
+        return (self._directory_regex is not None
+                and self._directory_regex.match(dir_path + "/") is not None)
+
+    def __repr__(self) -> str:
+        return (f"<PatternMatcher literals={len(self.literals)}, "
+                f"extensions={len(self.extensions)}, "
+                f"prefixes={len(self.prefixes)}, "
+                f"segments={len(self.segments)}, "
+                f"regex={len(self.regex_patterns)}>")
+
+
+class BytesPatternMatcher:
+    """
+    Bytes-path view of a PatternMatcher, for traversal with os.scandir(bytes).
+
+    Bucketed patterns are always ASCII, so for ASCII paths every bucket
+    lookup and the merged regex run on the raw bytes without decoding
+    (ASCII case folding is the same for bytes and str). Any other path is
+    decoded with os.fsdecode, exactly as os.scandir(str) would have named
+    it, and handed to the str matcher, so results never differ from
+    PatternMatcher's, including for names that are not valid UTF-8.
+
+    Only used on POSIX, where paths are bytes at the system call level.
+    """
+
+    def __init__(self, matcher: PatternMatcher):
+        """
+        Encode the buckets of a compiled matcher
+
+        Args:
+            matcher: Matcher to mirror
+        """
+        self._matcher = matcher
+        self.literals: FrozenSet[bytes] = frozenset(p.encode("ascii") for p in matcher.literals)
+        self.extensions: FrozenSet[bytes] = frozenset(p.encode("ascii") for p in matcher.extensions)
+        self.prefixes: Tuple[bytes, ...] = tuple(p.encode("ascii") for p in matcher.prefixes)
+        self.segments: FrozenSet[bytes] = frozenset(p.encode("ascii") for p in matcher.segments)
+
+        # ASCII regex sources translate to equivalent bytes regexes; otherwise
+        # ASCII paths are decoded for the str regex (cheap and rare)
+        self._ascii_regex = all(p.isascii() for p in matcher.regex_patterns)
+        self._ascii_directory = all(p.isascii() for p in matcher.directory_patterns)
+        self._regex = (PatternMatcher._compile(matcher._regex_source.encode("ascii"))
+                       if self._ascii_regex and matcher._regex_source is not None else None)
+        self._directory_regex = (PatternMatcher._compile(matcher._directory_source.encode("ascii"))
+                                 if self._ascii_directory and matcher._directory_source is not None else None)
+
+    def __len__(self) -> int:
+        return len(self._matcher)
+
+    def __bool__(self) -> bool:
+        return bool(self._matcher)
+
+    def matches(self, path: bytes) -> bool:
+        """
+        Check whether a bytes path matches any compiled pattern
+
+        Args:
+            path: Path as returned by os.scandir(bytes)
+
+        Returns:
+            bool: Same result as PatternMatcher.matches(os.fsdecode(path))
+        """
+        if not path.isascii():
+            fallback = self._matcher._fallback_regex
+            return fallback is not None and fallback.match(path.decode(_FS_ENCODING, _FS_ERRORS)) is not None
+
+        lowered = path.lower()
+        name = lowered[lowered.rfind(b"/") + 1:]
+
+        if self.literals and (name in self.literals or lowered in self.literals):
+            return True
+
+        if self.extensions:
+            dot = name.find(b".")
+            while dot != -1:
+                if name[dot:] in self.extensions:
+                    return True
+                dot = name.find(b".", dot + 1)
+
+        if self.prefixes and (lowered.startswith(self.prefixes) or name.startswith(self.prefixes)):
+            return True
+
+        if self.segments and not self.segments.isdisjoint(lowered.split(b"/")[1:-1]):
+            return True
+
+        if not self._ascii_regex:
+            return self._matcher._regex is not None and self._matcher._regex.match(path.decode("ascii")) is not None
+        return self._regex is not None and self._regex.match(path) is not None
+
+    def matches_directory(self, dir_path: bytes) -> bool:
+        """
+        Check whether every path below a directory is guaranteed to match
+
+        Args:
+            dir_path: Directory path as returned by os.scandir(bytes)
+
+        Returns:
+            bool: Same result as PatternMatcher.matches_directory(os.fsdecode(dir_path))
+        """
+        if not (self._ascii_directory and dir_path.isascii()):
+            return self._matcher.matches_directory(os.fsdecode(dir_path))
+        return self._directory_regex is not None and self._directory_regex.match(dir_path + b"/") is not None
+
+    def __repr__(self) -> str:
+        return f"<BytesPatternMatcher of {self._matcher!r}>"
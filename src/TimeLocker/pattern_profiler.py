@@ -0,0 +1,297 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from .pattern_matcher import PatternMatcher
+
+if TYPE_CHECKING:
+    from .file_selections import FileSelection, PatternGroup
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PatternStats:
+    """Counters for one pattern over a profiled traversal"""
+    pattern: str
+    kind: str  # "include" or "exclude"
+    bucket: str  # PatternMatcher.classify
+    tests: int = 0  # paths the pattern was tested against
+    evaluations: int = 0  # tests needed with first-match-wins in the profiled order
+    hits: int = 0  # paths the pattern matched
+    decisive_hits: int = 0  # paths no earlier pattern had matched
+    directory_prunes: int = 0  # directories skipped because of this pattern
+    match_ns: int = 0  # cumulative time spent testing the pattern
+
+    @property
+    def mean_ns(self) -> float:
+        """Average cost of one test"""
+        return self.match_ns / self.tests if self.tests else 0.0
+
+    @property
+    def cost_ns(self) -> float:
+        """Estimated matching time this pattern adds in the profiled order"""
+        return self.mean_ns * self.evaluations
+
+
+def covers(general: str, specific: str) -> bool:
+    """
+    Check whether every path matching one pattern also matches another
+
+    Only decided for ASCII patterns where ``general`` uses no wildcard but
+    ``*`` and ``specific`` has no character classes: each wildcard in
+    ``specific`` then falls inside a ``*`` of ``general`` whenever
+    ``general`` matches ``specific``'s text, so any expansion of it does
+    too. Matching is case-insensitive, as in PatternMatcher.
+
+    Args:
+        general: Pattern that may cover the other
+        specific: Pattern that may be covered
+
+    Returns:
+        bool: True if ``general`` provably matches everything ``specific`` does
+    """
+    if not (general.isascii() and specific.isascii()) or "?" in general or "[" in general or "[" in specific:
+        return False
+    text = specific.lower()
+    chunks = general.lower().split("*")
+    if len(chunks) == 1:
+        return text == chunks[0]
+    head, *middle, tail = chunks
+    if not text.startswith(head) or not text.endswith(tail) or len(text) < len(head) + len(tail):
+        return False
+    position = len(head)
+    end = len(text) - len(tail)
+    for chunk in middle:
+        position = text.find(chunk, position, end)
+        if position < 0:
+            return False
+        position += len(chunk)
+    return True
+
+
+def find_covered_patterns(patterns: Iterable[str]) -> Dict[str, str]:
+    """
+    Find patterns that another pattern in the same set already covers
+
+    Of two equivalent patterns (e.g. differing only in case) only the later
+    one in sort order is reported, so removing every reported pattern keeps
+    the set's behaviour.
+
+    Args:
+        patterns: Patterns of one kind (include or exclude)
+
+    Returns:
+        Dict mapping each redundant pattern to a pattern covering it
+    """
+    ordered = sorted(set(patterns))
+    # Only patterns without '?' and character classes can be proven to cover others
+    generals = [p for p in ordered if p.isascii() and "?" not in p and "[" not in p]
+    covered = {}
+    for specific in ordered:
+        for general in generals:
+            if general == specific or not covers(general, specific):
+                continue
+            if covers(specific, general) and specific < general:
+                continue  # Equivalent; the earlier pattern is kept
+            covered[specific] = general
+            break
+    return covered
+
+
+class _InstrumentedMatcher:
+    """
+    Drop-in replacement for a PatternMatcher during profiling
+
+    Gives the same answers as the wrapped matcher, and additionally tests
+    and times every pattern on its own in the given order.
+    """
+
+    def __init__(self, matcher: PatternMatcher, stats: Dict[str, PatternStats], order: List[str]):
+        self._matcher = matcher
+        self._singles = [(stats[p], PatternMatcher([p])) for p in order]
+        self._directory = [(stats[p], PatternMatcher([p])) for p in matcher.directory_patterns]
+
+    def __bool__(self) -> bool:
+        return bool(self._matcher)
+
+    def matches(self, path: str) -> bool:
+        decided = False
+        for stat, single in self._singles:
+            start = time.perf_counter_ns()
+            hit = single.matches(path)
+            stat.match_ns += time.perf_counter_ns() - start
+            stat.tests += 1
+            if not decided:
+                stat.evaluations += 1
+            if hit:
+                stat.hits += 1
+                if not decided:
+                    stat.decisive_hits += 1
+                    decided = True
+        return self._matcher.matches(path)
+
+    def matches_directory(self, dir_path: str) -> bool:
+        if not self._matcher.matches_directory(dir_path):
+            return False
+        for stat, single in self._directory:
+            if single.matches_directory(dir_path):
+                stat.directory_prunes += 1
+        return True
+
+
+class PatternProfile:
+    """Result of profiling a selection's patterns over one traversal"""
+
+    def __init__(self, stats: List[PatternStats], covered: Dict[str, str], groups: List[Dict[str, Any]],
+                 files_evaluated: int, elapsed_seconds: float):
+        self.stats = stats
+        self.covered = covered
+        self.groups = groups
+        self.files_evaluated = files_evaluated
+        self.elapsed_seconds = elapsed_seconds
+
+    def unmatched(self) -> List[PatternStats]:
+        """Patterns that matched no file and pruned no directory"""
+        return [s for s in self.stats if not s.hits and not s.directory_prunes]
+
+    def shadowed(self) -> List[PatternStats]:
+        """Patterns whose every match was already made by an earlier pattern"""
+        return [s for s in self.stats if s.hits and not s.decisive_hits and not s.directory_prunes]
+
+    def suggested_order(self) -> List[str]:
+        """
+        Patterns ordered so the most frequent deciders are tried first
+
+        Suitable for FileSelection.set_pattern_priority.
+        """
+        ranked = sorted(self.stats, key=lambda s: (-s.decisive_hits, -s.hits, s.mean_ns, s.pattern))
+        return list(dict.fromkeys(s.pattern for s in ranked))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-data form of the profile"""
+        return {
+                "files_evaluated": self.files_evaluated,
+                "elapsed_seconds": self.elapsed_seconds,
+                "patterns":        [dict(asdict(s), mean_ns=s.mean_ns, cost_ns=s.cost_ns) for s in self.stats],
+                "unmatched":       [s.pattern for s in self.unmatched()],
+                "shadowed":        [s.pattern for s in self.shadowed()],
+                "covered":         dict(self.covered),
+                "groups":          list(self.groups),
+                "suggested_order": self.suggested_order(),
+        }
+
+
+class PatternProfiler:
+    """
+    Instrument a FileSelection's compiled matchers for one traversal.
+
+    The selection is walked exactly as a backup scan would walk it, with
+    its compiled include and exclude matchers temporarily replaced by
+    instrumented stand-ins. For every path reaching a matcher, each pattern
+    is tested and timed on its own in the selection's current priority
+    order, giving per-pattern test, hit and first-match counts plus match
+    time. Patterns that were never needed, patterns another pattern
+    provably covers, and the pattern groups involved are reported
+    alongside. Profiling is much slower than matching, so it is meant for
+    analysis, not for backups.
+    """
+
+    def __init__(self, selection: 'FileSelection', groups: Optional[Iterable['PatternGroup']] = None):
+        """
+        Initialize the profiler
+
+        Args:
+            selection: Selection to profile
+            groups: Pattern groups to summarize (defaults to the selection's
+                own groups plus every common group fully present in it)
+        """
+        self._selection = selection
+        self._groups = groups
+
+    def _summarize_groups(self, stats: Dict[str, Dict[str, PatternStats]]) -> List[Dict[str, Any]]:
+        """Per pattern-group totals, for each kind the group's patterns appear in"""
+        from .file_selections import PatternGroup
+
+        groups = self._groups
+        if groups is None:
+            groups = dict(self._selection._pattern_groups)
+            for name in PatternGroup.COMMON_GROUPS:
+                group = PatternGroup.get_common_group(name)
+                if name not in groups and any(group.patterns <= kind_stats.keys() for kind_stats in stats.values()):
+                    groups[name] = group
+            groups = groups.values()
+
+        summary = []
+        for group in groups:
+            for kind, kind_stats in stats.items():
+                members = [kind_stats[p] for p in sorted(group.patterns) if p in kind_stats]
+                if not members:
+                    continue
+                summary.append({
+                        "name":     group.name,
+                        "kind":     kind,
+                        "patterns": len(members),
+                        "matched":  sum(1 for m in members if m.hits or m.directory_prunes),
+                        "hits":     sum(m.hits for m in members),
+                        "match_ns": sum(m.match_ns for m in members),
+                })
+        return summary
+
+    def run(self) -> PatternProfile:
+        """
+        Traverse the selection once with instrumented matchers
+
+        Returns:
+            PatternProfile with the collected statistics
+        """
+        selection = self._selection
+        selection._compile_patterns()
+        matchers = {"exclude": selection._compiled_exclude_patterns,
+                    "include": selection._compiled_include_patterns}
+
+        rank = {p: i for i, p in enumerate(selection._pattern_priority)}
+        stats: Dict[str, Dict[str, PatternStats]] = {}
+        instrumented = {}
+        for kind, matcher in matchers.items():
+            order = sorted(matcher.patterns, key=lambda p: rank.get(p, len(rank)))
+            stats[kind] = {p: PatternStats(p, kind, PatternMatcher.classify(p)) for p in order}
+            instrumented[kind] = _InstrumentedMatcher(matcher, stats[kind], order)
+
+        progress = {"files_processed": 0}
+        started = time.monotonic()
+        selection._compiled_exclude_patterns = instrumented["exclude"]
+        selection._compiled_include_patterns = instrumented["include"]
+        try:
+            for _ in selection.iter_effective_entries(progress):
+                pass
+        finally:
+            selection._compiled_exclude_patterns = matchers["exclude"]
+            selection._compiled_include_patterns = matchers["include"]
+        elapsed = time.monotonic() - started
+
+        covered = {}
+        for kind_stats in stats.values():
+            covered.update(find_covered_patterns(kind_stats))
+        logger.debug(f"Profiled {sum(map(len, stats.values()))} pattern(s) over "
+                     f"{progress['files_processed']} file(s) in {elapsed:.2f}s")
+        return PatternProfile([s for kind_stats in stats.values() for s in kind_stats.values()], covered,
+                              self._summarize_groups(stats), progress["files_processed"], elapsed)
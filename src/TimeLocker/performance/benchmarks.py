@@ -2,15 +2,19 @@
 Performance benchmarks for TimeLocker operations
 """
 
+import fnmatch
+import itertools
 import tempfile
 import shutil
 import time
 import os
+import re
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
 
 from ..file_selections import FileSelection, SelectionType
+from ..pattern_matcher import PatternMatcher
 from .profiler import PerformanceProfiler
 from .metrics import PerformanceMetrics
 
@@ -119,6 +123,61 @@ class PerformanceBenchmarks:
                 'matches_consistent':   legacy_matches == optimized_matches
         }
 
+    @staticmethod
+    def generate_patterns(num_patterns: int) -> List[str]:
+        """Generate distinct exclude patterns with a realistic mix of shapes"""
+        shapes = [
+                "*.ext{i}", "cache_{i}", "~tmp{i}*", "**/build_{i}/*",
+                "dir_{i}/*", "*/file_{i}?.txt", "[ab]log_{i}*", "*.{i}.bak"
+        ]
+        return [shapes[i % len(shapes)].format(i=i) for i in range(num_patterns)]
+
+    def benchmark_pattern_scaling(self, test_dir: Path,
+                                  pattern_counts: Optional[List[int]] = None,
+                                  max_files: int = 500) -> Dict[str, Any]:
+        """Benchmark the combined pattern matcher against per-pattern regex matching"""
+        pattern_counts = pattern_counts or [10, 100, 1000, 5000]
+        logger.info(f"Benchmarking pattern scaling for {pattern_counts} patterns")
+
+        test_files = [str(f) for f in test_dir.rglob("*") if f.is_file()][:max_files]
+        results = []
+
+        for num_patterns in pattern_counts:
+            patterns = self.generate_patterns(num_patterns)
+
+            # Per-pattern regex matching, as FileSelection did before PatternMatcher
+            compiled = [re.compile(fnmatch.translate(p), re.IGNORECASE) for p in patterns]
+            start_time = time.perf_counter()
+            per_pattern_matches = 0
+            for file_path in test_files:
+                name = os.path.basename(file_path)
+                if any(regex.match(file_path) or regex.match(name) for regex in compiled):
+                    per_pattern_matches += 1
+            per_pattern_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            matcher = PatternMatcher(patterns)
+            compile_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            matcher_matches = 0
+            for file_path in test_files:
+                if matcher.matches(file_path):
+                    matcher_matches += 1
+            matcher_time = time.perf_counter() - start_time
+
+            results.append({
+                    'num_patterns':       num_patterns,
+                    'num_test_files':     len(test_files),
+                    'compile_time':       compile_time,
+                    'per_pattern_time':   per_pattern_time,
+                    'matcher_time':       matcher_time,
+                    'speedup_factor':     per_pattern_time / matcher_time if matcher_time > 0 else 0,
+                    'matches_consistent': per_pattern_matches == matcher_matches
+            })
+
+        return {'scaling': results}
+
     def benchmark_file_traversal(self, test_dir: Path) -> Dict[str, Any]:
         """Benchmark file traversal performance"""
         logger.info("Benchmarking file traversal performance")
@@ -185,6 +244,426 @@ class PerformanceBenchmarks:
                 'throughput_files_per_sec': size_stats['file_count'] / (traversal_time + size_time) if (traversal_time + size_time) > 0 else 0
         }
 
+    def create_synthetic_tree(self, num_files: int = 1_000_000, files_per_dir: int = 1000,
+                              dirs_per_level: int = 10) -> Path:
+        """Create a tree of empty files spread over nested directories"""
+        tree_dir = self.temp_dir / f"tree_{num_files}"
+        tree_dir.mkdir(exist_ok=True)
+
+        num_dirs = max(1, num_files // files_per_dir)
+        for d in range(num_dirs):
+            # Nest directories two levels deep so traversal has to descend
+            dir_path = tree_dir / f"level_{d // dirs_per_level:04d}" / f"dir_{d % dirs_per_level:02d}"
+            dir_path.mkdir(parents=True, exist_ok=True)
+            for f in range(files_per_dir):
+                suffix = ".tmp" if f % 10 == 0 else ".dat"
+                open(dir_path / f"file_{f:05d}{suffix}", 'wb').close()
+
+        return tree_dir
+
+    @staticmethod
+    def _legacy_estimate_backup_size(selection: FileSelection) -> Dict[str, int]:
+        """os.walk + Path.stat size estimation, as FileSelection did before the scandir core"""
+        stats = {"total_size": 0, "file_count": 0}
+        for path in selection.includes:
+            for root, dirs, files in os.walk(path):
+                root_path = Path(root)
+                for file in files:
+                    file_path = root_path / file
+                    if selection.should_include_file(file_path):
+                        try:
+                            stats["total_size"] += file_path.stat().st_size
+                            stats["file_count"] += 1
+                        except OSError:
+                            continue
+        return stats
+
+    def benchmark_traversal_throughput(self, num_files: int = 1_000_000,
+                                       files_per_dir: int = 1000) -> Dict[str, Any]:
+        """Benchmark files/sec of size estimation before and after the scandir traversal core"""
+        logger.info(f"Benchmarking traversal throughput on {num_files} files")
+
+        tree_dir = self.create_synthetic_tree(num_files=num_files, files_per_dir=files_per_dir)
+
+        selection = FileSelection()
+        selection.add_path(tree_dir, SelectionType.INCLUDE)
+        selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+
+        start_time = time.perf_counter()
+        legacy_stats = self._legacy_estimate_backup_size(selection)
+        legacy_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        scandir_stats = selection.estimate_backup_size()
+        scandir_time = time.perf_counter() - start_time
+
+        total_files = max(1, num_files // files_per_dir) * files_per_dir
+        return {
+                'num_files':                  total_files,
+                'legacy_time':                legacy_time,
+                'scandir_time':               scandir_time,
+                'legacy_files_per_sec':       total_files / legacy_time if legacy_time > 0 else 0,
+                'scandir_files_per_sec':      total_files / scandir_time if scandir_time > 0 else 0,
+                'speedup_factor':             legacy_time / scandir_time if scandir_time > 0 else 0,
+                'results_consistent':         (legacy_stats['file_count'] == scandir_stats['file_count']
+                                               and legacy_stats['total_size'] == scandir_stats['total_size'])
+        }
+
+    # Entry names for create_hostile_tree: plain ASCII, valid non-ASCII, a newline,
+    # and bytes that are not valid UTF-8 (round-tripped through surrogateescape)
+    HOSTILE_NAME_TEMPLATES = (b"file_%05d.dat", b"file_%05d.tmp", "файл_%05d.dat".encode("utf-8"),
+                              b"line\nbreak_%05d.dat", b"bad_\xff\xfe_%05d.dat", b"latin1_caf\xe9_%05d.tmp")
+
+    def create_hostile_tree(self, num_files: int = 1_000_000, files_per_dir: int = 1000,
+                            dirs_per_level: int = 10) -> Path:
+        """
+        Create a tree of empty files whose names include hostile byte sequences
+
+        Every directory mixes the HOSTILE_NAME_TEMPLATES names, and some
+        directory names are not valid UTF-8 either. Names the file system
+        refuses (e.g. invalid UTF-8 on macOS) are skipped.
+        """
+        tree_dir = self.temp_dir / f"hostile_{num_files}"
+        tree_dir.mkdir(exist_ok=True)
+        root = os.fsencode(str(tree_dir))
+
+        num_dirs = max(1, num_files // files_per_dir)
+        for d in range(num_dirs):
+            leaf = b"dir_%02d" % (d % dirs_per_level) if d % 3 else b"dir_\xff%02d" % (d % dirs_per_level)
+            dir_path = os.path.join(root, b"level_%04d" % (d // dirs_per_level), leaf)
+            try:
+                os.makedirs(dir_path, exist_ok=True)
+            except OSError:
+                continue
+            for f in range(files_per_dir):
+                template = self.HOSTILE_NAME_TEMPLATES[f % len(self.HOSTILE_NAME_TEMPLATES)]
+                try:
+                    os.close(os.open(os.path.join(dir_path, template % f), os.O_CREAT | os.O_WRONLY, 0o644))
+                except OSError:
+                    continue
+
+        return tree_dir
+
+    def benchmark_bytes_traversal(self, num_files: int = 1_000_000, files_per_dir: int = 1000) -> Dict[str, Any]:
+        """
+        Benchmark producing a restic file list with str versus bytes traversal
+
+        The str side is what write_files_from did before the bytes fast path:
+        str traversal plus os.fsencode per path. Both walks visit entries in
+        the same order, so the lists are compared entry by entry.
+        """
+        logger.info(f"Benchmarking bytes traversal on {num_files} files with hostile names")
+
+        tree_dir = self.create_hostile_tree(num_files=num_files, files_per_dir=files_per_dir)
+
+        selection = FileSelection()
+        selection.add_path(tree_dir, SelectionType.INCLUDE)
+        for pattern in ("*.tmp", "*~", "**/node_modules/*", "*/level_0001/*_0000?.dat"):
+            selection.add_pattern(pattern, SelectionType.EXCLUDE)
+
+        start_time = time.perf_counter()
+        str_count = sum(1 for path_str, _ in selection.iter_effective_entries() if os.fsencode(path_str))
+        str_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        bytes_count = sum(1 for _ in selection.iter_effective_bytes())
+        bytes_time = time.perf_counter() - start_time
+
+        consistent = all(a is not None and b is not None and os.fsencode(a[0]) == b[0]
+                         for a, b in itertools.zip_longest(selection.iter_effective_entries(),
+                                                           selection.iter_effective_bytes()))
+        return {
+                'num_files':            num_files,
+                'files_selected':       bytes_count,
+                'str_time':             str_time,
+                'bytes_time':           bytes_time,
+                'str_files_per_sec':    str_count / str_time if str_time > 0 else 0,
+                'bytes_files_per_sec':  bytes_count / bytes_time if bytes_time > 0 else 0,
+                'speedup_factor':       str_time / bytes_time if bytes_time > 0 else 0,
+                'results_consistent':   consistent and str_count == bytes_count,
+        }
+
+    def benchmark_parent_selection(self, num_targets: int = 8, files_per_target: int = 500) -> Dict[str, Any]:
+        """
+        Benchmark restic's own parent choice against the snapshot index
+
+        Every target backs up the same root, excluding all but its own
+        subdirectory, and carries its own tag, as when many targets share a
+        repository. restic then picks the newest snapshot of the root as
+        parent, usually another target's, and hashes the target's files
+        again; the snapshot index picks the target's own snapshot. Needs
+        the restic binary.
+        """
+        from ..backup_target import PARENT_AUTO, PARENT_RESTIC, BackupTarget
+        from ..restic.Repositories.local import LocalResticRepository
+
+        if shutil.which("restic") is None:
+            return {'skipped': 'restic not found'}
+        logger.info(f"Benchmarking parent selection for {num_targets} targets sharing a repository")
+
+        root = self.temp_dir / "parent_selection"
+        for target in range(num_targets):
+            target_dir = root / f"target_{target:02d}"
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for i in range(files_per_target):
+                (target_dir / f"file_{i:05d}.dat").write_bytes(os.urandom(256))
+
+        repo = LocalResticRepository(str(self.temp_dir / "parent_repo"), password="benchmark")
+        repo.initialize_repository()
+
+        def backup_all(parent: str) -> Dict[str, Any]:
+            unmodified = 0
+            start_time = time.perf_counter()
+            for target in range(num_targets):
+                selection = FileSelection()
+                selection.add_path(root, SelectionType.INCLUDE)
+                for other in range(num_targets):
+                    if other != target:
+                        selection.add_path(root / f"target_{other:02d}", SelectionType.EXCLUDE)
+                result = repo.backup_target([BackupTarget(selection=selection, tags=[f"target-{target}"],
+                                                          parent=parent)])
+                unmodified += result.get('files_unmodified', 0)
+            return {'time': time.perf_counter() - start_time, 'files_unmodified': unmodified}
+
+        backup_all(PARENT_RESTIC)  # Seed one snapshot per target
+        restic_choice = backup_all(PARENT_RESTIC)
+        indexed_choice = backup_all(PARENT_AUTO)
+
+        total_files = num_targets * files_per_target
+        return {
+                'num_targets':             num_targets,
+                'total_files':             total_files,
+                'restic_time':             restic_choice['time'],
+                'restic_files_unmodified': restic_choice['files_unmodified'],
+                'index_time':              indexed_choice['time'],
+                'index_files_unmodified':  indexed_choice['files_unmodified'],
+                'speedup_factor':          restic_choice['time'] / indexed_choice['time']
+                if indexed_choice['time'] > 0 else 0,
+        }
+
+    def benchmark_snapshot_decoding(self, num_snapshots: int = 100_000) -> Dict[str, Any]:
+        """
+        Benchmark decoding a 'restic snapshots --json' listing
+
+        The legacy side is what ResticRepository.snapshots did before the
+        snapshot decoder: json.loads, then fromisoformat with a regex retry
+        for nanosecond fractions and a fresh Path per snapshot path.
+        """
+        import json
+        from datetime import datetime
+        from ..backup_snapshot import BackupSnapshot
+        from ..restic import snapshot_decoder
+        from ..restic.snapshot_decoder import SnapshotDecoder
+
+        logger.info(f"Benchmarking decoding of {num_snapshots} snapshot records")
+
+        hosts = [f"host-{i}" for i in range(4)]
+        tag_sets = [[], ["daily"], ["daily", "db"], ["weekly", "home"]]
+        path_sets = [["/home"], ["/etc", "/var/lib"], ["/srv/data"], ["/home", "/root"]]
+        records = []
+        for i in range(num_snapshots):
+            snapshot_id = f"{i:016x}" * 4
+            records.append({
+                    "time":     f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:07."
+                                f"{i % 1_000_000_000:09d}+02:00",
+                    "tree":     snapshot_id, "paths": path_sets[i % 4], "hostname": hosts[i % 4],
+                    "username": "root", "tags": tag_sets[i % 4], "id": snapshot_id, "short_id": snapshot_id[:8],
+            })
+        output = json.dumps(records)
+        del records
+
+        def legacy_decode(text: str):
+            snapshots = []
+            for s in json.loads(text):
+                timestamp_str = s["time"]
+                try:
+                    timestamp = datetime.fromisoformat(timestamp_str)
+                except ValueError:
+                    timestamp = datetime.fromisoformat(re.sub(r'\.(\d{6})\d*', r'.\1', timestamp_str))
+                snapshot = BackupSnapshot(repo=None, snapshot_id=s["short_id"], timestamp=timestamp,
+                                          paths=[Path(p) for p in s["paths"]])
+                snapshot.hostname = s["hostname"]
+                snapshot.tags = s["tags"] if "tags" in s else []
+                snapshots.append(snapshot)
+            return snapshots
+
+        start_time = time.perf_counter()
+        legacy = legacy_decode(output)
+        legacy_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        decoded = SnapshotDecoder().decode(output, None)
+        decoder_time = time.perf_counter() - start_time
+
+        consistent = len(legacy) == len(decoded) and all(
+                (a.id, a.timestamp, a.paths, a.hostname, a.tags) == (b.id, b.timestamp, b.paths, b.hostname, b.tags)
+                for a, b in zip(legacy, decoded))
+        return {
+                'num_snapshots':             num_snapshots,
+                'json_backend':              'orjson' if snapshot_decoder.orjson is not None else 'json',
+                'legacy_time':               legacy_time,
+                'decoder_time':              decoder_time,
+                'legacy_snapshots_per_sec':  num_snapshots / legacy_time if legacy_time > 0 else 0,
+                'decoder_snapshots_per_sec': num_snapshots / decoder_time if decoder_time > 0 else 0,
+                'speedup_factor':            legacy_time / decoder_time if decoder_time > 0 else 0,
+                'results_consistent':        consistent,
+        }
+
+    def benchmark_snapshot_memory(self, num_snapshots: int = 1_000_000) -> Dict[str, Any]:
+        """
+        Benchmark the memory a decoded snapshot listing keeps resident
+
+        The legacy side is the snapshot before it was slotted: a plain
+        object with a __dict__ holding a datetime, a list of fresh Path
+        objects and a list of tags per snapshot. Memory is measured with
+        tracemalloc while each listing is alive.
+        """
+        import json
+        import tracemalloc
+        from ..restic.snapshot_decoder import SnapshotDecoder, parse_rfc3339
+
+        logger.info(f"Benchmarking memory of {num_snapshots} resident snapshots")
+
+        class LegacySnapshot:
+            def __init__(self, repo, snapshot_id, timestamp, paths):
+                self.repo = repo
+                self.id = snapshot_id
+                self.timestamp = timestamp
+                self.paths = paths
+
+        hosts = [f"host-{i}" for i in range(4)]
+        tag_sets = [[], ["daily"], ["daily", "db"], ["weekly", "home"]]
+        path_sets = [["/home"], ["/etc", "/var/lib"], ["/srv/data"], ["/home", "/root"]]
+        records = []
+        for i in range(num_snapshots):
+            snapshot_id = f"{i:016x}" * 4
+            records.append({
+                    "time":     f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:07."
+                                f"{i % 1_000_000_000:09d}+02:00",
+                    "paths":    path_sets[i % 4], "hostname": hosts[i % 4], "tags": tag_sets[i % 4],
+                    "id":       snapshot_id, "short_id": snapshot_id[:8],
+            })
+        # Both sides decode the same JSON, so what they keep is counted
+        output = json.dumps(records)
+        del records
+
+        def legacy_decode(text: str):
+            snapshots = []
+            for s in json.loads(text):
+                snapshot = LegacySnapshot(None, s["short_id"], parse_rfc3339(s["time"]),
+                                          [Path(p) for p in s["paths"]])
+                snapshot.hostname = s["hostname"]
+                snapshot.tags = s["tags"] if "tags" in s else []
+                snapshots.append(snapshot)
+            return snapshots
+
+        def resident_bytes(decode) -> int:
+            tracemalloc.start()
+            try:
+                snapshots = decode(output)
+                resident = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+            del snapshots
+            return resident
+
+        legacy_bytes = resident_bytes(legacy_decode)
+        decoder = SnapshotDecoder()
+        compact_bytes = resident_bytes(lambda text: decoder.decode(text, None))
+
+        return {
+                'num_snapshots':                num_snapshots,
+                'legacy_bytes':                 legacy_bytes,
+                'compact_bytes':                compact_bytes,
+                'legacy_bytes_per_snapshot':    legacy_bytes / num_snapshots if num_snapshots else 0,
+                'compact_bytes_per_snapshot':   compact_bytes / num_snapshots if num_snapshots else 0,
+                'reduction_factor':             legacy_bytes / compact_bytes if compact_bytes > 0 else 0,
+        }
+
+    def benchmark_snapshot_queries(self, num_snapshots: int = 100_000, num_queries: int = 200) -> Dict[str, Any]:
+        """
+        Benchmark SnapshotManager lookups against its indexes
+
+        The legacy side is what SnapshotManager did before it kept
+        indexes: a startswith scan per ID lookup, and list comprehensions
+        plus a full sort per filtered listing. Index build time is
+        reported separately, since it is paid once per refresh.
+        """
+        import random
+        from datetime import datetime, timedelta, timezone
+        from ..backup_snapshot import BackupSnapshot
+        from ..snapshot_query_index import SnapshotQueryIndex
+
+        logger.info(f"Benchmarking {num_queries} queries over {num_snapshots} snapshots")
+
+        rng = random.Random(42)
+        base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        tags = [f"tag-{i}" for i in range(20)]
+        hosts = [f"host-{i}" for i in range(10)]
+        paths = [Path(f"/data/{i}") for i in range(50)]
+        snapshots = []
+        for i in range(num_snapshots):
+            snapshot = BackupSnapshot(None, f"{rng.getrandbits(64):016x}", base + timedelta(minutes=i),
+                                      [paths[i % len(paths)]])
+            snapshot.tags = [tags[i % len(tags)]]
+            snapshot.hostname = hosts[i % len(hosts)]
+            snapshots.append(snapshot)
+
+        queries = []
+        for _ in range(num_queries):
+            start = base + timedelta(minutes=rng.randrange(num_snapshots))
+            queries.append({
+                    'tags':        [rng.choice(tags)],
+                    'paths':       [rng.choice(paths)] if rng.random() < 0.5 else None,
+                    'date_from':   start,
+                    'date_to':     start + timedelta(days=rng.randrange(1, 30)),
+                    'max_results': rng.choice([None, 1, 10]),
+            })
+        lookups = [rng.choice(snapshots).id[:rng.randrange(8, 17)] for _ in range(num_queries)]
+
+        def legacy_query(tags=None, paths=None, date_from=None, date_to=None, max_results=None):
+            filtered = snapshots
+            if tags:
+                filtered = [s for s in filtered if any(tag in s.tags for tag in tags)]
+            if date_from:
+                filtered = [s for s in filtered if s.timestamp >= date_from]
+            if date_to:
+                filtered = [s for s in filtered if s.timestamp <= date_to]
+            if paths:
+                filtered = [s for s in filtered if any(path in s.paths for path in paths)]
+            filtered = sorted(filtered, key=lambda s: s.timestamp, reverse=True)
+            return filtered[:max_results] if max_results else filtered
+
+        def legacy_resolve(prefix):
+            return next(s for s in snapshots if s.id == prefix or s.id.startswith(prefix))
+
+        start_time = time.perf_counter()
+        legacy_results = [legacy_query(**query) for query in queries]
+        legacy_ids = [legacy_resolve(prefix) for prefix in lookups]
+        legacy_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        index = SnapshotQueryIndex(snapshots)
+        build_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        indexed_results = [index.query(**query) for query in queries]
+        indexed_ids = [index.resolve(prefix) for prefix in lookups]
+        indexed_time = time.perf_counter() - start_time
+
+        operations = len(queries) + len(lookups)
+        return {
+                'num_snapshots':           num_snapshots,
+                'num_operations':          operations,
+                'legacy_time':             legacy_time,
+                'index_build_time':        build_time,
+                'indexed_time':            indexed_time,
+                'legacy_ops_per_sec':      operations / legacy_time if legacy_time > 0 else 0,
+                'indexed_ops_per_sec':     operations / indexed_time if indexed_time > 0 else 0,
+                'speedup_factor':          legacy_time / indexed_time if indexed_time > 0 else 0,
+                'results_consistent':      legacy_results == indexed_results and legacy_ids == indexed_ids,
+        }
+
     def run_all_benchmarks(self) -> Dict[str, Any]:
         """Run all performance benchmarks"""
         logger.info("Running all performance benchmarks")
@@ -196,6 +675,7 @@ class PerformanceBenchmarks:
 
         # Run benchmarks
         results['pattern_matching'] = self.benchmark_file_selection_patterns(test_dir, num_patterns=50)
+        results['pattern_scaling'] = self.benchmark_pattern_scaling(test_dir, max_files=200)
         results['file_traversal'] = self.benchmark_file_traversal(test_dir)
         results['large_directory'] = self.benchmark_large_directory_scan(num_files=5000)
 
@@ -224,6 +704,18 @@ class PerformanceBenchmarks:
             report.append(f"  Results consistent: {pm.get('matches_consistent', False)}")
             report.append("")
 
+        # Pattern scaling results
+        ps = results.get('pattern_scaling', {})
+        if ps:
+            report.append("Pattern Scaling Performance:")
+            for row in ps.get('scaling', []):
+                report.append(f"  {row['num_patterns']:>5} patterns: "
+                              f"per-pattern {row['per_pattern_time']:.4f}s, "
+                              f"matcher {row['matcher_time']:.4f}s, "
+                              f"speedup {row['speedup_factor']:.1f}x, "
+                              f"consistent {row['matches_consistent']}")
+            report.append("")
+
         # File traversal results
         ft = results.get('file_traversal', {})
         if ft:
@@ -235,6 +727,77 @@ class PerformanceBenchmarks:
             report.append(f"  Throughput: {ft.get('throughput_files_per_sec', 0):.1f} files/sec")
             report.append("")
 
+        # Traversal throughput results
+        tt = results.get('traversal_throughput', {})
+        if tt:
+            report.append("Traversal Throughput (size estimation):")
+            report.append(f"  Files: {tt.get('num_files', 0):,}")
+            report.append(f"  Before (os.walk + Path.stat): {tt.get('legacy_files_per_sec', 0):.1f} files/sec")
+            report.append(f"  After (scandir core): {tt.get('scandir_files_per_sec', 0):.1f} files/sec")
+            report.append(f"  Speedup factor: {tt.get('speedup_factor', 0):.2f}x")
+            report.append(f"  Results consistent: {tt.get('results_consistent', False)}")
+            report.append("")
+
+        # Bytes traversal results
+        bt = results.get('bytes_traversal', {})
+        if bt:
+            report.append("Bytes Traversal (restic file list, hostile names):")
+            report.append(f"  Files: {bt.get('num_files', 0):,} ({bt.get('files_selected', 0):,} selected)")
+            report.append(f"  str traversal + fsencode: {bt.get('str_files_per_sec', 0):.1f} files/sec")
+            report.append(f"  bytes traversal: {bt.get('bytes_files_per_sec', 0):.1f} files/sec")
+            report.append(f"  Speedup factor: {bt.get('speedup_factor', 0):.2f}x")
+            report.append(f"  Results consistent: {bt.get('results_consistent', False)}")
+            report.append("")
+
+        # Snapshot decoding results
+        sd = results.get('snapshot_decoding', {})
+        if sd:
+            report.append(f"Snapshot Decoding ({sd.get('json_backend', 'json')}):")
+            report.append(f"  Snapshots: {sd.get('num_snapshots', 0):,}")
+            report.append(f"  Before (fromisoformat + Path per path): "
+                          f"{sd.get('legacy_snapshots_per_sec', 0):.1f} snapshots/sec")
+            report.append(f"  After (snapshot decoder): {sd.get('decoder_snapshots_per_sec', 0):.1f} snapshots/sec")
+            report.append(f"  Speedup factor: {sd.get('speedup_factor', 0):.2f}x")
+            report.append(f"  Results consistent: {sd.get('results_consistent', False)}")
+            report.append("")
+
+        # Snapshot memory results
+        sm = results.get('snapshot_memory', {})
+        if sm:
+            report.append("Snapshot Memory (resident listing):")
+            report.append(f"  Snapshots: {sm.get('num_snapshots', 0):,}")
+            report.append(f"  Before (__dict__, datetime, Path lists): {sm.get('legacy_bytes', 0) / 2 ** 20:.1f} MiB "
+                          f"({sm.get('legacy_bytes_per_snapshot', 0):.0f} bytes/snapshot)")
+            report.append(f"  After (__slots__, nanoseconds, shared tuples): "
+                          f"{sm.get('compact_bytes', 0) / 2 ** 20:.1f} MiB "
+                          f"({sm.get('compact_bytes_per_snapshot', 0):.0f} bytes/snapshot)")
+            report.append(f"  Reduction factor: {sm.get('reduction_factor', 0):.2f}x")
+            report.append("")
+
+        # Snapshot query results
+        sq = results.get('snapshot_queries', {})
+        if sq:
+            report.append("Snapshot Queries (SnapshotManager lookups):")
+            report.append(f"  Snapshots: {sq.get('num_snapshots', 0):,} ({sq.get('num_operations', 0)} operations)")
+            report.append(f"  Before (linear scans + sort): {sq.get('legacy_ops_per_sec', 0):.1f} ops/sec")
+            report.append(f"  After (query indexes): {sq.get('indexed_ops_per_sec', 0):.1f} ops/sec "
+                          f"(index built in {sq.get('index_build_time', 0):.3f}s)")
+            report.append(f"  Speedup factor: {sq.get('speedup_factor', 0):.2f}x")
+            report.append(f"  Results consistent: {sq.get('results_consistent', False)}")
+            report.append("")
+
+        # Parent selection results
+        pp = results.get('parent_selection', {})
+        if pp and 'skipped' not in pp:
+            report.append("Parent Selection (targets sharing a repository):")
+            report.append(f"  Targets: {pp.get('num_targets', 0)} ({pp.get('total_files', 0):,} files)")
+            report.append(f"  restic's choice: {pp.get('restic_time', 0):.2f}s, "
+                          f"{pp.get('restic_files_unmodified', 0):,} files unmodified")
+            report.append(f"  Snapshot index: {pp.get('index_time', 0):.2f}s, "
+                          f"{pp.get('index_files_unmodified', 0):,} files unmodified")
+            report.append(f"  Speedup factor: {pp.get('speedup_factor', 0):.2f}x")
+            report.append("")
+
         # Large directory results
         ld = results.get('large_directory', {})
         if ld:
@@ -26,6 +26,11 @@ class SnapshotNotFoundError(RecoveryError):
     pass
 
 
+class AmbiguousSnapshotIdError(SnapshotNotFoundError):
+    """Raised when a snapshot ID prefix matches more than one snapshot"""
+    pass
+
+
 class RestoreError(RecoveryError):
     """Base exception for restore operations"""
     pass
@@ -0,0 +1,126 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from .logging import logger
+
+# Combined length of argv entries above which lists are moved into files
+ARGV_FILE_THRESHOLD = 32 * 1024
+
+
+def exclude_file_safe(entry: str) -> bool:
+    """
+    Check whether an exclude entry survives a round trip through --exclude-file
+
+    restic reads exclude files line by line, trims surrounding whitespace,
+    skips blank lines and lines starting with '#', and expands environment
+    variables, so such entries must stay on the command line instead.
+
+    Args:
+        entry: Exclude pattern or path
+
+    Returns:
+        bool: True if the entry can be written to an exclude file verbatim
+    """
+    return (bool(entry) and entry == entry.strip() and not entry.startswith("#")
+            and "$" not in entry and "\n" not in entry and "\r" not in entry)
+
+
+def argv_length(option: Optional[str], values: Iterable[str]) -> int:
+    """
+    Approximate bytes a list of values would occupy in argv
+
+    Args:
+        option: Option name repeated before each value, or None for positionals
+        values: Argument values
+
+    Returns:
+        int: Combined length including separators
+    """
+    # "--option\0value\0" or "value\0"
+    per_value = len(option) + 4 if option else 1
+    return sum(len(value) + per_value for value in values)
+
+
+class ArgumentFiles:
+    """
+    Private temporary directory for restic list files (--exclude-file,
+    --files-from-raw and friends).
+
+    Use as a context manager around the restic invocation; the directory
+    and everything written into it is removed on exit, including when the
+    command fails or is interrupted. Files are written one entry at a time,
+    so arbitrarily large selections never need to be joined in memory.
+    """
+
+    def __init__(self, prefix: str = "timelocker-args-"):
+        self._prefix = prefix
+        self._directory: Optional[Path] = None
+        self._count = 0
+
+    @property
+    def directory(self) -> Optional[Path]:
+        """Temporary directory, or None when not entered"""
+        return self._directory
+
+    def __enter__(self) -> "ArgumentFiles":
+        # mkdtemp creates the directory readable by the current user only
+        self._directory = Path(tempfile.mkdtemp(prefix=self._prefix))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
+
+    def write(self, name: str, entries: Iterable[Union[str, bytes]], separator: bytes = b"\n") -> Path:
+        """
+        Stream entries into a new file in the temporary directory
+
+        Args:
+            name: Descriptive file name stem
+            entries: Lines to write; str entries are encoded with os.fsencode
+                so undecodable filename bytes round-trip unchanged, bytes
+                entries are written as they are
+            separator: Terminator written after every entry (b"\\0" for raw lists)
+
+        Returns:
+            Path: Location of the written file
+        """
+        if self._directory is None:
+            raise RuntimeError("ArgumentFiles must be entered before writing")
+
+        self._count += 1
+        path = self._directory / f"{self._count:02d}-{name}"
+        with open(path, "wb") as handle:
+            for entry in entries:
+                handle.write(os.fsencode(entry))
+                handle.write(separator)
+        return path
+
+    def cleanup(self):
+        """Remove the temporary directory and its files"""
+        if self._directory is None:
+            return
+        shutil.rmtree(self._directory, ignore_errors=True)
+        if self._directory.exists():
+            logger.warning(f"Could not remove temporary argument files in {self._directory}")
+        self._directory = None
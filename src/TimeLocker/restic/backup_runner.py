@@ -0,0 +1,289 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence
+
+from .errors import BackupCancelledError, RepositoryError
+from .logging import logger
+
+# Minimum seconds between status events delivered to on_event
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+# Seconds restic is given to exit after SIGINT, and again after SIGTERM
+DEFAULT_CANCEL_GRACE = 10.0
+
+# Plain stderr lines kept for error reports
+STDERR_TAIL_LINES = 50
+
+# Error events kept in full; later ones are only counted
+MAX_RECORDED_ERRORS = 100
+
+# restic's exit code when a snapshot was written but some source files could not be read
+EXIT_INCOMPLETE = 3
+
+_TYPE_KEY = b'"message_type"'
+_ERROR_TYPES = (b"error", b"exit_error")
+
+
+def message_type(line: bytes) -> Optional[bytes]:
+    """
+    Read the message_type of a restic JSON line without decoding the line
+
+    Args:
+        line: One line of restic --json output
+
+    Returns:
+        The message type (e.g. b"status"), or None if the line has none
+    """
+    key = line.find(_TYPE_KEY)
+    if key < 0:
+        return None
+    start = line.find(b'"', key + len(_TYPE_KEY))
+    end = line.find(b'"', start + 1) if start >= 0 else -1
+    return line[start + 1:end] if end >= 0 else None
+
+
+class StreamingBackupRunner:
+    """
+    Run a restic command with --json output, streaming its events.
+
+    restic prints a status line several times a second for the whole backup,
+    so its output is read from a Popen pipe line by line instead of being
+    captured. Only the lines that matter are decoded: every summary and
+    error, and status lines no more often than progress_interval (status
+    lines are cumulative, so skipping some loses nothing). stderr, where
+    restic reports per-file errors, is drained on a separate thread into a
+    bounded tail. Memory use is therefore constant however long restic runs.
+
+    cancel() may be called from any thread, or a cancel_event passed to
+    run() may be set: restic then receives SIGINT, which lets it stop
+    cleanly without writing a snapshot, followed by SIGTERM and finally
+    SIGKILL if it has not exited within the grace period.
+    """
+
+    def __init__(self, command: Sequence[str], env: Optional[Dict[str, str]] = None,
+                 on_event: Optional[Callable[[Dict], None]] = None,
+                 progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+                 cancel_grace: float = DEFAULT_CANCEL_GRACE,
+                 pass_fds: Sequence[int] = ()):
+        """
+        Initialize the runner
+
+        Args:
+            command: Complete restic command line
+            env: Environment for restic
+            on_event: Called with each decoded event; status events are
+                throttled to progress_interval. Error events read from
+                stderr are delivered on the stderr reader thread.
+            progress_interval: Minimum seconds between status events
+            cancel_grace: Seconds to wait for restic after each stop signal
+            pass_fds: File descriptors restic inherits (see FileListFeed)
+        """
+        self._command = list(command)
+        self._env = env
+        self._on_event = on_event
+        self._progress_interval = progress_interval
+        self._cancel_grace = cancel_grace
+        self._pass_fds = tuple(pass_fds)
+
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._cancel_requested = False
+        self._finished = threading.Event()
+        self._stderr_tail: Deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+
+        self.summary: Optional[Dict] = None
+        self.exit_error: Optional[Dict] = None
+        self.errors: List[Dict] = []
+        self.error_count = 0
+        self.lines_read = 0
+        self.returncode: Optional[int] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested"""
+        return self._cancel_requested
+
+    def run(self, cancel_event: Optional[threading.Event] = None) -> Optional[Dict]:
+        """
+        Start restic and consume its output until it exits
+
+        Args:
+            cancel_event: Optional event that cancels the run when set
+
+        Returns:
+            The summary event, or None if restic printed none. A snapshot
+            written despite unreadable files (exit code 3) counts as success.
+
+        Raises:
+            BackupCancelledError: If the run was cancelled
+            RepositoryError: If restic could not be started or exited with an error
+        """
+        with self._lock:
+            if self._cancel_requested or (cancel_event is not None and cancel_event.is_set()):
+                self._cancel_requested = True
+                raise BackupCancelledError("Backup cancelled before restic started")
+            try:
+                self._process = subprocess.Popen(self._command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                 env=self._env, pass_fds=self._pass_fds)
+            except OSError as e:
+                raise RepositoryError(f"Backup failed: could not start restic: {e}") from e
+
+        stderr_reader = threading.Thread(target=self._read_stderr, name="restic-stderr", daemon=True)
+        stderr_reader.start()
+        if cancel_event is not None:
+            threading.Thread(target=self._watch, args=(cancel_event,), name="restic-cancel", daemon=True).start()
+
+        try:
+            self._read_stdout()
+            self.returncode = self._process.wait()
+        except BaseException:
+            # Includes KeyboardInterrupt: never leave restic running behind us
+            self.cancel()
+            raise
+        finally:
+            self._finished.set()
+            stderr_reader.join()
+            for pipe in (self._process.stdout, self._process.stderr):
+                if pipe is not None:
+                    pipe.close()
+
+        if self._cancel_requested:
+            raise BackupCancelledError(f"Backup cancelled (restic exit code {self.returncode})")
+        if self.returncode == EXIT_INCOMPLETE and self.summary is not None:
+            logger.warning(f"Backup incomplete, {self.error_count} file(s) could not be read: {self.error_message()}")
+        elif self.returncode != 0:
+            raise RepositoryError(f"Backup failed: {self.error_message()}")
+        return self.summary
+
+    def cancel(self, grace_period: Optional[float] = None) -> bool:
+        """
+        Stop restic: SIGINT, then SIGTERM, then SIGKILL
+
+        Each signal is followed by up to grace_period seconds of waiting for
+        restic to exit. On Windows, where SIGINT cannot be sent to a single
+        process, the sequence starts with terminate().
+
+        Args:
+            grace_period: Seconds to wait after each signal (defaults to cancel_grace)
+
+        Returns:
+            bool: True if a running restic process was signalled
+        """
+        grace = self._cancel_grace if grace_period is None else grace_period
+        with self._lock:
+            self._cancel_requested = True
+            process = self._process
+        if process is None or process.poll() is not None:
+            return False
+
+        steps = [("SIGTERM", process.terminate), ("SIGKILL", process.kill)]
+        if os.name != "nt":
+            steps.insert(0, ("SIGINT", lambda: process.send_signal(signal.SIGINT)))
+        for name, send in steps:
+            logger.info(f"Cancelling restic (pid {process.pid}) with {name}")
+            try:
+                send()
+            except ProcessLookupError:
+                return True
+            try:
+                process.wait(timeout=grace)
+                return True
+            except subprocess.TimeoutExpired:
+                logger.warning(f"restic did not exit within {grace:.0f}s of {name}")
+        return True
+
+    def error_message(self) -> str:
+        """Best available description of why restic failed"""
+        if self.exit_error is not None and self.exit_error.get("message"):
+            return str(self.exit_error["message"])
+        if self._stderr_tail:
+            return "\n".join(self._stderr_tail)
+        if self.errors:
+            error = self.errors[-1].get("error")
+            return str(error.get("message") if isinstance(error, dict) else error)
+        return f"restic exited with code {self.returncode}"
+
+    def _read_stdout(self):
+        """Decode and dispatch the wanted stdout events, throttling status lines"""
+        interval = self._progress_interval
+        next_status = 0.0
+        for line in self._process.stdout:
+            self.lines_read += 1
+            kind = message_type(line)
+            if kind == b"status":
+                now = time.monotonic()
+                if now < next_status:
+                    continue
+                next_status = now + interval
+            elif kind != b"summary" and kind not in _ERROR_TYPES:
+                continue
+            event = self._decode(line)
+            if event is not None:
+                self._dispatch(event)
+
+    def _read_stderr(self):
+        """Drain stderr: error events are dispatched, other lines kept in a bounded tail"""
+        try:
+            for line in self._process.stderr:
+                if message_type(line) in _ERROR_TYPES:
+                    event = self._decode(line)
+                    if event is not None:
+                        self._dispatch(event)
+                        continue
+                text = line.decode("utf-8", "replace").rstrip("\r\n")
+                if text:
+                    self._stderr_tail.append(text)
+        except ValueError:
+            # Pipe closed while reading after cancellation
+            pass
+
+    def _watch(self, cancel_event: threading.Event):
+        """Cancel restic once cancel_event is set, until the run finishes"""
+        while not self._finished.is_set():
+            if cancel_event.wait(0.1):
+                self.cancel()
+                return
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[Dict]:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        return event if isinstance(event, dict) else None
+
+    def _dispatch(self, event: Dict):
+        kind = event.get("message_type")
+        if kind == "summary":
+            self.summary = event
+        elif kind in ("error", "exit_error"):
+            with self._lock:
+                if kind == "exit_error":
+                    self.exit_error = event
+                self.error_count += 1
+                if len(self.errors) < MAX_RECORDED_ERRORS:
+                    self.errors.append(event)
+        if self._on_event is not None:
+            self._on_event(event)
@@ -27,3 +27,6 @@ class RepositoryError(ResticError):
 
 class UnsupportedSchemeError(RepositoryError):
     pass
+
+class BackupCancelledError(RepositoryError):
+    pass
@@ -0,0 +1,129 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .argument_files import ArgumentFiles
+from .errors import RepositoryError
+from .logging import logger
+
+if TYPE_CHECKING:
+    from ..file_selections import FileSelection
+
+
+def _pipes_supported() -> bool:
+    """Whether a child process can open an inherited pipe through /dev/fd"""
+    return os.name == "posix" and os.path.isdir("/dev/fd")
+
+
+class FileListFeed:
+    """
+    Stream the exact file list of one or more FileSelections to restic.
+
+    The selections are traversed once with TimeLocker's matcher and every
+    included file is written, NUL-terminated, to a pipe that restic reads
+    with --files-from-raw, so restic neither walks nor filters those trees
+    itself. Where /dev/fd is unavailable the list is streamed into a
+    temporary file instead. File count and byte totals are gathered during
+    the same pass.
+
+    Use as a context manager around the restic invocation: pass ``path`` to
+    --files-from-raw and ``pass_fds`` to subprocess. On exit the pipe is
+    closed and the writer joined; a traversal error is raised as
+    RepositoryError, since restic will have seen a truncated list.
+    """
+
+    def __init__(self, selections: List['FileSelection'], argument_files: Optional[ArgumentFiles] = None):
+        """
+        Initialize the feed
+
+        Args:
+            selections: Selections whose included files are listed
+            argument_files: Open ArgumentFiles used when pipes are unavailable
+        """
+        self._selections = selections
+        self._argument_files = argument_files
+        self._read_fd: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self.path: Optional[str] = None
+        self.file_count = 0
+        self.total_size = 0
+
+    @property
+    def pass_fds(self) -> Tuple[int, ...]:
+        """File descriptors the restic process must inherit"""
+        return (self._read_fd,) if self._read_fd is not None else ()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Totals gathered while streaming the list"""
+        return {"file_count": self.file_count, "total_size": self.total_size}
+
+    def __enter__(self) -> "FileListFeed":
+        if _pipes_supported():
+            read_fd, write_fd = os.pipe()
+            self._read_fd = read_fd
+            self.path = f"/dev/fd/{read_fd}"
+            self._thread = threading.Thread(target=self._write_pipe, args=(write_fd,),
+                                            name="timelocker-file-list", daemon=True)
+            self._thread.start()
+        else:
+            if self._argument_files is None:
+                raise RepositoryError("Streaming a file list requires pipe support or a temporary directory")
+            self.path = str(self._argument_files.write("file-list", self._iter_paths(), separator=b"\0"))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._read_fd is not None:
+            # Closing our copy of the read end unblocks a writer whose reader never started
+            os.close(self._read_fd)
+            self._read_fd = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self._error is not None and exc_type is None:
+            raise RepositoryError(f"File list generation failed, backup may be incomplete: {self._error}")
+        return False
+
+    def _iter_paths(self):
+        """Yield included file paths once, counting files and bytes on the way"""
+        for selection in self._selections:
+            for path, entry in selection.iter_effective_bytes():
+                try:
+                    self.total_size += entry.stat().st_size if entry is not None else os.stat(path).st_size
+                except OSError:
+                    pass
+                self.file_count += 1
+                yield path
+
+    def _write_pipe(self, write_fd: int):
+        """Writer thread: stream the list into the pipe, then signal EOF by closing it"""
+        try:
+            with os.fdopen(write_fd, "wb", buffering=64 * 1024) as pipe:
+                for path in self._iter_paths():
+                    pipe.write(path)
+                    pipe.write(b"\0")
+        except BrokenPipeError:
+            # restic exited (or never started) before reading the whole list
+            logger.debug("File list reader closed the pipe early")
+        except BaseException as e:
+            logger.error(f"File list generation failed: {e}")
+            self._error = e
@@ -0,0 +1,143 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from .logging import logger
+from .snapshot_decoder import parse_rfc3339
+
+# How long a snapshot list fetched from restic is trusted for picking parents
+SNAPSHOT_INDEX_TTL = 300.0
+
+
+def parse_restic_time(value: str) -> float:
+    """
+    Convert a restic snapshot time to a POSIX timestamp
+
+    Args:
+        value: Time as printed by restic (see parse_rfc3339)
+
+    Returns:
+        float: Seconds since the epoch, 0.0 if the time cannot be parsed
+    """
+    try:
+        return parse_rfc3339(value.strip()).timestamp()
+    except (ValueError, OverflowError):
+        return 0.0
+
+
+def normalize_paths(paths: Iterable[Any]) -> FrozenSet[str]:
+    """The path set restic records for a backup of these paths (absolute and cleaned)"""
+    return frozenset(os.path.abspath(os.fspath(path)) for path in paths)
+
+
+class IndexedSnapshot(NamedTuple):
+    """What parent selection needs to know about one snapshot"""
+    snapshot_id: str
+    time: float
+    hostname: str
+    paths: FrozenSet[str]
+    tags: FrozenSet[str]
+
+
+class SnapshotIndex:
+    """
+    Snapshots of one repository, for choosing backup parents.
+
+    restic reuses the metadata of unchanged files from a backup's parent
+    snapshot, and by default picks as parent the newest snapshot with the
+    same host and paths. When many targets with overlapping paths share a
+    repository that guess can land on another target's snapshot, and every
+    file it does not cover is read and hashed again. The index answers the
+    question TimeLocker can answer precisely: the newest snapshot from this
+    host, with this target's tags and exactly this path set.
+
+    The index is filled from one 'restic snapshots' listing and kept up to
+    date with the snapshots this process creates; it is thread-safe.
+    """
+
+    def __init__(self, snapshots: Iterable[IndexedSnapshot] = (), loaded_at: Optional[float] = None):
+        """
+        Initialize the index
+
+        Args:
+            snapshots: Snapshots to start with
+            loaded_at: time.monotonic() of the listing the snapshots came from
+        """
+        self._snapshots: Dict[str, IndexedSnapshot] = {s.snapshot_id: s for s in snapshots}
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_restic_json(cls, data: List[Dict[str, Any]]) -> 'SnapshotIndex':
+        """
+        Build an index from the output of 'restic snapshots --json'
+
+        Args:
+            data: Decoded snapshot list
+
+        Returns:
+            SnapshotIndex of the listed snapshots
+        """
+        return cls(IndexedSnapshot(
+                snapshot_id=entry.get("short_id") or entry["id"][:8],
+                time=parse_restic_time(entry.get("time", "")),
+                hostname=entry.get("hostname", ""),
+                paths=frozenset(entry.get("paths") or ()),
+                tags=frozenset(entry.get("tags") or ()),
+        ) for entry in data)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._snapshots)
+
+    def is_stale(self, ttl: float = SNAPSHOT_INDEX_TTL) -> bool:
+        """Whether the listing is older than ttl seconds"""
+        return time.monotonic() - self.loaded_at > ttl
+
+    def add(self, snapshot: IndexedSnapshot) -> None:
+        """Record a snapshot created since the listing"""
+        with self._lock:
+            self._snapshots[snapshot.snapshot_id] = snapshot
+
+    def find_parent(self, hostname: str, paths: Optional[FrozenSet[str]],
+                    tags: FrozenSet[str] = frozenset()) -> Optional[IndexedSnapshot]:
+        """
+        Find the newest snapshot a backup of these paths should build on
+
+        Args:
+            hostname: Host the backup runs on
+            paths: Normalized path set of the backup (see normalize_paths),
+                or None to match on host and tags only
+            tags: Tags the parent must carry (the targets' own tags)
+
+        Returns:
+            Matching IndexedSnapshot, or None if there is none
+        """
+        with self._lock:
+            candidates = [s for s in self._snapshots.values()
+                          if s.hostname == hostname and (paths is None or s.paths == paths) and tags <= s.tags]
+        if not candidates:
+            return None
+        parent = max(candidates, key=lambda s: (s.time, s.snapshot_id))
+        described = "any paths" if paths is None else f"{len(paths)} path(s)"
+        logger.debug(f"Parent for {described} on {hostname}: {parent.snapshot_id} "
+                     f"(newest of {len(candidates)} candidate(s))")
+        return parent
@@ -1390,7 +1390,8 @@ restic_command_def = CommandDefinition(
                     description='help for list',
                 ),
             },
-            default_param_style=ParameterStyle.DOUBLE_DASH
+            default_param_style=ParameterStyle.DOUBLE_DASH,
+            synopsis_params=["type"]
         ),
         "features": CommandDefinition(
             name="features",
@@ -1452,7 +1453,8 @@ restic_command_def = CommandDefinition(
                     description='only consider snapshots including tag[,tag,...] (can be specified multiple times)',
                 ),
             },
-            default_param_style=ParameterStyle.DOUBLE_DASH
+            default_param_style=ParameterStyle.DOUBLE_DASH,
+            synopsis_params=["[snapshotID...]"]
         ),
         "prune": CommandDefinition(
             name="prune",
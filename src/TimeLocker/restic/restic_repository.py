@@ -18,24 +18,31 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 import json
 import os
 import hashlib
+import socket
 import subprocess
+import threading
+import time
 from abc import abstractmethod
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from packaging import version
 
-try:
-    import dateutil.parser
-except ImportError:
-    dateutil = None
-
 from ..backup_repository import BackupRepository, RetentionPolicy
 from ..backup_snapshot import BackupSnapshot
-from ..backup_target import BackupTarget
-from .errors import RepositoryError, ResticError
+from ..backup_target import PARENT_AUTO, PARENT_NONE, PARENT_RESTIC, BackupTarget
+from .argument_files import ARGV_FILE_THRESHOLD, ArgumentFiles, argv_length, exclude_file_safe
+from .backup_runner import StreamingBackupRunner
+from .errors import BackupCancelledError, RepositoryError, ResticError
+from .file_list_feed import FileListFeed
 from .logging import logger
+from .parent_selection import IndexedSnapshot, SnapshotIndex, normalize_paths
+from .snapshot_catalog import CatalogEntry, SnapshotCatalog
+from .snapshot_decoder import SnapshotDecoder, loads as decode_json
 from .restic_command_definition import restic_command_def
+from .version_cache import default_version_cache, identify_binary
 from ..command_builder import CommandBuilder
 from ..security import CredentialManager, CredentialManagerError
 
@@ -43,8 +50,15 @@ RESTIC_COMMAND = "restic"
 RESTIC_VERSION_COMMAND = f"{RESTIC_COMMAND} --json version"
 RESTIC_MIN_VERSION = "0.18.0"
 
+# New snapshots fetched by ID when refreshing the catalog; above this, one full listing is cheaper
+CATALOG_FETCH_BATCH = 256
+
 
 class ResticRepository(BackupRepository):
+    has_snapshot_catalog = True
+    # Choose backup parents from the persistent snapshot catalog instead of a full listing
+    use_snapshot_catalog = False
+
     def __init__(self, location: str, tags: Optional[List[str]] = None, password: Optional[str] = None,
                  min_version: str = RESTIC_MIN_VERSION, credential_manager: Optional[CredentialManager] = None):
         logger.debug(f"Initializing repository at location: {location}")
@@ -56,11 +70,54 @@ class ResticRepository(BackupRepository):
         logger.debug(f"ResticRepository initialized with explicit password: {'***' if password else 'None'}")
         self._credential_manager = credential_manager
         self._cached_env = None
+        self._snapshot_index: Optional[SnapshotIndex] = None
+        self._snapshot_catalog: Optional[SnapshotCatalog] = None
+        self._snapshot_decoder = SnapshotDecoder()
+        self._catalog_lock = threading.Lock()
         self._repository_id = self._generate_repository_id()
         self.validate()
         self._command = self._command.param("repo", self.uri)
 
     def _verify_restic_executable(self, min_version: str) -> Optional[str]:
+        """
+        Find the restic version and check it against min_version
+
+        The version is taken from the restic version cache when this build of
+        the binary has been seen before, so constructing a repository spawns
+        no process; otherwise it is detected and cached.
+
+        Raises:
+            ResticError: If restic is missing, unusable or older than min_version
+        """
+        binary = identify_binary(RESTIC_COMMAND)
+        cache = default_version_cache() if binary is not None else None
+        cached = cache.get(binary) if cache is not None else None
+        if cached is not None:
+            logger.debug(f"Using cached restic version {cached.version} for {binary.path}")
+            restic_version, legacy = cached
+        else:
+            restic_version, legacy = self._detect_restic_version()
+            if cache is not None:
+                cache.put(binary, restic_version, legacy)
+
+        if version.parse(restic_version) < version.parse(min_version):
+            if not legacy:
+                raise ResticError(f"restic version {restic_version} is below the required minimum version {min_version}.")
+            logger.warning(
+                    "restic version %s is below the required minimum %s; continuing without strict enforcement due to legacy binary.",
+                    restic_version,
+                    min_version,
+            )
+        return restic_version
+
+    def _detect_restic_version(self) -> Tuple[str, bool]:
+        """
+        Run 'restic version' to find the installed version
+
+        Returns:
+            Tuple of the version and whether it came from the plain text
+            output of a binary without --json support
+        """
         try:
             logger.info("Verifying restic executable...")
             # Build version command - json is a global parameter, so add it first
@@ -69,12 +126,7 @@ class ResticRepository(BackupRepository):
             version_command.command("version")
             subprocess_result = version_command.run()
             version_dict = json.loads(subprocess_result)
-            restic_version = version_dict.get("version", None)
-
-            if version.parse(restic_version) < version.parse(min_version):
-                raise ResticError(f"restic version {restic_version} is below the required minimum version {min_version}.")
-
-            return restic_version
+            return version_dict.get("version", None), False
         except (json.JSONDecodeError, FileNotFoundError, subprocess.CalledProcessError) as e:
             # If JSON parsing fails, try without JSON flag for basic version check
             logger.warning(f"JSON version check failed: {e}, trying basic version check")
@@ -87,14 +139,7 @@ class ResticRepository(BackupRepository):
                     if line.startswith('restic '):
                         parts = line.split()
                         if len(parts) >= 2:
-                            restic_version = parts[1]
-                            if version.parse(restic_version) < version.parse(min_version):
-                                logger.warning(
-                                        "restic version %s is below the required minimum %s; continuing without strict enforcement due to legacy binary.",
-                                        restic_version,
-                                        min_version,
-                                )
-                            return restic_version
+                            return parts[1], True
                 raise ResticError("Could not parse restic version from output")
             except FileNotFoundError:
                 raise ResticError("restic executable not found. Please ensure it is installed and in the PATH.")
@@ -198,7 +243,7 @@ class ResticRepository(BackupRepository):
             Exception: If initialization fails with details from restic
         """
         try:
-            result = self._command.command("init").run(self.to_env())
+            result = self._command.copy().command("init").run(self.to_env())
             logger.info("Repository initialized successfully")
             return True
         except subprocess.CalledProcessError as e:
@@ -230,25 +275,49 @@ class ResticRepository(BackupRepository):
     def check(self) -> bool:
         """Check if the backup repository is available"""
         try:
-            self._command.command("check").run(self.to_env())
+            self._command.copy().command("check").run(self.to_env())
             logger.info("Repository check passed")
             return True
         except Exception as e:
             logger.error(f"Repository check failed: {e}")
             return False
 
-    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None) -> Dict:
+    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None,
+                      progress_callback: Optional[Callable[[Dict], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict:
         """
         Create a new backup from the specified targets
 
+        restic's JSON events are streamed as they are printed (see
+        StreamingBackupRunner) rather than captured, so memory use does not
+        grow with the length of the backup and progress is available while
+        it runs.
+
+        Targets with ``stream_file_list`` set are traversed once by their
+        FileSelection and the resulting file list is streamed to restic
+        (see FileListFeed) instead of letting restic walk and filter them;
+        the result then carries the list totals under 'file_list'. restic
+        applies excludes, rule options and the parent to a whole run, and a
+        streamed list becomes the snapshot's path set, so when both kinds of
+        target are given they are backed up by separate restic runs: the
+        result then describes the last (streamed) snapshot, lists every
+        snapshot under 'snapshot_ids' and sums the runs' counters.
+        The parent snapshot is chosen here rather than by restic, following
+        the targets' ``parent`` policy (see _add_parent_argument); the result
+        carries the chosen parent under 'parent' when one was passed.
+
         Args:
             targets: List of BackupTarget objects defining what to backup
             tags: Optional list of tags to add to the backup
+            progress_callback: Optional callable receiving restic status events,
+                at most every DEFAULT_PROGRESS_INTERVAL seconds
+            cancel_event: Optional event that stops restic when set
 
         Returns:
             Dict: Backup result information including snapshot ID and statistics
 
         Raises:
+            BackupCancelledError: If cancel_event was set before restic finished
             RepositoryError: If backup operation fails
         """
         if not targets:
@@ -258,6 +327,34 @@ class ResticRepository(BackupRepository):
         for target in targets:
             target.validate()
 
+        if not any(target.selection.get_backup_paths() for target in targets):
+            raise RepositoryError("No paths specified for backup")
+
+        streamed_targets = [target for target in targets if getattr(target, "stream_file_list", False)]
+        walked_targets = [target for target in targets if not getattr(target, "stream_file_list", False)]
+        if streamed_targets and walked_targets:
+            logger.info(f"Backing up {len(walked_targets)} walked and {len(streamed_targets)} streamed "
+                        f"target(s) in separate restic runs")
+            results = [self._run_backup(group, tags, progress_callback, cancel_event)
+                       for group in (walked_targets, streamed_targets)]
+            return self._combine_backup_results(results)
+        return self._run_backup(targets, tags, progress_callback, cancel_event)
+
+    def _run_backup(self, targets: List[BackupTarget], tags: Optional[List[str]],
+                    progress_callback: Optional[Callable[[Dict], None]],
+                    cancel_event: Optional[threading.Event]) -> Dict:
+        """
+        Back up targets that either all stream their file list or all let restic walk them
+
+        Args:
+            targets: Validated targets, all of one kind
+            tags: Optional list of tags to add to the backup
+            progress_callback: Optional callable receiving restic status events
+            cancel_event: Optional event that stops restic when set
+
+        Returns:
+            Dict: Backup result of the single restic run
+        """
         # Collect all paths to backup and build command arguments
         all_paths = []
         all_tags = set(tags or [])
@@ -268,18 +365,12 @@ class ResticRepository(BackupRepository):
             all_paths.extend(paths)
             all_tags.update(target.tags)
 
-        if not all_paths:
-            raise RepositoryError("No paths specified for backup")
-
-        # Build backup command using the existing command builder pattern
-        backup_command = self._command.command("backup")
+        streamed_targets = [target for target in targets if getattr(target, "stream_file_list", False)]
+        walked_targets = [target for target in targets if not getattr(target, "stream_file_list", False)]
+        walked_paths = [path for target in walked_targets for path in target.selection.get_backup_paths()]
 
-        # Add exclude patterns from all targets
-        for target in targets:
-            for pattern in target.selection.exclude_patterns:
-                backup_command.param("exclude", pattern)
-            for path in target.selection.excludes:
-                backup_command.param("exclude", str(path))
+        # Build backup command on a fresh builder so per-call arguments never leak between runs
+        backup_command = CommandBuilder(restic_command_def).param("json").param("repo", self.uri).command("backup")
 
         # Add tags if any
         if all_tags:
@@ -287,34 +378,38 @@ class ResticRepository(BackupRepository):
             backup_command.param("tag", tag_string)
 
         try:
-            # Build the complete command list manually since restic backup needs paths as positional args
-            command_list = backup_command.build()
-            command_list.extend(all_paths)  # Add paths at the end
-
-            logger.info(f"Executing backup command: {' '.join(command_list[:3])} ... {len(all_paths)} paths")
-
-            # Execute the command directly
-            result = subprocess.run(
-                    command_list,
-                    capture_output=True,
-                    text=True,
-                    env=self.to_env(),
-                    check=True
-            )
-
-            # Parse JSON output to get backup results
-            lines = result.stdout.strip().split('\n')
-            backup_result = None
-
-            for line in lines:
-                if line.strip():
-                    try:
-                        data = json.loads(line)
-                        if data.get("message_type") == "summary":
-                            backup_result = data
-                            break
-                    except json.JSONDecodeError:
-                        continue
+            file_list_stats = None
+            with ArgumentFiles() as argument_files:
+                positional_paths = self._add_selection_arguments(backup_command, walked_targets, walked_paths,
+                                                                 argument_files)
+                parent = self._add_parent_argument(backup_command, targets, walked_paths,
+                                                   has_streamed=bool(streamed_targets))
+
+                feed = FileListFeed([target.selection for target in streamed_targets],
+                                    argument_files) if streamed_targets else nullcontext()
+                with feed:
+                    if streamed_targets:
+                        backup_command.param("files-from-raw", feed.path)
+
+                    # Build the complete command list manually since restic backup needs paths as positional args
+                    command_list = backup_command.build()
+                    command_list.extend(positional_paths)  # Add paths at the end
+
+                    logger.info(f"Executing backup command: {' '.join(command_list[:3])} ... {len(all_paths)} paths")
+
+                    runner = StreamingBackupRunner(
+                            command_list,
+                            env=self.to_env(),
+                            on_event=self._backup_event_handler(progress_callback),
+                            pass_fds=feed.pass_fds if streamed_targets else ()
+                    )
+                    backup_result = runner.run(cancel_event)
+
+                if streamed_targets:
+                    file_list_stats = feed.stats
+
+            if runner.error_count:
+                logger.warning(f"restic reported {runner.error_count} error(s) during backup")
 
             if backup_result:
                 snapshot_id = backup_result.get("snapshot_id", "unknown")
@@ -327,6 +422,12 @@ class ResticRepository(BackupRepository):
                 logger.info(f"Files: {files_new} new, {files_changed} changed, {files_unmodified} unmodified")
                 logger.info(f"Data added: {data_added} bytes")
 
+                if file_list_stats is not None:
+                    backup_result["file_list"] = file_list_stats
+                if parent is not None:
+                    backup_result["parent"] = parent
+                # A streamed snapshot is indexed without paths: only host and tags pick it as a parent
+                self._index_new_snapshot(snapshot_id, walked_paths, all_tags)
                 return backup_result
             else:
                 logger.warning("Backup completed but no summary found in output")
@@ -339,14 +440,222 @@ class ResticRepository(BackupRepository):
                         "data_added":       0
                 }
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Backup command failed with exit code {e.returncode}")
-            logger.error(f"Error output: {e.stderr}")
-            raise RepositoryError(f"Backup failed: {e.stderr}")
+        except BackupCancelledError as e:
+            logger.warning(str(e))
+            raise
+        except RepositoryError as e:
+            logger.error(f"Backup operation failed: {e}")
+            # The parent may have been forgotten meanwhile; a retry should list snapshots afresh
+            self._snapshot_index = None
+            raise
         except Exception as e:
             logger.error(f"Backup operation failed: {e}")
             raise RepositoryError(f"Backup failed: {e}")
 
+    @staticmethod
+    def _combine_backup_results(results: List[Dict]) -> Dict:
+        """
+        Merge the results of the restic runs of one backup
+
+        The last run's result is kept, with numeric counters summed over all
+        runs and every run's snapshot listed under 'snapshot_ids'.
+        """
+        combined = dict(results[-1])
+        for key, value in results[-1].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                combined[key] = sum(result.get(key, 0) for result in results)
+        combined["snapshot_ids"] = [result.get("snapshot_id", "unknown") for result in results]
+        return combined
+
+    def _add_parent_argument(self, backup_command: CommandBuilder, targets: List[BackupTarget],
+                             paths: List[str], has_streamed: bool) -> Optional[str]:
+        """
+        Pass restic the parent snapshot the targets' policy asks for
+
+        With PARENT_AUTO the parent is the newest snapshot in the snapshot
+        index from this host, carrying every target's tags and with exactly
+        the backup's path set; with no such snapshot restic picks one itself.
+        The index comes from the snapshot catalog when it is in use, or from
+        a recent listing of this instance; otherwise restic picks the parent
+        too, so a one-shot backup never lists every snapshot first.
+        PARENT_RESTIC leaves the choice to restic, PARENT_NONE passes --force
+        so every file is read again, and any other value is used as the
+        parent snapshot ID. Targets backed up together get one snapshot, so
+        the choice is only made when all of them share a policy.
+
+        A streamed file list becomes the snapshot's path set, which changes
+        whenever a file is added or removed, so restic's own choice (same
+        host and path set) would read every file again. Streamed backups
+        therefore take the newest snapshot from this host carrying the
+        targets' tags, whatever its paths, and list snapshots for it even
+        without a catalog. Without target tags there is nothing to match on
+        and restic picks the parent.
+
+        Args:
+            backup_command: Builder for the backup command
+            targets: All targets of the backup
+            paths: Backup paths of the walked targets
+            has_streamed: Whether the targets stream their file lists
+
+        Returns:
+            The parent snapshot ID passed to restic, if any
+        """
+        policies = {getattr(target, "parent", PARENT_AUTO) or PARENT_AUTO for target in targets}
+        if len(policies) > 1:
+            logger.debug(f"Targets disagree on the parent policy ({', '.join(sorted(policies))}); restic picks it")
+            return None
+        policy = policies.pop()
+        if policy == PARENT_RESTIC:
+            return None
+        if policy == PARENT_NONE:
+            backup_command.param("force")
+            return None
+        if policy != PARENT_AUTO:
+            backup_command.param("parent", policy)
+            return policy
+        tags = frozenset(tag for target in targets for tag in target.tags)
+        if has_streamed and not tags:
+            logger.debug("Streamed targets carry no tags to choose a parent by; restic picks it")
+            return None
+        index = self._snapshot_index
+        if not has_streamed and not self._catalog_in_use() and (index is None or index.is_stale()):
+            logger.debug("No snapshot catalog or recent listing to choose a parent from; restic picks it")
+            return None
+
+        try:
+            index = self.snapshot_index()
+        except Exception as e:
+            logger.warning(f"Could not list snapshots to choose a parent; restic picks it: {e}")
+            return None
+        parent = index.find_parent(socket.gethostname(), None if has_streamed else normalize_paths(paths), tags)
+        if parent is None:
+            return None
+        backup_command.param("parent", parent.snapshot_id)
+        logger.info(f"Using parent snapshot {parent.snapshot_id}")
+        return parent.snapshot_id
+
+    def snapshot_index(self, refresh: bool = False) -> SnapshotIndex:
+        """
+        Snapshot index used to choose backup parents
+
+        The index comes from the last snapshot listing of this instance
+        (snapshots() refreshes it too) and is listed again once it is older
+        than SNAPSHOT_INDEX_TTL. When the snapshot catalog is in use (see
+        use_snapshot_catalog) the index is built from the refreshed catalog
+        instead, which only fetches snapshots that are new since the last
+        refresh.
+
+        Args:
+            refresh: List the snapshots again even if the index is recent
+
+        Returns:
+            SnapshotIndex of this repository
+        """
+        index = self._snapshot_index
+        if refresh or index is None or index.is_stale():
+            if self._catalog_in_use():
+                self.refresh_snapshot_catalog()
+                entries = self.snapshot_catalog.query(newest_first=False)
+                index = self._snapshot_index = SnapshotIndex(entry.to_indexed() for entry in entries)
+            else:
+                output = self._command.copy().command("snapshots").run(self.to_env())
+                index = self._snapshot_index = SnapshotIndex.from_restic_json(decode_json(output or "[]"))
+            logger.debug(f"Indexed {len(index)} snapshot(s) for parent selection")
+        return index
+
+    def _catalog_in_use(self) -> bool:
+        """Whether snapshot listings should go through the snapshot catalog"""
+        return self.use_snapshot_catalog or self._snapshot_catalog is not None
+
+    def _index_new_snapshot(self, snapshot_id: str, paths: List[str], tags: Iterable[str]) -> None:
+        """Add a snapshot this instance just created to the parent index"""
+        if self._snapshot_index is None or not snapshot_id or snapshot_id == "unknown":
+            return
+        self._snapshot_index.add(IndexedSnapshot(snapshot_id[:8], time.time(), socket.gethostname(),
+                                                 normalize_paths(paths), frozenset(tags)))
+
+    def _backup_event_handler(self, progress_callback: Optional[Callable[[Dict], None]]) -> Callable[[Dict], None]:
+        """Event callback for StreamingBackupRunner, forwarding status events to progress_callback"""
+
+        def on_event(event: Dict):
+            self._handle_restic_output(event)
+            if progress_callback is not None and event.get("message_type") == "status":
+                progress_callback(event)
+
+        return on_event
+
+    def _add_selection_arguments(self, backup_command: CommandBuilder, targets: List[BackupTarget],
+                                 paths: List[str], argument_files: ArgumentFiles) -> List[str]:
+        """
+        Add exclude and path arguments, moving long lists into temporary files
+
+        Below ARGV_FILE_THRESHOLD every exclude becomes an --exclude option and
+        every path a positional argument. Above it, excludes are streamed into
+        an --exclude-file (entries restic would alter when read from a file
+        stay on the command line) and paths into a NUL-delimited
+        --files-from-raw list, keeping argv short for huge selections.
+
+        Args:
+            backup_command: Builder for the backup command
+            targets: Backup targets being backed up
+            paths: Backup paths of all targets
+            argument_files: Open ArgumentFiles to write list files into
+
+        Returns:
+            List[str]: Paths to append as positional arguments
+        """
+        # Deduplicate across targets while keeping a stable order
+        excludes = list(dict.fromkeys(
+                entry
+                for target in targets
+                for entry in (*sorted(target.selection.exclude_patterns),
+                              *sorted(str(path) for path in target.selection.excludes))
+        ))
+
+        if argv_length("exclude", excludes) > ARGV_FILE_THRESHOLD:
+            exclude_file = argument_files.write("exclude", (entry for entry in excludes if exclude_file_safe(entry)))
+            backup_command.param("exclude-file", str(exclude_file))
+            excludes = [entry for entry in excludes if not exclude_file_safe(entry)]
+            logger.debug(f"Wrote exclude list to {exclude_file}")
+
+        for entry in excludes:
+            backup_command.param("exclude", entry)
+
+        self._add_rule_arguments(backup_command, targets)
+
+        if argv_length(None, paths) > ARGV_FILE_THRESHOLD:
+            files_from = argument_files.write("files-from", paths, separator=b"\0")
+            backup_command.param("files-from-raw", str(files_from))
+            logger.debug(f"Wrote {len(paths)} backup paths to {files_from}")
+            return []
+
+        return list(paths)
+
+    @staticmethod
+    def _add_rule_arguments(backup_command: CommandBuilder, targets: List[BackupTarget]):
+        """
+        Add the selections' file system rules as restic options
+
+        restic applies these options to the whole command, so a rule is only
+        passed on when every target sets it; a looser target would otherwise
+        lose files it selected. Differing size limits use the largest one.
+        """
+        selections = [target.selection for target in targets]
+        if not selections:
+            return
+
+        if all(selection.one_file_system for selection in selections):
+            backup_command.param("one-file-system")
+        if all(selection.exclude_caches for selection in selections):
+            backup_command.param("exclude-caches")
+        limits = [selection.exclude_larger_than for selection in selections]
+        if None not in limits:
+            backup_command.param("exclude-larger-than", str(max(limits)))
+
+        if len(selections) > 1 and len({tuple(selection.get_rule_args()) for selection in selections}) > 1:
+            logger.warning("Backup targets use different file system rules; restic only applies the rules "
+                           "they all share. Enable stream_file_list to apply each target's own rules.")
+
     def verify_backup(self, snapshot_id: Optional[str] = None) -> bool:
         """
         Verify the integrity of a backup repository
@@ -505,67 +814,104 @@ class ResticRepository(BackupRepository):
 
     def snapshots(self, tags: Optional[List[str]] = None) -> List[BackupSnapshot]:
         """List available snapshots"""
-        output = self._command.command("snapshots").run(self.to_env())
-        snapshots_data = json.loads(output)
-
-        snapshots = []
-        for s in snapshots_data:
-            # Parse the timestamp string to datetime object
-            from datetime import datetime
-            timestamp_str = s["time"]
-            # Handle ISO format with timezone
-            if timestamp_str.endswith('Z'):
-                timestamp_str = timestamp_str[:-1] + '+00:00'
-            elif '+' in timestamp_str[-6:] or timestamp_str[-6:].count(':') == 2:
-                # Already has timezone info
-                pass
-            else:
-                # Add UTC timezone if missing
-                timestamp_str += '+00:00'
+        output = self._command.copy().command("snapshots").run(self.to_env())
+        snapshots_data = self._snapshot_decoder.load(output)
+        self._snapshot_index = SnapshotIndex.from_restic_json(snapshots_data)
+        return self._snapshot_decoder.build(snapshots_data, self)
+
+    @property
+    def snapshot_catalog(self) -> SnapshotCatalog:
+        """Persistent snapshot catalog of this repository, opened on first use"""
+        with self._catalog_lock:
+            if self._snapshot_catalog is None:
+                self._snapshot_catalog = SnapshotCatalog(self._repository_id)
+            return self._snapshot_catalog
+
+    def refresh_snapshot_catalog(self) -> Dict[str, int]:
+        """
+        Bring the snapshot catalog up to date with the repository
 
-            try:
-                timestamp = datetime.fromisoformat(timestamp_str)
-            except ValueError:
-                # Fallback for older Python versions or different formats
-                if dateutil:
-                    timestamp = dateutil.parser.parse(timestamp_str)
-                else:
-                    # Basic fallback - try to parse manually
-                    # Format: 2025-03-29T21:09:34.068185654+02:00
-                    import re
-                    # Remove microseconds if too long and parse
-                    clean_str = re.sub(r'\.(\d{6})\d*', r'.\1', timestamp_str)
-                    timestamp = datetime.fromisoformat(clean_str)
-
-            # Convert paths to Path objects
-            from pathlib import Path
-            paths = [Path(p) for p in s["paths"]]
-
-            snapshot = BackupSnapshot(
-                    repo=self,
-                    snapshot_id=s["short_id"],
-                    timestamp=timestamp,
-                    paths=paths
-            )
+        The IDs from 'restic list snapshots', which only lists file names,
+        are compared with the catalog: vanished snapshots are dropped and
+        only new ones are fetched, by ID in one 'restic snapshots' call.
+        Every restic call opens the repository and loads its index again,
+        so with more than CATALOG_FETCH_BATCH new snapshots (e.g. the first
+        refresh) one full listing is cheaper. The full listing is also the
+        fallback when fetching by ID fails because a snapshot was forgotten
+        meanwhile.
 
-            # Add additional attributes from restic data
-            if "hostname" in s:
-                snapshot.hostname = s["hostname"]
-            if "tags" in s:
-                snapshot.tags = s["tags"]
-            else:
-                snapshot.tags = []
+        Returns:
+            Dict with 'added', 'removed' and 'total' snapshot counts
+        """
+        catalog = self.snapshot_catalog
+        output = self._command.copy().command("list").run(self.to_env(), synopsis_values={"type": "snapshots"})
+        current = {line.strip() for line in output.splitlines() if line.strip()}
+        known = catalog.ids()
+        new_ids = sorted(current - known)
+
+        added = []
+        if len(new_ids) > CATALOG_FETCH_BATCH:
+            added = self._fetch_snapshot_data(None, wanted=set(new_ids))
+        elif new_ids:
+            try:
+                added = self._fetch_snapshot_data(new_ids)
+            except subprocess.CalledProcessError as e:
+                logger.debug(f"Fetching new snapshots by ID failed, listing all instead: {e}")
+                added = self._fetch_snapshot_data(None, wanted=set(new_ids))
+
+        removed = known - current
+        catalog.update(added, removed)
+        logger.debug(f"Snapshot catalog refreshed: {len(added)} added, {len(removed)} removed, {len(current)} total")
+        return {"added": len(added), "removed": len(removed), "total": len(current)}
+
+    def _fetch_snapshot_data(self, snapshot_ids: Optional[List[str]],
+                             wanted: Optional[Set[str]] = None) -> List[CatalogEntry]:
+        """Catalog entries for the given snapshots, or for all wanted ones from a full listing"""
+        command = self._command.copy().command("snapshots")
+        if snapshot_ids is None:
+            output = command.run(self.to_env())
+        else:
+            output = command.run(self.to_env(), synopsis_values={"snapshotID": snapshot_ids})
+        return [CatalogEntry.from_restic_json(entry) for entry in decode_json(output or "[]")
+                if wanted is None or entry["id"] in wanted]
+
+    def query_snapshots(self, tags: Optional[List[str]] = None, paths: Optional[List[Path]] = None,
+                        date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                        limit: Optional[int] = None, newest_first: bool = True,
+                        refresh: bool = True, hosts: Optional[List[str]] = None,
+                        id_prefix: Optional[str] = None) -> List[BackupSnapshot]:
+        """
+        List snapshots from the snapshot catalog, filtered in SQL
 
-            snapshots.append(snapshot)
+        Args:
+            tags: Keep snapshots carrying any of these tags
+            paths: Keep snapshots including any of these paths
+            date_from: Keep snapshots taken at or after this time (naive times are local)
+            date_to: Keep snapshots taken at or before this time
+            limit: Return at most this many snapshots
+            newest_first: Order by time descending (ascending otherwise)
+            refresh: Refresh the catalog first (see refresh_snapshot_catalog)
+            hosts: Keep snapshots taken on any of these hosts
+            id_prefix: Keep snapshots whose full ID starts with this string
 
-        return snapshots
+        Returns:
+            List of matching BackupSnapshot objects
+        """
+        if refresh:
+            self.refresh_snapshot_catalog()
+        entries = self.snapshot_catalog.query(
+                tags=tags, paths=[str(path) for path in paths] if paths else None, hosts=hosts,
+                time_from=date_from.timestamp() if date_from else None,
+                time_to=date_to.timestamp() if date_to else None,
+                limit=limit, newest_first=newest_first, id_prefix=id_prefix)
+        return self._snapshot_decoder.build([entry.to_restic_json() for entry in entries], self)
 
     def restore(self, snapshot_id: str, target_path: Optional[Path] = None) -> str:
-        return self._command.command("restore").param(snapshot_id).param("target", target_path).run(self.to_env())
+        return self._command.copy().command("restore").param(snapshot_id).param("target", target_path).run(self.to_env())
 
     def stats(self) -> dict:
         """Get snapshot stats"""
-        output = self._command.command("stats").run(self.to_env())
+        output = self._command.copy().command("stats").run(self.to_env())
         return json.loads(output)
 
     def location(self) -> str:
@@ -581,7 +927,8 @@ class ResticRepository(BackupRepository):
             policy: Retention policy specifying which snapshots to keep
             prune: If True, automatically run prune after forgetting snapshots
         """
-        cmdline = self._command.command("forget")
+        self._snapshot_index = None  # forgotten snapshots must not be chosen as parents
+        cmdline = self._command.copy().command("forget")
         if prune:
             cmdline.param("--prune")
         try:
@@ -603,7 +950,8 @@ class ResticRepository(BackupRepository):
             snapshotid: ID of the Snapshot to remove
             prune: If True, automatically run prune after forgetting snapshots
         """
-        cmdline = self._command.command("forget").param(snapshotid)
+        self._snapshot_index = None  # forgotten snapshots must not be chosen as parents
+        cmdline = self._command.copy().command("forget").param(snapshotid)
         if prune:
             cmdline.param("--prune")
         try:
@@ -621,7 +969,7 @@ class ResticRepository(BackupRepository):
         Remove unreferenced data from the repository.
         This removes file chunks that are no longer used by any snapshot.
         """
-        return self._command.command("prune").run(self.to_env())
+        return self._command.copy().command("prune").run(self.to_env())
 
     def validate(self) -> str:
         """Validate repository configuration"""
@@ -639,12 +987,18 @@ class ResticRepository(BackupRepository):
             self._on_backup_summary(output)
         elif message_type == "status":
             self._on_backup_status(output)
+        elif message_type in ("error", "exit_error"):
+            self._on_backup_error(output)
         # Handle other message types as needed
 
     def _on_backup_summary(self, summary: Dict):
-        # Placeholder for event handling logic
-        print(f"Backup Summary: {summary}")
+        logger.info(f"Backup Summary: {summary}")
 
     def _on_backup_status(self, status: Dict):
-        # Placeholder for event handling logic
-        print(f"Backup Status: {status}")
+        logger.debug(f"Backup Status: {status}")
+
+    def _on_backup_error(self, error: Dict):
+        details = error.get("error")
+        message = details.get("message") if isinstance(details, dict) else error.get("message", details)
+        item = error.get("item")
+        logger.warning(f"restic error{f' on {item}' if item else ''}: {message}")
@@ -0,0 +1,279 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .logging import logger
+from .parent_selection import IndexedSnapshot, parse_restic_time
+
+SCHEMA_VERSION = 1
+
+# The catalog holds paths, hosts and tags that are otherwise only readable by
+# decrypting the repository, so only the owner may read it
+_DIRECTORY_MODE = 0o700
+_FILE_MODE = 0o600
+
+_SCHEMA = """
+CREATE TABLE snapshots (
+    id TEXT PRIMARY KEY,
+    short_id TEXT NOT NULL,
+    time REAL NOT NULL,
+    time_text TEXT NOT NULL,
+    hostname TEXT NOT NULL,
+    username TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE INDEX snapshots_time ON snapshots (time);
+CREATE TABLE snapshot_tags (
+    tag TEXT NOT NULL,
+    snapshot_id TEXT NOT NULL,
+    PRIMARY KEY (tag, snapshot_id)
+) WITHOUT ROWID;
+CREATE INDEX snapshot_tags_snapshot ON snapshot_tags (snapshot_id);
+CREATE TABLE snapshot_paths (
+    path TEXT NOT NULL,
+    snapshot_id TEXT NOT NULL,
+    PRIMARY KEY (path, snapshot_id)
+) WITHOUT ROWID;
+CREATE INDEX snapshot_paths_snapshot ON snapshot_paths (snapshot_id);
+"""
+
+_COLUMNS = "id, short_id, time, time_text, hostname, username, paths, tags"
+
+
+class CatalogEntry(NamedTuple):
+    """One snapshot as recorded in the catalog"""
+    snapshot_id: str
+    short_id: str
+    time: float
+    time_text: str
+    hostname: str
+    username: str
+    paths: Tuple[str, ...]
+    tags: Tuple[str, ...]
+
+    @classmethod
+    def from_restic_json(cls, entry: Dict[str, Any]) -> 'CatalogEntry':
+        """Entry for one element of 'restic snapshots --json' output"""
+        time_text = entry.get("time", "")
+        return cls(entry["id"], entry.get("short_id") or entry["id"][:8], parse_restic_time(time_text), time_text,
+                   entry.get("hostname", ""), entry.get("username", ""),
+                   tuple(entry.get("paths") or ()), tuple(entry.get("tags") or ()))
+
+    def to_restic_json(self) -> Dict[str, Any]:
+        """The fields of this entry in 'restic snapshots --json' form"""
+        return {"id": self.snapshot_id, "short_id": self.short_id, "time": self.time_text,
+                "hostname": self.hostname, "username": self.username,
+                "paths": list(self.paths), "tags": list(self.tags)}
+
+    def to_indexed(self) -> IndexedSnapshot:
+        """What parent selection needs to know about this snapshot"""
+        return IndexedSnapshot(self.short_id, self.time, self.hostname, frozenset(self.paths), frozenset(self.tags))
+
+
+class SnapshotCatalog:
+    """
+    Persistent catalog of one repository's snapshots.
+
+    Listing snapshots with 'restic snapshots --json' reads and decodes
+    every snapshot in the repository, which takes seconds once there are
+    tens of thousands of them. The catalog keeps what TimeLocker needs of
+    each snapshot in an SQLite database under the TimeLocker cache
+    directory, so a refresh only has to fetch the snapshots that appeared
+    since (see ResticRepository.refresh_snapshot_catalog), and listings
+    filter by tag, path and time in SQL instead of in Python.
+
+    Snapshots are immutable in restic, so an ID known to the catalog never
+    needs fetching again. If the database cannot be opened the catalog
+    lives in memory for the life of the object. The database directory and
+    files are private to the owner (modes 0700 and 0600). Instances are
+    thread-safe; several processes may share one database file.
+    """
+
+    def __init__(self, repository_id: str, cache_dir: Optional[Union[str, Path]] = None):
+        """
+        Initialize the catalog
+
+        Args:
+            repository_id: Stable identifier of the repository (names the database file)
+            cache_dir: Directory holding catalog databases (defaults to a
+                'snapshots' directory in the TimeLocker cache directory)
+        """
+        if cache_dir is None:
+            from ..config.configuration_path_resolver import ConfigurationPathResolver
+            cache_dir = ConfigurationPathResolver.get_cache_directory() / "snapshots"
+        self._path = Path(cache_dir) / f"{repository_id}.sqlite"
+        self._lock = threading.Lock()
+        self._connection = self._open()
+
+    @property
+    def path(self) -> Path:
+        """Location of the database file"""
+        return self._path
+
+    def _open(self) -> sqlite3.Connection:
+        try:
+            self._path.parent.mkdir(mode=_DIRECTORY_MODE, parents=True, exist_ok=True)
+            os.chmod(self._path.parent, _DIRECTORY_MODE)
+            # Create the file with private permissions before SQLite opens it;
+            # SQLite gives its -wal and -shm files the database's permissions
+            os.close(os.open(self._path, os.O_RDWR | os.O_CREAT, _FILE_MODE))
+            os.chmod(self._path, _FILE_MODE)
+            connection = self._connect(str(self._path))
+            for suffix in ("-wal", "-shm"):
+                try:
+                    os.chmod(f"{self._path}{suffix}", _FILE_MODE)
+                except FileNotFoundError:
+                    pass
+        except (OSError, sqlite3.Error) as e:
+            logger.debug(f"Could not open snapshot catalog {self._path}, keeping it in memory: {e}")
+            connection = self._connect(":memory:")
+        return connection
+
+    @staticmethod
+    def _connect(database: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(database, timeout=30.0, check_same_thread=False, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            pass  # Not every file system supports WAL; the default journal still works
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                # Another process may have created the schema while we waited for the lock
+                if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    for table in ("snapshots", "snapshot_tags", "snapshot_paths"):
+                        connection.execute(f"DROP TABLE IF EXISTS {table}")
+                    for statement in _SCHEMA.split(";"):
+                        if statement.strip():
+                            connection.execute(statement)
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return connection
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    def ids(self) -> Set[str]:
+        """Full IDs of every snapshot in the catalog"""
+        with self._lock:
+            return {row[0] for row in self._connection.execute("SELECT id FROM snapshots")}
+
+    def update(self, added: Iterable[CatalogEntry] = (), removed: Iterable[str] = ()) -> None:
+        """
+        Record new snapshots and drop vanished ones in one transaction
+
+        Args:
+            added: Snapshots to add (replacing entries with the same ID)
+            removed: Full IDs of snapshots no longer in the repository
+        """
+        added = list(added)
+        removed = [(snapshot_id,) for snapshot_id in removed]
+        replaced = removed + [(entry.snapshot_id,) for entry in added]
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            for table in ("snapshot_tags", "snapshot_paths"):
+                self._connection.executemany(f"DELETE FROM {table} WHERE snapshot_id = ?", replaced)
+            self._connection.executemany("DELETE FROM snapshots WHERE id = ?", removed)
+            self._connection.executemany(
+                    f"INSERT OR REPLACE INTO snapshots ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(e.snapshot_id, e.short_id, e.time, e.time_text, e.hostname, e.username,
+                      json.dumps(e.paths), json.dumps(e.tags)) for e in added])
+            self._connection.executemany(
+                    "INSERT OR IGNORE INTO snapshot_tags (tag, snapshot_id) VALUES (?, ?)",
+                    [(tag, e.snapshot_id) for e in added for tag in e.tags])
+            self._connection.executemany(
+                    "INSERT OR IGNORE INTO snapshot_paths (path, snapshot_id) VALUES (?, ?)",
+                    [(path, e.snapshot_id) for e in added for path in e.paths])
+        if added or removed:
+            logger.debug(f"Snapshot catalog {self._path.name}: {len(added)} added, {len(removed)} removed")
+
+    def query(self, tags: Optional[Iterable[str]] = None, paths: Optional[Iterable[str]] = None,
+              hosts: Optional[Iterable[str]] = None,
+              time_from: Optional[float] = None, time_to: Optional[float] = None,
+              limit: Optional[int] = None, newest_first: bool = True,
+              id_prefix: Optional[str] = None) -> List[CatalogEntry]:
+        """
+        Snapshots matching every given predicate
+
+        Args:
+            tags: Keep snapshots carrying any of these tags
+            paths: Keep snapshots including any of these paths
+            hosts: Keep snapshots taken on any of these hosts
+            time_from: Keep snapshots taken at or after this POSIX time
+            time_to: Keep snapshots taken at or before this POSIX time
+            limit: Return at most this many snapshots
+            newest_first: Order by time descending (ascending otherwise)
+            id_prefix: Keep snapshots whose full ID starts with this string
+
+        Returns:
+            List of matching CatalogEntry objects
+        """
+        clauses, arguments = [], []
+        if id_prefix is not None:
+            clauses.append("id LIKE ? || '%' ESCAPE '\\'")
+            arguments.append(id_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"))
+        for table, column, values in (("snapshot_tags", "tag", tags), ("snapshot_paths", "path", paths)):
+            if values:
+                values = list(values)
+                clauses.append(f"id IN (SELECT snapshot_id FROM {table} "
+                               f"WHERE {column} IN ({', '.join('?' * len(values))}))")
+                arguments.extend(values)
+        if hosts:
+            hosts = list(hosts)
+            clauses.append(f"hostname IN ({', '.join('?' * len(hosts))})")
+            arguments.extend(hosts)
+        if time_from is not None:
+            clauses.append("time >= ?")
+            arguments.append(time_from)
+        if time_to is not None:
+            clauses.append("time <= ?")
+            arguments.append(time_to)
+
+        sql = f"SELECT {_COLUMNS} FROM snapshots"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY time {'DESC' if newest_first else 'ASC'}, id"
+        if limit:
+            sql += " LIMIT ?"
+            arguments.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, arguments).fetchall()
+        if id_prefix is not None:
+            # LIKE ignores ASCII case; snapshot IDs are compared exactly
+            rows = [row for row in rows if row[0].startswith(id_prefix)]
+        return [CatalogEntry(row[0], row[1], row[2], row[3], row[4], row[5],
+                             tuple(json.loads(row[6])), tuple(json.loads(row[7]))) for row in rows]
+
+    def clear(self) -> None:
+        """Forget every snapshot"""
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            for table in ("snapshot_tags", "snapshot_paths", "snapshots"):
+                self._connection.execute(f"DELETE FROM {table}")
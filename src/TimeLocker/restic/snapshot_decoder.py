@@ -0,0 +1,219 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import gc
+import json
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import dateutil.parser
+except ImportError:
+    dateutil = None
+
+from ..backup_snapshot import BackupSnapshot
+
+if TYPE_CHECKING:
+    from ..backup_repository import BackupRepository
+
+# Fraction digits beyond microseconds, for parsers that only take six
+_LONG_FRACTION = re.compile(r"(\.\d{6})\d+")
+# Nanosecond digits of a fraction starting at index 19 (after YYYY-MM-DDTHH:MM:SS)
+_SUB_MICROSECOND = re.compile(r"\.\d{6}(\d{1,3})")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Distinct path sets, tag sets and zones a decoder remembers before starting afresh
+MAX_INTERNED = 65536
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decode JSON with orjson when it is installed, else with the json module"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_rfc3339(text: str) -> datetime:
+    """
+    Parse a restic timestamp into an aware datetime
+
+    datetime.fromisoformat reads restic's nanosecond fractions and 'Z'
+    suffix directly since Python 3.11 and is implemented in C, so it is
+    tried first; the fraction is truncated to microseconds. Times without
+    a zone are taken as UTC. Other RFC 3339 spellings it rejects are
+    retried with the fraction cut and, when installed, with dateutil.
+
+    Args:
+        text: Timestamp such as 2025-03-29T21:09:34.068185654+02:00
+
+    Returns:
+        datetime: Aware datetime in the timestamp's own zone
+
+    Raises:
+        ValueError: If the text is not a timestamp
+    """
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        parsed = _parse_fallback(text)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """
+    Hold off the cyclic garbage collector while a listing is built
+
+    Every few hundred allocations the collector walks the young objects,
+    and the tens of thousands of dicts, lists and snapshots of a large
+    listing make those walks cost more than the decoding itself. None of
+    them form cycles, so collection can wait until the listing is built.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _parse_fallback(text: str) -> datetime:
+    cleaned = _LONG_FRACTION.sub(r"\1", text.strip())
+    if cleaned.endswith(("Z", "z")):
+        cleaned = cleaned[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(cleaned)
+    except ValueError:
+        if dateutil is None:
+            raise
+        return dateutil.parser.parse(text)
+
+
+def parse_rfc3339_ns(text: str) -> Tuple[int, tzinfo]:
+    """
+    Parse a restic timestamp into nanoseconds since the epoch and its zone
+
+    Unlike parse_rfc3339 the digits below a microsecond are kept.
+
+    Args:
+        text: Timestamp such as 2025-03-29T21:09:34.068185654+02:00
+
+    Returns:
+        Tuple of nanoseconds since the epoch and the timestamp's zone
+
+    Raises:
+        ValueError: If the text is not a timestamp
+    """
+    parsed = parse_rfc3339(text)
+    time_ns = (parsed - _EPOCH) // _MICROSECOND * 1000
+    nanos = _SUB_MICROSECOND.match(text, 19)
+    if nanos is not None:
+        time_ns += int(nanos.group(1).ljust(3, "0"))
+    return time_ns, parsed.tzinfo
+
+
+class SnapshotDecoder:
+    """
+    Turns 'restic snapshots --json' output into BackupSnapshot objects.
+
+    Repositories with tens of thousands of snapshots repeat the same few
+    hostnames, path sets, tag sets and zones in every entry. The decoder
+    interns each of them, so a listing holds one copy of each however many
+    snapshots refer to it, and builds the compact snapshots in one pass
+    with the hot lookups bound to locals. The interning tables live as
+    long as the decoder (a repository keeps one) and are emptied once
+    they exceed MAX_INTERNED entries.
+    """
+
+    def __init__(self):
+        self._interned: Dict[Any, Any] = {}
+
+    def load(self, output: Union[str, bytes]) -> List[Dict[str, Any]]:
+        """
+        Decode the JSON of a snapshot listing into plain entries
+
+        Args:
+            output: Raw JSON output of 'restic snapshots --json'
+
+        Returns:
+            List of snapshot dicts as printed by restic
+        """
+        if not output:
+            return []
+        with _gc_paused():
+            return loads(output)
+
+    def decode(self, output: Union[str, bytes], repository: 'BackupRepository') -> List[BackupSnapshot]:
+        """
+        Decode a snapshot listing
+
+        Args:
+            output: Raw JSON output of 'restic snapshots --json'
+            repository: Repository the snapshots belong to
+
+        Returns:
+            List of BackupSnapshot objects in listing order
+        """
+        return self.build(self.load(output), repository)
+
+    def build(self, entries: List[Dict[str, Any]], repository: 'BackupRepository') -> List[BackupSnapshot]:
+        """
+        Build snapshots from decoded listing entries
+
+        Args:
+            entries: Decoded elements of a 'restic snapshots --json' listing
+            repository: Repository the snapshots belong to
+
+        Returns:
+            List of BackupSnapshot objects in the order of the entries
+        """
+        interned = self._interned
+        if len(interned) > MAX_INTERNED:
+            interned.clear()
+
+        def intern_tuple(values) -> Tuple[str, ...]:
+            key = tuple(values) if values else ()
+            shared = interned.get(key)
+            if shared is None:
+                shared = interned[key] = tuple(sys.intern(value) for value in key)
+            return shared
+
+        intern = sys.intern
+        parse_time = parse_rfc3339_ns
+        from_listing = BackupSnapshot.from_listing
+        snapshots = []
+        append = snapshots.append
+        with _gc_paused():
+            for entry in entries:
+                time_ns, zone = parse_time(entry["time"])
+                zone = interned.setdefault(zone, zone)
+                hostname = entry.get("hostname")
+                append(from_listing(repository, entry["short_id"], time_ns, zone,
+                                    intern_tuple(entry["paths"]), intern_tuple(entry.get("tags")),
+                                    intern(hostname) if hostname is not None else None))
+        return snapshots
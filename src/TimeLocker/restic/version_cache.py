@@ -0,0 +1,188 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+from .logging import logger
+
+CACHE_FILE_NAME = "restic_version.json"
+
+# Binaries remembered on disk (e.g. several restic installs on PATH over time)
+MAX_ENTRIES = 16
+
+
+class BinaryIdentity(NamedTuple):
+    """What a cached version is valid for: one build of the binary at one path"""
+    path: str
+    mtime_ns: int
+    size: int
+
+
+class CachedVersion(NamedTuple):
+    version: str
+    legacy: bool  # detected from plain 'restic version' output rather than --json
+
+
+def identify_binary(command: str) -> Optional[BinaryIdentity]:
+    """
+    Resolve a command on PATH to the file that would run, without running it
+
+    Args:
+        command: Executable name or path (e.g. "restic")
+
+    Returns:
+        BinaryIdentity of the resolved file (symlinks followed), or None if not found
+    """
+    found = shutil.which(command)
+    if found is None:
+        return None
+    path = os.path.realpath(found)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return BinaryIdentity(path, st.st_mtime_ns, st.st_size)
+
+
+class ResticVersionCache:
+    """
+    Detected restic versions, in memory and on disk.
+
+    Finding the version means spawning 'restic version', which costs more
+    than everything else a short CLI invocation does per repository. The
+    result is remembered per binary, keyed by its resolved path, mtime and
+    size, so it is only detected again after the binary is replaced or
+    upgraded. The on-disk copy is a small JSON file under the TimeLocker
+    cache directory, written atomically; if it cannot be written the cache
+    still works for the life of the process.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        """
+        Initialize the version cache
+
+        Args:
+            cache_dir: Directory holding the cache file (defaults to the
+                TimeLocker cache directory)
+        """
+        if cache_dir is None:
+            from ..config.configuration_path_resolver import ConfigurationPathResolver
+            cache_dir = ConfigurationPathResolver.get_cache_directory()
+        self._path = Path(cache_dir) / CACHE_FILE_NAME
+        self._lock = threading.Lock()
+        self._memory: Dict[BinaryIdentity, CachedVersion] = {}
+        self._disk: Optional[Dict[str, Dict]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, binary: BinaryIdentity) -> Optional[CachedVersion]:
+        """
+        Look up the version detected for a binary
+
+        Args:
+            binary: Identity of the restic binary
+
+        Returns:
+            CachedVersion, or None if this build of the binary was never seen
+        """
+        with self._lock:
+            cached = self._memory.get(binary)
+            if cached is None:
+                entry = self._load().get(binary.path)
+                if entry and (entry.get("mtime_ns"), entry.get("size")) == (binary.mtime_ns, binary.size):
+                    cached = self._memory[binary] = CachedVersion(str(entry["version"]), bool(entry.get("legacy")))
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return cached
+
+    def put(self, binary: BinaryIdentity, version: str, legacy: bool = False):
+        """
+        Remember the version detected for a binary
+
+        Args:
+            binary: Identity of the restic binary
+            version: Version it reported
+            legacy: Whether it was parsed from plain text output
+        """
+        with self._lock:
+            self._memory[binary] = CachedVersion(version, legacy)
+            entries = self._load()
+            entries.pop(binary.path, None)
+            entries[binary.path] = {"mtime_ns": binary.mtime_ns, "size": binary.size,
+                                    "version": version, "legacy": legacy}
+            while len(entries) > MAX_ENTRIES:
+                entries.pop(next(iter(entries)))
+            self._write(entries)
+
+    def clear(self):
+        """Forget every cached version, in memory and on disk"""
+        with self._lock:
+            self._memory.clear()
+            self._disk = {}
+            try:
+                self._path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.debug(f"Could not remove restic version cache {self._path}: {e}")
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._disk is None:
+            try:
+                data = json.loads(self._path.read_text(encoding="utf-8"))
+                self._disk = data if isinstance(data, dict) else {}
+            except (OSError, ValueError):
+                self._disk = {}
+        return self._disk
+
+    def _write(self, entries: Dict[str, Dict]):
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self._path.parent, prefix=".restic-version-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                    json.dump(entries, handle)
+                os.replace(tmp_name, self._path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.debug(f"Could not write restic version cache {self._path}: {e}")
+
+
+_default_cache: Optional[ResticVersionCache] = None
+_default_lock = threading.Lock()
+
+
+def default_version_cache() -> ResticVersionCache:
+    """Process-wide version cache stored in the TimeLocker cache directory"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResticVersionCache()
+        return _default_cache
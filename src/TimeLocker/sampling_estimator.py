@@ -0,0 +1,303 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import heapq
+import logging
+import math
+import random
+import time
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .inode_set import SizeTally, summarize_stats
+from .scan_cache import DirectoryAggregate
+
+if TYPE_CHECKING:
+    from .file_selections import FileSelection
+
+logger = logging.getLogger(__name__)
+
+# Estimated quantities, in the order probes report them
+_FIELDS = ("file_count", "apparent_size", "allocated_size", "directory_count")
+
+# Strata with at most this many directories are counted exactly instead of sampled
+EXACT_STRATUM_DIRECTORIES = 64
+
+
+class _Stratum:
+    """Running probe statistics for one top-level subtree"""
+
+    __slots__ = ("path", "probes", "sums", "squares", "exact")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.probes = 0
+        self.sums = [0.0] * len(_FIELDS)
+        self.squares = [0.0] * len(_FIELDS)
+        # Set when a probe could not have gone any other way, making it exact
+        self.exact = False
+
+    def add(self, values: Tuple[float, ...], deterministic: bool):
+        self.probes += 1
+        for i, value in enumerate(values):
+            self.sums[i] += value
+            self.squares[i] += value * value
+        if deterministic:
+            self.exact = True
+
+    def mean(self, field: int) -> float:
+        return self.sums[field] / self.probes
+
+    def variance_of_mean(self, field: int) -> float:
+        """Estimated variance of the stratum mean (s^2 / n)"""
+        if self.exact:
+            return 0.0
+        mean = self.mean(field)
+        if self.probes < 2:
+            # A single probe says nothing about spread; assume 100% relative error
+            return mean * mean
+        variance = max(0.0, (self.squares[field] - self.probes * mean * mean) / (self.probes - 1))
+        return variance / self.probes
+
+    def priority(self) -> float:
+        """Expected reduction in byte variance from one more probe"""
+        if self.exact:
+            return 0.0
+        if self.probes < 2:
+            return math.inf
+        return self.variance_of_mean(1) / (self.probes + 1)
+
+
+class SamplingEstimator:
+    """
+    Time-budgeted statistical estimate of a FileSelection's backup size.
+
+    The files directly inside each include root are counted exactly and
+    every first-level subdirectory becomes a stratum. Within a stratum,
+    each probe is a random root-to-leaf descent (Knuth's tree-size
+    estimator): a directory reached through branching factors b1..bk is
+    weighted by b1*...*bk, which makes each probe an unbiased estimate of
+    the subtree's totals. Probes go first to unsampled strata, then to the
+    stratum whose byte estimate is least certain, until the time budget runs
+    out. Stratum means are summed and their variances combined into normal
+    confidence intervals.
+
+    Small strata (up to EXACT_STRATUM_DIRECTORIES directories) are counted
+    exactly on first visit and contribute no error. Directory listings are
+    memoized, so repeated descents only pay for the directories they have
+    not seen before. Hardlinks cannot be deduplicated from a sample, so
+    'unique_size' and 'total_size' equal the apparent size.
+    """
+
+    def __init__(self, selection: 'FileSelection', time_budget: float = 2.0,
+                 confidence: float = 0.95, seed: Optional[int] = None):
+        """
+        Initialize the estimator
+
+        Args:
+            selection: File selection to estimate
+            time_budget: Seconds to spend sampling
+            confidence: Two-sided confidence level of the reported bounds
+            seed: Optional random seed for reproducible estimates
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        self._selection = selection
+        self._time_budget = time_budget
+        self._confidence = confidence
+        self._random = random.Random(seed)
+        self._listings: Dict[str, Optional[Tuple[DirectoryAggregate, List[str]]]] = {}
+        self._progress = {"files_processed": 0}
+
+    def _list(self, dir_path: str) -> Optional[Tuple[DirectoryAggregate, List[str]]]:
+        """Memoized directory aggregate"""
+        try:
+            return self._listings[dir_path]
+        except KeyError:
+            listing = self._selection._aggregate_directory(dir_path, self._progress)
+            self._listings[dir_path] = listing
+            return listing
+
+    @staticmethod
+    def _totals(aggregate: DirectoryAggregate) -> Tuple[float, ...]:
+        """One directory's contribution in _FIELDS order"""
+        allocated = aggregate.single_link_allocated + sum(link[3] for link in aggregate.hardlinks)
+        return aggregate.file_count, aggregate.apparent_size, allocated, 1
+
+    def _enumerate(self, start: str, deadline: float) -> Optional[Tuple[float, ...]]:
+        """
+        Count a stratum exactly if it is small
+
+        Returns:
+            Exact totals in _FIELDS order, or None if the stratum has more than
+            EXACT_STRATUM_DIRECTORIES directories or the deadline passed
+        """
+        totals = [0.0] * len(_FIELDS)
+        stack = [start]
+        visited = 0
+        while stack:
+            if visited >= EXACT_STRATUM_DIRECTORIES or time.monotonic() > deadline:
+                return None
+            listing = self._list(stack.pop())
+            visited += 1
+            if listing is None:
+                continue
+            aggregate, subdirs = listing
+            for i, value in enumerate(self._totals(aggregate)):
+                totals[i] += value
+            stack.extend(subdirs)
+        return tuple(totals)
+
+    def _probe(self, start: str, deadline: float) -> Optional[Tuple[Tuple[float, ...], bool]]:
+        """
+        One random descent from a stratum root
+
+        Returns:
+            (weighted totals in _FIELDS order, whether the descent was forced
+            at every step), or None if the deadline passed mid-descent
+        """
+        weight = 1
+        totals = [0.0] * len(_FIELDS)
+        deterministic = True
+        dir_path = start
+        while True:
+            listing = self._list(dir_path)
+            if listing is None:
+                break
+            aggregate, subdirs = listing
+            for i, value in enumerate(self._totals(aggregate)):
+                totals[i] += weight * value
+            if not subdirs:
+                break
+            if len(subdirs) > 1:
+                deterministic = False
+            if time.monotonic() > deadline:
+                return None
+            weight *= len(subdirs)
+            dir_path = self._random.choice(subdirs)
+        return tuple(totals), deterministic
+
+    def estimate(self) -> Dict[str, object]:
+        """
+        Sample until the time budget is spent
+
+        Returns:
+            Dict with the keys of FileSelection.estimate_backup_size plus
+            'file_count_error' and 'total_size_error' (confidence interval
+            half-widths), 'confidence', 'probes', 'strata',
+            'strata_sampled', 'elapsed_seconds' and 'sampled' (True)
+        """
+        started = time.monotonic()
+        deadline = started + self._time_budget
+        selection = self._selection
+        selection._compile_patterns()
+        selection._index_paths()
+
+        exact = SizeTally()
+        exact_directories = 0
+        strata: List[_Stratum] = []
+
+        for path in sorted(selection.includes, key=str):
+            if not path.exists():
+                continue
+            if not path.is_dir():
+                if selection.should_include_file(path):
+                    try:
+                        exact.add(*summarize_stats([path.stat()]))
+                    except OSError:
+                        continue
+                continue
+            if selection.is_directory_excluded(path):
+                continue
+            listing = self._list(str(path))
+            if listing is None:
+                continue
+            aggregate, subdirs = listing
+            exact.add(aggregate.file_count, aggregate.apparent_size, aggregate.single_link_size,
+                      aggregate.single_link_allocated, aggregate.hardlinks)
+            exact_directories += 1
+            strata.extend(_Stratum(subdir) for subdir in subdirs)
+
+        # Visit strata in random order so a budget that runs out early is not biased by name
+        self._random.shuffle(strata)
+        queue = [(-math.inf, index) for index in range(len(strata))]
+        heapq.heapify(queue)
+        probes = 0
+        while queue and time.monotonic() < deadline:
+            _, index = heapq.heappop(queue)
+            stratum = strata[index]
+            if stratum.probes == 0:
+                exact_totals = self._enumerate(stratum.path, deadline)
+                if exact_totals is not None:
+                    stratum.add(exact_totals, True)
+                    probes += 1
+                    continue
+            outcome = self._probe(stratum.path, deadline)
+            if outcome is None:
+                break
+            stratum.add(*outcome)
+            probes += 1
+            if not stratum.exact:
+                heapq.heappush(queue, (-stratum.priority(), index))
+
+        estimates, variances = self._combine(strata)
+        z = NormalDist().inv_cdf((1 + self._confidence) / 2)
+        file_count = exact.file_count + estimates[0]
+        apparent_size = exact.apparent_size + estimates[1]
+
+        logger.debug(f"Sampled {probes} probe(s) over {len(strata)} strata in {time.monotonic() - started:.2f}s")
+        return {
+                "total_size":       round(apparent_size),
+                "apparent_size":    round(apparent_size),
+                "unique_size":      round(apparent_size),
+                "allocated_size":   round(exact.allocated_size + estimates[2]),
+                "duplicate_links":  0,
+                "file_count":       round(file_count),
+                "directory_count":  round(exact_directories + estimates[3]),
+                "file_count_error": round(z * math.sqrt(variances[0])),
+                "total_size_error": round(z * math.sqrt(variances[1])),
+                "confidence":       self._confidence,
+                "probes":           probes,
+                "strata":           len(strata),
+                "strata_sampled":   sum(1 for stratum in strata if stratum.probes),
+                "elapsed_seconds":  time.monotonic() - started,
+                "sampled":          True,
+        }
+
+    @staticmethod
+    def _combine(strata: List[_Stratum]) -> Tuple[List[float], List[float]]:
+        """
+        Sum stratum estimates and variances
+
+        Strata the budget never reached are imputed with the mean of the
+        sampled strata, adding the between-strata variance for each.
+        """
+        estimates = [0.0] * len(_FIELDS)
+        variances = [0.0] * len(_FIELDS)
+        sampled = [stratum for stratum in strata if stratum.probes]
+        unsampled = len(strata) - len(sampled)
+
+        for field in range(len(_FIELDS)):
+            means = [stratum.mean(field) for stratum in sampled]
+            estimates[field] = sum(means)
+            variances[field] = sum(stratum.variance_of_mean(field) for stratum in sampled)
+            if unsampled and means:
+                average = sum(means) / len(means)
+                spread = (sum((m - average) ** 2 for m in means) / (len(means) - 1)) if len(means) > 1 else average ** 2
+                estimates[field] += unsampled * average
+                variances[field] += unsampled * spread + (unsampled ** 2) * spread / len(means)
+        return estimates, variances
@@ -0,0 +1,329 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# File header: magic, format version, length of the selection fingerprint
+_MAGIC = b"TLSC"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBH")
+# Per-directory record: path length, subdirectory names length, hardlink
+# count, mtime_ns, inode, file count, apparent bytes, single-link bytes,
+# single-link allocated bytes, files evaluated
+_RECORD = struct.Struct("<IIIqQQQQQQ")
+# Hardlinked file: st_dev, st_ino, st_size, allocated bytes
+_HARDLINK = struct.Struct("<QQQQ")
+_INODE_MASK = (1 << 64) - 1
+
+# Directories modified this recently may change again within the same mtime tick
+_RACY_WINDOW_NS = 2_000_000_000
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 1_000_000
+
+
+class DirectoryAggregate(NamedTuple):
+    """Cached scan result for the direct contents of one directory"""
+    mtime_ns: int
+    inode: int
+    file_count: int
+    apparent_size: int
+    single_link_size: int
+    single_link_allocated: int
+    files_processed: int
+    subdirs: Tuple[str, ...]
+    # (st_dev, st_ino, st_size, allocated) of files with more than one link
+    hardlinks: Tuple[Tuple[int, int, int, int], ...] = ()
+
+
+class ScanCache:
+    """
+    Persistent per-directory scan aggregates for incremental size estimation.
+
+    Each record holds the included file count and byte totals of a single
+    directory's direct children, the identity of its hardlinked files (so
+    deduplication still works across cached directories), the
+    subdirectories that were descended and the directory's mtime and inode
+    at scan time. A later scan that finds the
+    same mtime and inode reuses the record instead of listing and stat-ing
+    the directory again; it still visits every subdirectory, since changes
+    deep in a tree do not update the mtime of its ancestors.
+
+    Directory mtimes change when entries are added, removed or renamed, but
+    not when an existing file is rewritten in place, so a cached estimate
+    does not see size changes of files that were modified in place.
+
+    Records are only valid for the selection they were computed with, so
+    each cache file is named after FileSelection.scan_fingerprint(); changing
+    paths or patterns selects a different file and the stale one is aged out
+    by the size limit. The format is a short header followed by
+    zlib-compressed fixed-size records, written atomically.
+    """
+
+    def __init__(self, fingerprint: str, cache_dir: Optional[Union[str, Path]] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Initialize the scan cache
+
+        Args:
+            fingerprint: Selection fingerprint the records belong to
+            cache_dir: Directory holding cache files (defaults to a 'scan'
+                directory under the TimeLocker cache directory)
+            max_bytes: Total size allowed for all scan cache files
+            max_entries: Maximum number of directory records kept per file
+        """
+        if cache_dir is None:
+            from .config.configuration_path_resolver import ConfigurationPathResolver
+            cache_dir = ConfigurationPathResolver.get_cache_directory() / "scan"
+        self._cache_dir = Path(cache_dir)
+        self._fingerprint = fingerprint
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._previous: Dict[str, DirectoryAggregate] = {}
+        self._current: Dict[str, DirectoryAggregate] = {}
+        self._loaded = False
+        self._scan_started_ns = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self) -> Path:
+        """Location of the cache file for this fingerprint"""
+        return self._cache_dir / f"{self._fingerprint}.scan"
+
+    @property
+    def loaded(self) -> bool:
+        """Whether load() has been called"""
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._previous)
+
+    def load(self) -> int:
+        """
+        Load records from disk, discarding unreadable or mismatched files
+
+        Returns:
+            int: Number of directory records loaded
+        """
+        self._loaded = True
+        self._previous = {}
+        self._current = {}
+        self._scan_started_ns = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            data = self.path.read_bytes()
+        except OSError:
+            return 0
+
+        try:
+            self._previous = self._decode(data)
+        except (ValueError, struct.error, zlib.error) as e:
+            logger.debug(f"Discarding unreadable scan cache {self.path}: {e}")
+            self._previous = {}
+        return len(self._previous)
+
+    def lookup(self, dir_path: str, stat_result: os.stat_result) -> Optional[DirectoryAggregate]:
+        """
+        Return the cached aggregate for a directory if it is unchanged
+
+        Args:
+            dir_path: Directory path as used during traversal
+            stat_result: Current stat of the directory
+
+        Returns:
+            DirectoryAggregate or None if missing or stale
+        """
+        record = self._previous.get(dir_path)
+        if (record is not None and record.mtime_ns == stat_result.st_mtime_ns
+                and record.inode == stat_result.st_ino & _INODE_MASK):
+            self.hits += 1
+            self._current[dir_path] = record
+            return record
+        self.misses += 1
+        return None
+
+    def store(self, dir_path: str, record: DirectoryAggregate):
+        """
+        Record the aggregate for a freshly scanned directory
+
+        Directories modified within the racy window of the scan start are
+        not recorded, as a change in the same mtime tick would go unnoticed.
+
+        Args:
+            dir_path: Directory path as used during traversal
+            record: Aggregate for the directory's direct contents
+        """
+        if record.mtime_ns >= self._scan_started_ns - _RACY_WINDOW_NS:
+            return
+        if len(self._current) >= self._max_entries:
+            return
+        self._current[dir_path] = record._replace(inode=record.inode & _INODE_MASK)
+
+    def save(self) -> bool:
+        """
+        Write the records seen during this scan and enforce the size limit
+
+        Directories that were not visited are dropped, so removed subtrees
+        do not accumulate.
+
+        Returns:
+            bool: True if the cache file was written
+        """
+        payload = self._encode(self._current)
+        if len(payload) > self._max_bytes:
+            logger.debug(f"Scan cache of {len(payload)} bytes exceeds limit, not saving")
+            self.invalidate()
+            return False
+
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self._cache_dir, prefix=".scan-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(payload)
+                os.replace(tmp_name, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.warning(f"Could not write scan cache {self.path}: {e}")
+            return False
+
+        self._previous = dict(self._current)
+        self._enforce_size_limit()
+        return True
+
+    def invalidate(self):
+        """Discard all records for this fingerprint, in memory and on disk"""
+        self._previous = {}
+        self._current = {}
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    @staticmethod
+    def clear(cache_dir: Optional[Union[str, Path]] = None) -> int:
+        """
+        Remove every scan cache file
+
+        Args:
+            cache_dir: Directory holding cache files (defaults as in __init__)
+
+        Returns:
+            int: Number of files removed
+        """
+        if cache_dir is None:
+            from .config.configuration_path_resolver import ConfigurationPathResolver
+            cache_dir = ConfigurationPathResolver.get_cache_directory() / "scan"
+        removed = 0
+        for cache_file in Path(cache_dir).glob("*.scan"):
+            try:
+                cache_file.unlink()
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _enforce_size_limit(self):
+        """Delete the least recently written cache files until under max_bytes"""
+        files = []
+        for cache_file in self._cache_dir.glob("*.scan"):
+            try:
+                st = cache_file.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, cache_file))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, cache_file in sorted(files, key=lambda item: item[0]):
+            if total <= self._max_bytes:
+                break
+            if cache_file == self.path:
+                continue
+            try:
+                cache_file.unlink()
+                total -= size
+            except OSError:
+                continue
+
+    def _encode(self, records: Dict[str, DirectoryAggregate]) -> bytes:
+        """Serialize records to the on-disk format"""
+        fingerprint = self._fingerprint.encode("ascii")
+        chunks = []
+        for dir_path, record in records.items():
+            path_bytes = os.fsencode(dir_path)
+            names = b"\0".join(os.fsencode(name) for name in record.subdirs)
+            chunks.append(_RECORD.pack(len(path_bytes), len(names), len(record.hardlinks),
+                                       record.mtime_ns, record.inode, record.file_count,
+                                       record.apparent_size, record.single_link_size,
+                                       record.single_link_allocated, record.files_processed))
+            chunks.append(path_bytes)
+            chunks.append(names)
+            for device, inode, size, allocated in record.hardlinks:
+                chunks.append(_HARDLINK.pack(device & _INODE_MASK, inode & _INODE_MASK, size, allocated))
+        return (_HEADER.pack(_MAGIC, _VERSION, len(fingerprint)) + fingerprint
+                + zlib.compress(b"".join(chunks), 6))
+
+    def _decode(self, data: bytes) -> Dict[str, DirectoryAggregate]:
+        """Parse the on-disk format, raising ValueError on any mismatch"""
+        magic, version, fingerprint_len = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("unrecognised scan cache header")
+        offset = _HEADER.size
+        fingerprint = data[offset:offset + fingerprint_len].decode("ascii", "replace")
+        if fingerprint != self._fingerprint:
+            raise ValueError("scan cache belongs to a different selection")
+
+        body = zlib.decompress(data[offset + fingerprint_len:])
+        records = {}
+        offset = 0
+        while offset < len(body):
+            (path_len, names_len, link_count, mtime_ns, inode, file_count, apparent_size,
+             single_link_size, single_link_allocated, files_processed) = _RECORD.unpack_from(body, offset)
+            offset += _RECORD.size
+            dir_path = os.fsdecode(body[offset:offset + path_len])
+            offset += path_len
+            names = body[offset:offset + names_len]
+            offset += names_len
+            if offset > len(body):
+                raise ValueError("truncated scan cache record")
+            hardlinks = tuple(_HARDLINK.unpack_from(body, offset + i * _HARDLINK.size) for i in range(link_count))
+            offset += link_count * _HARDLINK.size
+            subdirs = tuple(os.fsdecode(name) for name in names.split(b"\0")) if names else ()
+            records[dir_path] = DirectoryAggregate(mtime_ns, inode, file_count, apparent_size,
+                                                   single_link_size, single_link_allocated,
+                                                   files_processed, subdirs, hardlinks)
+        return records
+
+    def __repr__(self) -> str:
+        return f"<ScanCache fingerprint={self._fingerprint[:12]} records={len(self._previous)}>"
@@ -82,6 +82,9 @@ class CredentialManager:
         # Thread safety for concurrent access
         self._file_lock = threading.RLock()
 
+        # Bumped on every write so holders of derived state (e.g. pooled repositories) can tell it is stale
+        self._revision = 0
+
         # Initialize audit logging
         self._initialize_audit_log()
 
@@ -367,6 +370,13 @@ class CredentialManager:
             self.credentials_file.write_bytes(encrypted_data)
         except Exception as e:
             raise CredentialManagerError(f"Failed to save credentials: {e}")
+        finally:
+            self._revision += 1
+
+    @property
+    def revision(self) -> int:
+        """Number of times this instance has written the credential store"""
+        return self._revision
 
     def store_repository_password(self, repository_id: str, password: str, allow_prompt: bool = True) -> None:
         """
@@ -0,0 +1,230 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from .file_selections import FileSelection
+
+logger = logging.getLogger(__name__)
+
+# File header: magic, format version, marshal version
+_MAGIC = b"TLSL"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBB")
+
+# Target configuration keys that determine the compiled selection
+_SELECTION_KEYS = ("paths", "exclude_patterns", "include_patterns")
+_RULE_KEYS = ("one_file_system", "exclude_caches", "exclude_larger_than")
+
+DEFAULT_MAX_FILES = 256
+
+
+class SelectionCache:
+    """
+    On-disk cache of compiled FileSelections, keyed by target configuration.
+
+    Building a selection from configuration means normalizing every root,
+    classifying every pattern into matcher buckets, translating the rest to
+    regex source and building the path tries. The result of all that is
+    stored per target as a single marshal file (FileSelection's
+    to_compiled_state), so repeated short invocations restore it with one
+    read. Regexes themselves cannot be serialized; PatternMatcher compiles
+    them on first use instead.
+
+    The key hashes the selection-relevant configuration keys together with
+    the Python version, because fnmatch translations and the marshal format
+    may differ between versions. A changed configuration simply selects a
+    different file; the oldest files are removed beyond max_files.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None, max_files: int = DEFAULT_MAX_FILES):
+        """
+        Initialize the selection cache
+
+        Args:
+            cache_dir: Directory holding cache files (defaults to a 'selections'
+                directory under the TimeLocker cache directory)
+            max_files: Maximum number of cached selections kept
+        """
+        if cache_dir is None:
+            from .config.configuration_path_resolver import ConfigurationPathResolver
+            cache_dir = ConfigurationPathResolver.get_cache_directory() / "selections"
+        self._cache_dir = Path(cache_dir)
+        self._max_files = max_files
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def config_key(target_config: Dict[str, Any]) -> str:
+        """
+        Stable hash of the parts of a target configuration that shape its selection
+
+        The TimeLocker and Python versions are part of the hash, so an
+        upgrade never reuses state compiled by other code.
+
+        Args:
+            target_config: Backup target configuration dict
+
+        Returns:
+            str: Hex digest naming the cache file
+        """
+        from . import __version__
+
+        relevant = {key: sorted(str(value) for value in target_config.get(key) or ())
+                    for key in _SELECTION_KEYS}
+        relevant.update((key, target_config[key]) for key in _RULE_KEYS if target_config.get(key))
+        digest = hashlib.sha256()
+        digest.update(f"{_VERSION}\0{__version__}\0{sys.version_info[0]}.{sys.version_info[1]}\0".encode("ascii"))
+        digest.update(json.dumps(relevant, sort_keys=True, ensure_ascii=False).encode("utf-8", "surrogateescape"))
+        return digest.hexdigest()
+
+    def path_for(self, target_config: Dict[str, Any]) -> Path:
+        """Location of the cache file for a target configuration"""
+        return self._cache_dir / f"{self.config_key(target_config)}.sel"
+
+    def load(self, target_config: Dict[str, Any]) -> Optional[FileSelection]:
+        """
+        Restore the compiled selection for a target configuration
+
+        Args:
+            target_config: Backup target configuration dict
+
+        Returns:
+            FileSelection, or None if nothing usable is cached
+        """
+        path = self.path_for(target_config)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+
+        try:
+            magic, version, marshal_version = _HEADER.unpack_from(data, 0)
+            if magic != _MAGIC or version != _VERSION or marshal_version != marshal.version:
+                raise ValueError("unrecognised selection cache header")
+            selection = FileSelection.from_compiled_state(marshal.loads(data[_HEADER.size:]))
+        except (ValueError, EOFError, TypeError, KeyError, struct.error) as e:
+            logger.debug(f"Discarding unreadable selection cache {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return selection
+
+    def store(self, target_config: Dict[str, Any], selection: FileSelection) -> bool:
+        """
+        Write the compiled selection for a target configuration
+
+        Args:
+            target_config: Backup target configuration dict
+            selection: Selection built from that configuration
+
+        Returns:
+            bool: True if the cache file was written
+        """
+        path = self.path_for(target_config)
+        payload = _HEADER.pack(_MAGIC, _VERSION, marshal.version) + marshal.dumps(selection.to_compiled_state())
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self._cache_dir, prefix=".sel-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(payload)
+                os.replace(tmp_name, path)
+            except BaseException:
+                self._remove(Path(tmp_name))
+                raise
+        except OSError as e:
+            logger.warning(f"Could not write selection cache {path}: {e}")
+            return False
+
+        self._enforce_file_limit()
+        return True
+
+    def get_or_build(self, target_config: Dict[str, Any],
+                     build: Callable[[Dict[str, Any]], FileSelection]) -> FileSelection:
+        """
+        Load the cached selection, or build and cache it
+
+        Args:
+            target_config: Backup target configuration dict
+            build: Builds a FileSelection from the configuration on a miss
+
+        Returns:
+            FileSelection for the configuration
+        """
+        selection = self.load(target_config)
+        if selection is None:
+            selection = build(target_config)
+            self.store(target_config, selection)
+        return selection
+
+    @staticmethod
+    def clear(cache_dir: Optional[Union[str, Path]] = None) -> int:
+        """
+        Remove every cached selection
+
+        Args:
+            cache_dir: Directory holding cache files (defaults as in __init__)
+
+        Returns:
+            int: Number of files removed
+        """
+        if cache_dir is None:
+            from .config.configuration_path_resolver import ConfigurationPathResolver
+            cache_dir = ConfigurationPathResolver.get_cache_directory() / "selections"
+        removed = 0
+        for cache_file in Path(cache_dir).glob("*.sel"):
+            try:
+                cache_file.unlink()
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _enforce_file_limit(self):
+        """Delete the least recently written cache files beyond max_files"""
+        files = []
+        for cache_file in self._cache_dir.glob("*.sel"):
+            try:
+                files.append((cache_file.stat().st_mtime_ns, cache_file))
+            except OSError:
+                continue
+        files.sort(key=lambda item: item[0])
+        for _, cache_file in files[:max(0, len(files) - self._max_files)]:
+            self._remove(cache_file)
+
+    def __repr__(self) -> str:
+        return f"<SelectionCache dir={self._cache_dir} hits={self.hits} misses={self.misses}>"
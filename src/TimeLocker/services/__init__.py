@@ -6,6 +6,7 @@ and follow SOLID principles for better maintainability.
 """
 
 from .validation_service import ValidationService, ValidationError, ValidationResult
+from .repository_pool import RepositoryPool
 from .repository_factory import RepositoryFactory, repository_factory
 from .configuration_service import ConfigurationService
 from .backup_orchestrator import BackupOrchestrator
@@ -14,6 +15,7 @@ __all__ = [
         'ValidationService',
         'ValidationError',
         'ValidationResult',
+        'RepositoryPool',
         'RepositoryFactory',
         'repository_factory',
         'ConfigurationService',
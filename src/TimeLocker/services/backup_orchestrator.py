@@ -16,6 +16,9 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
 import logging
+import math
+import os
+import threading
 import time
 import uuid
 from typing import List, Dict, Any, Optional
@@ -29,10 +32,15 @@ from ..interfaces import (
     BackupResult,
     BackupOrchestratorError,
     InvalidBackupConfigurationError,
-    BackupExecutionError
+    BackupExecutionError,
+    BackupCancellationError
 )
-from ..backup_target import BackupTarget
+from ..backup_target import PARENT_AUTO, BackupTarget
+from ..restic.errors import BackupCancelledError
 from ..file_selections import FileSelection, SelectionType
+from ..scan_cache import ScanCache
+from ..selection_cache import SelectionCache
+from .repository_governor import LockGrant, LockMode, RepositoryGovernor, lock_mode_for
 from ..utils import (
     with_error_handling,
     with_retry,
@@ -56,7 +64,9 @@ class BackupOrchestrator(IBackupOrchestrator):
     def __init__(self,
                  repository_factory: IRepositoryFactory,
                  configuration_provider: IConfigurationProvider,
-                 max_concurrent_backups: int = 2):
+                 max_concurrent_backups: int = 2,
+                 selection_cache: Optional[SelectionCache] = None,
+                 governor: Optional[RepositoryGovernor] = None):
         """
         Initialize backup orchestrator.
         
@@ -64,16 +74,23 @@ class BackupOrchestrator(IBackupOrchestrator):
             repository_factory: Factory for creating repository instances
             configuration_provider: Provider for configuration access
             max_concurrent_backups: Maximum number of concurrent backup operations
+            selection_cache: Optional on-disk cache of compiled target selections
+            governor: Scheduler serializing operations that need a repository's
+                exclusive lock (shared by default only within this orchestrator)
         """
         self._repository_factory = repository_factory
         self._configuration_provider = configuration_provider
         self._max_concurrent_backups = max_concurrent_backups
+        self._selection_cache = selection_cache
+        self._governor = governor or RepositoryGovernor()
 
         # Track active backup operations
         self._active_backups: Dict[str, BackupResult] = {}
         self._backup_history: List[BackupResult] = []
         self._executor = ThreadPoolExecutor(max_workers=max_concurrent_backups)
         self._futures: Dict[str, Future] = {}
+        # Set to stop the restic process of a running backup (see cancel_backup)
+        self._cancel_events: Dict[str, threading.Event] = {}
 
         logger.debug(f"BackupOrchestrator initialized with max_concurrent_backups={max_concurrent_backups}")
 
@@ -84,7 +101,9 @@ class BackupOrchestrator(IBackupOrchestrator):
                        target_names: List[str],
                        tags: Optional[List[str]] = None,
                        dry_run: bool = False,
-                       password: Optional[str] = None) -> BackupResult:
+                       password: Optional[str] = None,
+                       stream_file_list: Optional[List[str]] = None,
+                       operation_id: Optional[str] = None) -> BackupResult:
         logger = logging.getLogger(__name__)
         logger.debug(f"execute_backup called with repository_name='{repository_name}', target_names={target_names}")
         """
@@ -96,6 +115,9 @@ class BackupOrchestrator(IBackupOrchestrator):
             tags: Optional tags to apply to backup
             dry_run: Whether to perform a dry run without actual backup
             password: Optional password for repository access
+            stream_file_list: Target names to back up from a precomputed file
+                list, in addition to targets configured with stream_file_list
+            operation_id: Identifier to track the operation under (generated if omitted)
 
         Returns:
             BackupResult with operation details
@@ -103,7 +125,7 @@ class BackupOrchestrator(IBackupOrchestrator):
         Raises:
             BackupOrchestratorError: If backup cannot be executed
         """
-        operation_id = str(uuid.uuid4())
+        operation_id = operation_id or str(uuid.uuid4())
 
         logger.debug(f"execute_backup received password: {'***' if password else 'None'}")
 
@@ -113,11 +135,13 @@ class BackupOrchestrator(IBackupOrchestrator):
                 repository_name=repository_name,
                 target_names=target_names.copy(),
                 start_time=time.time(),
-                metadata={'operation_id': operation_id, 'dry_run': dry_run, 'tags': tags or [], 'password': password}
+                metadata={'operation_id': operation_id, 'dry_run': dry_run, 'tags': tags or [], 'password': password,
+                          'stream_file_list': stream_file_list or []}
         )
 
         # Track the operation
         self._active_backups[operation_id] = backup_result
+        self._cancel_events[operation_id] = threading.Event()
 
         try:
             # Validate configuration before execution
@@ -166,6 +190,87 @@ class BackupOrchestrator(IBackupOrchestrator):
             # Remove from active backups
             if operation_id in self._active_backups:
                 del self._active_backups[operation_id]
+            self._cancel_events.pop(operation_id, None)
+
+    def submit_backup(self,
+                      repository_name: str,
+                      target_names: List[str],
+                      tags: Optional[List[str]] = None,
+                      dry_run: bool = False,
+                      password: Optional[str] = None,
+                      stream_file_list: Optional[List[str]] = None) -> str:
+        """
+        Queue a backup to run in the background.
+
+        The backup waits in its repository's queue until the repository lock
+        it needs is free, then runs on one of max_concurrent_backups worker
+        threads. Backups to one repository run side by side; they wait for
+        exclusive operations (e.g. verification) queued before them.
+
+        Args:
+            repository_name: Name of repository to backup to
+            target_names: Names of backup targets to include
+            tags: Optional tags to apply to backup
+            dry_run: Whether to perform a dry run without actual backup
+            password: Optional password for repository access
+            stream_file_list: Target names to back up from a precomputed file list
+
+        Returns:
+            Operation ID for cancel_backup and wait_for_backup
+        """
+        operation_id = str(uuid.uuid4())
+        mode = LockMode.NONE if dry_run else lock_mode_for("backup")
+
+        def _run(grant: LockGrant) -> BackupResult:
+            return self.execute_backup(repository_name, target_names, tags=tags, dry_run=dry_run, password=password,
+                                       stream_file_list=stream_file_list, operation_id=operation_id)
+
+        future = self._governor.submit(self._executor, self._repository_lock_key(repository_name), mode, _run)
+        self._futures[operation_id] = future
+        logger.debug(f"Queued backup operation {operation_id} for repository '{repository_name}'")
+        return operation_id
+
+    def wait_for_backup(self, operation_id: str, timeout: Optional[float] = None) -> Optional[BackupResult]:
+        """
+        Wait for a backup queued with submit_backup to finish.
+
+        Args:
+            operation_id: Operation ID returned by submit_backup
+            timeout: Seconds to wait (None waits indefinitely)
+
+        Returns:
+            BackupResult, or None if the operation is unknown or was
+            cancelled before it started
+
+        Raises:
+            concurrent.futures.TimeoutError: If the backup is still running after timeout
+            BackupExecutionError: If the backup raised
+        """
+        future = self._futures.get(operation_id)
+        if future is None:
+            return None
+        try:
+            if future.cancelled():
+                return None
+            return future.result(timeout)
+        finally:
+            if future.done():
+                self._futures.pop(operation_id, None)
+
+    def _repository_lock_key(self, repository_name: str) -> str:
+        """Identify a repository for locking by its URI, so aliases share one queue"""
+        try:
+            for repo_config in self._configuration_provider.get_repositories():
+                if repo_config['name'] == repository_name:
+                    return repo_config['uri']
+        except Exception as e:
+            logger.debug(f"Could not resolve URI of repository '{repository_name}': {e}")
+        return repository_name
+
+    @property
+    def repository_governor(self) -> RepositoryGovernor:
+        """Scheduler for operations on each repository, with lock-wait statistics"""
+        return self._governor
 
     def _execute_dry_run(self, backup_result: BackupResult) -> BackupResult:
         """Execute a dry run backup"""
@@ -187,27 +292,20 @@ class BackupOrchestrator(IBackupOrchestrator):
             # Get backup targets
             targets = self._get_backup_targets(backup_result.target_names)
 
-            # Simulate backup process
+            # Simulate backup process by streaming each target's selection
             total_files = 0
             total_bytes = 0
 
             for target in targets:
-                # Estimate files and size (simplified)
-                for path in target.paths:
-                    try:
-                        from pathlib import Path
-                        path_obj = Path(path)
-                        if path_obj.exists():
-                            if path_obj.is_file():
-                                total_files += 1
-                                total_bytes += path_obj.stat().st_size
-                            elif path_obj.is_dir():
-                                for file_path in path_obj.rglob('*'):
-                                    if file_path.is_file():
-                                        total_files += 1
-                                        total_bytes += file_path.stat().st_size
-                    except Exception as e:
-                        backup_result.warnings.append(f"Could not analyze path {path}: {e}")
+                try:
+                    for path_str, entry in target.selection.iter_effective_entries():
+                        try:
+                            total_bytes += entry.stat().st_size if entry is not None else os.stat(path_str).st_size
+                        except OSError:
+                            continue
+                        total_files += 1
+                except Exception as e:
+                    backup_result.warnings.append(f"Could not analyze target {target.name}: {e}")
 
             backup_result.files_processed = total_files
             backup_result.bytes_processed = total_bytes
@@ -252,17 +350,53 @@ class BackupOrchestrator(IBackupOrchestrator):
             # Get backup targets
             targets = self._get_backup_targets(backup_result.target_names)
 
+            # Targets may also opt into a precomputed file list for this run only
+            for target in targets:
+                if target.name in backup_result.metadata.get('stream_file_list', []):
+                    target.stream_file_list = True
+
+            cancel_event = self._cancel_events.get(backup_result.metadata.get('operation_id'))
+
+            def _on_progress(status: Dict[str, Any]):
+                backup_result.files_processed = status.get('files_done', backup_result.files_processed)
+                backup_result.bytes_processed = status.get('bytes_done', backup_result.bytes_processed)
+
             # Execute backup with retry
             @with_retry(max_retries=3, delay=1.0, backoff_multiplier=2.0)
             def _perform_backup():
-                return repository.backup_target(targets, backup_result.metadata.get('tags', []))
-
-            result = _perform_backup()
-
-            if result and 'snapshot_id' in result:
+                try:
+                    return repository.backup_target(targets, backup_result.metadata.get('tags', []),
+                                                    progress_callback=_on_progress, cancel_event=cancel_event)
+                except BackupCancelledError:
+                    # A cancelled backup must not be retried
+                    return None
+
+            try:
+                with self._governor.acquire(repo_config['uri'], lock_mode_for("backup"), cancel_event) as grant:
+                    self._record_lock_wait(backup_result, grant)
+                    result = _perform_backup()
+            except BackupCancellationError:
+                # Cancelled while queued behind another operation's repository lock
+                result = None
+
+            if result is None and cancel_event is not None and cancel_event.is_set():
+                backup_result.status = BackupStatus.CANCELLED
+                backup_result.warnings.append("Backup cancelled; no snapshot was created")
+                logger.info(f"Backup cancelled for repository: {backup_result.repository_name}")
+            elif result and 'snapshot_id' in result:
                 backup_result.snapshot_id = result['snapshot_id']
-                backup_result.files_processed = result.get('files_processed', 0)
-                backup_result.bytes_processed = result.get('bytes_processed', 0)
+                # restic's summary totals, else the last progress event's counts
+                backup_result.files_processed = result.get('files_processed',
+                                                           result.get('total_files_processed',
+                                                                      backup_result.files_processed))
+                backup_result.bytes_processed = result.get('bytes_processed',
+                                                           result.get('total_bytes_processed',
+                                                                      backup_result.bytes_processed))
+                if 'file_list' in result:
+                    # Streamed targets were counted during the same pass that fed restic
+                    backup_result.metadata['file_list'] = result['file_list']
+                    backup_result.files_processed = backup_result.files_processed or result['file_list']['file_count']
+                    backup_result.bytes_processed = backup_result.bytes_processed or result['file_list']['total_size']
                 backup_result.status = BackupStatus.COMPLETED
 
                 logger.info(f"Backup completed successfully: {backup_result.snapshot_id}")
@@ -277,6 +411,16 @@ class BackupOrchestrator(IBackupOrchestrator):
 
         return backup_result
 
+    @staticmethod
+    def _record_lock_wait(backup_result: BackupResult, grant: LockGrant) -> None:
+        """Record how long an operation waited for its repository lock"""
+        backup_result.metadata['lock_wait_seconds'] = grant.wait_seconds
+        update_operation_tracking(backup_result.metadata.get('operation_id'),
+                                  metadata={'lock_wait_seconds': grant.wait_seconds})
+        if grant.wait_seconds > 0.001:
+            logger.info(f"Waited {grant.wait_seconds:.2f}s for the {grant.mode.value} lock on "
+                        f"repository '{backup_result.repository_name}'")
+
     def _get_backup_targets(self, target_names: List[str]) -> List[BackupTarget]:
         """Get backup target instances from configuration"""
         targets = []
@@ -296,24 +440,10 @@ class BackupOrchestrator(IBackupOrchestrator):
             if not target_config:
                 raise InvalidBackupConfigurationError(f"Backup target '{target_name}' not found")
 
-            # Create FileSelection from target configuration
-            selection = FileSelection()
-
-            logger.debug(f"Creating FileSelection for target '{target_name}'")
-            logger.debug(f"Target config paths: {target_config.get('paths', [])}")
-
-            # Add paths to selection
-            for path in target_config['paths']:
-                selection.add_path(path, SelectionType.INCLUDE)
-                logger.debug(f"Added path to selection: {path}")
-
-            # Add exclude patterns
-            for pattern in target_config.get('exclude_patterns', []):
-                selection.add_pattern(pattern, SelectionType.EXCLUDE)
-
-            # Add include patterns
-            for pattern in target_config.get('include_patterns', []):
-                selection.add_pattern(pattern, SelectionType.INCLUDE)
+            if self._selection_cache is not None:
+                selection = self._selection_cache.get_or_build(target_config, self._build_selection)
+            else:
+                selection = self._build_selection(target_config)
 
             logger.debug("FileSelection created, about to create BackupTarget")
             logger.debug(f"selection object: {selection}")
@@ -322,7 +452,9 @@ class BackupOrchestrator(IBackupOrchestrator):
             target = BackupTarget(
                     selection=selection,
                     name=target_config['name'],
-                    tags=target_config.get('tags', [])
+                    tags=target_config.get('tags', []),
+                    stream_file_list=bool(target_config.get('stream_file_list', False)),
+                    parent=target_config.get('parent') or PARENT_AUTO
             )
 
             logger.debug(f"BackupTarget created successfully for '{target_name}'")
@@ -331,6 +463,34 @@ class BackupOrchestrator(IBackupOrchestrator):
 
         return targets
 
+    @staticmethod
+    def _build_selection(target_config: Dict[str, Any]) -> FileSelection:
+        """Create a FileSelection from a backup target configuration"""
+        selection = FileSelection()
+
+        logger.debug(f"Creating FileSelection for target '{target_config.get('name')}'")
+        logger.debug(f"Target config paths: {target_config.get('paths', [])}")
+
+        # Add paths to selection
+        for path in target_config['paths']:
+            selection.add_path(path, SelectionType.INCLUDE)
+            logger.debug(f"Added path to selection: {path}")
+
+        # Add exclude patterns
+        for pattern in target_config.get('exclude_patterns', []):
+            selection.add_pattern(pattern, SelectionType.EXCLUDE)
+
+        # Add include patterns
+        for pattern in target_config.get('include_patterns', []):
+            selection.add_pattern(pattern, SelectionType.INCLUDE)
+
+        # File system rules
+        selection.one_file_system = target_config.get('one_file_system', False)
+        selection.exclude_caches = target_config.get('exclude_caches', False)
+        selection.exclude_larger_than = target_config.get('exclude_larger_than')
+
+        return selection
+
     def execute_scheduled_backups(self) -> List[BackupResult]:
         """
         Execute all scheduled backup operations.
@@ -396,12 +556,23 @@ class BackupOrchestrator(IBackupOrchestrator):
         """
         Cancel a running backup operation.
         
+        A backup whose restic process is running is stopped by signalling
+        restic (see StreamingBackupRunner.cancel); no snapshot is created.
+
         Args:
             operation_id: Unique identifier for backup operation
             
         Returns:
             True if backup was cancelled, False if not found or not running
         """
+        cancel_event = self._cancel_events.get(operation_id)
+        backup_result = self._active_backups.get(operation_id)
+        if cancel_event is not None and backup_result is not None and not cancel_event.is_set():
+            cancel_event.set()
+            backup_result.status = BackupStatus.CANCELLED
+            logger.info(f"Cancelling backup operation: {operation_id}")
+            return True
+
         if operation_id in self._futures:
             future = self._futures[operation_id]
             if not future.done():
@@ -449,26 +620,86 @@ class BackupOrchestrator(IBackupOrchestrator):
         history = sorted(history, key=lambda x: x.start_time or 0, reverse=True)
         return history[:limit]
 
+    @profile_operation("estimate_backup_size")
     def estimate_backup_size(self,
                              repository_name: str,
-                             target_names: List[str]) -> Dict[str, Any]:
+                             target_names: List[str],
+                             max_workers: int = 1,
+                             use_scan_cache: bool = False,
+                             sample_seconds: Optional[float] = None) -> Dict[str, Any]:
         """
         Estimate backup size and duration.
         
         Args:
             repository_name: Name of repository
             target_names: Names of backup targets
+            max_workers: Number of scanner threads per target (1 scans serially)
+            use_scan_cache: Reuse and update the persistent per-directory scan cache
+            sample_seconds: Approximate each target by sampling for this many
+                seconds instead of scanning it fully; adds error bounds
             
         Returns:
             Dictionary with size and time estimates
         """
-        # This would analyze the targets and provide estimates
-        # For now, return placeholder data
-        return {
+        start_time = time.time()
+        targets = self._get_backup_targets(target_names)
+
+        estimate = {
                 'estimated_files':            0,
                 'estimated_bytes':            0,
-                'estimated_duration_seconds': 0
+                'estimated_apparent_bytes':   0,
+                'estimated_allocated_bytes':  0,
+                'estimated_directories':      0,
+                'estimated_duration_seconds': 0,
+                'targets':                    {}
         }
+        files_variance = bytes_variance = 0.0
+
+        for target in targets:
+            if sample_seconds is not None:
+                # Split the budget evenly across targets
+                stats = target.selection.sample_backup_size(time_budget=sample_seconds / len(targets))
+                files_variance += stats['file_count_error'] ** 2
+                bytes_variance += stats['total_size_error'] ** 2
+            else:
+                scan_cache = ScanCache(target.selection.scan_fingerprint()) if use_scan_cache else None
+                stats = target.selection.estimate_backup_size(max_workers=max_workers, scan_cache=scan_cache)
+                if scan_cache is not None:
+                    stats['cached_directories'] = scan_cache.hits
+            estimate['targets'][target.name] = stats
+            estimate['estimated_files'] += stats['file_count']
+            estimate['estimated_bytes'] += stats['total_size']
+            estimate['estimated_apparent_bytes'] += stats['apparent_size']
+            estimate['estimated_allocated_bytes'] += stats['allocated_size']
+            estimate['estimated_directories'] += stats['directory_count']
+
+        if sample_seconds is not None:
+            # Targets are sampled independently, so their error bounds add in quadrature
+            estimate['estimated_files_error'] = round(math.sqrt(files_variance))
+            estimate['estimated_bytes_error'] = round(math.sqrt(bytes_variance))
+            estimate['sampled'] = True
+
+        estimate['scan_duration_seconds'] = time.time() - start_time
+        logger.info(f"Estimated {estimate['estimated_files']} files, {estimate['estimated_bytes']} bytes "
+                    f"for {len(targets)} target(s) in {estimate['scan_duration_seconds']:.2f}s")
+        return estimate
+
+    def analyze_target_patterns(self, target_name: str) -> Dict[str, Any]:
+        """
+        Profile how a backup target's patterns match its files.
+
+        Args:
+            target_name: Name of backup target
+
+        Returns:
+            Dictionary from PatternProfile.to_dict plus 'target'
+        """
+        target = self._get_backup_targets([target_name])[0]
+        analysis = target.selection.profile_patterns().to_dict()
+        analysis['target'] = target_name
+        logger.info(f"Profiled {len(analysis['patterns'])} pattern(s) of target '{target_name}' over "
+                    f"{analysis['files_evaluated']} file(s)")
+        return analysis
 
     def verify_backup_integrity(self,
                                 repository_name: str,
@@ -506,9 +737,10 @@ class BackupOrchestrator(IBackupOrchestrator):
             # Create repository instance directly from URI
             repository = self._repository_factory.create_repository(repository_uri, repository_name=repository_name)
 
-            # Verify backup
+            # Verify backup; restic check needs the repository to itself
             if hasattr(repository, 'verify_backup'):
-                return repository.verify_backup(snapshot_id)
+                with self._governor.acquire(repository_uri, lock_mode_for("check")):
+                    return repository.verify_backup(snapshot_id)
             else:
                 logger.warning(f"Repository {repository.__class__.__name__} does not support verification")
                 return True
@@ -22,6 +22,7 @@ from urllib.parse import urlparse
 from ..interfaces import IRepositoryFactory, RepositoryFactoryError, UnsupportedSchemeError
 from ..backup_repository import BackupRepository
 from . import ValidationService
+from .repository_pool import DEFAULT_POOL_SIZE, RepositoryPool, make_pool_key
 from ..utils import with_error_handling, ErrorContext
 
 logger = logging.getLogger(__name__)
@@ -34,18 +35,25 @@ class RepositoryFactory(IRepositoryFactory):
     This factory supports the Open/Closed Principle by allowing new repository
     types to be registered without modifying existing code, and follows the
     Single Responsibility Principle by focusing solely on repository creation.
+
+    Created repositories are pooled per URI, repository name and credential
+    identity, so repeated requests for the same repository share one warm
+    instance instead of re-checking restic and rebuilding its environment.
     """
 
-    def __init__(self, validation_service: Optional[ValidationService] = None):
+    def __init__(self, validation_service: Optional[ValidationService] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE):
         """
         Initialize repository factory.
 
         Args:
             validation_service: Optional validation service for URI validation
+            pool_size: Number of repository instances kept for reuse (0 disables pooling)
         """
         self._repository_types: Dict[str, Type[BackupRepository]] = {}
         self._validation_service = validation_service or ValidationService()
         self._credential_manager = None  # Lazy-loaded credential manager
+        self._pool = RepositoryPool(pool_size)
         self._register_default_types()
         logger.debug("RepositoryFactory initialized")
 
@@ -135,6 +143,10 @@ class RepositoryFactory(IRepositoryFactory):
         """
         Create a repository instance from URI.
 
+        An instance created earlier for the same URI, repository name,
+        options and credentials is returned instead of a new one while it is
+        pooled; see invalidate_repository.
+
         Args:
             uri: Repository URI
             password: Optional password for repository
@@ -169,34 +181,64 @@ class RepositoryFactory(IRepositoryFactory):
         # Get repository class and create instance
         repository_class = self._repository_types[scheme]
 
-        try:
-            # Create repository instance with appropriate parameters
-            logger.debug(f"Repository factory received password: {'***' if password else 'None'}")
-            if password:
-                kwargs['password'] = password
-                logger.debug("Password added to kwargs")
+        logger.debug(f"Repository factory received password: {'***' if password else 'None'}")
+        if password:
+            kwargs['password'] = password
+            logger.debug("Password added to kwargs")
 
-            # Provide credential manager to repository
+        # Provide credential manager to repository
+        try:
             kwargs['credential_manager'] = self._get_credential_manager()
-            logger.debug("Credential manager added to kwargs")
-
-            # Pass repository_name if provided (for per-repository credential lookup)
-            if 'repository_name' in kwargs:
-                logger.debug(f"Repository name provided for credential lookup: {kwargs['repository_name']}")
-
-            # Use from_parsed_uri class method if available, otherwise fall back to constructor
-            if hasattr(repository_class, 'from_parsed_uri'):
-                logger.debug(f"Using from_parsed_uri with kwargs: {list(kwargs.keys())}")
-                repository = repository_class.from_parsed_uri(parsed, **kwargs)
-            else:
-                logger.debug(f"Using constructor with kwargs: {list(kwargs.keys())}")
-                repository = repository_class(uri, **kwargs)
+        except Exception as e:
+            raise RepositoryFactoryError(f"Failed to create repository: {e}") from e
+        logger.debug("Credential manager added to kwargs")
+
+        # Pass repository_name if provided (for per-repository credential lookup)
+        if 'repository_name' in kwargs:
+            logger.debug(f"Repository name provided for credential lookup: {kwargs['repository_name']}")
+
+        options = {k: v for k, v in kwargs.items() if k not in ('password', 'credential_manager')}
+        pool_key = make_pool_key(repository_class, uri, password or None, kwargs['credential_manager'], options)
+
+        def build() -> BackupRepository:
+            try:
+                # Use from_parsed_uri class method if available, otherwise fall back to constructor
+                if hasattr(repository_class, 'from_parsed_uri'):
+                    logger.debug(f"Using from_parsed_uri with kwargs: {list(kwargs.keys())}")
+                    repository = repository_class.from_parsed_uri(parsed, **kwargs)
+                else:
+                    logger.debug(f"Using constructor with kwargs: {list(kwargs.keys())}")
+                    repository = repository_class(uri, **kwargs)
+            except Exception as e:
+                raise RepositoryFactoryError(f"Failed to create repository: {e}") from e
 
             logger.info(f"Created {repository_class.__name__} for URI: {uri}")
             return repository
 
-        except Exception as e:
-            raise RepositoryFactoryError(f"Failed to create repository: {e}") from e
+        return self._pool.get_or_create(pool_key, build)
+
+    def invalidate_repository(self, uri: Optional[str] = None, repository_name: Optional[str] = None) -> int:
+        """
+        Drop pooled instances after a repository's configuration or credentials change.
+
+        Args:
+            uri: Repository URI whose instances to drop
+            repository_name: Repository name whose instances to drop
+                             (with neither given, the whole pool is cleared)
+
+        Returns:
+            Number of instances dropped
+        """
+        return self._pool.invalidate(uri=uri, repository_name=repository_name)
+
+    def clear_repository_pool(self) -> None:
+        """Drop every pooled repository instance."""
+        self._pool.clear()
+
+    @property
+    def repository_pool(self) -> RepositoryPool:
+        """Pool of created repository instances."""
+        return self._pool
 
     def get_supported_schemes(self) -> List[str]:
         """
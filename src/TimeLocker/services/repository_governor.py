@@ -0,0 +1,355 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from ..interfaces import BackupCancellationError
+
+logger = logging.getLogger(__name__)
+
+
+class LockMode(Enum):
+    """Repository lock a restic command takes"""
+    NONE = "none"
+    SHARED = "shared"
+    EXCLUSIVE = "exclusive"
+
+
+# Lock taken by each restic command; commands not listed are treated as exclusive
+RESTIC_LOCK_MODES: Dict[str, LockMode] = {
+        "backup":        LockMode.SHARED,
+        "cat":           LockMode.SHARED,
+        "check":         LockMode.EXCLUSIVE,
+        "copy":          LockMode.SHARED,
+        "diff":          LockMode.SHARED,
+        "dump":          LockMode.SHARED,
+        "find":          LockMode.SHARED,
+        "forget":        LockMode.EXCLUSIVE,
+        "init":          LockMode.NONE,
+        "list":          LockMode.SHARED,
+        "ls":            LockMode.SHARED,
+        "migrate":       LockMode.EXCLUSIVE,
+        "mount":         LockMode.SHARED,
+        "prune":         LockMode.EXCLUSIVE,
+        "rebuild-index": LockMode.EXCLUSIVE,
+        "recover":       LockMode.SHARED,
+        "repair":        LockMode.EXCLUSIVE,
+        "restore":       LockMode.SHARED,
+        "snapshots":     LockMode.SHARED,
+        "stats":         LockMode.SHARED,
+        "tag":           LockMode.EXCLUSIVE,
+        "unlock":        LockMode.NONE,
+        "version":       LockMode.NONE,
+}
+
+
+def lock_mode_for(command: str) -> LockMode:
+    """
+    Look up the repository lock a restic command takes
+
+    Args:
+        command: restic command name (e.g. "backup", "prune")
+
+    Returns:
+        LockMode for the command, EXCLUSIVE if it is unknown
+    """
+    return RESTIC_LOCK_MODES.get(command, LockMode.EXCLUSIVE)
+
+
+@dataclass
+class LockGrant:
+    """A granted repository lock and how long it was waited for"""
+    repository: str
+    mode: LockMode
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class _Ticket:
+    mode: LockMode
+    enqueued_at: float
+    on_grant: Optional[Callable[['LockGrant'], None]] = None  # queued jobs; None for blocking callers
+    grant: Optional[LockGrant] = None
+
+
+@dataclass
+class _RepositoryState:
+    shared: int = 0
+    exclusive: bool = False
+    queue: Deque[_Ticket] = field(default_factory=deque)
+    acquisitions: int = 0
+    contended: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class RepositoryGovernor:
+    """
+    Per-repository scheduler for restic operations.
+
+    restic lets any number of shared-lock commands (backup, restore,
+    snapshots) run against a repository together, but an exclusive-lock
+    command (prune, forget, check) needs the repository to itself. Started
+    blindly, such operations fail on restic's lock or spin in its retry
+    loop. The governor queues requests per repository in arrival order and
+    grants them as the locks allow: consecutive shared requests run side by
+    side, an exclusive request waits for running ones to finish, and
+    nothing queued behind an exclusive request overtakes it. Repositories
+    are independent.
+
+    Blocking callers use acquire(); submit() queues a job and hands it to
+    an executor only once its lock is granted, so queued jobs do not tie up
+    worker threads. A thread already holding a repository's lock may
+    acquire it again without queueing. The time each request waited is
+    kept per repository (see statistics()).
+    """
+
+    def __init__(self, max_shared: Optional[int] = None):
+        """
+        Initialize the governor
+
+        Args:
+            max_shared: Most shared-lock operations run at once per
+                repository (None for no limit)
+        """
+        self.max_shared = max_shared
+        self._states: Dict[str, _RepositoryState] = {}
+        self._condition = threading.Condition()
+        self._held = threading.local()
+
+    def _state(self, repository: str) -> _RepositoryState:
+        state = self._states.get(repository)
+        if state is None:
+            state = self._states[repository] = _RepositoryState()
+        return state
+
+    def _held_grants(self) -> Dict[str, LockGrant]:
+        held = getattr(self._held, "grants", None)
+        if held is None:
+            held = self._held.grants = {}
+        return held
+
+    def _dispatch(self, repository: str, state: _RepositoryState) -> List[_Ticket]:
+        """Grant queued requests in order while they are compatible (caller holds the lock)"""
+        granted = []
+        while state.queue:
+            ticket = state.queue[0]
+            if ticket.mode is LockMode.EXCLUSIVE:
+                if state.exclusive or state.shared:
+                    break
+                state.exclusive = True
+            else:
+                if state.exclusive or (self.max_shared is not None and state.shared >= self.max_shared):
+                    break
+                state.shared += 1
+            state.queue.popleft()
+
+            wait = time.monotonic() - ticket.enqueued_at
+            ticket.grant = LockGrant(repository, ticket.mode, wait)
+            state.acquisitions += 1
+            state.total_wait += wait
+            state.max_wait = max(state.max_wait, wait)
+            if wait > 0.001:
+                state.contended += 1
+            granted.append(ticket)
+        if granted:
+            self._condition.notify_all()
+        return granted
+
+    def _enqueue(self, repository: str, ticket: _Ticket) -> List[_Ticket]:
+        state = self._state(repository)
+        state.queue.append(ticket)
+        return self._dispatch(repository, state)
+
+    def _start_jobs(self, tickets: List[_Ticket]) -> None:
+        """Run the grant callbacks of queued jobs (outside the lock)"""
+        for ticket in tickets:
+            if ticket.on_grant is not None:
+                ticket.on_grant(ticket.grant)
+
+    def release(self, grant: LockGrant) -> None:
+        """
+        Release a granted lock and start whatever it was holding up
+
+        Args:
+            grant: Grant returned by acquire() or passed to a submitted job
+        """
+        if grant.mode is LockMode.NONE:
+            return
+        with self._condition:
+            state = self._states[grant.repository]
+            if grant.mode is LockMode.EXCLUSIVE:
+                state.exclusive = False
+            else:
+                state.shared -= 1
+            started = self._dispatch(grant.repository, state)
+        self._start_jobs(started)
+
+    @contextmanager
+    def acquire(self, repository: str, mode: LockMode,
+                cancel_event: Optional[threading.Event] = None) -> Iterator[LockGrant]:
+        """
+        Hold a repository lock for the duration of the block
+
+        Args:
+            repository: Repository identity (e.g. its URI)
+            mode: Lock the operation needs
+            cancel_event: Stops waiting for the lock when set
+
+        Yields:
+            LockGrant with the time spent waiting
+
+        Raises:
+            BackupCancellationError: If cancel_event was set before the lock was granted
+            RuntimeError: If the thread holds a shared lock and asks for an exclusive one
+        """
+        held = self._held_grants().get(repository)
+        if held is not None:
+            if mode is LockMode.EXCLUSIVE and held.mode is not LockMode.EXCLUSIVE:
+                raise RuntimeError(f"Cannot upgrade a shared lock on {repository} to exclusive")
+            yield held
+            return
+        if mode is LockMode.NONE:
+            yield LockGrant(repository, mode)
+            return
+
+        ticket = _Ticket(mode, time.monotonic())
+        with self._condition:
+            started = self._enqueue(repository, ticket)
+        self._start_jobs(started)
+
+        with self._condition:
+            while ticket.grant is None:
+                if cancel_event is not None and cancel_event.is_set():
+                    state = self._states[repository]
+                    state.queue.remove(ticket)
+                    # Requests queued behind this one may be grantable now
+                    started = self._dispatch(repository, state)
+                    break
+                self._condition.wait(0.1 if cancel_event is not None else None)
+        if ticket.grant is None:
+            self._start_jobs(started)
+            raise BackupCancellationError(f"Cancelled while waiting for the {mode.value} lock on {repository}")
+
+        if ticket.grant.wait_seconds > 0.001:
+            logger.debug(f"Waited {ticket.grant.wait_seconds:.3f}s for {mode.value} lock on {repository}")
+        self._held_grants()[repository] = ticket.grant
+        try:
+            yield ticket.grant
+        finally:
+            del self._held_grants()[repository]
+            self.release(ticket.grant)
+
+    def submit(self, executor: Executor, repository: str, mode: LockMode,
+               fn: Callable[[LockGrant], Any]) -> Future:
+        """
+        Queue a job that runs on executor once its repository lock is granted
+
+        The returned future stays pending while the job is queued and can be
+        cancelled until then, which takes it out of the queue.
+
+        Args:
+            executor: Executor to run the job on
+            repository: Repository identity (e.g. its URI)
+            mode: Lock the job needs
+            fn: Job; called with its LockGrant, which the job's thread holds
+                (nested acquire() calls for the repository do not queue again)
+
+        Returns:
+            Future resolving to fn's result
+        """
+        future: Future = Future()
+
+        def run(grant: LockGrant) -> None:
+            held = self._held_grants()
+            held[repository] = grant
+            try:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    result = fn(grant)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            finally:
+                del held[repository]
+                self.release(grant)
+
+        def start(grant: LockGrant) -> None:
+            try:
+                executor.submit(run, grant)
+            except RuntimeError as e:  # executor shut down
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+                self.release(grant)
+
+        if mode is LockMode.NONE:
+            start(LockGrant(repository, mode))
+            return future
+
+        ticket = _Ticket(mode, time.monotonic(), on_grant=start)
+
+        def withdraw_if_cancelled(done: Future) -> None:
+            if not done.cancelled():
+                return
+            with self._condition:
+                state = self._states[repository]
+                if ticket not in state.queue:
+                    return  # Already granted; run() sees the cancellation and releases
+                state.queue.remove(ticket)
+                started = self._dispatch(repository, state)
+            self._start_jobs(started)
+
+        future.add_done_callback(withdraw_if_cancelled)
+        with self._condition:
+            started = self._enqueue(repository, ticket)
+        self._start_jobs(started)
+        return future
+
+    def statistics(self, repository: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Lock usage and lock-wait figures
+
+        Args:
+            repository: Repository to report on (all repositories if None)
+
+        Returns:
+            Dict of figures for one repository, or a dict of them keyed by repository
+        """
+        with self._condition:
+            if repository is None:
+                return {name: self.statistics(name) for name in self._states}
+            state = self._states.get(repository) or _RepositoryState()
+            return {
+                    "acquisitions":       state.acquisitions,
+                    "contended":          state.contended,
+                    "total_wait_seconds": state.total_wait,
+                    "max_wait_seconds":   state.max_wait,
+                    "mean_wait_seconds":  state.total_wait / state.acquisitions if state.acquisitions else 0.0,
+                    "queued":             len(state.queue),
+                    "shared_holders":     state.shared,
+                    "exclusive_held":     state.exclusive,
+            }
@@ -0,0 +1,215 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from ..backup_repository import BackupRepository
+
+logger = logging.getLogger(__name__)
+
+# Distinct repositories kept warm per factory; a CLI run or a scheduled batch rarely touches more
+DEFAULT_POOL_SIZE = 32
+
+# Environment variables repositories may take credentials from (restic password, S3 and B2 keys)
+CREDENTIAL_ENV_PREFIXES = ("RESTIC_", "AWS_", "B2_")
+
+
+class PoolKey(NamedTuple):
+    """What a pooled repository instance was built from"""
+    repository_class: type
+    uri: str
+    repository_name: Optional[str]
+    credentials: str  # digest of everything the instance may take credentials from
+    options: Tuple[Tuple[str, Hashable], ...]
+
+
+def credential_identity(password: Optional[str], credential_manager: Any = None) -> str:
+    """
+    Digest the credential sources a repository instance reads
+
+    Covers the explicit password, which credential manager instance is used
+    and how many times its store has been written, and the credential
+    variables in the environment, so a repository built before any of them
+    changed is never handed out afterwards. Only the digest is kept, never
+    the password itself.
+
+    Args:
+        password: Explicit repository password, if any
+        credential_manager: Credential manager given to the repository
+
+    Returns:
+        str: Hex digest identifying the credentials
+    """
+    digest = hashlib.sha256()
+    digest.update(b"\0" if password is None else b"\1" + password.encode("utf-8", "surrogatepass"))
+    if credential_manager is not None:
+        revision = getattr(credential_manager, "revision", 0)
+        digest.update(f"\0{id(credential_manager)}:{revision if isinstance(revision, int) else 0}".encode())
+    for name in sorted(os.environ):
+        if name.startswith(CREDENTIAL_ENV_PREFIXES):
+            digest.update(f"\0{name}={os.environ[name]}".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def make_pool_key(repository_class: type, uri: str, password: Optional[str], credential_manager: Any,
+                  options: Dict[str, Any]) -> Optional[PoolKey]:
+    """
+    Build the pool key for a repository request
+
+    Args:
+        repository_class: Class the factory will instantiate
+        uri: Repository URI as given
+        password: Explicit password, if any
+        credential_manager: Credential manager given to the repository
+        options: Remaining constructor keyword arguments (repository_name included)
+
+    Returns:
+        PoolKey, or None if an option cannot be compared reliably, in which
+        case the request should bypass the pool
+    """
+    frozen = []
+    for name, value in sorted(options.items()):
+        if name == "repository_name":
+            continue
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        try:
+            hash(value)
+        except TypeError:
+            return None
+        frozen.append((name, value))
+    return PoolKey(repository_class, uri, options.get("repository_name"),
+                   credential_identity(password, credential_manager), tuple(frozen))
+
+
+class RepositoryPool:
+    """
+    Least-recently-used pool of constructed repository instances.
+
+    Building a repository checks restic, validates the location, derives
+    the repository ID and, on first use, assembles the restic environment
+    with a credential lookup. Instances are kept per PoolKey so later
+    requests for the same repository with the same credentials get the
+    warm instance back. Construction of one key is serialized, so
+    concurrent callers build it once and share it; different keys build in
+    parallel. Entries are dropped in LRU order beyond max_size and on
+    invalidate(); an instance being built while it is invalidated is
+    returned to its caller but not kept.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE):
+        """
+        Initialize the pool
+
+        Args:
+            max_size: Number of instances kept; 0 disables pooling
+        """
+        self.max_size = max(0, max_size)
+        self._entries: "OrderedDict[PoolKey, BackupRepository]" = OrderedDict()
+        self._building: Dict[PoolKey, threading.Lock] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _lookup(self, key: PoolKey) -> Optional[BackupRepository]:
+        """Return a pooled instance and mark it recently used (caller holds the lock)"""
+        repository = self._entries.get(key)
+        if repository is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return repository
+
+    def get_or_create(self, key: Optional[PoolKey], create: Callable[[], BackupRepository]) -> BackupRepository:
+        """
+        Return the pooled instance for key, building it with create on a miss
+
+        Args:
+            key: Pool key, or None to always build a fresh, unpooled instance
+            create: Builds the repository; exceptions propagate and nothing is pooled
+
+        Returns:
+            BackupRepository instance
+        """
+        if key is None or self.max_size == 0:
+            return create()
+
+        with self._lock:
+            repository = self._lookup(key)
+            if repository is not None:
+                return repository
+            key_lock = self._building.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                repository = self._lookup(key)
+                if repository is not None:
+                    return repository
+                self.misses += 1
+                generation = self._generation
+            try:
+                repository = create()
+            finally:
+                with self._lock:
+                    if self._building.get(key) is key_lock:
+                        del self._building[key]
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = repository
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            return repository
+
+    def invalidate(self, uri: Optional[str] = None, repository_name: Optional[str] = None) -> int:
+        """
+        Drop pooled instances for a repository, or all of them
+
+        Args:
+            uri: Drop instances built for this URI
+            repository_name: Drop instances built under this repository name
+
+        Returns:
+            int: Number of instances dropped
+        """
+        with self._lock:
+            self._generation += 1
+            if uri is None and repository_name is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key in self._entries
+                         if (uri is not None and key.uri == uri)
+                         or (repository_name is not None and key.repository_name == repository_name)]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} pooled repository instance(s)")
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every pooled instance"""
+        self.invalidate()
@@ -75,7 +75,7 @@ class SnapshotService(ISnapshotService):
                         timestamp=snapshot.timestamp,
                         paths=snapshot.paths,
                         tags=getattr(snapshot, 'tags', []),
-                        hostname=getattr(snapshot, 'hostname', 'unknown'),
+                        hostname=getattr(snapshot, 'hostname', None) or 'unknown',
                         username=getattr(snapshot, 'username', 'unknown'),
                         size=stats.get('total_size', 0),
                         file_count=stats.get('file_count', 0),
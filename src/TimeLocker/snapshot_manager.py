@@ -15,6 +15,7 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import copy
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Optional, Dict, Any, Callable
@@ -22,7 +23,8 @@ import logging
 
 from .backup_repository import BackupRepository
 from .backup_snapshot import BackupSnapshot
-from .recovery_errors import SnapshotNotFoundError, RecoveryError
+from .recovery_errors import AmbiguousSnapshotIdError, SnapshotNotFoundError, RecoveryError
+from .snapshot_query_index import SnapshotQueryIndex
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,7 @@ class SnapshotFilter:
 
     def __init__(self):
         self.tags: Optional[List[str]] = None
+        self.hosts: Optional[List[str]] = None
         self.date_from: Optional[datetime] = None
         self.date_to: Optional[datetime] = None
         self.paths: Optional[List[Path]] = None
@@ -42,6 +45,11 @@ class SnapshotFilter:
         self.tags = tags
         return self
 
+    def with_hosts(self, hosts: List[str]) -> 'SnapshotFilter':
+        """Filter by the hosts snapshots were taken on"""
+        self.hosts = hosts
+        return self
+
     def with_date_range(self, date_from: Optional[datetime] = None,
                         date_to: Optional[datetime] = None) -> 'SnapshotFilter':
         """Filter by date range"""
@@ -61,19 +69,36 @@ class SnapshotFilter:
 
 
 class SnapshotManager:
-    """Manages snapshot listing, filtering, and selection operations"""
+    """
+    Manages snapshot listing, filtering, and selection operations
 
-    def __init__(self, repository: BackupRepository):
+    ID lookups and filtered listings are answered from a
+    SnapshotQueryIndex over the cached listing. The index is built on
+    first use after each refresh, so listing without filters never pays
+    for it. With use_catalog, both are answered in SQL from the
+    repository's persistent snapshot catalog instead.
+    """
+
+    def __init__(self, repository: BackupRepository, use_catalog: bool = False):
         """
         Initialize SnapshotManager
         
         Args:
             repository: BackupRepository instance to work with
+            use_catalog: List and look up snapshots through the repository's
+                persistent snapshot catalog, filtering in SQL
+
+        Raises:
+            ValueError: If use_catalog is set for a repository without a catalog
         """
+        if use_catalog and not getattr(repository, 'has_snapshot_catalog', False):
+            raise ValueError(f"{type(repository).__name__} has no snapshot catalog")
         self.repository = repository
+        self._use_catalog = use_catalog
         self._cached_snapshots: Optional[List[BackupSnapshot]] = None
         self._cache_timestamp: Optional[datetime] = None
         self._cache_ttl = timedelta(minutes=5)  # Cache for 5 minutes
+        self._index: Optional[SnapshotQueryIndex] = None
 
     def list_snapshots(self, filter_criteria: Optional[SnapshotFilter] = None,
                        force_refresh: bool = False) -> List[BackupSnapshot]:
@@ -91,21 +116,14 @@ class SnapshotManager:
             RecoveryError: If unable to retrieve snapshots
         """
         try:
-            # Check cache validity
-            if (not force_refresh and self._cached_snapshots is not None and
-                    self._cache_timestamp is not None and
-                    datetime.now() - self._cache_timestamp < self._cache_ttl):
-                snapshots = self._cached_snapshots
-            else:
-                # Refresh cache
-                snapshots = self.repository.snapshots()
-                self._cached_snapshots = snapshots
-                self._cache_timestamp = datetime.now()
-                logger.info(f"Retrieved {len(snapshots)} snapshots from repository")
+            if self._use_catalog:
+                return self._list_from_catalog(filter_criteria, force_refresh)
+
+            snapshots = self._load_snapshots(force_refresh)
 
             # Apply filters if provided
             if filter_criteria:
-                snapshots = self._apply_filters(snapshots, filter_criteria)
+                snapshots = self._apply_filters(filter_criteria)
 
             return snapshots
 
@@ -113,26 +131,99 @@ class SnapshotManager:
             logger.error(f"Failed to list snapshots: {e}")
             raise RecoveryError(f"Failed to retrieve snapshots: {e}")
 
+    def _load_snapshots(self, force_refresh: bool) -> List[BackupSnapshot]:
+        """Return the cached listing, fetching it again once the cache period is over"""
+        if (not force_refresh and self._cached_snapshots is not None and
+                self._cache_timestamp is not None and
+                datetime.now() - self._cache_timestamp < self._cache_ttl):
+            return self._cached_snapshots
+
+        snapshots = self.repository.snapshots()
+        self._cached_snapshots = snapshots
+        self._cache_timestamp = datetime.now()
+        self._index = None
+        logger.info(f"Retrieved {len(snapshots)} snapshots from repository")
+        return snapshots
+
+    def _refresh_catalog(self, force_refresh: bool):
+        """Refresh the snapshot catalog at most once per cache period"""
+        if (force_refresh or self._cache_timestamp is None or
+                datetime.now() - self._cache_timestamp >= self._cache_ttl):
+            refresh = self.repository.refresh_snapshot_catalog()
+            self._cache_timestamp = datetime.now()
+            logger.info(f"Snapshot catalog holds {refresh['total']} snapshots "
+                        f"({refresh['added']} new, {refresh['removed']} removed)")
+
+    def _query_index(self) -> SnapshotQueryIndex:
+        """
+        Index over the current listing, rebuilt only after a refresh
+
+        Raises:
+            RecoveryError: If unable to retrieve snapshots
+        """
+        try:
+            snapshots = self._load_snapshots(force_refresh=False)
+            if self._index is None:
+                self._index = SnapshotQueryIndex(snapshots)
+            return self._index
+        except Exception as e:
+            logger.error(f"Failed to index snapshots: {e}")
+            raise RecoveryError(f"Failed to retrieve snapshots: {e}")
+
+    def _list_from_catalog(self, filter_criteria: Optional[SnapshotFilter],
+                           force_refresh: bool) -> List[BackupSnapshot]:
+        """
+        List snapshots from the repository's snapshot catalog
+
+        The catalog is refreshed at most once per cache period (the refresh
+        only fetches new snapshots), and the filter criteria become the
+        catalog query. Results are ordered as from _apply_filters: newest
+        first when filtered, repository order (oldest first) otherwise.
+        """
+        self._refresh_catalog(force_refresh)
+
+        if filter_criteria is None:
+            return self.repository.query_snapshots(newest_first=False, refresh=False)
+        return self.repository.query_snapshots(tags=filter_criteria.tags,
+                                               hosts=filter_criteria.hosts,
+                                               paths=filter_criteria.paths,
+                                               date_from=filter_criteria.date_from,
+                                               date_to=filter_criteria.date_to,
+                                               limit=filter_criteria.max_results,
+                                               refresh=False)
+
     def get_snapshot_by_id(self, snapshot_id: str) -> BackupSnapshot:
         """
         Get a specific snapshot by ID
         
         Args:
-            snapshot_id: ID of the snapshot to retrieve
+            snapshot_id: ID of the snapshot to retrieve, or a unique prefix of it
             
         Returns:
             BackupSnapshot instance
             
         Raises:
             SnapshotNotFoundError: If snapshot is not found
+            AmbiguousSnapshotIdError: If the prefix matches several snapshots
         """
-        snapshots = self.list_snapshots()
+        if self._use_catalog:
+            return self._resolve_from_catalog(snapshot_id)
+        return self._query_index().resolve(snapshot_id)
 
-        for snapshot in snapshots:
-            if snapshot.id == snapshot_id or snapshot.id.startswith(snapshot_id):
-                return snapshot
-
-        raise SnapshotNotFoundError(f"Snapshot with ID '{snapshot_id}' not found")
+    def _resolve_from_catalog(self, snapshot_id: str) -> BackupSnapshot:
+        """Look up an ID prefix in the snapshot catalog, fetching at most two matches"""
+        try:
+            self._refresh_catalog(force_refresh=False)
+            matches = self.repository.query_snapshots(id_prefix=snapshot_id, limit=2, refresh=False)
+        except Exception as e:
+            logger.error(f"Failed to look up snapshot {snapshot_id}: {e}")
+            raise RecoveryError(f"Failed to retrieve snapshots: {e}")
+        if not matches:
+            raise SnapshotNotFoundError(f"Snapshot with ID '{snapshot_id}' not found")
+        if len(matches) > 1:
+            raise AmbiguousSnapshotIdError(f"Snapshot ID '{snapshot_id}' is ambiguous: it matches "
+                                           f"'{matches[0].id}', '{matches[1].id}' and possibly more")
+        return matches[0]
 
     def get_latest_snapshot(self, filter_criteria: Optional[SnapshotFilter] = None) -> Optional[BackupSnapshot]:
         """
@@ -144,13 +235,14 @@ class SnapshotManager:
         Returns:
             Latest BackupSnapshot or None if no snapshots found
         """
-        snapshots = self.list_snapshots(filter_criteria)
+        if filter_criteria is None and not self._use_catalog:
+            return self._query_index().latest()
 
-        if not snapshots:
-            return None
-
-        # Sort by timestamp descending and return first
-        return sorted(snapshots, key=lambda s: s.timestamp, reverse=True)[0]
+        # Filtered listings are newest first, so only the first match is needed
+        criteria = copy.copy(filter_criteria) if filter_criteria is not None else SnapshotFilter()
+        criteria.max_results = 1
+        snapshots = self.list_snapshots(criteria)
+        return snapshots[0] if snapshots else None
 
     def get_snapshots_by_date(self, target_date: datetime,
                               tolerance_hours: int = 24) -> List[BackupSnapshot]:
@@ -172,35 +264,14 @@ class SnapshotManager:
 
         return self.list_snapshots(filter_criteria)
 
-    def _apply_filters(self, snapshots: List[BackupSnapshot],
-                       filter_criteria: SnapshotFilter) -> List[BackupSnapshot]:
-        """Apply filter criteria to snapshot list"""
-        filtered = snapshots
-
-        # Filter by tags
-        if filter_criteria.tags:
-            filtered = [s for s in filtered if any(tag in getattr(s, 'tags', [])
-                                                   for tag in filter_criteria.tags)]
-
-        # Filter by date range
-        if filter_criteria.date_from:
-            filtered = [s for s in filtered if s.timestamp >= filter_criteria.date_from]
-        if filter_criteria.date_to:
-            filtered = [s for s in filtered if s.timestamp <= filter_criteria.date_to]
-
-        # Filter by paths
-        if filter_criteria.paths:
-            filtered = [s for s in filtered if any(path in s.paths
-                                                   for path in filter_criteria.paths)]
-
-        # Sort by timestamp descending (newest first)
-        filtered = sorted(filtered, key=lambda s: s.timestamp, reverse=True)
-
-        # Limit results
-        if filter_criteria.max_results:
-            filtered = filtered[:filter_criteria.max_results]
-
-        return filtered
+    def _apply_filters(self, filter_criteria: SnapshotFilter) -> List[BackupSnapshot]:
+        """Apply filter criteria to the cached listing, newest first"""
+        return self._query_index().query(tags=filter_criteria.tags,
+                                         hosts=filter_criteria.hosts,
+                                         paths=filter_criteria.paths,
+                                         date_from=filter_criteria.date_from,
+                                         date_to=filter_criteria.date_to,
+                                         max_results=filter_criteria.max_results)
 
     def get_snapshot_summary(self, snapshot: BackupSnapshot) -> Dict[str, Any]:
         """
@@ -236,4 +307,5 @@ class SnapshotManager:
         """Clear the snapshot cache"""
         self._cached_snapshots = None
         self._cache_timestamp = None
+        self._index = None
         logger.debug("Snapshot cache cleared")
@@ -0,0 +1,180 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from heapq import merge
+from itertools import islice
+from pathlib import PurePath
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .backup_snapshot import BackupSnapshot
+from .recovery_errors import AmbiguousSnapshotIdError, SnapshotNotFoundError
+
+# A rank list with the bounds of the part a query looks at
+_Span = Tuple[List[int], int, int]
+
+
+class SnapshotQueryIndex:
+    """
+    In-memory indexes over one snapshot listing.
+
+    Snapshots are ranked by time (ties keep listing order), and every
+    index refers to snapshots by rank: a sorted ID array resolves IDs and
+    unique prefixes with bisect, the time-sorted array turns a date range
+    into a slice of ranks, and inverted indexes map each tag, host and
+    path to the ascending ranks of the snapshots carrying it. A query
+    walks its candidate ranks newest first, so it touches only matching
+    snapshots and stops once max_results are found.
+
+    The index is immutable; build a new one when the listing changes.
+    """
+
+    def __init__(self, snapshots: Iterable[BackupSnapshot]):
+        """
+        Build the indexes
+
+        Args:
+            snapshots: Snapshot listing, in repository order
+        """
+        # Sorting the reversed listing, then reading newest first, keeps equal times in listing order
+        self._by_time: List[BackupSnapshot] = sorted(reversed(list(snapshots)), key=lambda s: s.timestamp)
+        self._times: List[datetime] = [s.timestamp for s in self._by_time]
+
+        ranks: Dict[str, int] = {}
+        self._tags: Dict[str, List[int]] = {}
+        self._hosts: Dict[str, List[int]] = {}
+        self._paths: Dict[Hashable, List[int]] = {}
+        for rank, snapshot in enumerate(self._by_time):
+            # The newest snapshot wins when an ID is listed twice
+            ranks[snapshot.id] = rank
+            for tag in set(getattr(snapshot, 'tags', None) or ()):
+                self._tags.setdefault(tag, []).append(rank)
+            hostname = getattr(snapshot, 'hostname', None)
+            if hostname is not None:
+                self._hosts.setdefault(hostname, []).append(rank)
+            paths = snapshot.paths or ()
+            for path in set((paths,) if isinstance(paths, PurePath) else paths):
+                self._paths.setdefault(path, []).append(rank)
+        self._ranks = ranks
+        self._ids: List[str] = sorted(ranks)
+
+    def __len__(self) -> int:
+        return len(self._by_time)
+
+    def latest(self) -> Optional[BackupSnapshot]:
+        """The newest snapshot, or None if there are none"""
+        return self._by_time[-1] if self._by_time else None
+
+    def resolve(self, snapshot_id: str) -> BackupSnapshot:
+        """
+        Find a snapshot by its ID or a unique ID prefix
+
+        Args:
+            snapshot_id: Full or short snapshot ID, or a prefix of one
+
+        Returns:
+            The snapshot whose ID equals snapshot_id, else the only one
+            whose ID starts with it
+
+        Raises:
+            SnapshotNotFoundError: If no snapshot ID starts with snapshot_id
+            AmbiguousSnapshotIdError: If several snapshot IDs start with it
+        """
+        rank = self._ranks.get(snapshot_id)
+        if rank is not None:
+            return self._by_time[rank]
+
+        ids = self._ids
+        first = bisect_left(ids, snapshot_id)
+        matches = [found for found in islice(ids, first, first + 2) if found.startswith(snapshot_id)]
+        if not matches:
+            raise SnapshotNotFoundError(f"Snapshot with ID '{snapshot_id}' not found")
+        if len(matches) > 1:
+            raise AmbiguousSnapshotIdError(f"Snapshot ID '{snapshot_id}' is ambiguous: it matches "
+                                           f"'{matches[0]}', '{matches[1]}' and possibly more")
+        return self._by_time[self._ranks[matches[0]]]
+
+    def query(self, tags: Optional[Sequence[str]] = None, hosts: Optional[Sequence[str]] = None,
+              paths: Optional[Sequence[Hashable]] = None, date_from: Optional[datetime] = None,
+              date_to: Optional[datetime] = None, max_results: Optional[int] = None) -> List[BackupSnapshot]:
+        """
+        Snapshots matching every given criterion, newest first
+
+        Args:
+            tags: Keep snapshots carrying any of these tags
+            hosts: Keep snapshots taken on any of these hosts
+            paths: Keep snapshots including any of these paths
+            date_from: Keep snapshots taken at or after this time
+            date_to: Keep snapshots taken at or before this time
+            max_results: Return at most this many snapshots (falsy for all)
+
+        Returns:
+            List of matching snapshots, newest first
+        """
+        low = bisect_left(self._times, date_from) if date_from is not None else 0
+        high = bisect_right(self._times, date_to) if date_to is not None else len(self._times)
+        if low >= high:
+            return []
+
+        postings = [self._postings(index, keys, low, high)
+                    for index, keys in ((self._tags, tags), (self._hosts, hosts), (self._paths, paths)) if keys]
+        if not postings:
+            candidates: Iterator[int] = iter(range(high - 1, low - 1, -1))
+        else:
+            # Walk the most selective criterion and probe the others
+            postings.sort(key=lambda spans: sum(stop - start for _, start, stop in spans))
+            candidates = self._newest_first(postings[0])
+            others = postings[1:]
+            if others:
+                candidates = (rank for rank in candidates
+                              if all(any(self._contains(span, rank) for span in spans) for spans in others))
+
+        by_time = self._by_time
+        return [by_time[rank] for rank in islice(candidates, max_results or None)]
+
+    @staticmethod
+    def _postings(index: Dict[Hashable, List[int]], keys: Iterable[Hashable],
+                  low: int, high: int) -> List[_Span]:
+        """Spans of the given keys' rank lists that fall in [low, high)"""
+        spans = []
+        for key in set(keys):
+            ranks = index.get(key)
+            if ranks:
+                start, stop = bisect_left(ranks, low), bisect_left(ranks, high)
+                if start < stop:
+                    spans.append((ranks, start, stop))
+        return spans
+
+    @staticmethod
+    def _newest_first(spans: List[_Span]) -> Iterator[int]:
+        """Union of rank spans, descending and without duplicates"""
+        walks = [map(ranks.__getitem__, range(stop - 1, start - 1, -1)) for ranks, start, stop in spans]
+        if len(walks) == 1:
+            yield from walks[0]
+            return
+        previous = None
+        for rank in merge(*walks, reverse=True):
+            if rank != previous:
+                yield rank
+                previous = rank
+
+    @staticmethod
+    def _contains(span: _Span, rank: int) -> bool:
+        ranks, start, stop = span
+        position = bisect_left(ranks, rank, start, stop)
+        return position < stop and ranks[position] == rank
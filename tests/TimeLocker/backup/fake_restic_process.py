@@ -0,0 +1,74 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import io
+import json
+from typing import Dict, Iterable, List, Optional
+
+from TimeLocker.restic.restic_repository import ResticRepository
+
+
+class OfflineResticRepository(ResticRepository):
+    """ResticRepository that needs no restic binary, backend or credentials"""
+
+    def backend_env(self):
+        return {}
+
+    def validate(self):
+        return "ok"
+
+    def _verify_restic_executable(self, min_version: str) -> str:
+        return min_version
+
+    def password(self):
+        return "test-password"
+
+
+class FakeResticProcess:
+    """Stand-in for the subprocess.Popen object running restic --json"""
+
+    def __init__(self, events: Iterable[Dict] = (), stderr: bytes = b"", returncode: int = 0,
+                 stdout: Optional[bytes] = None):
+        if stdout is None:
+            stdout = b"".join(json.dumps(event).encode() + b"\n" for event in events)
+        self.stdout = io.BytesIO(stdout)
+        self.stderr = io.BytesIO(stderr)
+        self.returncode: Optional[int] = None
+        self._exit_code = returncode
+        self.pid = 4242
+        self.signals: List[str] = []
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        self.returncode = self._exit_code
+        return self.returncode
+
+    def send_signal(self, sig):
+        self.signals.append(f"signal {sig}")
+
+    def terminate(self):
+        self.signals.append("terminate")
+
+    def kill(self):
+        self.signals.append("kill")
+
+
+def summary_event(snapshot_id: str = "abc123", **fields) -> Dict:
+    """A restic backup summary event"""
+    return dict({"message_type": "summary", "snapshot_id": snapshot_id}, **fields)
@@ -39,7 +39,8 @@ class MockBackupRepository(BackupRepository):
     def check(self) -> bool:
         return self._initialized
 
-    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None) -> Dict:
+    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None,
+                      progress_callback=None, cancel_event=None) -> Dict:
         snapshot_id = f"mock-snapshot-{len(self._snapshots)}"
         paths = [target.path for target in targets]
         snapshot = BackupSnapshot(self, snapshot_id, datetime.now(), paths)
@@ -14,6 +14,8 @@ from TimeLocker.file_selections import FileSelection, SelectionType
 from TimeLocker.restic.Repositories.local import LocalResticRepository
 from TimeLocker.restic.errors import RepositoryError
 
+from .fake_restic_process import FakeResticProcess
+
 
 class TestBackupOperations:
     """Test cases for backup operations"""
@@ -63,7 +65,7 @@ class TestBackupOperations:
         assert str(self.source_path / "subdir") in exclude_args
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
-    @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
@@ -72,17 +74,14 @@ class TestBackupOperations:
         mock_verify.return_value = "0.18.0"
 
         # Mock successful backup result
-        mock_result = Mock()
-        mock_result.stdout = json.dumps({
+        mock_subprocess.return_value = FakeResticProcess([{
                 "message_type":     "summary",
                 "snapshot_id":      "abc123def456",
                 "files_new":        5,
                 "files_changed":    2,
                 "files_unmodified": 10,
                 "data_added":       1024
-        })
-        mock_result.returncode = 0
-        mock_subprocess.return_value = mock_result
+        }])
 
         # Create repository and backup target
         repository = LocalResticRepository(
@@ -124,7 +123,7 @@ class TestBackupOperations:
         assert str(self.source_path) in command_list
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
-    @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
@@ -133,17 +132,14 @@ class TestBackupOperations:
         mock_verify.return_value = "0.18.0"
 
         # Mock successful backup result
-        mock_result = Mock()
-        mock_result.stdout = json.dumps({
+        mock_subprocess.return_value = FakeResticProcess([{
                 "message_type":     "summary",
                 "snapshot_id":      "multi123",
                 "files_new":        8,
                 "files_changed":    3,
                 "files_unmodified": 15,
                 "data_added":       2048
-        })
-        mock_result.returncode = 0
-        mock_subprocess.return_value = mock_result
+        }])
 
         # Create repository
         repository = LocalResticRepository(
@@ -203,7 +199,7 @@ class TestBackupOperations:
             repository.backup_target([])
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
-    @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
@@ -212,12 +208,7 @@ class TestBackupOperations:
         mock_verify.return_value = "0.18.0"
 
         # Mock failed backup
-        from subprocess import CalledProcessError
-        mock_subprocess.side_effect = CalledProcessError(
-                returncode=1,
-                cmd=["restic", "backup"],
-                stderr="Repository not found"
-        )
+        mock_subprocess.return_value = FakeResticProcess(stderr=b"Repository not found\n", returncode=1)
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -232,7 +223,7 @@ class TestBackupOperations:
         )
 
         # Should raise RepositoryError
-        with pytest.raises(RepositoryError, match="Backup failed"):
+        with pytest.raises(RepositoryError, match="Backup failed: Repository not found"):
             repository.backup_target([target])
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
@@ -293,7 +284,7 @@ class TestBackupOperations:
         assert result is False
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
-    @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
@@ -302,17 +293,14 @@ class TestBackupOperations:
         mock_verify.return_value = "0.18.0"
 
         # Mock successful backup result
-        mock_result = Mock()
-        mock_result.stdout = json.dumps({
+        mock_subprocess.return_value = FakeResticProcess([{
                 "message_type":     "summary",
                 "snapshot_id":      "tagged123",
                 "files_new":        3,
                 "files_changed":    1,
                 "files_unmodified": 5,
                 "data_added":       512
-        })
-        mock_result.returncode = 0
-        mock_subprocess.return_value = mock_result
+        }])
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -0,0 +1,125 @@
+"""
+Tests for the bytes-path traversal and matching fast path
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from TimeLocker.file_selections import CACHEDIR_SIGNATURE, FileSelection, SelectionType
+from TimeLocker.path_index import PathPrefixIndex, split_path, split_path_bytes
+from TimeLocker.pattern_matcher import PatternMatcher
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="bytes traversal is POSIX only")
+
+HOSTILE_NAMES = [
+        b"plain.txt", b"UPPER.TXT", b"notes.tmp", b"line\nbreak.txt", b"bad_\xff\xfe.txt", b"bad_\xff.tmp",
+        "café.txt".encode("utf-8"), "K.log".encode("utf-8"), b"caf\xe9.log", b"trailing\n", b"build.o",
+]
+
+PATTERNS = ["*.tmp", "k.log", "build*", "**/skip/*", "*/sub/?ad_*.txt", "café*", "*\n"]
+
+
+class TestBytesTraversal:
+    """Test cases for FileSelection.iter_effective_bytes"""
+
+    def setup_method(self):
+        """Create a tree of hostile file and directory names"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.root = os.fsencode(str(self.temp_dir))
+        try:
+            for directory in [b"", b"sub", b"skip", b"dir_\xff", b"sub/n\nested"]:
+                dir_path = os.path.join(self.root, directory)
+                os.makedirs(dir_path, exist_ok=True)
+                for name in HOSTILE_NAMES:
+                    os.close(os.open(os.path.join(dir_path, name), os.O_CREAT | os.O_WRONLY, 0o644))
+        except OSError as e:
+            shutil.rmtree(self.temp_dir)
+            pytest.skip(f"File system rejects hostile names: {e}")
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _assert_same_selection(self, selection: FileSelection):
+        expected = [os.fsencode(path) for path, _ in selection.iter_effective_entries()]
+        actual = [path for path, _ in selection.iter_effective_bytes()]
+        assert actual == expected
+        return actual
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_matches_str_traversal(self):
+        """Bytes traversal selects exactly what the str traversal selects"""
+        selection = FileSelection()
+        selection.add_path(self.temp_dir)
+        selection.add_path(os.fsdecode(os.path.join(self.root, b"dir_\xff", b"bad_\xff\xfe.txt")), SelectionType.EXCLUDE)
+        for pattern in PATTERNS:
+            selection.add_pattern(pattern, SelectionType.EXCLUDE)
+
+        selected = self._assert_same_selection(selection)
+
+        assert os.path.join(self.root, b"line\nbreak.txt") in selected
+        assert os.path.join(self.root, b"dir_\xff", b"bad_\xff.txt") not in selected
+        assert os.path.join(self.root, b"sub", b"bad_\xff\xfe.txt") not in selected
+        assert os.path.join(self.root, "K.log".encode("utf-8")) not in selected
+        assert not any(b"/skip/" in path or path.endswith(b".tmp") for path in selected)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_include_patterns_and_rules(self):
+        """Include patterns, single-file roots and file system rules behave the same"""
+        (self.temp_dir / "skip" / "CACHEDIR.TAG").write_bytes(CACHEDIR_SIGNATURE)
+        selection = FileSelection()
+        selection.add_path(os.fsdecode(os.path.join(self.root, b"bad_\xff.tmp")))
+        selection.add_pattern("*.txt", SelectionType.INCLUDE)
+        selection.add_pattern("*.TMP", SelectionType.INCLUDE)
+        selection.exclude_caches = True
+
+        selected = self._assert_same_selection(selection)
+
+        assert selected == [os.path.join(self.root, b"bad_\xff.tmp")]
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_write_files_from_keeps_raw_names(self):
+        """NUL-separated file lists carry undecodable and multi-line names verbatim"""
+        selection = FileSelection()
+        selection.add_path(self.temp_dir / "sub")
+        selection.add_pattern("n?ested", SelectionType.EXCLUDE)
+        output = self.temp_dir / "list"
+
+        count = selection.write_files_from(output, null_separated=True)
+
+        entries = output.read_bytes().split(b"\0")[:-1]
+        assert count == len(entries) == len(HOSTILE_NAMES) * 2
+        assert os.path.join(self.root, b"sub", b"n\nested", b"bad_\xff\xfe.txt") in entries
+
+
+@pytest.mark.unit
+def test_bytes_matcher_agrees_with_str_matcher():
+    """BytesPatternMatcher gives PatternMatcher's answer for the decoded path"""
+    matcher = PatternMatcher(PATTERNS + ["*.LOG", "[a-c]*.o", "/abs/literal"])
+    paths = [b"/x/" + name for name in HOSTILE_NAMES] + [
+            b"/abs/literal", b"/ABS/LITERAL", b"/a/skip", b"/a/skip/b", b"/sub/bad_1.txt", b"/a/sub/Bad_x.txt"]
+    for path in paths:
+        assert matcher.bytes_matcher.matches(path) == matcher.matches(os.fsdecode(path)), path
+        assert (matcher.bytes_matcher.matches_directory(path)
+                == matcher.matches_directory(os.fsdecode(path))), path
+
+
+@pytest.mark.unit
+def test_encoded_index_matches_str_index():
+    """Encoded path tries answer bytes queries as the str trie answers str ones"""
+    roots = ["/data/a", os.fsdecode(b"/data/\xff"), "//net/share"]
+    index = PathPrefixIndex(roots)
+    for path in [b"/data/a/x", b"/data/\xff/y", b"/data/\xfe", b"//net/share/z", b"/net/share", b"/data"]:
+        assert split_path_bytes(path) == tuple(os.fsencode(part) for part in split_path(os.fsdecode(path)))
+        assert index.encoded.covers_parts(split_path_bytes(path)) == index.covers(os.fsdecode(path)), path
@@ -0,0 +1,114 @@
+"""
+Tests for streaming effective path enumeration
+"""
+
+import io
+import shutil
+import tempfile
+import types
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+from TimeLocker.interfaces import BackupResult, BackupStatus
+
+
+class TestEffectivePathStream:
+    """Test cases for iter_effective_paths and its consumers"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for rel in ["docs/a.txt", "docs/b.log", "src/main.py", "src/cache/c.bin", "top.txt"]:
+            (self.temp_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.temp_dir / rel).write_text(rel)
+
+        self.selection = FileSelection()
+        self.selection.add_path(self.temp_dir)
+        self.selection.add_path(self.temp_dir / "src" / "cache", SelectionType.EXCLUDE)
+        self.selection.add_pattern("*.log", SelectionType.EXCLUDE)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_stream_is_lazy_generator(self):
+        """iter_effective_paths yields lazily and matches get_effective_paths"""
+        stream = self.selection.iter_effective_paths()
+        assert isinstance(stream, types.GeneratorType)
+
+        first = next(stream)
+        assert isinstance(first, Path)
+        streamed = [first] + list(stream)
+        assert streamed == self.selection.get_effective_paths()["included"]
+        assert {p.relative_to(self.temp_dir).as_posix() for p in streamed} == {"docs/a.txt", "src/main.py", "top.txt"}
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_entries_report_progress(self):
+        """iter_effective_entries counts every evaluated file"""
+        progress = {"files_processed": 0}
+        entries = list(self.selection.iter_effective_entries(progress))
+        assert len(entries) == 3
+        assert all(entry is not None and entry.path == path for path, entry in entries)
+        assert progress["files_processed"] == 4  # cache/ is pruned, b.log is evaluated
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_write_files_from(self):
+        """The --files-from export streams one entry per included file"""
+        buffer = io.BytesIO()
+        assert self.selection.write_files_from(buffer) == 3
+        lines = buffer.getvalue().decode().splitlines()
+        assert lines == [str(p) for p in self.selection.iter_effective_paths()]
+
+        output = self.temp_dir.parent / f"{self.temp_dir.name}.files"
+        try:
+            assert self.selection.write_files_from(output, null_separated=True) == 3
+            raw = output.read_bytes()
+            assert raw.endswith(b"\0") and raw.count(b"\0") == 3
+        finally:
+            output.unlink()
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_write_files_from_newline_in_name(self):
+        """NUL-separated export round-trips filenames containing newlines"""
+        try:
+            (self.temp_dir / "odd\nname.txt").write_text("x")
+        except OSError:
+            pytest.skip("Filenames with newlines not supported on this platform")
+
+        buffer = io.BytesIO()
+        self.selection.write_files_from(buffer, null_separated=True)
+        names = [Path(p.decode()).name for p in buffer.getvalue().split(b"\0") if p]
+        assert "odd\nname.txt" in names
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_dry_run_consumes_stream(self):
+        """Dry runs count files and bytes from each target's selection"""
+        config_provider = Mock()
+        config_provider.get_repositories.return_value = [{'name': 'repo'}]
+        config_provider.get_backup_targets.return_value = [
+                {'name': 'files', 'paths': [str(self.temp_dir)], 'exclude_patterns': ["*.log"]},
+        ]
+        orchestrator = BackupOrchestrator(Mock(), config_provider)
+
+        result = orchestrator._execute_dry_run(BackupResult(
+                status=BackupStatus.PENDING, repository_name="repo", target_names=["files"]))
+
+        assert result.status == BackupStatus.COMPLETED
+        assert result.files_processed == 4
+        assert result.bytes_processed == sum(len(rel) for rel in ["docs/a.txt", "src/main.py", "src/cache/c.bin", "top.txt"])
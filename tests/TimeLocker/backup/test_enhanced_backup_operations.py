@@ -16,6 +16,8 @@ from TimeLocker.file_selections import FileSelection, SelectionType
 from TimeLocker.restic.Repositories.local import LocalResticRepository
 from TimeLocker.restic.errors import RepositoryError
 
+from .fake_restic_process import FakeResticProcess
+
 
 class TestEnhancedBackupOperations:
     """Test cases for enhanced backup operations"""
@@ -118,25 +120,24 @@ class TestEnhancedBackupOperations:
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
     @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
-    def test_backup_with_retry_success_first_attempt(self, mock_subprocess, mock_verify):
+    def test_backup_with_retry_success_first_attempt(self, mock_popen, mock_subprocess, mock_verify):
         """Test successful backup on first attempt"""
         mock_verify.return_value = "0.18.0"
 
         # Mock successful backup result
-        mock_result = Mock()
-        mock_result.stdout = json.dumps({
+        mock_popen.return_value = FakeResticProcess([{
                 "message_type":     "summary",
                 "snapshot_id":      "retry123",
                 "files_new":        3,
                 "files_changed":    0,
                 "files_unmodified": 0,
                 "data_added":       1024
-        })
-        mock_result.returncode = 0
-        mock_subprocess.return_value = mock_result
+        }])
+        mock_subprocess.return_value = Mock(stdout="no errors were found", returncode=0)
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -152,37 +153,32 @@ class TestEnhancedBackupOperations:
 
         # Verify results
         assert result["snapshot_id"] == "retry123"
-        assert mock_subprocess.call_count == 2  # backup + verification
+        assert mock_popen.call_count == 1  # backup
+        assert mock_subprocess.call_count == 1  # verification
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
     @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
-    def test_backup_with_retry_success_after_failure(self, mock_subprocess, mock_verify):
+    def test_backup_with_retry_success_after_failure(self, mock_popen, mock_subprocess, mock_verify):
         """Test successful backup after initial failure"""
         mock_verify.return_value = "0.18.0"
 
         # Mock first attempt failure, second attempt success
-        from subprocess import CalledProcessError
-
-        def side_effect(*args, **kwargs):
-            if mock_subprocess.call_count == 1:
-                raise CalledProcessError(1, ["restic", "backup"], stderr="Temporary failure")
-            else:
-                mock_result = Mock()
-                mock_result.stdout = json.dumps({
+        mock_popen.side_effect = [
+                FakeResticProcess(stderr=b"Temporary failure\n", returncode=1),
+                FakeResticProcess([{
                         "message_type":     "summary",
                         "snapshot_id":      "retry456",
                         "files_new":        3,
                         "files_changed":    0,
                         "files_unmodified": 0,
                         "data_added":       1024
-                })
-                mock_result.returncode = 0
-                return mock_result
-
-        mock_subprocess.side_effect = side_effect
+                }]),
+        ]
+        mock_subprocess.return_value = Mock(stdout="no errors were found", returncode=0)
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -200,10 +196,10 @@ class TestEnhancedBackupOperations:
 
         # Verify results
         assert result["snapshot_id"] == "retry456"
-        assert mock_subprocess.call_count >= 2
+        assert mock_popen.call_count == 2
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
-    @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
@@ -212,10 +208,8 @@ class TestEnhancedBackupOperations:
         mock_verify.return_value = "0.18.0"
 
         # Mock all attempts failing
-        from subprocess import CalledProcessError
-        mock_subprocess.side_effect = CalledProcessError(
-                1, ["restic", "backup"], stderr="Persistent failure"
-        )
+        mock_subprocess.side_effect = lambda *args, **kwargs: FakeResticProcess(stderr=b"Persistent failure\n",
+                                                                                returncode=1)
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -236,25 +230,24 @@ class TestEnhancedBackupOperations:
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
     @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
-    def test_create_full_backup(self, mock_subprocess, mock_verify):
+    def test_create_full_backup(self, mock_popen, mock_subprocess, mock_verify):
         """Test full backup creation"""
         mock_verify.return_value = "0.18.0"
 
         # Mock successful backup result
-        mock_result = Mock()
-        mock_result.stdout = json.dumps({
+        mock_popen.return_value = FakeResticProcess([{
                 "message_type":     "summary",
                 "snapshot_id":      "full123",
                 "files_new":        5,
                 "files_changed":    0,
                 "files_unmodified": 0,
                 "data_added":       2048
-        })
-        mock_result.returncode = 0
-        mock_subprocess.return_value = mock_result
+        }])
+        mock_subprocess.return_value = Mock(stdout="no errors were found", returncode=0)
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -272,7 +265,7 @@ class TestEnhancedBackupOperations:
         assert result["snapshot_id"] == "full123"
 
         # Check that backup command included correct tags
-        call_args = mock_subprocess.call_args_list[0]  # First call is the backup
+        call_args = mock_popen.call_args
         command_list = call_args[0][0]
 
         # Should contain full and manual tags
@@ -284,25 +277,24 @@ class TestEnhancedBackupOperations:
 
     @patch('TimeLocker.restic.restic_repository.ResticRepository._verify_restic_executable')
     @patch('subprocess.run')
+    @patch('subprocess.Popen')
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
-    def test_create_incremental_backup(self, mock_subprocess, mock_verify):
+    def test_create_incremental_backup(self, mock_popen, mock_subprocess, mock_verify):
         """Test incremental backup creation"""
         mock_verify.return_value = "0.18.0"
 
         # Mock successful backup result
-        mock_result = Mock()
-        mock_result.stdout = json.dumps({
+        mock_popen.return_value = FakeResticProcess([{
                 "message_type":     "summary",
                 "snapshot_id":      "incr123",
                 "files_new":        1,
                 "files_changed":    2,
                 "files_unmodified": 10,
                 "data_added":       512
-        })
-        mock_result.returncode = 0
-        mock_subprocess.return_value = mock_result
+        }])
+        mock_subprocess.return_value = Mock(stdout="no errors were found", returncode=0)
 
         repository = LocalResticRepository(
                 location=str(self.repo_path),
@@ -322,7 +314,7 @@ class TestEnhancedBackupOperations:
         assert result["snapshot_id"] == "incr123"
 
         # Check that backup command included correct tags
-        call_args = mock_subprocess.call_args_list[0]  # First call is the backup
+        call_args = mock_popen.call_args
         command_list = call_args[0][0]
 
         # Should contain incremental and parent tags
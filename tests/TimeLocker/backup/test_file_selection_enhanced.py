@@ -2,6 +2,7 @@
 Tests for enhanced file selection functionality
 """
 
+import os
 import pytest
 import tempfile
 import shutil
@@ -266,6 +267,34 @@ class TestEnhancedFileSelection:
         assert stats["total_size"] == 0
         assert stats["file_count"] == 0
 
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_traversal_matches_os_walk(self):
+        """Test the scandir traversal core finds the same files as os.walk"""
+        try:
+            os.symlink(self.test_dir / "subdir2", self.test_dir / "linked_dir")
+            os.symlink(self.test_dir / "missing", self.test_dir / "broken_link")
+        except OSError:
+            pytest.skip("Symbolic links not supported on this platform")
+
+        selection = FileSelection()
+        selection.add_path(self.test_dir, SelectionType.INCLUDE)
+        selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+
+        expected = [Path(root) / name
+                    for root, _, files in os.walk(self.test_dir) for name in files
+                    if not name.endswith(".tmp")]
+        included = selection.get_effective_paths()["included"]
+        assert sorted(included) == sorted(expected)
+        assert self.test_dir / "broken_link" in included
+        assert not any("linked_dir" in p.parts for p in included)
+
+        # Broken symlinks cannot be sized, so they are left out of the estimate
+        stats = selection.estimate_backup_size()
+        assert stats["file_count"] == len(expected) - 1
+        assert stats["total_size"] == sum(p.stat().st_size for p in expected if p.exists())
+
     @pytest.mark.backup
     @pytest.mark.filesystem
     @pytest.mark.unit
@@ -0,0 +1,195 @@
+"""
+Tests for one-file-system, size-limit and cache-directory selection rules
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from TimeLocker.backup_target import BackupTarget
+from TimeLocker.file_selections import CACHEDIR_SIGNATURE, FileSelection, parse_size
+from TimeLocker.scan_cache import ScanCache
+from TimeLocker.selection_cache import SelectionCache
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+
+from .fake_restic_process import FakeResticProcess, OfflineResticRepository, summary_event
+
+
+class TestFilesystemRules:
+    """Test cases for FileSelection file system rules"""
+
+    def setup_method(self):
+        """Create a tree with a tagged cache, a bogus tag, a large file and a 'mount'"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.root = self.temp_dir / "data"
+        for rel, size in [("small.txt", 10), ("big.bin", 4096), ("cache/blob", 10), ("notcache/keep", 10),
+                          ("mnt/remote.txt", 10), ("docs/a.txt", 10)]:
+            (self.root / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / rel).write_bytes(b"x" * size)
+        (self.root / "cache" / "CACHEDIR.TAG").write_bytes(CACHEDIR_SIGNATURE + b"\n# created by a tool\n")
+        (self.root / "notcache" / "CACHEDIR.TAG").write_bytes(b"Signature: not the right one\n")
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _selected(self, selection: FileSelection):
+        return sorted(str(path.relative_to(self.root)) for path in selection.iter_effective_paths())
+
+    def _selection(self) -> FileSelection:
+        selection = FileSelection()
+        selection.add_path(self.root)
+        return selection
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_exclude_caches_requires_valid_signature(self):
+        """Only directories with a correctly signed CACHEDIR.TAG are pruned"""
+        selection = self._selection()
+        assert "cache/blob" in self._selected(selection)
+
+        selection.exclude_caches = True
+
+        selected = self._selected(selection)
+        assert "cache/blob" not in selected and "cache/CACHEDIR.TAG" not in selected
+        assert "notcache/keep" in selected
+        assert selection.is_directory_excluded(self.root / "cache")
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_exclude_larger_than(self):
+        """Files above the size limit are skipped by traversal and single-file checks"""
+        selection = self._selection()
+        selection.exclude_larger_than = "1k"
+
+        assert selection.exclude_larger_than == 1024
+        assert "big.bin" not in self._selected(selection)
+        assert "small.txt" in self._selected(selection)
+        assert not selection.should_include_file(self.root / "big.bin")
+        assert selection.estimate_backup_size()["file_count"] == 7
+
+        single = FileSelection()
+        single.add_path(self.root / "big.bin")
+        single.exclude_larger_than = 100
+        assert list(single.iter_effective_paths()) == []
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_one_file_system_prunes_other_devices(self):
+        """Directories on a device other than the include roots' are pruned"""
+        mount = str(self.root / "mnt")
+        real_lstat = os.lstat
+
+        def fake_lstat(path, *args, **kwargs):
+            st = real_lstat(path, *args, **kwargs)
+            if os.fspath(path) == mount:
+                return os.stat_result((st.st_mode, st.st_ino, st.st_dev + 1, *tuple(st)[3:]))
+            return st
+
+        selection = self._selection()
+        selection.one_file_system = True
+        with patch("TimeLocker.file_selections.os.lstat", side_effect=fake_lstat):
+            selected = self._selected(selection)
+
+        assert "mnt/remote.txt" not in selected
+        assert "docs/a.txt" in selected
+        assert "mnt/remote.txt" in self._selected(self._selection())
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_cache_tag_honoured_on_scan_cache_hit(self):
+        """A cache tag added after a cached scan prunes the directory even though its parent is unchanged"""
+        (self.root / "cache" / "CACHEDIR.TAG").unlink()
+        selection = self._selection()
+        selection.exclude_caches = True
+        for directory in [self.root, *(p for p in self.root.iterdir() if p.is_dir())]:
+            os.utime(directory, (1_000_000_000, 1_000_000_000))  # outside the racy window
+        scan_cache = ScanCache(selection.scan_fingerprint(), cache_dir=self.temp_dir / "scan")
+        assert selection.estimate_backup_size(scan_cache=scan_cache)["file_count"] == 7
+
+        (self.root / "cache" / "CACHEDIR.TAG").write_bytes(CACHEDIR_SIGNATURE)
+        restored = FileSelection.from_compiled_state(selection.to_compiled_state())
+        scan_cache = ScanCache(restored.scan_fingerprint(), cache_dir=self.temp_dir / "scan")
+
+        assert restored.estimate_backup_size(scan_cache=scan_cache)["file_count"] == 6
+        assert scan_cache.hits > 0
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_restic_args_and_fingerprint(self):
+        """Rules become restic options and change the scan fingerprint"""
+        selection = self._selection()
+        fingerprint = selection.scan_fingerprint()
+        selection.one_file_system = True
+        selection.exclude_caches = True
+        selection.exclude_larger_than = "2M"
+
+        args = selection.to_restic_args()
+        assert "--one-file-system" in args and "--exclude-caches" in args
+        assert args[args.index("--exclude-larger-than") + 1] == str(2 * 1024 ** 2)
+        assert selection.scan_fingerprint() != fingerprint
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_backup_command_uses_shared_rules(self):
+        """Only rules shared by every walked target reach the restic command"""
+        repo = OfflineResticRepository(location=str(self.temp_dir / "repo"))
+        strict = self._selection()
+        strict.one_file_system = True
+        strict.exclude_caches = True
+        strict.exclude_larger_than = 100
+        loose = self._selection()
+        loose.exclude_caches = True
+        loose.exclude_larger_than = 500
+        captured = {}
+
+        def fake_popen(command_list, **kwargs):
+            captured["argv"] = list(command_list)
+            return FakeResticProcess([summary_event()])
+
+        with patch("TimeLocker.restic.backup_runner.subprocess.Popen", side_effect=fake_popen):
+            repo.backup_target([BackupTarget(selection=strict), BackupTarget(selection=loose)])
+
+        argv = captured["argv"]
+        assert "--one-file-system" not in argv
+        assert "--exclude-caches" in argv
+        assert argv[argv.index("--exclude-larger-than") + 1] == "500"
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_target_config_rules(self):
+        """Target configuration sets the rules and keys the selection cache"""
+        config = {'name': 'data', 'paths': [str(self.root)], 'one_file_system': True,
+                  'exclude_caches': True, 'exclude_larger_than': '10k'}
+        selection = BackupOrchestrator._build_selection(config)
+
+        assert selection.one_file_system and selection.exclude_caches
+        assert selection.exclude_larger_than == 10 * 1024
+        plain = dict(config, one_file_system=False, exclude_caches=False, exclude_larger_than=None)
+        assert SelectionCache.config_key(config) != SelectionCache.config_key(plain)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value,expected", [
+        ("500", 500), (2048, 2048), ("10k", 10240), ("3M", 3 * 1024 ** 2), ("1g", 1024 ** 3), (" 2T ", 2 * 1024 ** 4),
+])
+def test_parse_size(value, expected):
+    """Sizes follow restic's --exclude-larger-than syntax"""
+    assert parse_size(value) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value", ["", "k", "1.5M", "-1", "10x", -5])
+def test_parse_size_rejects_invalid(value):
+    """Malformed and negative sizes are rejected"""
+    with pytest.raises(ValueError):
+        parse_size(value)
@@ -0,0 +1,111 @@
+"""
+Tests for hardlink- and sparse-aware size accounting
+"""
+
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection
+from TimeLocker.inode_set import InodeSet, SizeTally, summarize_stats
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_inode_set_matches_python_set():
+    """InodeSet agrees with a set of tuples across growth and several devices"""
+    rng = random.Random(1234)
+    inodes = InodeSet()
+    reference = set()
+    for _ in range(50_000):
+        key = (rng.choice([1, 2, 2049]), rng.choice([0, rng.getrandbits(64), rng.randrange(20_000)]))
+        assert inodes.add(*key) == (key not in reference)
+        reference.add(key)
+
+    assert len(inodes) == len(reference)
+    assert all(key in inodes for key in list(reference)[:1000])
+    assert (3, 1) not in inodes
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_inode_set_is_compact():
+    """Memory per inode stays far below a set of tuples"""
+    inodes = InodeSet()
+    for inode in range(1, 200_001):
+        inodes.add(64769, inode * 7919)
+    assert inodes.memory_bytes / len(inodes) <= 26
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_tally_deduplicates_hardlinks():
+    """Only the first link to an inode adds to unique and allocated bytes"""
+    tally = SizeTally()
+    tally.add(3, 300, 100, 4096, ((1, 7, 100, 4096), (1, 7, 100, 4096)))
+    tally.add(1, 100, 0, 0, ((1, 7, 100, 4096),))
+    assert tally.file_count == 4
+    assert tally.apparent_size == 400
+    assert tally.unique_size == 200
+    assert tally.allocated_size == 8192
+    assert tally.duplicate_links == 2
+
+
+class TestHardlinkEstimate:
+    """estimate_backup_size accounting on real hardlinked and sparse files"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / "a").mkdir()
+        (self.temp_dir / "b").mkdir()
+        (self.temp_dir / "a" / "data.bin").write_bytes(b"x" * 5000)
+        (self.temp_dir / "a" / "solo.bin").write_bytes(b"y" * 300)
+        try:
+            os.link(self.temp_dir / "a" / "data.bin", self.temp_dir / "b" / "data.bin")
+            os.link(self.temp_dir / "a" / "data.bin", self.temp_dir / "b" / "copy.bin")
+        except (OSError, AttributeError):
+            pytest.skip("Hard links not supported on this platform")
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_hardlinks_counted_once(self, workers):
+        """Apparent size counts every path, unique size every inode once"""
+        selection = FileSelection()
+        selection.add_path(self.temp_dir)
+        stats = selection.estimate_backup_size(max_workers=workers)
+
+        assert stats["file_count"] == 4
+        assert stats["apparent_size"] == 3 * 5000 + 300
+        assert stats["unique_size"] == stats["total_size"] == 5000 + 300
+        assert stats["duplicate_links"] == 2
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_sparse_file_allocation(self):
+        """Allocated size follows st_blocks, so sparse files report their real footprint"""
+        sparse = self.temp_dir / "sparse.img"
+        with open(sparse, "wb") as handle:
+            handle.truncate(64 * 1024 * 1024)
+        st = sparse.stat()
+        if not hasattr(st, "st_blocks") or st.st_blocks * 512 >= st.st_size:
+            pytest.skip("Sparse files not supported on this filesystem")
+
+        selection = FileSelection()
+        selection.add_path(sparse)
+        stats = selection.estimate_backup_size()
+        assert stats["unique_size"] == 64 * 1024 * 1024
+        assert stats["allocated_size"] == st.st_blocks * 512
+        assert summarize_stats([st])[3] == st.st_blocks * 512
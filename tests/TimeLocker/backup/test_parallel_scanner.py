@@ -0,0 +1,95 @@
+"""
+Tests for parallel backup size estimation
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.parallel_scanner import ParallelScanner
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+
+
+class TestParallelScanner:
+    """Test cases for ParallelScanner"""
+
+    def setup_method(self):
+        """Create a tree with several roots, nested directories and exclusions"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for root in ["alpha", "beta"]:
+            for d in range(6):
+                dir_path = self.temp_dir / root / f"dir_{d}" / "nested"
+                dir_path.mkdir(parents=True)
+                for f in range(5):
+                    (dir_path / f"file_{f}.dat").write_bytes(b"x" * (f + d))
+                    (dir_path.parent / f"file_{f}.tmp").write_bytes(b"tmp")
+        (self.temp_dir / "single.txt").write_text("single file")
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _selection(self) -> FileSelection:
+        selection = FileSelection()
+        selection.add_path(self.temp_dir / "alpha")
+        selection.add_path(self.temp_dir / "beta")
+        selection.add_path(self.temp_dir / "single.txt")
+        selection.add_path(self.temp_dir / "beta" / "dir_3", SelectionType.EXCLUDE)
+        selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+        return selection
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    @pytest.mark.parametrize("workers", [2, 4, 16])
+    def test_parallel_totals_match_serial(self, workers):
+        """Parallel scans give exactly the serial totals"""
+        serial = self._selection().estimate_backup_size()
+        parallel = self._selection().estimate_backup_size(max_workers=workers)
+        assert parallel == serial
+        assert serial["file_count"] == 11 * 5 + 1
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_scanner_reports_files_processed(self):
+        """The scanner counts every file it evaluated, included or not"""
+        stats = ParallelScanner(self._selection(), max_workers=3).scan()
+        assert stats["files_processed"] == 11 * 10 + 1
+        assert stats["directory_count"] == 2 + 11 * 2
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_scanner_handles_missing_roots(self):
+        """Missing include roots contribute nothing"""
+        selection = FileSelection()
+        selection.add_path(self.temp_dir / "does-not-exist")
+        stats = ParallelScanner(selection, max_workers=2).scan()
+        assert stats["files_processed"] == stats["file_count"] == stats["directory_count"] == 0
+        assert stats["total_size"] == stats["apparent_size"] == stats["allocated_size"] == 0
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_orchestrator_estimate_uses_targets(self):
+        """BackupOrchestrator.estimate_backup_size sums per-target scans"""
+        config_provider = Mock()
+        config_provider.get_backup_targets.return_value = [
+                {'name': 'alpha', 'paths': [str(self.temp_dir / "alpha")], 'exclude_patterns': ["*.tmp"]},
+                {'name': 'beta', 'paths': [str(self.temp_dir / "beta")]},
+        ]
+        orchestrator = BackupOrchestrator(Mock(), config_provider)
+
+        estimate = orchestrator.estimate_backup_size("repo", ["alpha", "beta"], max_workers=4)
+
+        assert estimate['targets']['alpha']['file_count'] == 30
+        assert estimate['targets']['beta']['file_count'] == 60
+        assert estimate['estimated_files'] == 90
+        assert estimate['estimated_bytes'] == sum(t['total_size'] for t in estimate['targets'].values())
+        assert estimate['scan_duration_seconds'] >= 0
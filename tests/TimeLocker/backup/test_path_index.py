@@ -0,0 +1,109 @@
+"""
+Tests for the path prefix index used by FileSelection
+"""
+
+import shutil
+import tempfile
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.path_index import PathPrefixIndex, split_path
+
+ROOTS = ["/home/user/cache", "/home/user/projects/tmp", "relative/dir", "/srv"]
+
+PATHS = [
+        "/home/user/cache", "/home/user/cache/", "/home/user/cache/a/b.txt", "/home/user/cached/file",
+        "/home/user/projects/tmp/x", "/home/user/projects/tmpfile", "/home/user/projects",
+        "relative/dir/file", "./relative/dir/file", "relative/directory", "/relative/dir/file",
+        "/srv", "/srv/www/index.html", "/srvx", "//srv/file", "/home//user/cache/x", "/",
+]
+
+
+def reference_covers(path, roots):
+    """The relative_to loop FileSelection used before the prefix index"""
+    path_obj = Path(path)
+    for root in roots:
+        try:
+            path_obj.relative_to(root)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+@pytest.mark.parametrize("path", PATHS)
+def test_covers_matches_relative_to(path):
+    """The trie gives the same answer as Path.relative_to against every root"""
+    index = PathPrefixIndex(ROOTS)
+    assert index.covers(path) == reference_covers(path, ROOTS)
+    assert index.covers(Path(path)) == reference_covers(path, ROOTS)
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+@pytest.mark.parametrize("path", ["/a//b/./c/", "//a", "///a", "a/../b", ".", ""])
+def test_split_path_matches_pathlib(path):
+    """String splitting follows PurePath parsing"""
+    assert split_path(path) == PurePosixPath(path).parts
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_index_size():
+    """Duplicate roots are counted once and an empty index is falsy"""
+    assert not PathPrefixIndex()
+    index = PathPrefixIndex(["/a", Path("/a"), "/a/b"])
+    assert len(index) == 2
+
+
+class TestFileSelectionPathIndex:
+    """FileSelection behaviour backed by the path indexes"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for rel in ["keep/a.txt", "skip/b.txt", "skip/deep/c.txt", "keep/skip/d.txt"]:
+            (self.temp_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.temp_dir / rel).write_text(rel)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_index_rebuilt_when_paths_change(self):
+        """Adding and removing paths invalidates the indexes"""
+        selection = FileSelection()
+        selection.add_path(self.temp_dir)
+        assert selection.should_include_file(self.temp_dir / "skip" / "b.txt")
+
+        selection.add_path(self.temp_dir / "skip", SelectionType.EXCLUDE)
+        assert not selection.should_include_file(self.temp_dir / "skip" / "b.txt")
+        assert selection.is_directory_excluded(self.temp_dir / "skip" / "deep")
+        assert not selection.is_directory_excluded(self.temp_dir / "keep" / "skip")
+
+        selection.remove_path(self.temp_dir / "skip", SelectionType.EXCLUDE)
+        assert selection.should_include_file(self.temp_dir / "skip" / "b.txt")
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_walk_skips_excluded_directories(self):
+        """Excluded subtrees are pruned without changing the resulting file set"""
+        selection = FileSelection()
+        selection.add_path(self.temp_dir)
+        selection.add_path(self.temp_dir / "skip", SelectionType.EXCLUDE)
+
+        included = {p.relative_to(self.temp_dir).as_posix() for p in selection.get_effective_paths()["included"]}
+        assert included == {"keep/a.txt", "keep/skip/d.txt"}
+
+        stats = selection.estimate_backup_size()
+        assert stats["file_count"] == 2
+        assert stats["directory_count"] == 3  # root, keep, keep/skip
@@ -0,0 +1,145 @@
+"""
+Tests for the combined pattern matcher used by FileSelection
+"""
+
+import fnmatch
+import os
+import re
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.pattern_matcher import PatternMatcher
+
+PATTERNS = [
+        "*.tmp", "*.TAR.gz", "~*", "*.", "cache", "Thumbs.db", "/abs/literal/file.txt",
+        "__pycache__/*", "node_modules/*", "**/node_modules/*", "**/.git/*",
+        "dir_*/*", "*/file_*", "*/a/b/*", "a*b*c", "[abc]*.log", "file?.txt", "*~", "*",
+]
+
+PATHS = [
+        "report.tmp", "/home/u/report.TMP", "/home/u/archive.tar.gz", "/home/u/archive.gz",
+        "/home/u/~lock", "/home/u/trailing.", "/var/cache", "/var/cache/file",
+        "/home/u/thumbs.db", "/abs/literal/file.txt", "/abs/literal/file.txt.bak",
+        "__pycache__/mod.pyc", "/proj/__pycache__/mod.pyc", "/proj/node_modules/x/y.js",
+        "/proj/.git/HEAD", "node_modules/x", "/node_modules", "/.GIT/config", "dir_1/file",
+        "/x/file_1", "/x/aXbYc", "/x/a/b/c", "/x/b1.log",
+        "/x/file1.txt", "/x/file12.txt", "/x/notes~", "/x/plain", "/ünï/cödé.tmp",
+        "/ünï/ARCHIVE.TAR.GZ", "/x/K.tmp", "/line\nbreak/file.tmp",
+]
+
+
+def reference_matches(path, patterns):
+    """Per-pattern regex loop FileSelection used before the combined matcher"""
+    name = os.path.basename(path)
+    for pattern in patterns:
+        regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+        if regex.match(path) or regex.match(name):
+            return True
+    return False
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_single_pattern_matches_reference(pattern):
+    """Each pattern bucket gives the same answers as the per-pattern regex loop"""
+    matcher = PatternMatcher([pattern])
+    for path in PATHS:
+        assert matcher.matches(path) == reference_matches(path, [pattern]), (pattern, path)
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_combined_patterns_match_reference():
+    """Merging all patterns into one matcher does not change results"""
+    patterns = [p for p in PATTERNS if p != "*"]
+    matcher = PatternMatcher(patterns)
+    for path in PATHS:
+        assert matcher.matches(path) == reference_matches(path, patterns), path
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_pattern_buckets():
+    """Patterns are split into hash, prefix and regex buckets"""
+    matcher = PatternMatcher(["cache", "*.tmp", "~*", "**/.git/*", "a*b*c"])
+    assert matcher.literals == {"cache"}
+    assert matcher.extensions == {".tmp"}
+    assert matcher.prefixes == ("~",)
+    assert matcher.segments == {".git"}
+    assert matcher.regex_patterns == ("a*b*c",)
+    assert len(matcher) == 5
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_empty_matcher():
+    """An empty matcher never matches and is falsy"""
+    matcher = PatternMatcher([])
+    assert not matcher
+    assert not matcher.matches("/any/path")
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_file_selection_uses_matcher():
+    """FileSelection compiles its pattern sets into matchers"""
+    selection = FileSelection()
+    selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+    selection._compile_patterns()
+    assert isinstance(selection._compiled_exclude_patterns, PatternMatcher)
+    assert selection._matches_compiled_patterns("/x/a.TMP", selection._compiled_exclude_patterns)
+
+    selection.add_pattern("*.bak", SelectionType.EXCLUDE)
+    selection._compile_patterns()
+    assert selection._matches_compiled_patterns("/x/a.bak", selection._compiled_exclude_patterns)
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+@pytest.mark.parametrize("directory, expected", [
+        ("/proj/node_modules", True),
+        ("/proj/node_modules/pkg", True),
+        ("/proj/node_modules_old", False),
+        ("/proj/.GIT", True),
+        ("__pycache__", True),
+        ("/proj/__pycache__", False),
+        ("dir_7", True),
+        ("/x/dir_7", False),
+        ("/proj", False),
+])
+def test_matches_directory(directory, expected):
+    """Directory-level patterns prune only subtrees whose every path matches"""
+    patterns = ["**/node_modules/*", "**/.git/*", "__pycache__/*", "dir_*/*", "*.tmp"]
+    matcher = PatternMatcher(patterns)
+    assert matcher.matches_directory(directory) is expected
+    if expected:
+        for rest in ["f", "a/b.txt", "x.TMP"]:
+            assert reference_matches(f"{directory}/{rest}", patterns)
+
+
+@pytest.mark.backup
+@pytest.mark.filesystem
+@pytest.mark.unit
+def test_pattern_excluded_directories_are_pruned(tmp_path):
+    """Traversal skips pattern-excluded subtrees with an unchanged file set"""
+    for rel in ["src/a.py", "src/node_modules/pkg/index.js", "node_modules/b.js",
+                ".git/HEAD", "src/__pycache__/a.pyc", "docs/c.md"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(rel)
+
+    selection = FileSelection()
+    selection.add_path(tmp_path)
+    for pattern in ["**/node_modules/*", "**/.git/*", "**/__pycache__/*"]:
+        selection.add_pattern(pattern, SelectionType.EXCLUDE)
+
+    assert selection.is_directory_excluded(tmp_path / "src" / "node_modules")
+    assert not selection.is_directory_excluded(tmp_path / "src")
+
+    included = {p.relative_to(tmp_path).as_posix() for p in selection.get_effective_paths()["included"]}
+    assert included == {"src/a.py", "docs/c.md"}
+
+    stats = selection.estimate_backup_size()
+    assert stats["file_count"] == 2
+    assert stats["directory_count"] == 3  # root, src, docs
@@ -0,0 +1,121 @@
+"""
+Tests for per-pattern profiling of file selections
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.pattern_matcher import PatternMatcher
+from TimeLocker.pattern_profiler import covers, find_covered_patterns
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+
+
+class TestPatternProfiler:
+    """Test cases for FileSelection.profile_patterns"""
+
+    def setup_method(self):
+        """Create a tree with temporary files, logs and a node_modules directory"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for rel in ["src/a.py", "src/b.py", "src/c.tmp", "src/d.tmp", "src/e.tmp", "logs/app.log",
+                    "node_modules/pkg/index.js", "node_modules/pkg/lib.js", "README"]:
+            (self.temp_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.temp_dir / rel).write_text(rel)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _selection(self) -> FileSelection:
+        selection = FileSelection()
+        selection.add_path(self.temp_dir)
+        for pattern in ["*.log", "*.tmp", "c.tmp", "*.bak", "**/node_modules/*"]:
+            selection.add_pattern(pattern, SelectionType.EXCLUDE)
+        return selection
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_profile_counts_hits_and_prunes(self):
+        """Hits, first matches and directory prunes are attributed per pattern"""
+        selection = self._selection()
+        expected = sorted(map(str, selection.iter_effective_paths()))
+
+        profile = selection.profile_patterns()
+        stats = {s.pattern: s for s in profile.stats}
+
+        assert stats["*.tmp"].hits == 3 and stats["*.tmp"].decisive_hits == 3
+        assert stats["c.tmp"].hits == 1 and stats["c.tmp"].decisive_hits == 0
+        assert stats["*.log"].hits == 1
+        assert stats["**/node_modules/*"].directory_prunes == 1
+        assert stats["*.bak"].tests == profile.files_evaluated == 7
+        assert stats["*.bak"].bucket == "extension"
+        assert [s.pattern for s in profile.unmatched()] == ["*.bak"]
+        assert [s.pattern for s in profile.shadowed()] == ["c.tmp"]
+        assert profile.covered == {"c.tmp": "*.tmp"}
+        # Profiling leaves the selection's behaviour untouched
+        assert sorted(map(str, selection.iter_effective_paths())) == expected
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_reorder_puts_frequent_patterns_first(self):
+        """Suggested order ranks by first matches and reordering keeps results"""
+        selection = self._selection()
+        expected = sorted(map(str, selection.iter_effective_paths()))
+
+        profile = selection.profile_patterns(reorder=True)
+
+        assert profile.suggested_order()[0] == "*.tmp"
+        assert selection._pattern_priority == tuple(profile.suggested_order())
+        assert sorted(map(str, selection.iter_effective_paths())) == expected
+        assert selection.profile_patterns().stats[0].pattern == "*.tmp"
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_pattern_groups_and_orchestrator_report(self):
+        """Pattern groups are summarized and the orchestrator returns plain data"""
+        config_provider = Mock()
+        config_provider.get_backup_targets.return_value = [{
+                'name':             'tree',
+                'paths':            [str(self.temp_dir)],
+                'exclude_patterns': ["*.tmp", "*.temp", "~*", "*.bak", "*.swp", "*.cache",
+                                     "__pycache__/*", "*.pyc", "node_modules/*"],
+        }]
+        analysis = BackupOrchestrator(Mock(), config_provider).analyze_target_patterns('tree')
+
+        assert analysis['target'] == 'tree'
+        group = next(g for g in analysis['groups'] if g['name'] == 'temporary_files')
+        assert group['patterns'] == 9 and group['matched'] == 1 and group['hits'] == 3
+        assert 'node_modules/*' in analysis['unmatched']
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("general,specific,expected", [
+        ("*.tmp", "foo.tmp", True), ("*.tmp", "*x.TMP", True), ("*", "**/cache/*", True),
+        ("*/cache/*", "**/cache/*", True), ("*.tmp", "*.log", False), ("a?c", "a*c", False),
+        ("*.tmp", "[ab].tmp", False), ("**/cache/*", "cache/*", False),
+])
+def test_covers(general, specific, expected):
+    """Coverage is only claimed when it holds for every path"""
+    assert covers(general, specific) is expected
+
+
+@pytest.mark.unit
+def test_covered_claims_hold_on_sample_paths():
+    """No path matched by a covered pattern escapes its covering pattern"""
+    patterns = ["*.tmp", "*.TMP", "build/*", "build/out/*", "*/build/*", "*.o", "x*.o", "?.o"]
+    samples = ["a.tmp", "B.TMP", "build/out/a.o", "/src/build/x.o", "x1.o", "q.o", "/build/y"]
+    covered = find_covered_patterns(patterns)
+
+    assert set(covered) == {"*.tmp", "build/out/*", "x*.o", "?.o"}
+    for specific, general in covered.items():
+        for path in samples:
+            if PatternMatcher([specific]).matches(path):
+                assert PatternMatcher([general]).matches(path), (specific, general, path)
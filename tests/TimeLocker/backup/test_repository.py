@@ -42,7 +42,8 @@ class MockTestBackupRepository(BackupRepository):
     def check(self) -> bool:
         return self._initialized
 
-    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None) -> Dict:
+    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None,
+                      progress_callback=None, cancel_event=None) -> Dict:
         if not targets:
             return {"error": "No backup targets provided"}
         if tags and not all(isinstance(tag, str) for tag in tags):
@@ -0,0 +1,144 @@
+"""
+Tests for the per-repository lock governor and the orchestrator's job queue
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from TimeLocker.interfaces import BackupCancellationError, BackupStatus
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+from TimeLocker.services.repository_governor import LockMode, RepositoryGovernor, lock_mode_for
+
+
+class _Recorder:
+    """Records overlapping operations per repository"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = []
+        self.overlaps = []
+        self.order = []
+
+    def run(self, name, duration=0.05):
+        with self.lock:
+            self.overlaps.append((name, tuple(self.running)))
+            self.running.append(name)
+            self.order.append(name)
+        time.sleep(duration)
+        with self.lock:
+            self.running.remove(name)
+        return name
+
+
+@pytest.mark.unit
+def test_lock_modes():
+    """restic commands map to the lock they take; unknown commands are exclusive"""
+    assert lock_mode_for("backup") is LockMode.SHARED
+    assert lock_mode_for("prune") is LockMode.EXCLUSIVE
+    assert lock_mode_for("check") is LockMode.EXCLUSIVE
+    assert lock_mode_for("unlock") is LockMode.NONE
+    assert lock_mode_for("something-new") is LockMode.EXCLUSIVE
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_shared_run_together_and_exclusive_alone():
+    """Queued shared jobs overlap; an exclusive job runs alone and is not overtaken"""
+    governor = RepositoryGovernor()
+    recorder = _Recorder()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [governor.submit(executor, "repo", mode, lambda grant, name=name: recorder.run(name))
+                   for name, mode in [("b1", LockMode.SHARED), ("b2", LockMode.SHARED),
+                                      ("prune", LockMode.EXCLUSIVE), ("b3", LockMode.SHARED)]]
+        other = governor.submit(executor, "other", LockMode.EXCLUSIVE, lambda grant: recorder.run("other"))
+        assert [f.result(5) for f in futures] == ["b1", "b2", "prune", "b3"]
+        other.result(5)
+
+    overlaps = dict(recorder.overlaps)
+    assert set(overlaps["prune"]) <= {"other"}
+    assert set(overlaps["b3"]) <= {"other"}
+    assert recorder.order.index("b3") > recorder.order.index("prune")
+    assert any(overlaps[name] for name in ("b1", "b2"))  # the two backups overlapped
+
+    stats = governor.statistics("repo")
+    assert stats["acquisitions"] == 4 and stats["contended"] >= 2
+    assert stats["max_wait_seconds"] >= 0.04 and stats["queued"] == 0
+    assert not stats["shared_holders"] and not stats["exclusive_held"]
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_acquire_is_reentrant_and_cancellable():
+    """A holder may re-acquire; a cancelled waiter leaves the queue"""
+    governor = RepositoryGovernor()
+    with governor.acquire("repo", LockMode.EXCLUSIVE) as outer:
+        with governor.acquire("repo", LockMode.SHARED) as inner:
+            assert inner is outer
+
+        cancel = threading.Event()
+        errors = []
+
+        def wait_for_lock():
+            try:
+                with governor.acquire("repo", LockMode.SHARED, cancel_event=cancel):
+                    pass
+            except BackupCancellationError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait_for_lock)
+        waiter.start()
+        time.sleep(0.05)
+        assert governor.statistics("repo")["queued"] == 1
+        cancel.set()
+        waiter.join(2)
+        assert errors and governor.statistics("repo")["queued"] == 0
+
+    with governor.acquire("repo", LockMode.SHARED):
+        with pytest.raises(RuntimeError):
+            with governor.acquire("repo", LockMode.EXCLUSIVE):
+                pass
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_cancel_queued_job():
+    """Cancelling a queued job's future removes it before it runs"""
+    governor = RepositoryGovernor()
+    ran = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with governor.acquire("repo", LockMode.EXCLUSIVE):
+            future = governor.submit(executor, "repo", LockMode.SHARED, lambda grant: ran.append(1))
+            assert future.cancel()
+        assert governor.submit(executor, "repo", LockMode.SHARED, lambda grant: "ok").result(5) == "ok"
+    assert ran == []
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_orchestrator_records_lock_wait(tmp_path):
+    """Queued backups wait for an exclusive verification and record the wait"""
+    config_provider = Mock()
+    config_provider.get_repositories.return_value = [{'name': 'main', 'uri': str(tmp_path / "repo")}]
+    config_provider.get_backup_targets.return_value = [{'name': 'docs', 'paths': [str(tmp_path)]}]
+    repository = Mock()
+    repository.backup_target.return_value = {'snapshot_id': 'abc123'}
+    repository.verify_backup.side_effect = lambda snapshot_id: time.sleep(0.2) or True
+    factory = Mock()
+    factory.create_repository.return_value = repository
+    orchestrator = BackupOrchestrator(factory, config_provider)
+
+    verifier = threading.Thread(target=orchestrator.verify_backup_integrity, args=("main",))
+    verifier.start()
+    time.sleep(0.05)
+    operation_id = orchestrator.submit_backup("main", ["docs"])
+    result = orchestrator.wait_for_backup(operation_id, timeout=5)
+    verifier.join(5)
+
+    assert result.status == BackupStatus.COMPLETED
+    assert result.metadata['lock_wait_seconds'] >= 0.1
+    assert orchestrator.repository_governor.statistics(str(tmp_path / "repo"))["acquisitions"] == 2
+    assert orchestrator.wait_for_backup(operation_id) is None
@@ -0,0 +1,183 @@
+"""
+Tests for the repository instance pool behind RepositoryFactory
+"""
+
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from TimeLocker.backup_manager import BackupManager
+from TimeLocker.backup_repository import BackupRepository
+from TimeLocker.interfaces import RepositoryFactoryError
+from TimeLocker.restic.restic_repository import ResticRepository
+from TimeLocker.services import repository_factory
+from TimeLocker.services.repository_factory import RepositoryFactory
+from TimeLocker.services.repository_pool import RepositoryPool, make_pool_key
+
+
+class _CountingRepository(BackupRepository):
+    """Registered for local paths; records every construction"""
+    builds = []
+    fail = False
+
+    @classmethod
+    def from_parsed_uri(cls, parsed, **kwargs):
+        if cls.fail:
+            raise ValueError("backend unavailable")
+        repository = Mock(spec=BackupRepository)
+        repository.location = parsed.path
+        repository.options = kwargs
+        cls.builds.append(repository)
+        return repository
+
+
+@pytest.fixture
+def factory():
+    _CountingRepository.builds = []
+    _CountingRepository.fail = False
+    factory = RepositoryFactory(pool_size=2)
+    factory.register_repository_type("local", _CountingRepository)
+    factory._credential_manager = Mock(revision=0)
+    factory._credential_manager.is_locked.return_value = False
+    return factory
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_same_request_reuses_instance(factory):
+    """Same URI, name, options and credentials share one instance"""
+    first = factory.create_repository("/repos/a", password="pw", repository_name="a")
+
+    assert factory.create_repository("/repos/a", password="pw", repository_name="a") is first
+    assert factory.create_repository("/repos/a", password="other", repository_name="a") is not first
+    assert factory.create_repository("/repos/a", password="pw", repository_name="b") is not first
+    assert factory.repository_pool.hits == 1 and factory.repository_pool.misses == 3
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_lru_eviction(factory):
+    """The least recently used instance is dropped beyond the pool size"""
+    a = factory.create_repository("/repos/a")
+    b = factory.create_repository("/repos/b")
+    assert factory.create_repository("/repos/a") is a  # a is now most recent
+    factory.create_repository("/repos/c")
+
+    assert len(factory.repository_pool) == 2 and factory.repository_pool.evictions == 1
+    assert factory.create_repository("/repos/a") is a
+    assert factory.create_repository("/repos/b") is not b
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_explicit_invalidation(factory):
+    """Instances are dropped by repository name, by URI, or all at once"""
+    named = factory.create_repository("/repos/a", repository_name="a")
+    other = factory.create_repository("/repos/b", repository_name="b")
+
+    assert factory.invalidate_repository(repository_name="a") == 1
+    assert factory.create_repository("/repos/a", repository_name="a") is not named
+    assert factory.create_repository("/repos/b", repository_name="b") is other
+
+    assert factory.invalidate_repository(uri="/repos/b") == 1
+    factory.clear_repository_pool()
+    assert len(factory.repository_pool) == 0
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_credential_changes_miss_the_pool(factory, monkeypatch):
+    """Credential store writes and credential environment changes yield new instances"""
+    first = factory.create_repository("/repos/a")
+
+    factory._credential_manager.revision = 1
+    second = factory.create_repository("/repos/a")
+    assert second is not first
+
+    monkeypatch.setenv("RESTIC_PASSWORD", "from-env")
+    assert factory.create_repository("/repos/a") is not second
+    monkeypatch.setenv("UNRELATED_SETTING", "1")
+    assert factory.create_repository("/repos/a") is factory.create_repository("/repos/a")
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_failures_and_unhashable_options_are_not_pooled(factory):
+    """Failed constructions are not remembered and unhashable options bypass the pool"""
+    _CountingRepository.fail = True
+    with pytest.raises(RepositoryFactoryError):
+        factory.create_repository("/repos/a")
+    _CountingRepository.fail = False
+
+    factory.create_repository("/repos/a")
+    assert len(_CountingRepository.builds) == 1
+
+    first = factory.create_repository("/repos/b", extra={"k": "v"})
+    assert factory.create_repository("/repos/b", extra={"k": "v"}) is not first
+    assert make_pool_key(_CountingRepository, "/repos/b", None, None, {"tags": ["x"]}).options == (("tags", ("x",)),)
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_concurrent_requests_build_once():
+    """Threads asking for the same key share a single construction"""
+    pool = RepositoryPool()
+    key = make_pool_key(_CountingRepository, "/repos/a", None, None, {})
+    builds = []
+
+    def create():
+        builds.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get_or_create(key, create))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_invalidation_during_construction_is_not_kept():
+    """An instance invalidated while being built is returned but not pooled"""
+    pool = RepositoryPool()
+    key = make_pool_key(_CountingRepository, "/repos/a", None, None, {})
+
+    def create():
+        pool.invalidate(uri="/repos/a")
+        return object()
+
+    built = pool.get_or_create(key, create)
+    assert built is not None and len(pool) == 0
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_pool_disabled(factory):
+    """A pool size of zero builds every time"""
+    unpooled = RepositoryFactory(pool_size=0)
+    unpooled.register_repository_type("local", _CountingRepository)
+    unpooled._credential_manager = factory._credential_manager
+
+    assert unpooled.create_repository("/repos/a") is not unpooled.create_repository("/repos/a")
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_from_uri_reuses_restic_repository(tmp_path):
+    """BackupManager.from_uri goes through the shared pool"""
+    location = str(tmp_path / "repo")
+    with patch.object(ResticRepository, "_verify_restic_executable", return_value="0.18.0") as verify:
+        try:
+            first = BackupManager.from_uri(location, password="secret")
+            assert BackupManager.from_uri(location, password="secret") is first
+            assert verify.call_count == 1
+        finally:
+            repository_factory.invalidate_repository(uri=location)
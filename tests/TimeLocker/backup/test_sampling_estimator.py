@@ -0,0 +1,128 @@
+"""
+Tests for time-budgeted sampling size estimates
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.sampling_estimator import EXACT_STRATUM_DIRECTORIES, SamplingEstimator
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+
+
+class TestSamplingEstimator:
+    """Test cases for SamplingEstimator"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _small_tree(self) -> FileSelection:
+        root = self.temp_dir / "small"
+        for d in range(4):
+            nested = root / f"dir_{d}" / "nested"
+            nested.mkdir(parents=True)
+            for f in range(3):
+                (nested / f"file_{f}.dat").write_bytes(b"x" * (f + d + 1))
+                (nested / f"file_{f}.tmp").write_bytes(b"tmp")
+        (root / "top.txt").write_text("top")
+        selection = FileSelection()
+        selection.add_path(root)
+        selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+        return selection
+
+    def _wide_tree(self) -> FileSelection:
+        """Two strata, each too large to enumerate, with uniform branching"""
+        root = self.temp_dir / "wide"
+        for stratum in range(2):
+            for a in range(EXACT_STRATUM_DIRECTORIES // 4):
+                for b in range(5):
+                    leaf = root / f"s{stratum}" / f"a{a}" / f"b{b}"
+                    leaf.mkdir(parents=True)
+                    for f in range(2 + (a + b) % 3):
+                        (leaf / f"f{f}").write_bytes(b"y" * 100)
+        selection = FileSelection()
+        selection.add_path(root)
+        return selection
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_small_tree_is_exact(self):
+        """Strata small enough to enumerate are counted exactly with no error"""
+        selection = self._small_tree()
+        exact = selection.estimate_backup_size()
+        sampled = selection.sample_backup_size(time_budget=5.0, seed=1)
+
+        for key in ("file_count", "apparent_size", "directory_count"):
+            assert sampled[key] == exact[key]
+        assert sampled["file_count_error"] == 0
+        assert sampled["total_size_error"] == 0
+        assert sampled["strata_sampled"] == sampled["strata"] == 4
+        assert set(exact) <= set(sampled)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_large_tree_estimate_within_bounds(self):
+        """Sampled strata give an estimate near the exact totals with a positive error bound"""
+        selection = self._wide_tree()
+        exact = selection.estimate_backup_size()
+        sampled = SamplingEstimator(selection, time_budget=1.0, seed=7).estimate()
+
+        assert sampled["sampled"] is True
+        assert sampled["probes"] > sampled["strata"]
+        assert sampled["file_count_error"] > 0
+        # Uniform fan-out keeps the per-probe variance low, so a generous margin is stable
+        assert abs(sampled["file_count"] - exact["file_count"]) <= max(3 * sampled["file_count_error"],
+                                                                       exact["file_count"] * 0.25)
+        assert sampled["directory_count"] == exact["directory_count"]
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_time_budget_is_respected(self):
+        """Sampling stops close to the requested budget"""
+        sampled = self._wide_tree().sample_backup_size(time_budget=0.2, seed=3)
+        assert sampled["elapsed_seconds"] < 2.0
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_excluded_roots_and_invalid_confidence(self):
+        """Excluded directories are skipped and the confidence level is validated"""
+        selection = self._small_tree()
+        selection.add_path(self.temp_dir / "small" / "dir_0", SelectionType.EXCLUDE)
+        sampled = selection.sample_backup_size(time_budget=1.0, seed=1)
+        assert sampled["file_count"] == selection.estimate_backup_size()["file_count"]
+
+        with pytest.raises(ValueError):
+            SamplingEstimator(selection, confidence=1.5)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_orchestrator_sampled_estimate(self):
+        """The orchestrator adds combined error bounds when sampling"""
+        config_provider = Mock()
+        config_provider.get_backup_targets.return_value = [
+                {'name': 'small', 'paths': [str(self.temp_dir / "small")], 'exclude_patterns': ['*.tmp']},
+        ]
+        self._small_tree()
+        orchestrator = BackupOrchestrator(Mock(), config_provider)
+
+        estimate = orchestrator.estimate_backup_size("", ["small"], sample_seconds=1.0)
+
+        assert estimate['sampled'] is True
+        assert estimate['estimated_files'] == 4 * 3 + 1
+        assert estimate['estimated_files_error'] == 0
+        assert 'total_size_error' in estimate['targets']['small']
@@ -0,0 +1,156 @@
+"""
+Tests for the persistent directory scan cache
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.scan_cache import DirectoryAggregate, ScanCache
+
+
+def age_tree(root: Path, seconds: int = 60):
+    """Move directory mtimes out of the racy window so they can be cached"""
+    past = time.time() - seconds
+    for dir_path, _, _ in os.walk(root):
+        os.utime(dir_path, (past, past))
+
+
+class TestScanCache:
+    """Test cases for ScanCache and cached size estimation"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.tree = self.temp_dir / "tree"
+        self.cache_dir = self.temp_dir / "cache"
+        for d in range(4):
+            for sub in ["a", "b"]:
+                dir_path = self.tree / f"dir_{d}" / sub
+                dir_path.mkdir(parents=True)
+                for f in range(3):
+                    (dir_path / f"file_{f}.dat").write_bytes(b"x" * (10 + f))
+                (dir_path / "skip.tmp").write_bytes(b"tmp")
+        age_tree(self.tree)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _selection(self) -> FileSelection:
+        selection = FileSelection()
+        selection.add_path(self.tree)
+        selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+        return selection
+
+    def _cache(self, selection: FileSelection) -> ScanCache:
+        return ScanCache(selection.scan_fingerprint(), cache_dir=self.cache_dir)
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_repeat_estimate_reuses_unchanged_directories(self):
+        """A second estimate answers every unchanged directory from the cache"""
+        selection = self._selection()
+        expected = selection.estimate_backup_size()
+
+        first = self._cache(selection)
+        assert selection.estimate_backup_size(scan_cache=first) == expected
+        assert first.hits == 0 and first.path.exists()
+
+        second = self._cache(selection)
+        assert selection.estimate_backup_size(scan_cache=second) == expected
+        assert second.hits == expected["directory_count"]
+        assert second.misses == 0
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_changed_directory_is_rescanned(self):
+        """Adding a file changes the directory mtime and only that directory is rescanned"""
+        selection = self._selection()
+        selection.estimate_backup_size(scan_cache=self._cache(selection))
+
+        (self.tree / "dir_2" / "b" / "new.dat").write_bytes(b"y" * 100)
+        (self.tree / "dir_3" / "c").mkdir()
+        (self.tree / "dir_3" / "c" / "deep.dat").write_bytes(b"z" * 7)
+
+        cache = self._cache(selection)
+        stats = selection.estimate_backup_size(scan_cache=cache)
+        assert stats == self._selection().estimate_backup_size()
+        assert cache.misses == 3  # dir_2/b, dir_3 and the new dir_3/c
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_pattern_change_invalidates(self):
+        """A different selection never reads another selection's records"""
+        selection = self._selection()
+        selection.estimate_backup_size(scan_cache=self._cache(selection))
+
+        changed = self._selection()
+        changed.add_pattern("file_0.dat", SelectionType.EXCLUDE)
+        assert changed.scan_fingerprint() != selection.scan_fingerprint()
+
+        cache = self._cache(changed)
+        assert cache.load() == 0
+        stats = changed.estimate_backup_size(scan_cache=cache)
+        assert stats["file_count"] == 8 * 2
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_recent_directories_are_not_cached(self):
+        """Directories modified within the racy window are always rescanned"""
+        selection = self._selection()
+        now = time.time()
+        os.utime(self.tree / "dir_0", (now, now))
+        selection.estimate_backup_size(scan_cache=self._cache(selection))
+
+        cache = self._cache(selection)
+        selection.estimate_backup_size(scan_cache=cache)
+        assert cache.misses == 1
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_format_round_trip_and_corruption(self):
+        """Records survive a save/load cycle and corrupt files are discarded"""
+        cache = ScanCache("f" * 64, cache_dir=self.cache_dir)
+        cache.load()
+        record = DirectoryAggregate(1_000_000_000, 42, 3, 300, 200, 4096, 4, ("a", "b\nc", "\udcff"),
+                                    ((2049, 1 << 63, 100, 512),))
+        cache.store("/some/dir", record)
+        assert cache.save()
+
+        reloaded = ScanCache("f" * 64, cache_dir=self.cache_dir)
+        assert reloaded.load() == 1
+        stat_result = SimpleNamespace(st_mtime_ns=1_000_000_000, st_ino=42)
+        assert reloaded.lookup("/some/dir", stat_result) == record
+
+        reloaded.path.write_bytes(reloaded.path.read_bytes()[:-5])
+        assert ScanCache("f" * 64, cache_dir=self.cache_dir).load() == 0
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_size_limit_evicts_oldest_files(self):
+        """Saving enforces the total size limit by removing older cache files"""
+        for index, fingerprint in enumerate(["a" * 64, "b" * 64, "c" * 64]):
+            cache = ScanCache(fingerprint, cache_dir=self.cache_dir, max_bytes=300)
+            cache.load()
+            for d in range(5):
+                cache.store(f"/dir/{d}", DirectoryAggregate(1, d, d, d, d, d, d, ()))
+            assert cache.save()
+            past = time.time() - 100 + index
+            os.utime(cache.path, (past, past))
+
+        remaining = sorted(p.name[0] for p in self.cache_dir.glob("*.scan"))
+        assert "c" in remaining
+        assert sum(p.stat().st_size for p in self.cache_dir.glob("*.scan")) <= 300
+        assert ScanCache.clear(self.cache_dir) == len(remaining)
@@ -0,0 +1,141 @@
+"""
+Tests for the on-disk cache of compiled file selections
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.pattern_matcher import PatternMatcher
+from TimeLocker.selection_cache import SelectionCache
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+
+PROBE_PATHS = [
+        "/data/docs/report.pdf", "/data/docs/notes.tmp", "/data/node_modules/pkg/index.js",
+        "/data/skip/file.txt", "/data/src/Main.PY", "/data/ünïcode/файл.txt", "/other/file.py",
+        "/data/build/out/app.o", "/data/.cache/x",
+]
+
+
+class TestSelectionCache:
+    """Test cases for SelectionCache and compiled selection state"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cache = SelectionCache(self.temp_dir / "selections")
+        self.config = {
+                'name':             'docs',
+                'paths':            ['/data', '/other/file.py'],
+                'exclude_patterns': ['*.tmp', '**/node_modules/*', '/data/skip', 'build*', '*/.cache/*', '*.о'],
+                'include_patterns': ['*.py'],
+        }
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _orchestrator(self, configs) -> BackupOrchestrator:
+        config_provider = Mock()
+        config_provider.get_backup_targets.return_value = configs
+        return BackupOrchestrator(Mock(), config_provider, selection_cache=self.cache)
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_compiled_state_round_trip(self):
+        """A restored selection makes the same decisions as the original"""
+        original = BackupOrchestrator._build_selection(self.config)
+        original.add_path("/data/excluded", SelectionType.EXCLUDE)
+        restored = FileSelection.from_compiled_state(original.to_compiled_state())
+
+        assert restored.includes == original.includes
+        assert restored.exclude_patterns == original.exclude_patterns
+        for path in PROBE_PATHS:
+            assert restored.should_include_file(path) == original.should_include_file(path), path
+        for directory in ["/data/node_modules", "/data/excluded/sub", "/data"]:
+            assert restored.is_directory_excluded(directory) == original.is_directory_excluded(directory)
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_compiled_state_keeps_groups_and_priority(self):
+        """Pattern groups can still be removed after a restore, and the profiled order survives"""
+        original = FileSelection()
+        original.add_path("/data")
+        original.add_pattern_group("temporary_files", SelectionType.EXCLUDE)
+        original.add_pattern("*.log", SelectionType.EXCLUDE)
+        original.set_pattern_priority(["*.log", "*.tmp"])
+        restored = FileSelection.from_compiled_state(original.to_compiled_state())
+
+        assert restored._pattern_priority == ("*.log", "*.tmp")
+        assert restored.should_include_file("/data/a.tmp") is False
+        restored.remove_pattern_group("temporary_files", SelectionType.EXCLUDE)
+
+        assert restored.exclude_patterns == {"*.log"}
+        assert restored.should_include_file("/data/a.tmp") is True
+        assert restored.should_include_file("/data/a.log") is False
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_second_load_skips_compilation(self):
+        """The second invocation restores the selection without building matchers"""
+        first = self._orchestrator([self.config])._get_backup_targets(['docs'])[0].selection
+        assert self.cache.misses == 1 and self.cache.path_for(self.config).exists()
+
+        with patch.object(PatternMatcher, "__init__", side_effect=AssertionError("recompiled")):
+            second = self._orchestrator([self.config])._get_backup_targets(['docs'])[0].selection
+
+        assert self.cache.hits == 1
+        for path in PROBE_PATHS:
+            assert second.should_include_file(path) == first.should_include_file(path), path
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_key_follows_selection_config(self):
+        """Only selection-relevant keys change the cache key, independent of order"""
+        key = SelectionCache.config_key(self.config)
+        reordered = dict(self.config, paths=list(reversed(self.config['paths'])), tags=['new'], name='renamed')
+        assert SelectionCache.config_key(reordered) == key
+        changed = dict(self.config, exclude_patterns=self.config['exclude_patterns'] + ['*.log'])
+        assert SelectionCache.config_key(changed) != key
+        with patch("TimeLocker.__version__", "0.0.0-upgraded"):
+            assert SelectionCache.config_key(self.config) != key
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_corrupt_file_is_rebuilt(self):
+        """Unreadable cache files are discarded and rebuilt"""
+        path = self.cache.path_for(self.config)
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"TLSL\x01garbage")
+
+        selection = self.cache.get_or_build(self.config, BackupOrchestrator._build_selection)
+
+        assert self.cache.misses == 1
+        assert selection.should_include_file("/data/docs/report.pdf")
+        assert self.cache.load(self.config) is not None
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_file_limit_and_clear(self):
+        """Old cache files are evicted beyond max_files and clear removes the rest"""
+        cache = SelectionCache(self.temp_dir / "limited", max_files=2)
+        for i in range(4):
+            cache.store(dict(self.config, paths=[f"/data/{i}"]), FileSelection())
+        assert len(list((self.temp_dir / "limited").glob("*.sel"))) == 2
+        assert SelectionCache.clear(self.temp_dir / "limited") == 2
+
+
+@pytest.mark.unit
+def test_pattern_matcher_compiles_lazily():
+    """Regexes are compiled on first use and survive a state round trip"""
+    matcher = PatternMatcher(["*.log", "*/data/*.c?v", "**/cache/*"])
+    assert "_regex" not in vars(matcher)
+    restored = PatternMatcher.from_state(matcher.to_state())
+    assert restored.matches("/x/data/a.csv") and not restored.matches("/x/data/a.txt")
+    assert restored.matches_directory("/home/cache")
+    assert "_regex" in vars(restored)
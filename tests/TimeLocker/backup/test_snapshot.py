@@ -15,7 +15,7 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import pytest
@@ -308,3 +308,68 @@ def test_verify_snapshot_integrity():
 
     # Assert
     assert result == False, "Verify method should return False for an unimplemented verify method"
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_from_listing_shares_compact_fields():
+    """
+    Test that snapshots built from a listing keep its tuples and build paths and timestamps on access.
+    """
+    repo = MockBackupRepository()
+    zone = timezone(timedelta(hours=2))
+    paths, tags = ("/home", "/etc"), ("daily",)
+    time_ns = 1_743_275_374_068_185_654
+
+    first = BackupSnapshot.from_listing(repo, "aaaaaaaa", time_ns, zone, paths, tags, "alpha")
+    second = BackupSnapshot.from_listing(repo, "bbbbbbbb", time_ns, zone, paths, tags)
+
+    assert first._paths is second._paths and first._tags is second._tags
+    assert first.paths == [Path("/home"), Path("/etc")]
+    assert first.paths[0] is second.paths[0]
+    assert first.timestamp == datetime(2025, 3, 29, 21, 9, 34, 68185, tzinfo=zone)
+    assert first.timestamp.utcoffset() == timedelta(hours=2)
+    assert first.timestamp_ns == time_ns
+    assert (first.hostname, first.tags) == ("alpha", ["daily"])
+    assert second.hostname is None
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_compact_fields_round_trip_through_setters():
+    """
+    Test that naive and aware timestamps, paths and tags read back as they were assigned.
+    """
+    naive = datetime(2024, 2, 29, 23, 59, 59, 999999)
+    aware = datetime(1969, 12, 31, 12, tzinfo=timezone(-timedelta(hours=5)))
+    snapshot = BackupSnapshot(MockBackupRepository(), "test_id", naive, [Path("/a"), Path("/b")])
+
+    assert snapshot.tags == [] and snapshot.hostname is None
+    assert snapshot.timestamp == naive and snapshot.timestamp.tzinfo is None
+    snapshot.timestamp = aware
+    assert snapshot.timestamp == aware and snapshot.timestamp.utcoffset() == aware.utcoffset()
+    snapshot.timestamp = None
+    assert snapshot.timestamp is None and snapshot.timestamp_ns is None
+
+    assert snapshot.paths == [Path("/a"), Path("/b")]
+    snapshot.tags = ["daily"]
+    assert snapshot.tags == ["daily"]
+    assert not hasattr(snapshot, "__dict__")
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_listed_paths_and_tags_change_in_place():
+    """
+    Test that the lists read from a listed snapshot are kept, so changing them changes the snapshot.
+    """
+    shared = ("/data",)
+    first = BackupSnapshot.from_listing(MockBackupRepository(), "first", 0, timezone.utc, shared, ("daily",))
+    second = BackupSnapshot.from_listing(MockBackupRepository(), "second", 0, timezone.utc, shared, ("daily",))
+
+    first.paths.append(Path("/etc"))
+    first.tags.extend(["weekly"])
+
+    assert first.paths == [Path("/data"), Path("/etc")] and first.paths is first.paths
+    assert first.tags == ["daily", "weekly"] and first.tags is first.tags
+    assert second.paths == [Path("/data")] and second.tags == ["daily"]
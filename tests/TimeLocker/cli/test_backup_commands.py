@@ -235,3 +235,62 @@ class TestBackupCommands:
             # Verbose flag should be accepted
             # Range allowed: may fail (1) if no repository configured or succeed (0)
             assert result.exit_code in [0, 1]
+
+
+class TestBackupEstimateCommand:
+    """Test suite for the backup estimate command."""
+
+    @pytest.mark.unit
+    def test_backup_estimate_help(self):
+        """Test backup estimate command help output."""
+        result = runner.invoke(app, ["backup", "estimate", "--help"])
+        assert_help_quality(result, "backup estimate")
+
+        combined = combined_output(result)
+        assert "--target" in combined or "-t" in combined
+        assert "--workers" in combined or "-w" in combined
+
+    @pytest.mark.unit
+    @patch('src.TimeLocker.cli.get_cli_service_manager')
+    def test_backup_estimate_passes_workers(self, mock_service_manager):
+        """Test backup estimate forwards targets and worker count to the service."""
+        mock_manager = Mock()
+        mock_service_manager.return_value = mock_manager
+        mock_manager.estimate_backup_size = Mock(return_value={
+                'estimated_files':       3,
+                'estimated_bytes':       2048,
+                'estimated_directories': 1,
+                'scan_duration_seconds': 0.01,
+                'targets':               {'docs': {'file_count': 3, 'directory_count': 1, 'total_size': 2048}}
+        })
+
+        result = runner.invoke(app, ["backup", "estimate", "--target", "docs", "--workers", "4"])
+
+        assert_success(result)
+        mock_manager.estimate_backup_size.assert_called_once_with(
+                repository_input="", target_names=["docs"], max_workers=4, use_scan_cache=True, sample_seconds=None)
+        assert_output_contains(result, "docs")
+
+    @pytest.mark.unit
+    @patch('src.TimeLocker.cli.get_cli_service_manager')
+    def test_backup_estimate_sampled(self, mock_service_manager):
+        """Test backup estimate --sample forwards the budget and shows error bounds."""
+        mock_manager = Mock()
+        mock_service_manager.return_value = mock_manager
+        mock_manager.estimate_backup_size = Mock(return_value={
+                'estimated_files':       1000,
+                'estimated_files_error': 50,
+                'estimated_bytes':       4096,
+                'estimated_bytes_error': 1024,
+                'estimated_directories': 10,
+                'sampled':               True,
+                'targets':               {'docs': {'file_count': 1000, 'file_count_error': 50,
+                                                   'directory_count': 10, 'total_size': 4096,
+                                                   'total_size_error': 1024}}
+        })
+
+        result = runner.invoke(app, ["backup", "estimate", "--target", "docs", "--sample", "0.5"])
+
+        assert_success(result)
+        assert mock_manager.estimate_backup_size.call_args.kwargs["sample_seconds"] == 0.5
+        assert_output_contains(result, "± 50")
@@ -265,6 +265,37 @@ class TestTargetsCommands:
         # Mocked service manager returns success, should exit 0
         assert_success(result)
 
+    @pytest.mark.unit
+    @patch('src.TimeLocker.cli.get_cli_service_manager')
+    def test_targets_analyze_command(self, mock_service_manager):
+        """Test targets analyze reports pattern statistics and redundancy."""
+        mock_manager = Mock()
+        mock_service_manager.return_value = mock_manager
+        mock_manager.analyze_target_patterns.return_value = {
+                'target':          'test-target',
+                'files_evaluated': 120,
+                'elapsed_seconds': 0.05,
+                'patterns':        [
+                        {'pattern': '*.tmp', 'kind': 'exclude', 'bucket': 'extension', 'hits': 7,
+                         'decisive_hits': 7, 'directory_prunes': 0, 'evaluations': 120, 'match_ns': 50000},
+                        {'pattern': 'foo.tmp', 'kind': 'exclude', 'bucket': 'literal', 'hits': 1,
+                         'decisive_hits': 0, 'directory_prunes': 0, 'evaluations': 113, 'match_ns': 20000},
+                ],
+                'unmatched':       [],
+                'shadowed':        ['foo.tmp'],
+                'covered':         {'foo.tmp': '*.tmp'},
+                'groups':          [],
+                'suggested_order': ['*.tmp', 'foo.tmp'],
+        }
+
+        result = runner.invoke(app, ["targets", "analyze", "test-target"])
+
+        assert_success(result)
+        mock_manager.analyze_target_patterns.assert_called_once_with(target_name="test-target")
+        combined = _combined_output(result)
+        assert "*.tmp" in combined
+        assert "redundant" in combined
+
     @pytest.mark.unit
     def test_targets_add_nonexistent_path(self):
         """Test targets add command with nonexistent path."""
@@ -0,0 +1,180 @@
+"""
+Tests for running commands from an event loop with CommandBuilder.run_async and stream_async
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from TimeLocker.command_builder import (
+    CommandBuilder,
+    CommandDefinition,
+    CommandOutputLimitError,
+    CommandParameter,
+    ParameterStyle,
+)
+
+POSIX_ONLY = pytest.mark.skipif(os.name == "nt", reason="process checks use POSIX signals")
+
+
+def _python(script: str) -> CommandBuilder:
+    definition = CommandDefinition(sys.executable,
+                                   parameters={"c": CommandParameter(name="c", style=ParameterStyle.SINGLE_DASH)})
+    return CommandBuilder(definition).param("c", script)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class _CountingSemaphore(asyncio.Semaphore):
+    """Semaphore recording the most holders it had at once"""
+
+    def __init__(self, value: int):
+        super().__init__(value)
+        self.held = 0
+        self.peak = 0
+
+    async def acquire(self):
+        await super().acquire()
+        self.held += 1
+        self.peak = max(self.peak, self.held)
+        return True
+
+    def release(self):
+        self.held -= 1
+        super().release()
+
+
+@pytest.mark.unit
+def test_run_async_returns_output_with_env():
+    """Output is returned and extra variables are added to the inherited environment"""
+    script = "import os; print(os.environ['TL_ASYNC_TEST'], 'PATH' in os.environ)"
+
+    output = asyncio.run(_python(script).run_async(env={"TL_ASYNC_TEST": "hello"}))
+
+    assert output == "hello True\n"
+
+
+@pytest.mark.unit
+def test_run_async_failure_carries_stderr():
+    """A non-zero exit raises CalledProcessError with stderr, as run() does"""
+    script = "import sys; sys.stderr.write('boom'); sys.exit(3)"
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        asyncio.run(_python(script).run_async())
+
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.stderr == "boom"
+
+
+@pytest.mark.unit
+def test_run_async_output_limit():
+    """Output beyond max_output is refused instead of being buffered"""
+    script = "import sys; sys.stdout.write('x' * 300000)"
+
+    with pytest.raises(CommandOutputLimitError):
+        asyncio.run(_python(script).run_async(max_output=100000))
+
+
+@POSIX_ONLY
+@pytest.mark.unit
+def test_run_async_timeout_stops_command(tmp_path: Path):
+    """A timed-out command is stopped and reported as TimeoutExpired"""
+    pid_file = tmp_path / "pid"
+    script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(60)"
+
+    async def scenario():
+        # Long enough for the child to start and write its pid even on a loaded machine
+        task = asyncio.ensure_future(_python(script).run_async(timeout=5.0))
+        while not task.done() and (not pid_file.exists() or not pid_file.read_text()):
+            await asyncio.sleep(0.01)
+        with pytest.raises(subprocess.TimeoutExpired):
+            await task
+
+    asyncio.run(scenario())
+
+    assert not _is_running(int(pid_file.read_text()))
+
+
+@POSIX_ONLY
+@pytest.mark.unit
+def test_cancelling_run_async_stops_command(tmp_path: Path):
+    """Cancelling the awaiting task stops the command"""
+    pid_file = tmp_path / "pid"
+    script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(60)"
+
+    async def scenario():
+        task = asyncio.ensure_future(_python(script).run_async())
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    assert not _is_running(int(pid_file.read_text()))
+
+
+@POSIX_ONLY
+@pytest.mark.unit
+def test_stream_async_yields_lines_and_stops_on_break():
+    """Lines arrive as they are written and leaving the loop stops the command"""
+    script = "import itertools, os, time\nfor i in itertools.count():\n    print(os.getpid(), i, flush=True)\n"
+
+    async def scenario():
+        seen = []
+        lines = _python(script).stream_async()
+        async for line in lines:
+            seen.append(line)
+            if len(seen) == 5:
+                break
+        await lines.aclose()
+        return seen
+
+    seen = asyncio.run(scenario())
+
+    assert [line.split()[1] for line in seen] == ["0", "1", "2", "3", "4"]
+    assert not _is_running(int(seen[0].split()[0]))
+
+
+@pytest.mark.unit
+def test_stream_async_failure_and_long_lines():
+    """Exit status is checked at the end of the stream and overlong lines are refused"""
+
+    async def collect(builder: CommandBuilder, **kwargs):
+        return [line async for line in builder.stream_async(**kwargs)]
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        asyncio.run(collect(_python("import sys; print('a'); print('b'); sys.exit(2)")))
+    assert excinfo.value.returncode == 2
+
+    with pytest.raises(CommandOutputLimitError):
+        asyncio.run(collect(_python("print('y' * 200000)"), max_line=1000))
+
+    assert asyncio.run(collect(_python("print('a\\r\\nb')"))) == ["a", "b"]
+
+
+@pytest.mark.unit
+def test_semaphore_bounds_concurrency():
+    """No more commands run at once than the semaphore admits"""
+
+    async def scenario():
+        semaphore = _CountingSemaphore(2)
+        outputs = await asyncio.gather(*(_python(f"import time; time.sleep(0.1); print({i})").run_async(
+                semaphore=semaphore) for i in range(6)))
+        return semaphore.peak, outputs
+
+    peak, outputs = asyncio.run(scenario())
+
+    assert peak == 2
+    assert outputs == [f"{i}\n" for i in range(6)]
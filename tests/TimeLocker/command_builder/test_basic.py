@@ -101,3 +101,13 @@ class TestBuilderState:
         builder.clear()
         result = builder.build()
         assert result == ["test-cmd"]
+
+    @pytest.mark.unit
+    def test_copy_is_independent(self, builder):
+        """Extending a copy leaves the original builder unchanged"""
+        builder.param("verbose")
+        first = builder.copy().command("backup").param("source", "/a").build()
+        second = builder.copy().command("backup").param("source", "/b").build()
+        assert first == ["test-cmd", "backup", "--verbose", "--source", "/a"]
+        assert second == ["test-cmd", "backup", "--verbose", "--source", "/b"]
+        assert builder.build() == ["test-cmd", "--verbose"]
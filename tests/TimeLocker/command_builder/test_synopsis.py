@@ -48,6 +48,10 @@ class TestSynopsisParameters:
         result = builder.build(synopsis_values={"snapshotID": "abc123", "dir": "/path/to/dir"})
         assert result == ["test-cmd", "abc123", "/path/to/dir"]
 
+        # Test with several values for a repeatable synopsis parameter
+        result = builder.build(synopsis_values={"snapshotID": "abc123", "dir": ["/a", "/b"]})
+        assert result == ["test-cmd", "abc123", "/a", "/b"]
+
         # Test with flags and synopsis parameters
         result = builder.param("verbose").build(synopsis_values={"snapshotID": "abc123"})
         assert result == ["test-cmd", "--verbose", "abc123"]
@@ -2,6 +2,7 @@
 Performance benchmark tests for TimeLocker
 """
 
+import os
 import pytest
 import tempfile
 import shutil
@@ -49,6 +50,22 @@ class TestPerformanceBenchmarks:
             if results['legacy_match_time'] > 0.001:  # Only check if meaningful time
                 assert results['speedup_factor'] >= 0.5  # At least not 2x slower
 
+    @pytest.mark.performance
+    @pytest.mark.unit
+    def test_pattern_scaling_performance(self):
+        """Test that the combined matcher scales better than per-pattern matching"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            test_dir = benchmarks.create_test_files(num_files=200, num_dirs=5)
+
+            results = benchmarks.benchmark_pattern_scaling(test_dir, pattern_counts=[10, 1000])
+
+            assert [row['num_patterns'] for row in results['scaling']] == [10, 1000]
+            for row in results['scaling']:
+                assert row['matches_consistent'] is True
+
+            # With many patterns the merged matcher must beat one regex per pattern
+            assert results['scaling'][-1]['speedup_factor'] > 1.0
+
     @pytest.mark.performance
     @pytest.mark.unit
     def test_file_traversal_performance(self):
@@ -73,6 +90,73 @@ class TestPerformanceBenchmarks:
             if results['file_count'] > 100:
                 assert results['throughput_files_per_sec'] >= 50  # Conservative threshold
 
+    @pytest.mark.performance
+    @pytest.mark.unit
+    def test_traversal_throughput(self):
+        """Test the scandir traversal core against os.walk-based estimation"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            results = benchmarks.benchmark_traversal_throughput(num_files=2000, files_per_dir=200)
+
+            assert results['num_files'] == 2000
+            assert results['results_consistent'] is True
+            assert results['scandir_files_per_sec'] > 0
+            assert results['legacy_files_per_sec'] > 0
+
+    @pytest.mark.performance
+    @pytest.mark.unit
+    @pytest.mark.skipif(os.name == "nt", reason="bytes traversal is POSIX only")
+    def test_bytes_traversal_throughput(self):
+        """Test the bytes traversal against str traversal on hostile filenames"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            results = benchmarks.benchmark_bytes_traversal(num_files=1200, files_per_dir=120)
+
+            assert results['results_consistent'] is True
+            assert results['files_selected'] > 0
+            assert results['bytes_files_per_sec'] > 0
+            assert results['str_files_per_sec'] > 0
+
+    @pytest.mark.performance
+    @pytest.mark.unit
+    def test_snapshot_decoding(self):
+        """Test the snapshot decoder against the legacy per-snapshot parsing"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            results = benchmarks.benchmark_snapshot_decoding(num_snapshots=5000)
+
+            assert results['results_consistent'] is True
+            assert results['decoder_snapshots_per_sec'] > 0
+            assert results['legacy_snapshots_per_sec'] > 0
+
+    @pytest.mark.performance
+    @pytest.mark.unit
+    def test_snapshot_memory(self):
+        """Test that decoded snapshots keep less memory resident than the legacy objects"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            results = benchmarks.benchmark_snapshot_memory(num_snapshots=20_000)
+
+            assert results['compact_bytes'] > 0
+            assert results['compact_bytes'] < results['legacy_bytes']
+
+    @pytest.mark.performance
+    @pytest.mark.unit
+    def test_snapshot_queries(self):
+        """Test that indexed snapshot queries agree with and beat the linear scans"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            results = benchmarks.benchmark_snapshot_queries(num_snapshots=20_000, num_queries=50)
+
+            assert results['results_consistent'] is True
+            assert results['speedup_factor'] > 1.0
+
+    @pytest.mark.performance
+    @pytest.mark.slow
+    @pytest.mark.skipif(shutil.which("restic") is None, reason="restic binary not available")
+    def test_parent_selection(self):
+        """Test that indexed parents leave each target's files unmodified"""
+        with PerformanceBenchmarks(self.temp_dir) as benchmarks:
+            results = benchmarks.benchmark_parent_selection(num_targets=4, files_per_target=100)
+
+            assert results['index_files_unmodified'] == results['total_files']
+            assert results['restic_files_unmodified'] < results['index_files_unmodified']
+
     @pytest.mark.performance
     @pytest.mark.unit
     def test_large_directory_performance(self):
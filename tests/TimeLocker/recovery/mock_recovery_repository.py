@@ -13,6 +13,15 @@ from TimeLocker.backup_snapshot import BackupSnapshot
 from TimeLocker.backup_target import BackupTarget
 
 
+class MockRecoverySnapshot(BackupSnapshot):
+    """Snapshot whose stats report its size and file counts"""
+    __slots__ = ("file_counts",)
+
+    def get_stats(self) -> dict:
+        total_files, unique_files = getattr(self, 'file_counts', (1, 1))
+        return {'total_size': self.size, 'total_files': total_files, 'unique_files': unique_files}
+
+
 class MockRecoveryRepository(BackupRepository):
     """Enhanced mock repository for testing recovery operations"""
 
@@ -32,7 +41,7 @@ class MockRecoveryRepository(BackupRepository):
         base_time = datetime.now() - timedelta(days=7)
 
         # Snapshot 1: Recent full backup
-        snapshot1 = BackupSnapshot(
+        snapshot1 = MockRecoverySnapshot(
                 repo=self,
                 snapshot_id="abc123",
                 timestamp=base_time + timedelta(days=6),
@@ -40,12 +49,11 @@ class MockRecoveryRepository(BackupRepository):
         )
         snapshot1.tags = ["full", "documents", "photos"]
         snapshot1.size = 1024 * 1024 * 100  # 100MB
-        # Override get_stats to return the size
-        snapshot1.get_stats = lambda: {'total_size': snapshot1.size, 'total_files': 100, 'unique_files': 95}
+        snapshot1.file_counts = (100, 95)
         self._snapshots["abc123"] = snapshot1
 
         # Snapshot 2: Older incremental backup
-        snapshot2 = BackupSnapshot(
+        snapshot2 = MockRecoverySnapshot(
                 repo=self,
                 snapshot_id="def456",
                 timestamp=base_time + timedelta(days=3),
@@ -53,12 +61,11 @@ class MockRecoveryRepository(BackupRepository):
         )
         snapshot2.tags = ["incremental", "documents"]
         snapshot2.size = 1024 * 1024 * 50  # 50MB
-        # Override get_stats to return the size
-        snapshot2.get_stats = lambda: {'total_size': snapshot2.size, 'total_files': 50, 'unique_files': 45}
+        snapshot2.file_counts = (50, 45)
         self._snapshots["def456"] = snapshot2
 
         # Snapshot 3: Very old backup
-        snapshot3 = BackupSnapshot(
+        snapshot3 = MockRecoverySnapshot(
                 repo=self,
                 snapshot_id="ghi789",
                 timestamp=base_time,
@@ -66,8 +73,7 @@ class MockRecoveryRepository(BackupRepository):
         )
         snapshot3.tags = ["full", "config"]
         snapshot3.size = 1024 * 1024 * 10  # 10MB
-        # Override get_stats to return the size
-        snapshot3.get_stats = lambda: {'total_size': snapshot3.size, 'total_files': 10, 'unique_files': 10}
+        snapshot3.file_counts = (10, 10)
         self._snapshots["ghi789"] = snapshot3
 
     def initialize(self) -> bool:
@@ -77,7 +83,8 @@ class MockRecoveryRepository(BackupRepository):
     def check(self) -> bool:
         return self._initialized
 
-    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None) -> Dict:
+    def backup_target(self, targets: List[BackupTarget], tags: Optional[List[str]] = None,
+                      progress_callback=None, cancel_event=None) -> Dict:
         # Not needed for recovery testing
         return {"snapshot_id": "new-snapshot", "summary": "Mock backup"}
 
@@ -152,7 +159,7 @@ class MockRecoveryRepository(BackupRepository):
     def add_test_snapshot(self, snapshot_id: str, timestamp: datetime,
                           paths: List[Path], tags: List[str] = None, size: int = 0):
         """Add a test snapshot"""
-        snapshot = BackupSnapshot(
+        snapshot = MockRecoverySnapshot(
                 repo=self,
                 snapshot_id=snapshot_id,
                 timestamp=timestamp,
@@ -160,8 +167,6 @@ class MockRecoveryRepository(BackupRepository):
         )
         snapshot.tags = tags or []
         snapshot.size = size
-        # Override get_stats to return the size
-        snapshot.get_stats = lambda: {'total_size': snapshot.size, 'total_files': 1, 'unique_files': 1}
         self._snapshots[snapshot_id] = snapshot
 
     def clear_snapshots(self):
@@ -0,0 +1,121 @@
+"""
+Tests for the in-memory snapshot query indexes
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from TimeLocker.backup_snapshot import BackupSnapshot
+from TimeLocker.recovery_errors import AmbiguousSnapshotIdError, SnapshotNotFoundError
+from TimeLocker.snapshot_manager import SnapshotFilter, SnapshotManager
+from TimeLocker.snapshot_query_index import SnapshotQueryIndex
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+TAGS = ["daily", "weekly", "db", "home"]
+HOSTS = ["alpha", "beta", "gamma"]
+PATHS = [Path("/home"), Path("/etc"), Path("/srv")]
+
+
+def _snapshot(snapshot_id: str, hours: int, tags=(), hostname=None, paths=(Path("/home"),)) -> BackupSnapshot:
+    snapshot = BackupSnapshot(None, snapshot_id, BASE + timedelta(hours=hours), list(paths))
+    snapshot.tags = list(tags)
+    if hostname is not None:
+        snapshot.hostname = hostname
+    return snapshot
+
+
+def _random_listing(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [_snapshot(f"{rng.getrandbits(32):08x}", rng.randrange(200), rng.sample(TAGS, rng.randrange(3)),
+                      rng.choice(HOSTS), rng.sample(PATHS, rng.randrange(1, 3))) for _ in range(count)]
+
+
+def _reference(snapshots, tags=None, hosts=None, paths=None, date_from=None, date_to=None, max_results=None):
+    """The linear filter SnapshotManager used before it kept indexes"""
+    found = [s for s in snapshots
+             if (not tags or any(tag in s.tags for tag in tags))
+             and (not hosts or s.hostname in hosts)
+             and (not paths or any(path in s.paths for path in paths))
+             and (date_from is None or s.timestamp >= date_from)
+             and (date_to is None or s.timestamp <= date_to)]
+    found = sorted(found, key=lambda s: s.timestamp, reverse=True)
+    return found[:max_results] if max_results else found
+
+
+@pytest.mark.unit
+def test_queries_match_linear_filtering():
+    """Every combination of criteria returns what the linear filter returned, in the same order"""
+    snapshots = _random_listing(400)
+    index = SnapshotQueryIndex(snapshots)
+    rng = random.Random(11)
+
+    for _ in range(300):
+        criteria = {
+                "tags":        rng.sample(TAGS + ["missing"], rng.randrange(3)) or None,
+                "hosts":       rng.sample(HOSTS, rng.randrange(3)) or None,
+                "paths":       rng.sample(PATHS, rng.randrange(3)) or None,
+                "date_from":   BASE + timedelta(hours=rng.randrange(-10, 150)) if rng.random() < 0.5 else None,
+                "date_to":     BASE + timedelta(hours=rng.randrange(50, 210)) if rng.random() < 0.5 else None,
+                "max_results": rng.choice([None, 0, 1, 5, 50]),
+        }
+        assert [s.id for s in index.query(**criteria)] == [s.id for s in _reference(snapshots, **criteria)]
+
+
+@pytest.mark.unit
+def test_resolve_ids_and_prefixes():
+    """Exact IDs win over prefixes, unique prefixes resolve and shared ones are ambiguous"""
+    index = SnapshotQueryIndex([_snapshot("abc123", 1), _snapshot("abc124", 2), _snapshot("abc", 3),
+                                _snapshot("def456", 4)])
+
+    assert index.resolve("abc").timestamp == BASE + timedelta(hours=3)
+    assert index.resolve("abc124").id == "abc124"
+    assert index.resolve("de").id == "def456"
+    with pytest.raises(AmbiguousSnapshotIdError):
+        index.resolve("abc12")
+    with pytest.raises(SnapshotNotFoundError):
+        index.resolve("abd")
+    assert index.latest().id == "def456"
+    assert SnapshotQueryIndex([]).latest() is None
+
+
+class _CountingList(list):
+    reads = 0
+
+    def __getitem__(self, item):
+        self.reads += 1
+        return super().__getitem__(item)
+
+
+@pytest.mark.unit
+def test_max_results_stops_walking_candidates():
+    """A limited query reads only as many snapshots as it returns"""
+    snapshots = [_snapshot(f"{n:08x}", n, tags=["daily"]) for n in range(1000)]
+    index = SnapshotQueryIndex(snapshots)
+    index._by_time = _CountingList(index._by_time)
+
+    assert [s.id for s in index.query(tags=["daily"], max_results=3)] == ["000003e7", "000003e6", "000003e5"]
+    assert index._by_time.reads == 3
+
+
+@pytest.mark.unit
+def test_manager_rebuilds_index_only_on_refresh():
+    """The manager reuses its index until the listing is fetched again"""
+    repository = Mock(has_snapshot_catalog=False)
+    repository.snapshots.return_value = _random_listing(50)
+    manager = SnapshotManager(repository)
+
+    assert manager._index is None and len(manager.list_snapshots()) == 50
+    assert manager._index is None
+    first = manager.get_snapshot_by_id(repository.snapshots.return_value[0].id)
+    index = manager._index
+    manager.list_snapshots(SnapshotFilter().with_hosts(["alpha"]).with_max_results(2))
+    assert manager.get_latest_snapshot().timestamp == max(s.timestamp for s in repository.snapshots.return_value)
+    assert manager._index is index and repository.snapshots.call_count == 1
+
+    manager.list_snapshots(force_refresh=True)
+    assert manager._index is None
+    assert manager.get_snapshot_by_id(first.id) is first
@@ -0,0 +1,130 @@
+"""
+Tests for moving long restic backup argument lists into temporary files
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from TimeLocker.backup_target import BackupTarget
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.restic.argument_files import ArgumentFiles, argv_length, exclude_file_safe
+from TimeLocker.restic.errors import RepositoryError
+from tests.TimeLocker.backup.fake_restic_process import FakeResticProcess, OfflineResticRepository, summary_event
+
+
+class TestArgumentFiles:
+    """Test cases for backup_target argument file generation"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.repo = OfflineResticRepository(location=str(self.temp_dir / "repo"))
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _target(self, path_count: int, exclude_count: int) -> BackupTarget:
+        selection = FileSelection()
+        for i in range(path_count):
+            path = self.temp_dir / f"source_{i:05d}"
+            path.mkdir()
+            selection.add_path(path)
+        for i in range(exclude_count):
+            selection.add_pattern(f"*.ext{i:05d}", SelectionType.EXCLUDE)
+        return BackupTarget(selection=selection, tags=["test"])
+
+    def _run_backup(self, target: BackupTarget, process: FakeResticProcess = None):
+        captured = {}
+
+        def fake_popen(command_list, **kwargs):
+            captured["argv"] = list(command_list)
+            # List files must exist while restic runs
+            captured["files"] = {arg: Path(arg).read_bytes() for arg in command_list if Path(arg).is_file()}
+            return process or FakeResticProcess([summary_event()])
+
+        with patch("TimeLocker.restic.backup_runner.subprocess.Popen", side_effect=fake_popen):
+            result = self.repo.backup_target([target])
+        return result, captured
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_small_selection_uses_argv(self):
+        """Short lists stay as --exclude options and positional paths"""
+        result, captured = self._run_backup(self._target(2, 3))
+
+        assert result["snapshot_id"] == "abc123"
+        argv = captured["argv"]
+        assert argv.count("--exclude") == 3
+        assert "--exclude-file" not in argv and "--files-from-raw" not in argv
+        assert set(argv[-2:]) == {str(self.temp_dir / "source_00000"), str(self.temp_dir / "source_00001")}
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_large_selection_uses_files(self):
+        """Long lists are streamed into files that are removed afterwards"""
+        target = self._target(1500, 3000)
+        target.selection.add_pattern("$HOME/cache", SelectionType.EXCLUDE)
+        _, captured = self._run_backup(target)
+
+        argv = captured["argv"]
+        exclude_file = argv[argv.index("--exclude-file") + 1]
+        files_from = argv[argv.index("--files-from-raw") + 1]
+
+        excludes = captured["files"][exclude_file].decode().splitlines()
+        assert len(excludes) == 3000 and "*.ext00042" in excludes
+        assert argv[argv.index("--exclude") + 1] == "$HOME/cache"
+
+        paths = captured["files"][files_from].split(b"\0")
+        assert paths[-1] == b"" and len(paths) == 1501
+        assert not any(arg.startswith(str(self.temp_dir / "source_")) for arg in argv)
+        assert len(" ".join(argv)) < 1024
+
+        assert not Path(exclude_file).exists()
+        assert not Path(files_from).parent.exists()
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_files_removed_on_failure(self):
+        """List files are cleaned up when restic fails"""
+        failure = FakeResticProcess(stderr=b"boom\n", returncode=1)
+        with pytest.raises(RepositoryError, match="boom"):
+            self._run_backup(self._target(1500, 0), process=failure)
+
+        leftovers = list(Path(tempfile.gettempdir()).glob("timelocker-args-*"))
+        assert not [p for p in leftovers if (p / "01-files-from").exists()]
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_repeat_backups_do_not_accumulate_arguments(self):
+        """Each backup builds its command from scratch"""
+        target = self._target(1, 2)
+        _, first = self._run_backup(target)
+        _, second = self._run_backup(target)
+        assert first["argv"] == second["argv"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("entry,safe", [
+        ("*.tmp", True), ("/home/user/cache", True), ("# not a comment", False),
+        (" padded", False), ("$HOME/x", False), ("line\nbreak", False), ("", False),
+])
+def test_exclude_file_safe(entry, safe):
+    """Entries restic would alter when read from a file are detected"""
+    assert exclude_file_safe(entry) is safe
+
+
+@pytest.mark.unit
+def test_argument_files_write_and_cleanup():
+    """Entries are written with the requested separator and removed on exit"""
+    with ArgumentFiles() as files:
+        path = files.write("list", iter(["a", "b\nc", "\udcff"]), separator=b"\0")
+        assert path.read_bytes() == b"a\0b\nc\0\xff\0"
+        directory = files.directory
+    assert not directory.exists()
+    assert argv_length("exclude", ["ab"]) == len("--exclude ab ")
@@ -0,0 +1,192 @@
+"""
+Tests for streaming restic backup output and cancelling running backups
+"""
+
+import json
+import os
+import sys
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from TimeLocker.interfaces import BackupStatus
+from TimeLocker.restic import backup_runner
+from TimeLocker.restic.backup_runner import StreamingBackupRunner, message_type
+from TimeLocker.restic.errors import BackupCancelledError, RepositoryError
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+from tests.TimeLocker.backup.fake_restic_process import FakeResticProcess, summary_event
+
+POSIX_ONLY = pytest.mark.skipif(os.name == "nt", reason="SIGINT cancellation is POSIX only")
+
+# Child process standing in for restic: prints status lines until interrupted
+RESTIC_STAND_IN = """
+import json, signal, sys, time
+if sys.argv[1] == "ignore":
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+try:
+    while True:
+        print(json.dumps({"message_type": "status", "percent_done": 0.1}), flush=True)
+        time.sleep(0.01)
+except KeyboardInterrupt:
+    sys.exit(130)
+"""
+
+
+def _status(files_done: int) -> dict:
+    return {"message_type": "status", "files_done": files_done, "bytes_done": files_done * 10}
+
+
+def _run(process: FakeResticProcess, **kwargs):
+    events = []
+    runner = StreamingBackupRunner(["restic", "backup"], on_event=events.append, **kwargs)
+    with patch("TimeLocker.restic.backup_runner.subprocess.Popen", return_value=process):
+        result = runner.run()
+    return runner, events, result
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("line,expected", [
+        (b'{"message_type":"status","percent_done":0.5}', b"status"),
+        (b'{"message_type": "summary", "snapshot_id": "x"}\n', b"summary"),
+        (b'{"percent_done": 0.5}', None),
+        (b'not json at all', None),
+])
+def test_message_type(line, expected):
+    """The message type is read straight from the raw line"""
+    assert message_type(line) == expected
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_status_events_are_throttled():
+    """Only the first status line in an interval is decoded; summaries always are"""
+    events = [_status(i) for i in range(5000)] + [{"message_type": "verbose_status", "item": "/a"}]
+    process = FakeResticProcess(events + [summary_event(total_files_processed=5000)])
+
+    with patch.object(backup_runner.json, "loads", wraps=json.loads) as loads:
+        runner, delivered, result = _run(process, progress_interval=3600)
+
+    assert result["snapshot_id"] == "abc123"
+    assert [e["message_type"] for e in delivered] == ["status", "summary"]
+    assert loads.call_count == 2
+    assert runner.lines_read == 5002
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_unthrottled_status_events_are_all_delivered():
+    """A zero interval forwards every status line"""
+    _, delivered, _ = _run(FakeResticProcess([_status(i) for i in range(50)] + [summary_event()]),
+                           progress_interval=0)
+
+    assert [e.get("files_done") for e in delivered[:-1]] == list(range(50))
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_failure_reports_exit_error_and_bounds_errors():
+    """Error events are counted, kept up to a limit, and the exit error explains the failure"""
+    errors = [{"message_type": "error", "error": {"message": f"unreadable {i}"}, "item": f"/f{i}"}
+              for i in range(backup_runner.MAX_RECORDED_ERRORS + 20)]
+    stderr = b"".join(json.dumps(e).encode() + b"\n" for e in errors)
+    stderr += b"plain warning\n" + json.dumps({"message_type": "exit_error", "code": 1,
+                                               "message": "Fatal: repository is locked"}).encode() + b"\n"
+    runner = StreamingBackupRunner(["restic", "backup"])
+
+    with patch("TimeLocker.restic.backup_runner.subprocess.Popen",
+               return_value=FakeResticProcess(stderr=stderr, returncode=1)):
+        with pytest.raises(RepositoryError, match="Fatal: repository is locked"):
+            runner.run()
+
+    assert runner.error_count == len(errors) + 1
+    assert len(runner.errors) == backup_runner.MAX_RECORDED_ERRORS
+    assert runner.returncode == 1
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_incomplete_snapshot_is_success():
+    """Exit code 3 with a summary means the snapshot was written despite unreadable files"""
+    stderr = json.dumps({"message_type": "error", "error": {"message": "permission denied"}}).encode() + b"\n"
+    runner, delivered, result = _run(FakeResticProcess([summary_event("partial")], stderr=stderr, returncode=3))
+
+    assert result["snapshot_id"] == "partial"
+    assert runner.error_count == 1
+    assert {e["message_type"] for e in delivered} == {"error", "summary"}
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_cancel_before_start_does_not_spawn():
+    """A cancel event set before the run starts prevents restic from being started"""
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    with patch("TimeLocker.restic.backup_runner.subprocess.Popen") as popen:
+        with pytest.raises(BackupCancelledError):
+            StreamingBackupRunner(["restic", "backup"]).run(cancel_event)
+
+    popen.assert_not_called()
+
+
+@POSIX_ONLY
+@pytest.mark.backup
+@pytest.mark.unit
+@pytest.mark.parametrize("mode,grace", [("interrupt", 10.0), ("ignore", 0.2)])
+def test_cancel_stops_running_process(mode, grace):
+    """Setting the cancel event stops the child, escalating when SIGINT is ignored"""
+    cancel_event = threading.Event()
+    statuses = []
+
+    def on_event(event):
+        # Cancel once restic is demonstrably running
+        statuses.append(event)
+        cancel_event.set()
+
+    runner = StreamingBackupRunner([sys.executable, "-c", RESTIC_STAND_IN, mode], on_event=on_event,
+                                   progress_interval=0, cancel_grace=grace)
+
+    with pytest.raises(BackupCancelledError):
+        runner.run(cancel_event)
+
+    assert runner.cancelled and statuses
+    assert runner.returncode == (130 if mode == "interrupt" else -15)
+
+
+@pytest.mark.backup
+@pytest.mark.unit
+def test_orchestrator_cancel_backup():
+    """cancel_backup stops a running backup without retrying it"""
+    config_provider = Mock()
+    config_provider.get_repositories.return_value = [{'name': 'repo', 'uri': '/tmp/repo'}]
+    config_provider.get_backup_targets.return_value = [{'name': 'target', 'paths': ['/tmp']}]
+    started = threading.Event()
+
+    def backup_target(targets, tags, progress_callback=None, cancel_event=None):
+        progress_callback(_status(7))
+        started.set()
+        assert cancel_event.wait(5)
+        raise BackupCancelledError("Backup cancelled")
+
+    repository = Mock()
+    repository.backup_target.side_effect = backup_target
+    factory = Mock()
+    factory.create_repository.return_value = repository
+    orchestrator = BackupOrchestrator(factory, config_provider)
+    results = []
+
+    worker = threading.Thread(target=lambda: results.append(orchestrator.execute_backup('repo', ['target'])))
+    worker.start()
+    assert started.wait(5)
+    operation_id = orchestrator.list_active_backups()[0].metadata['operation_id']
+
+    assert orchestrator.cancel_backup(operation_id) is True
+    assert orchestrator.cancel_backup(operation_id) is False
+    worker.join(5)
+
+    result = results[0]
+    assert result.status == BackupStatus.CANCELLED
+    assert result.files_processed == 7 and result.bytes_processed == 70
+    assert repository.backup_target.call_count == 1
+    assert orchestrator.list_active_backups() == []
@@ -0,0 +1,172 @@
+"""
+Tests for streaming a precomputed file list to restic
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from TimeLocker.backup_target import BackupTarget
+from TimeLocker.file_selections import FileSelection, SelectionType
+from TimeLocker.interfaces import BackupResult, BackupStatus
+from TimeLocker.restic.argument_files import ArgumentFiles
+from TimeLocker.restic.file_list_feed import FileListFeed
+from TimeLocker.restic.parent_selection import SnapshotIndex
+from TimeLocker.services.backup_orchestrator import BackupOrchestrator
+from tests.TimeLocker.backup.fake_restic_process import FakeResticProcess, OfflineResticRepository, summary_event
+
+
+class TestFileListFeed:
+    """Test cases for FileListFeed and stream_file_list targets"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.source = self.temp_dir / "source"
+        for rel in ["keep/a.txt", "keep/b.log", "skip/c.txt", "d.txt"]:
+            (self.source / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.source / rel).write_text(rel)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _selection(self) -> FileSelection:
+        selection = FileSelection()
+        selection.add_path(self.source)
+        selection.add_path(self.source / "skip", SelectionType.EXCLUDE)
+        selection.add_pattern("*.log", SelectionType.EXCLUDE)
+        return selection
+
+    def _expected(self):
+        return sorted(str(self.source / rel) for rel in ["keep/a.txt", "d.txt"])
+
+    def _fake_restic(self, captured):
+        def fake_popen(command_list, **kwargs):
+            captured["argv"] = list(command_list)
+            captured["pass_fds"] = kwargs.get("pass_fds")
+            list_path = command_list[command_list.index("--files-from-raw") + 1]
+            with open(list_path, "rb") as handle:
+                captured["list"] = handle.read()
+            return FakeResticProcess([summary_event("feed123")])
+
+        return fake_popen
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_feed_streams_exact_file_list(self):
+        """The pipe carries exactly the selection's included files"""
+        with FileListFeed([self._selection()]) as feed:
+            with open(feed.path, "rb") as handle:
+                data = handle.read()
+
+        assert sorted(p.decode() for p in data.split(b"\0") if p) == self._expected()
+        assert feed.stats == {"file_count": 2, "total_size": len("keep/a.txt") + len("d.txt")}
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_feed_without_reader_does_not_hang(self):
+        """Closing the feed before restic reads it stops the writer"""
+        selection = FileSelection()
+        for i in range(2000):
+            (self.source / f"many_{i:04d}_{'x' * 60}.txt").write_text("x")
+        selection.add_path(self.source)
+        with FileListFeed([selection]):
+            pass
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_file_fallback_without_pipes(self):
+        """Without /dev/fd the list is streamed into a temporary file"""
+        with ArgumentFiles() as argument_files:
+            with patch("TimeLocker.restic.file_list_feed._pipes_supported", return_value=False):
+                with FileListFeed([self._selection()], argument_files) as feed:
+                    assert feed.pass_fds == ()
+                    data = Path(feed.path).read_bytes()
+        assert sorted(p.decode() for p in data.split(b"\0") if p) == self._expected()
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_backup_target_streams_opted_in_targets(self):
+        """Streamed targets are not passed as paths or excludes to restic"""
+        repo = OfflineResticRepository(location=str(self.temp_dir / "repo"))
+        target = BackupTarget(selection=self._selection(), tags=["t"], stream_file_list=True)
+
+        captured = {}
+        with patch("TimeLocker.restic.backup_runner.subprocess.Popen", side_effect=self._fake_restic(captured)):
+            result = repo.backup_target([target])
+
+        assert result["snapshot_id"] == "feed123"
+        assert result["file_list"]["file_count"] == 2
+        assert sorted(p.decode() for p in captured["list"].split(b"\0") if p) == self._expected()
+        assert "--exclude" not in captured["argv"]
+        assert str(self.source) not in captured["argv"]
+        if captured["pass_fds"]:
+            assert captured["argv"][captured["argv"].index("--files-from-raw") + 1].startswith("/dev/fd/")
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_mixed_targets_run_separately(self):
+        """Walked and streamed targets get their own restic runs, so excludes never reach the file list"""
+        repo = OfflineResticRepository(location=str(self.temp_dir / "repo"))
+        walked_selection = FileSelection()
+        walked_selection.add_path(self.source / "skip")
+        walked_selection.add_pattern("*.tmp", SelectionType.EXCLUDE)
+        walked = BackupTarget(selection=walked_selection, tags=["t"])
+        streamed = BackupTarget(selection=self._selection(), tags=["t"], stream_file_list=True)
+        repo._snapshot_index = SnapshotIndex()
+
+        argvs = []
+
+        def fake_popen(command_list, **kwargs):
+            argvs.append(list(command_list))
+            return FakeResticProcess([summary_event(f"snap{len(argvs)}", files_new=len(argvs))])
+
+        with patch("TimeLocker.restic.backup_runner.subprocess.Popen", side_effect=fake_popen):
+            result = repo.backup_target([streamed, walked])
+
+        assert len(argvs) == 2
+        assert "*.tmp" in argvs[0] and "--files-from-raw" not in argvs[0]
+        assert "--files-from-raw" in argvs[1] and "--exclude" not in argvs[1]
+        assert result["snapshot_ids"] == ["snap1", "snap2"]
+        assert result["snapshot_id"] == "snap2"
+        assert result["files_new"] == 3
+        assert result["file_list"]["file_count"] == 2
+
+    @pytest.mark.backup
+    @pytest.mark.filesystem
+    @pytest.mark.unit
+    def test_orchestrator_opts_in_per_target(self):
+        """The orchestrator enables streaming from target config or run metadata"""
+        config_provider = Mock()
+        config_provider.get_repositories.return_value = [{'name': 'repo', 'uri': str(self.temp_dir / "repo")}]
+        config_provider.get_backup_targets.return_value = [
+                {'name': 'streamed', 'paths': [str(self.source)], 'stream_file_list': True},
+                {'name': 'walked', 'paths': [str(self.source / "keep")]},
+                {'name': 'override', 'paths': [str(self.source / "skip")]},
+        ]
+        repository = Mock()
+        repository.backup_target.return_value = {'snapshot_id': 'abc', 'file_list': {'file_count': 5, 'total_size': 50}}
+        factory = Mock()
+        factory.create_repository.return_value = repository
+        orchestrator = BackupOrchestrator(factory, config_provider)
+
+        result = orchestrator._execute_actual_backup(BackupResult(
+                status=BackupStatus.PENDING, repository_name="repo",
+                target_names=["streamed", "walked", "override"],
+                metadata={'stream_file_list': ["override"]}))
+
+        targets = repository.backup_target.call_args[0][0]
+        assert [t.stream_file_list for t in targets] == [True, False, True]
+        assert result.status == BackupStatus.COMPLETED
+        assert result.files_processed == 5
+        assert result.metadata['file_list']['total_size'] == 50
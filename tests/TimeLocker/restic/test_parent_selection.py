@@ -0,0 +1,246 @@
+"""
+Tests for choosing backup parent snapshots from a local snapshot index
+"""
+
+import json
+import shutil
+import socket
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from TimeLocker.backup_repository import RetentionPolicy
+from TimeLocker.backup_target import PARENT_NONE, PARENT_RESTIC, BackupTarget
+from TimeLocker.file_selections import FileSelection
+from TimeLocker.restic.errors import RepositoryError
+from TimeLocker.restic.parent_selection import IndexedSnapshot, SnapshotIndex, normalize_paths, parse_restic_time
+from TimeLocker.restic.snapshot_catalog import SnapshotCatalog
+from tests.TimeLocker.backup.fake_restic_process import FakeResticProcess, OfflineResticRepository, summary_event
+
+HOST = "host-a"
+
+
+def _snapshot(snapshot_id, when, paths, hostname=HOST, tags=()):
+    return IndexedSnapshot(snapshot_id, when, hostname, frozenset(paths), frozenset(tags))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value,expected", [
+        ("2025-03-29T21:09:34.068185654+02:00", datetime(2025, 3, 29, 19, 9, 34, 68185, tzinfo=timezone.utc)),
+        ("2025-03-29T19:09:34Z", datetime(2025, 3, 29, 19, 9, 34, tzinfo=timezone.utc)),
+        ("2025-03-29T19:09:34.5", datetime(2025, 3, 29, 19, 9, 34, 500000, tzinfo=timezone.utc)),
+])
+def test_parse_restic_time(value, expected):
+    """Nanosecond fractions and zone offsets are understood"""
+    assert parse_restic_time(value) == pytest.approx(expected.timestamp())
+
+
+@pytest.mark.unit
+def test_parse_restic_time_rejects_garbage():
+    """Unparseable times sort before every real snapshot"""
+    assert parse_restic_time("yesterday") == 0.0
+
+
+@pytest.mark.unit
+def test_find_parent_matches_host_paths_and_tags():
+    """The newest snapshot with the same host, path set and tags wins"""
+    index = SnapshotIndex([
+            _snapshot("old", 1.0, ["/data/a"], tags=["daily"]),
+            _snapshot("new", 3.0, ["/data/a"], tags=["daily", "extra"]),
+            _snapshot("wider", 5.0, ["/data/a", "/data/b"], tags=["daily"]),
+            _snapshot("other-host", 6.0, ["/data/a"], hostname="host-b", tags=["daily"]),
+            _snapshot("untagged", 7.0, ["/data/a"]),
+    ])
+
+    assert index.find_parent(HOST, frozenset({"/data/a"}), frozenset({"daily"})).snapshot_id == "new"
+    assert index.find_parent(HOST, frozenset({"/data/a"})).snapshot_id == "untagged"
+    assert index.find_parent(HOST, frozenset({"/data/b"})) is None
+    assert index.find_parent("host-b", frozenset({"/data/a", "/data/b"})) is None
+
+    index.add(_snapshot("newest", 8.0, ["/data/a"], tags=["daily"]))
+    assert index.find_parent(HOST, frozenset({"/data/a"}), frozenset({"daily"})).snapshot_id == "newest"
+
+
+@pytest.mark.unit
+def test_index_from_restic_json():
+    """Snapshot listings are indexed by short ID with parsed times"""
+    index = SnapshotIndex.from_restic_json([
+            {"id": "0123456789abcdef", "short_id": "01234567", "time": "2025-01-01T00:00:00Z",
+             "hostname": HOST, "paths": ["/data"], "tags": None},
+            {"id": "fedcba9876543210", "time": "2025-01-02T00:00:00.123456789Z", "hostname": HOST,
+             "paths": ["/data"]},
+    ])
+
+    assert len(index) == 2
+    assert index.find_parent(HOST, frozenset({"/data"})).snapshot_id == "fedcba98"
+    assert not index.is_stale()
+    assert SnapshotIndex(loaded_at=0.0).is_stale(ttl=1.0)
+
+
+class TestBackupParentSelection:
+    """Test cases for the parent argument of ResticRepository.backup_target"""
+
+    def setup_method(self):
+        """Create two directories and a repository with a preloaded snapshot index"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.dir_a = self.temp_dir / "a"
+        self.dir_b = self.temp_dir / "b"
+        for directory in (self.dir_a, self.dir_b):
+            directory.mkdir()
+            (directory / "file.txt").write_text("data")
+        self.repo = OfflineResticRepository(location=str(self.temp_dir / "repo"))
+        self.host = socket.gethostname()
+        self.repo._snapshot_index = SnapshotIndex([
+                IndexedSnapshot("aaaa0001", 1.0, self.host, normalize_paths([self.dir_a]), frozenset({"daily"})),
+                IndexedSnapshot("bbbb0001", 2.0, self.host, normalize_paths([self.dir_b]), frozenset({"daily"})),
+                IndexedSnapshot("abab0001", 3.0, self.host, normalize_paths([self.dir_a, self.dir_b]), frozenset()),
+        ])
+        self.argvs = []
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    def _target(self, directory: Path, **kwargs) -> BackupTarget:
+        selection = FileSelection()
+        selection.add_path(directory)
+        return BackupTarget(selection=selection, tags=["daily"], **kwargs)
+
+    def _backup(self, *targets, snapshot_id="cccc0001"):
+        def fake_popen(command_list, **kwargs):
+            self.argvs.append(list(command_list))
+            return FakeResticProcess([summary_event(snapshot_id)])
+
+        with patch("TimeLocker.restic.backup_runner.subprocess.Popen", side_effect=fake_popen):
+            return self.repo.backup_target(list(targets))
+
+    @staticmethod
+    def _parent_of(argv):
+        return argv[argv.index("--parent") + 1] if "--parent" in argv else None
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_auto_picks_the_targets_own_snapshot(self):
+        """The parent is the target's own snapshot, not the newer one of a wider backup"""
+        result = self._backup(self._target(self.dir_a))
+
+        assert self._parent_of(self.argvs[-1]) == "aaaa0001"
+        assert result["parent"] == "aaaa0001"
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_new_snapshot_becomes_next_parent(self):
+        """Snapshots created by this instance are chosen without listing again"""
+        self._backup(self._target(self.dir_a), snapshot_id="cccc0001")
+        self._backup(self._target(self.dir_a), snapshot_id="cccc0002")
+
+        assert self._parent_of(self.argvs[-1]) == "cccc0001"
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_no_matching_snapshot_leaves_choice_to_restic(self):
+        """Without a matching snapshot no --parent is passed"""
+        result = self._backup(self._target(self.temp_dir / "repo"))
+
+        assert "--parent" not in self.argvs[-1] and "--force" not in self.argvs[-1]
+        assert "parent" not in result
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_streamed_targets_pick_parent_by_host_and_tags(self):
+        """A streamed file list changes the path set, so only host and tags choose its parent"""
+        self.repo._snapshot_index.add(IndexedSnapshot("dddd0001", 4.0, self.host,
+                                                      normalize_paths([self.dir_a / "file.txt"]), frozenset({"docs"})))
+        streamed = BackupTarget(selection=self._target(self.dir_a).selection, tags=["docs"], stream_file_list=True)
+
+        result = self._backup(streamed, snapshot_id="cccc0001")
+        self._backup(streamed, snapshot_id="cccc0002")
+        self._backup(self._target(self.dir_a), snapshot_id="cccc0003")
+
+        assert self._parent_of(self.argvs[0]) == "dddd0001" and result["parent"] == "dddd0001"
+        assert self._parent_of(self.argvs[1]) == "cccc0001"
+        assert self._parent_of(self.argvs[2]) == "aaaa0001"
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_untagged_streamed_targets_leave_choice_to_restic(self):
+        """Without tags there is nothing to tell a streamed target's snapshots apart"""
+        streamed = BackupTarget(selection=self._target(self.dir_a).selection, stream_file_list=True)
+
+        self._backup(streamed)
+
+        assert "--parent" not in self.argvs[-1]
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    @pytest.mark.parametrize("policy,expected_parent,expect_force", [
+            (PARENT_RESTIC, None, False), (PARENT_NONE, None, True), ("deadbeef", "deadbeef", False),
+    ])
+    def test_explicit_policies(self, policy, expected_parent, expect_force):
+        """restic, none and pinned snapshot IDs are passed through as asked"""
+        with patch.object(self.repo, "snapshot_index", side_effect=AssertionError("index not needed")):
+            self._backup(self._target(self.dir_a, parent=policy))
+
+        assert self._parent_of(self.argvs[-1]) == expected_parent
+        assert ("--force" in self.argvs[-1]) is expect_force
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_disagreeing_targets_leave_choice_to_restic(self):
+        """Targets sharing one snapshot but not a policy get no --parent"""
+        self._backup(self._target(self.dir_a), self._target(self.dir_b, parent=PARENT_NONE))
+
+        assert "--parent" not in self.argvs[-1] and "--force" not in self.argvs[-1]
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_listing_failure_falls_back_to_restic(self):
+        """A failed snapshot listing does not fail the backup"""
+        self.repo._snapshot_index = None
+        self.repo.use_snapshot_catalog = True
+        with patch.object(self.repo, "snapshot_index", side_effect=RepositoryError("locked")):
+            result = self._backup(self._target(self.dir_a))
+
+        assert "--parent" not in self.argvs[-1]
+        assert result["snapshot_id"] == "cccc0001"
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_without_catalog_or_listing_restic_picks(self):
+        """A one-shot backup does not list every snapshot just to choose a parent"""
+        self.repo._snapshot_index = SnapshotIndex(loaded_at=0.0)
+
+        with patch("TimeLocker.command_builder.core.CommandBuilder.run",
+                   side_effect=AssertionError("snapshots listed")):
+            result = self._backup(self._target(self.dir_a))
+
+        assert "--parent" not in self.argvs[-1] and "parent" not in result
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_stale_index_is_refreshed_from_the_catalog(self):
+        """With the catalog in use, an expired index is rebuilt from the refreshed catalog"""
+        self.repo._snapshot_index = SnapshotIndex(loaded_at=0.0)
+        self.repo._snapshot_catalog = SnapshotCatalog("repo", cache_dir=self.temp_dir / "catalog")
+        listing = [{"id": "dddd0001" * 8, "short_id": "dddd0001", "time": "2025-01-01T00:00:00Z",
+                    "hostname": self.host, "paths": [str(self.dir_a)], "tags": ["daily"]}]
+
+        with patch("TimeLocker.command_builder.core.CommandBuilder.run",
+                   side_effect=[listing[0]["id"] + "\n", json.dumps(listing)]):
+            self._backup(self._target(self.dir_a))
+        self.repo.snapshot_catalog.close()
+
+        assert self._parent_of(self.argvs[-1]) == "dddd0001"
+
+    @pytest.mark.backup
+    @pytest.mark.unit
+    def test_retention_drops_the_index(self):
+        """Forgetting snapshots invalidates the index so forgotten parents are not used"""
+        with patch("TimeLocker.command_builder.core.CommandBuilder.run", return_value=""):
+            assert self.repo.apply_retention_policy(RetentionPolicy(last=1))
+
+        assert self.repo._snapshot_index is None
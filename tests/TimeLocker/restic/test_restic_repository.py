@@ -16,6 +16,7 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
 import json
+import logging
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
@@ -88,42 +89,42 @@ def test__handle_restic_output_3():
         mock_status.assert_not_called()
 
 @pytest.mark.unit
-def test__on_backup_status_prints_status(capsys):
+def test__on_backup_status_logs_status(caplog):
     repo = ConcreteResticRepository(location="test_location")
     status = {"message_type": "status", "percent_done": 50}
 
-    repo._on_backup_status(status)
+    with caplog.at_level(logging.DEBUG, logger="restic"):
+        repo._on_backup_status(status)
 
-    captured = capsys.readouterr()
-    assert captured.out.strip() == f"Backup Status: {status}"
+    assert f"Backup Status: {status}" in caplog.messages
 
 @pytest.mark.unit
-def test__on_backup_status_with_empty_dict(capsys):
+def test__on_backup_status_with_empty_dict(caplog):
     repo = ConcreteResticRepository("dummy_location")
 
-    repo._on_backup_status({})
+    with caplog.at_level(logging.DEBUG, logger="restic"):
+        repo._on_backup_status({})
 
-    captured = capsys.readouterr()
-    assert captured.out.strip() == "Backup Status: {}"
+    assert "Backup Status: {}" in caplog.messages
 
 @pytest.mark.unit
-def test__on_backup_summary_prints_summary(capsys):
+def test__on_backup_summary_logs_summary(caplog):
     repo = ConcreteResticRepository(location="test_location")
     summary = {"files": 100, "dirs": 10, "size": 1024}
 
-    repo._on_backup_summary(summary)
+    with caplog.at_level(logging.INFO, logger="restic"):
+        repo._on_backup_summary(summary)
 
-    captured = capsys.readouterr()
-    assert captured.out.strip() == f"Backup Summary: {summary}"
+    assert f"Backup Summary: {summary}" in caplog.messages
 
 @pytest.mark.unit
-def test__on_backup_summary_with_empty_dict(capsys):
+def test__on_backup_summary_with_empty_dict(caplog):
     repo = ConcreteResticRepository("dummy_location")
 
-    repo._on_backup_summary({})
+    with caplog.at_level(logging.INFO, logger="restic"):
+        repo._on_backup_summary({})
 
-    captured = capsys.readouterr()
-    assert "Backup Summary: {}" in captured.out
+    assert "Backup Summary: {}" in caplog.messages
 
 @pytest.mark.unit
 def test__verify_restic_executable_2():
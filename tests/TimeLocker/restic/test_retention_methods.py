@@ -17,6 +17,9 @@ class _StubCommand:
         self.stderr = stderr
 
     # chainable API like CommandBuilder
+    def copy(self) -> "_StubCommand":
+        return self
+
     def command(self, _name: str) -> "_StubCommand":
         return self
 
@@ -0,0 +1,293 @@
+"""
+Tests for the persistent snapshot catalog and its incremental refresh
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import stat
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from TimeLocker.command_builder import CommandBuilder
+from TimeLocker.recovery_errors import AmbiguousSnapshotIdError, SnapshotNotFoundError
+from TimeLocker.restic import restic_repository
+from TimeLocker.restic.snapshot_catalog import CatalogEntry, SnapshotCatalog
+from TimeLocker.snapshot_manager import SnapshotFilter, SnapshotManager
+from tests.TimeLocker.backup.fake_restic_process import OfflineResticRepository
+
+
+def _snapshot_json(n: int, tags=(), paths=("/data",)) -> dict:
+    snapshot_id = f"{n:08x}" + "0" * 56
+    return {"id": snapshot_id, "short_id": snapshot_id[:8], "time": f"2025-01-{n:02d}T12:00:00.123456789+01:00",
+            "hostname": "host", "username": "user", "paths": list(paths), "tags": list(tags)}
+
+
+class FakeRestic:
+    """Answers 'restic list snapshots' and 'restic snapshots' from a snapshot list"""
+
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.calls = []
+        self.fail_by_id = False
+
+    def run(self, builder: CommandBuilder, env=None, synopsis_values=None, use_short_form=False):
+        argv = builder.build(synopsis_values)
+        self.calls.append(argv)
+        if "list" in argv:
+            return "".join(s["id"] + "\n" for s in self.snapshots)
+        requested = self.requested_ids(argv)
+        if requested and self.fail_by_id:
+            raise subprocess.CalledProcessError(1, argv, stderr="no matching ID found")
+        return json.dumps([s for s in self.snapshots if not requested or s["id"] in requested])
+
+    @staticmethod
+    def requested_ids(argv):
+        return [arg for arg in argv[argv.index("snapshots") + 1:] if len(arg) == 64]
+
+    def snapshot_calls(self):
+        return [argv for argv in self.calls if "snapshots" in argv and "list" not in argv]
+
+
+class TestSnapshotCatalog:
+    """Test cases for SnapshotCatalog"""
+
+    def setup_method(self):
+        """Create a catalog in a temporary cache directory"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.catalog = SnapshotCatalog("repo", cache_dir=self.temp_dir)
+        self.catalog.update(CatalogEntry.from_restic_json(s) for s in [
+                _snapshot_json(1, tags=["daily"], paths=["/data", "/etc"]),
+                _snapshot_json(2, tags=["weekly"]),
+                _snapshot_json(3, tags=["daily", "weekly"], paths=["/home"]),
+        ])
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        self.catalog.close()
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    @pytest.mark.unit
+    def test_query_predicates(self):
+        """Tag, path and time predicates combine, newest first"""
+        short = lambda entries: [e.short_id for e in entries]
+        day = lambda n: datetime(2025, 1, n, tzinfo=timezone.utc).timestamp()
+
+        assert short(self.catalog.query()) == ["00000003", "00000002", "00000001"]
+        assert short(self.catalog.query(newest_first=False, limit=2)) == ["00000001", "00000002"]
+        assert short(self.catalog.query(tags=["daily"])) == ["00000003", "00000001"]
+        assert short(self.catalog.query(tags=["daily", "weekly"])) == ["00000003", "00000002", "00000001"]
+        assert short(self.catalog.query(paths=["/etc", "/home"])) == ["00000003", "00000001"]
+        assert short(self.catalog.query(tags=["weekly"], time_to=day(3))) == ["00000002"]
+        assert short(self.catalog.query(time_from=day(2), time_to=day(3))) == ["00000002"]
+        assert short(self.catalog.query(hosts=["host"], limit=1)) == ["00000003"]
+        assert self.catalog.query(hosts=["elsewhere"]) == []
+
+    @pytest.mark.unit
+    def test_query_by_id_prefix(self):
+        """ID prefixes are matched in SQL, exactly and without LIKE wildcards"""
+        short = lambda entries: [e.short_id for e in entries]
+
+        assert short(self.catalog.query(id_prefix="00000002")) == ["00000002"]
+        assert short(self.catalog.query(id_prefix=_snapshot_json(3)["id"])) == ["00000003"]
+        assert short(self.catalog.query(id_prefix="0000000", limit=2)) == ["00000003", "00000002"]
+        assert self.catalog.query(id_prefix="0000000_") == []
+        assert self.catalog.query(id_prefix="%") == []
+
+    @pytest.mark.unit
+    def test_entries_round_trip(self):
+        """Entries keep the restic fields BackupSnapshot needs"""
+        entry = self.catalog.query(paths=["/etc"])[0]
+
+        assert entry.to_restic_json() == _snapshot_json(1, ["daily"], ["/data", "/etc"])
+        assert entry.time == datetime(2025, 1, 1, 11, 0, 0, 123456, tzinfo=timezone.utc).timestamp()
+
+    @pytest.mark.unit
+    def test_persists_and_removes(self):
+        """A second instance sees the same snapshots, and removals drop their tags and paths"""
+        other = SnapshotCatalog("repo", cache_dir=self.temp_dir)
+        try:
+            assert len(other) == 3
+            other.update(removed=[_snapshot_json(3)["id"]])
+            assert self.catalog.ids() == {_snapshot_json(1)["id"], _snapshot_json(2)["id"]}
+            assert self.catalog.query(paths=["/home"]) == []
+        finally:
+            other.close()
+
+    @pytest.mark.unit
+    def test_schema_change_rebuilds(self):
+        """A database written by another schema version starts empty"""
+        self.catalog.close()
+        with sqlite3.connect(self.temp_dir / "repo.sqlite") as connection:
+            connection.execute("PRAGMA user_version = 999")
+        connection.close()
+
+        self.catalog = SnapshotCatalog("repo", cache_dir=self.temp_dir)
+
+        assert len(self.catalog) == 0
+
+    @pytest.mark.unit
+    def test_unwritable_cache_falls_back_to_memory(self):
+        """The catalog still works when its directory cannot be created"""
+        blocker = self.temp_dir / "file"
+        blocker.write_text("not a directory")
+        catalog = SnapshotCatalog("repo", cache_dir=blocker / "snapshots")
+        try:
+            catalog.update([CatalogEntry.from_restic_json(_snapshot_json(4))])
+            assert len(catalog) == 1
+        finally:
+            catalog.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+@pytest.mark.unit
+def test_catalog_files_are_private(tmp_path):
+    """The catalog directory and database files are only accessible to their owner"""
+    old_umask = os.umask(0o022)
+    try:
+        catalog = SnapshotCatalog("repo", cache_dir=tmp_path / "snapshots")
+        catalog.update([CatalogEntry.from_restic_json(_snapshot_json(1))])
+    finally:
+        os.umask(old_umask)
+    try:
+        files = [catalog.path] + [Path(f"{catalog.path}{suffix}") for suffix in ("-wal", "-shm")]
+        assert stat.S_IMODE(catalog.path.parent.stat().st_mode) == 0o700
+        assert {stat.S_IMODE(path.stat().st_mode) for path in files if path.exists()} == {0o600}
+    finally:
+        catalog.close()
+
+
+class TestCatalogRefresh:
+    """Test cases for ResticRepository.refresh_snapshot_catalog and query_snapshots"""
+
+    def setup_method(self):
+        """Create a repository whose catalog lives in a temporary directory"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.repo = OfflineResticRepository(location=str(self.temp_dir / "repo"))
+        self.repo._snapshot_catalog = SnapshotCatalog("repo", cache_dir=self.temp_dir)
+        self.restic = FakeRestic([_snapshot_json(n, tags=["daily"] if n % 2 else []) for n in range(1, 6)])
+        self.patcher = patch.object(CommandBuilder, "run", autospec=True, side_effect=self.restic.run)
+        self.patcher.start()
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        self.patcher.stop()
+        self.repo.snapshot_catalog.close()
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+    @pytest.mark.unit
+    def test_refresh_fetches_only_new_snapshots(self):
+        """Known snapshots are not fetched again and vanished ones are dropped"""
+        assert self.repo.refresh_snapshot_catalog() == {"added": 5, "removed": 0, "total": 5}
+
+        self.restic.snapshots = self.restic.snapshots[1:] + [_snapshot_json(6)]
+        self.restic.calls.clear()
+        assert self.repo.refresh_snapshot_catalog() == {"added": 1, "removed": 1, "total": 5}
+
+        fetch = self.restic.snapshot_calls()
+        assert len(fetch) == 1 and fetch[0][-1] == _snapshot_json(6)["id"]
+        assert _snapshot_json(1)["id"] not in self.repo.snapshot_catalog.ids()
+
+        self.restic.calls.clear()
+        assert self.repo.refresh_snapshot_catalog()["added"] == 0
+        assert self.restic.snapshot_calls() == []
+
+    @pytest.mark.unit
+    def test_large_and_failed_fetches_use_a_full_listing(self):
+        """More than one batch of new snapshots, or a failed fetch by ID, fall back to one full listing"""
+        with patch.object(restic_repository, "CATALOG_FETCH_BATCH", 4):
+            self.repo.refresh_snapshot_catalog()
+        assert len(self.restic.calls) == 2
+        assert [self.restic.requested_ids(argv) for argv in self.restic.snapshot_calls()] == [[]]
+        assert len(self.repo.snapshot_catalog) == 5
+
+        self.restic.snapshots.append(_snapshot_json(7))
+        self.restic.fail_by_id = True
+        assert self.repo.refresh_snapshot_catalog()["added"] == 1
+        assert len(self.repo.snapshot_catalog) == 6
+
+    @pytest.mark.unit
+    def test_refresh_fetches_one_batch_in_one_call(self):
+        """Up to a full batch of new snapshots costs one listing of IDs and one fetch by ID"""
+        with patch.object(restic_repository, "CATALOG_FETCH_BATCH", 5):
+            self.repo.refresh_snapshot_catalog()
+
+        assert len(self.restic.calls) == 2
+        assert len(self.restic.requested_ids(self.restic.snapshot_calls()[0])) == 5
+        assert len(self.repo.snapshot_catalog) == 5
+
+    @pytest.mark.unit
+    def test_query_snapshots(self):
+        """Catalog queries return BackupSnapshots like snapshots() does"""
+        listed = {s.id: s for s in self.repo.snapshots()}
+
+        found = self.repo.query_snapshots(tags=["daily"], limit=2)
+
+        assert [s.id for s in found] == ["00000005", "00000003"]
+        for snapshot in found:
+            reference = listed[snapshot.id]
+            assert (snapshot.timestamp, snapshot.paths, snapshot.tags, snapshot.hostname) == \
+                   (reference.timestamp, reference.paths, reference.tags, reference.hostname)
+
+    @pytest.mark.unit
+    def test_snapshot_manager_pushes_filters_down(self):
+        """SnapshotManager queries the catalog and refreshes it once per cache period"""
+        manager = SnapshotManager(self.repo, use_catalog=True)
+
+        assert [s.id for s in manager.list_snapshots()] == [f"{n:08x}" for n in range(1, 6)]
+        criteria = (SnapshotFilter().with_tags(["daily"]).with_paths([Path("/data")])
+                    .with_date_range(date_from=datetime(2025, 1, 2, tzinfo=timezone.utc)))
+        assert [s.id for s in manager.list_snapshots(criteria)] == ["00000005", "00000003"]
+        assert manager.get_snapshot_by_id("00000004").id == "00000004"
+        assert sum("list" in argv for argv in self.restic.calls) == 1
+
+        manager.list_snapshots(force_refresh=True)
+        assert sum("list" in argv for argv in self.restic.calls) == 2
+
+    @pytest.mark.unit
+    def test_snapshot_manager_catalog_is_opt_in(self):
+        """Without use_catalog the manager lists snapshots and never refreshes the catalog"""
+        manager = SnapshotManager(self.repo)
+
+        assert len(manager.list_snapshots()) == 5
+        assert manager.get_snapshot_by_id("00000004").id == "00000004"
+        assert not any("list" in argv for argv in self.restic.calls)
+        assert len(self.repo.snapshot_catalog) == 0
+        with pytest.raises(ValueError):
+            SnapshotManager(object(), use_catalog=True)
+
+    @pytest.mark.unit
+    def test_snapshot_manager_resolves_ids_in_sql(self):
+        """ID lookups query the catalog for at most two matches instead of loading it"""
+        manager = SnapshotManager(self.repo, use_catalog=True)
+
+        with patch.object(SnapshotCatalog, "query", autospec=True, side_effect=SnapshotCatalog.query) as query:
+            assert manager.get_snapshot_by_id("00000004").id == "00000004"
+            assert manager.get_snapshot_by_id(_snapshot_json(2)["id"]).id == "00000002"
+            with pytest.raises(AmbiguousSnapshotIdError):
+                manager.get_snapshot_by_id("0000000")
+            with pytest.raises(SnapshotNotFoundError):
+                manager.get_snapshot_by_id("ffff")
+
+        assert all(call.kwargs["id_prefix"] and call.kwargs["limit"] == 2 for call in query.call_args_list)
+
+    @pytest.mark.unit
+    def test_parent_index_comes_from_the_catalog(self):
+        """With the catalog in use, parent selection refreshes it instead of listing every snapshot"""
+        self.repo.use_snapshot_catalog = True
+
+        assert len(self.repo.snapshot_index()) == 5
+        self.restic.snapshots.append(_snapshot_json(6))
+        self.restic.calls.clear()
+        index = self.repo.snapshot_index(refresh=True)
+
+        assert len(index) == 6
+        assert [self.restic.requested_ids(argv) for argv in self.restic.snapshot_calls()] == [[_snapshot_json(6)["id"]]]
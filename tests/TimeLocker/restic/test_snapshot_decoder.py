@@ -0,0 +1,102 @@
+"""
+Tests for decoding restic snapshot listings
+"""
+
+import gc
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from TimeLocker.restic import snapshot_decoder
+from TimeLocker.restic.snapshot_decoder import SnapshotDecoder, loads, parse_rfc3339
+
+LISTING = [
+        {"time": "2025-03-29T21:09:34.068185654+02:00", "paths": ["/home", "/etc"], "hostname": "alpha",
+         "username": "root", "tags": ["daily"], "id": "a" * 64, "short_id": "aaaaaaaa"},
+        {"time": "2025-03-30T08:00:00Z", "paths": ["/home"], "hostname": "alpha", "id": "b" * 64,
+         "short_id": "bbbbbbbb"},
+        {"time": "2025-03-31T08:00:00.5-05:30", "paths": ["/etc"], "tags": ["daily", "db"], "id": "c" * 64,
+         "short_id": "cccccccc"},
+]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("text,expected", [
+        ("2025-03-29T21:09:34.068185654+02:00",
+         datetime(2025, 3, 29, 21, 9, 34, 68185, tzinfo=timezone(timedelta(hours=2)))),
+        ("2025-03-29T19:09:34Z", datetime(2025, 3, 29, 19, 9, 34, tzinfo=timezone.utc)),
+        ("2025-03-29T19:09:34.1", datetime(2025, 3, 29, 19, 9, 34, 100000, tzinfo=timezone.utc)),
+        ("2025-03-29T19:09:34-05:30", datetime(2025, 3, 29, 19, 9, 34, tzinfo=timezone(-timedelta(hours=5, minutes=30)))),
+])
+def test_parse_rfc3339(text, expected):
+    """restic's timestamps parse to aware datetimes in their own zone"""
+    parsed = parse_rfc3339(text)
+
+    assert parsed == expected
+    assert parsed.utcoffset() == expected.utcoffset()
+
+
+@pytest.mark.unit
+def test_parse_rfc3339_rejects_garbage():
+    """Text that is not a timestamp raises ValueError"""
+    with pytest.raises(ValueError):
+        parse_rfc3339("not a time")
+
+
+@pytest.mark.unit
+def test_decoder_builds_snapshots():
+    """Snapshots carry the listing's fields and share path objects"""
+    repository = object()
+    snapshots = SnapshotDecoder().decode(json.dumps(LISTING), repository)
+
+    assert [s.id for s in snapshots] == ["aaaaaaaa", "bbbbbbbb", "cccccccc"]
+    assert snapshots[0].repo is repository
+    assert snapshots[0].paths == [Path("/home"), Path("/etc")]
+    assert snapshots[0].paths[0] is snapshots[1].paths[0]
+    assert snapshots[1].timestamp == datetime(2025, 3, 30, 8, tzinfo=timezone.utc)
+    assert (snapshots[0].hostname, snapshots[0].tags) == ("alpha", ["daily"])
+    assert snapshots[1].tags == [] and snapshots[2].hostname is None
+    assert snapshots[2].tags is not LISTING[2]["tags"]
+
+
+@pytest.mark.unit
+def test_decoder_restores_collector_state():
+    """Decoding leaves the garbage collector as it found it"""
+    decoder = SnapshotDecoder()
+    assert gc.isenabled()
+    decoder.decode(json.dumps(LISTING), None)
+    assert gc.isenabled()
+
+    gc.disable()
+    try:
+        decoder.decode(json.dumps(LISTING), None)
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+    assert SnapshotDecoder().decode("", None) == []
+
+
+@pytest.mark.unit
+def test_loads_prefers_orjson():
+    """The optional orjson backend is used when it is importable"""
+    fake = SimpleNamespace(loads=lambda data: ["from orjson"])
+    with patch.object(snapshot_decoder, "orjson", fake):
+        assert loads(b"[]") == ["from orjson"]
+    with patch.object(snapshot_decoder, "orjson", None):
+        assert loads("[1]") == [1]
+
+
+@pytest.mark.unit
+def test_decoder_keeps_nanoseconds_and_shares_tuples():
+    """Listing times keep their nanoseconds and equal path and tag sets are stored once"""
+    snapshots = SnapshotDecoder().decode(json.dumps(LISTING + [dict(LISTING[0], short_id="dddddddd")]), None)
+
+    assert snapshots[0].timestamp_ns == 1_743_275_374_068_185_654
+    assert snapshots[2].timestamp_ns % 1_000_000_000 == 500_000_000
+    assert snapshots[0]._paths is snapshots[3]._paths and snapshots[0]._tags is snapshots[3]._tags
+    assert snapshots[0].timestamp.tzinfo is snapshots[3].timestamp.tzinfo
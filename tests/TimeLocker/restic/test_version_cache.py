@@ -0,0 +1,120 @@
+"""
+Tests for caching the detected restic version per binary
+"""
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from TimeLocker.restic import version_cache
+from TimeLocker.restic.errors import ResticError
+from TimeLocker.restic.restic_repository import ResticRepository
+from TimeLocker.restic.version_cache import BinaryIdentity, ResticVersionCache, identify_binary
+
+POSIX_ONLY = pytest.mark.skipif(os.name == "nt", reason="uses an executable script on PATH")
+
+
+class _ConcreteRepo(ResticRepository):
+    def backend_env(self):
+        return {}
+
+    def validate(self):
+        return "ok"
+
+
+@pytest.fixture
+def fake_restic(tmp_path, monkeypatch):
+    """An executable named restic, first on PATH through a symlink"""
+    real = tmp_path / "opt" / "restic-0.18.1"
+    real.parent.mkdir()
+    real.write_text("#!/bin/sh\nexit 0\n")
+    real.chmod(0o755)
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "restic").symlink_to(real)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    return real
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Version cache in a temporary directory, used by every repository"""
+    cache = ResticVersionCache(tmp_path / "cache")
+    with patch.object(version_cache, "_default_cache", cache):
+        yield cache
+
+
+@POSIX_ONLY
+@pytest.mark.unit
+def test_identify_binary_follows_symlinks(fake_restic):
+    """The identity names the real file and changes when it is rewritten"""
+    binary = identify_binary("restic")
+
+    assert binary.path == os.path.realpath(fake_restic)
+    assert binary.size == fake_restic.stat().st_size
+    fake_restic.write_text("#!/bin/sh\nexit 1\n")
+    assert identify_binary("restic") != binary
+    assert identify_binary("no-such-restic-binary") is None
+
+
+@pytest.mark.unit
+def test_cache_persists_and_invalidates(tmp_path):
+    """Versions survive a new process and are dropped when the binary changes"""
+    binary = BinaryIdentity("/usr/bin/restic", 1_700_000_000_000_000_000, 30_000_000)
+    ResticVersionCache(tmp_path).put(binary, "0.18.1")
+
+    fresh = ResticVersionCache(tmp_path)
+    assert fresh.get(binary) == ("0.18.1", False)
+    assert fresh.get(binary._replace(mtime_ns=binary.mtime_ns + 1)) is None
+    assert fresh.get(binary._replace(size=1)) is None
+    assert (fresh.hits, fresh.misses) == (1, 2)
+
+    fresh.clear()
+    assert ResticVersionCache(tmp_path).get(binary) is None
+
+
+@pytest.mark.unit
+def test_cache_tolerates_bad_files_and_bounds_entries(tmp_path):
+    """A corrupt cache file is ignored, and only the newest binaries are kept"""
+    (tmp_path / version_cache.CACHE_FILE_NAME).write_text("{not json")
+    cache = ResticVersionCache(tmp_path)
+    binaries = [BinaryIdentity(f"/opt/restic-{i}", i, i) for i in range(version_cache.MAX_ENTRIES + 3)]
+    for binary in binaries:
+        cache.put(binary, "0.18.0")
+
+    stored = json.loads((tmp_path / version_cache.CACHE_FILE_NAME).read_text())
+    assert list(stored) == [b.path for b in binaries[3:]]
+
+
+@POSIX_ONLY
+@pytest.mark.unit
+def test_repository_construction_uses_cache(fake_restic, cache):
+    """Only the first repository for a binary runs 'restic version'"""
+    with patch("TimeLocker.restic.restic_repository.CommandBuilder.run",
+               return_value=json.dumps({"version": "0.18.1"})) as run:
+        first = _ConcreteRepo(location="/backups/a")
+        second = _ConcreteRepo(location="/backups/b")
+        assert run.call_count == 1
+
+        os.utime(fake_restic, ns=(0, 0))  # upgraded in place
+        _ConcreteRepo(location="/backups/c")
+        assert run.call_count == 2
+
+    assert first._restic_version == second._restic_version == "0.18.1"
+
+
+@POSIX_ONLY
+@pytest.mark.unit
+def test_cached_version_still_checked_against_minimum(fake_restic, cache):
+    """A cached version below the minimum fails as a detected one would; legacy ones only warn"""
+    binary = identify_binary("restic")
+    cache.put(binary, "0.9.0")
+    with patch("TimeLocker.restic.restic_repository.CommandBuilder.run") as run:
+        with pytest.raises(ResticError, match="below the required minimum"):
+            _ConcreteRepo(location="/backups/a")
+
+        cache.put(binary, "0.9.0", legacy=True)
+        assert _ConcreteRepo(location="/backups/a")._restic_version == "0.9.0"
+    run.assert_not_called()
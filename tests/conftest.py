@@ -0,0 +1,42 @@
+"""
+Copyright ©  Bruce Cherrington
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import TimeLocker.config.configuration_path_resolver as resolver
+import TimeLocker.restic.version_cache as version_cache
+import src.TimeLocker.config.configuration_path_resolver as src_resolver
+import src.TimeLocker.restic.version_cache as src_version_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_directory(tmp_path, monkeypatch):
+    """
+    Keep every on-disk cache (restic versions, snapshot catalogs, scan and
+    selection caches) inside the test's temporary directory.
+
+    Tests import the package both as TimeLocker and as src.TimeLocker, so
+    both copies of the resolver and the process-wide version cache are reset.
+    """
+    xdg_cache_home = tmp_path / "xdg-cache"
+    cache_dir = xdg_cache_home / "timelocker"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(xdg_cache_home))
+    for module in (resolver, src_resolver):
+        monkeypatch.setattr(module.ConfigurationPathResolver, "get_cache_directory", staticmethod(lambda: cache_dir))
+    for module in (version_cache, src_version_cache):
+        monkeypatch.setattr(module, "_default_cache", None)
+    return cache_dir